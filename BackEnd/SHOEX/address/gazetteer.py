@@ -0,0 +1,262 @@
+"""
+Danh mục địa chỉ Việt Nam trong bộ nhớ (tỉnh → phường/xã → thôn/xóm/địa điểm)
+
+Nguồn: file SQLite đi kèm repo (settings.ADDRESS_DATASET_PATH, bảng address_level4: province, ward, hamlet),
+nạp 1 lần mỗi process (get_gazetteer). Form địa chỉ không phụ thuộc API bên ngoài nữa;
+cập nhật dữ liệu bằng manage.py rebuild_address_dataset.
+
+So khớp không dấu, không phân biệt hoa thường: 'ha noi', 'Hà Nội', 'thành phố hà nội' là 1.
+Gợi ý theo tiền tố dùng mảng khóa đã sắp xếp + bisect cho từng cấp; mỗi tên được đánh chỉ mục
+theo tên đầy đủ và theo từng từ ('Phường Ba Đình' → 'phuong ba dinh', 'ba dinh', 'dinh').
+"""
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from contextlib import closing
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROVINCE, WARD, HAMLET = 'province', 'ward', 'hamlet'
+LEVELS = (PROVINCE, WARD, HAMLET)
+
+ADMIN_PREFIXES = (
+    'thanh pho', 'tp', 'tinh', 'quan', 'huyen', 'thi xa', 'thi tran', 'phuong', 'xa', 'p', 'x',
+)
+
+Suggestion = namedtuple('Suggestion', 'level province ward hamlet')
+
+
+def fold(text):
+    """'Thành phố Hà Nội' → 'thanh pho ha noi' (bỏ dấu, chữ thường, chỉ giữ chữ/số)"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text).replace('Đ', 'D').replace('đ', 'd'))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', text).strip()
+
+
+def strip_admin_prefix(folded):
+    """'thanh pho ha noi' → 'ha noi'; 'phuong 01' → 'phuong 01' (không bỏ nếu chỉ còn số)"""
+    for prefix in ADMIN_PREFIXES:
+        if folded.startswith(prefix + ' ') and len(folded) > len(prefix) + 1:
+            rest = folded[len(prefix) + 1:]
+            return folded if rest.isdigit() else rest
+    return folded
+
+
+def _sort_key(name):
+    """Sắp xếp theo tên bỏ tiền tố hành chính: Bắc Ninh, Đà Nẵng, Hà Nội"""
+    folded = fold(name)
+    return strip_admin_prefix(folded), folded
+
+
+def _index_keys(name):
+    """Tên đầy đủ + mọi hậu tố theo từ"""
+    words = fold(name).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class _PrefixIndex:
+    """Mảng khóa đã sắp xếp + id bản ghi song song (gọn hơn trie, tra cứu O(log n))"""
+
+    def __init__(self, pairs):
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.refs = array('I', (ref for _, ref in pairs))
+
+    def scan(self, prefix):
+        index = bisect_left(self.keys, prefix)
+        keys, refs = self.keys, self.refs
+        while index < len(keys) and keys[index].startswith(prefix):
+            yield refs[index]
+            index += 1
+
+
+class Gazetteer:
+    def __init__(self, rows):
+        """rows: iterable (province, ward, hamlet); hamlet có thể rỗng"""
+        tree = {}
+        for province, ward, hamlet in rows:
+            if not province:
+                continue
+            wards = tree.setdefault(province, {})
+            if ward:
+                hamlets = wards.setdefault(ward, set())
+                if hamlet:
+                    hamlets.add(hamlet)
+
+        self._tree = {
+            province: {ward: sorted(hamlets, key=_sort_key) for ward, hamlets in wards.items()}
+            for province, wards in tree.items()
+        }
+        self._provinces = sorted(self._tree, key=_sort_key)
+        self._wards = {province: sorted(wards, key=_sort_key) for province, wards in self._tree.items()}
+
+        # Tra tên không dấu / không tiền tố hành chính → tên chuẩn
+        self._province_lookup = {}
+        self._ward_lookup = {}
+        for province in self._provinces:
+            self._add_lookup(self._province_lookup, province)
+            self._ward_lookup[province] = {}
+            for ward in self._wards[province]:
+                self._add_lookup(self._ward_lookup[province], ward)
+
+        self._entries = []
+        pairs = {level: [] for level in LEVELS}
+        for province in self._provinces:
+            self._add_entry(pairs, Suggestion(PROVINCE, province, None, None), province)
+            for ward in self._wards[province]:
+                self._add_entry(pairs, Suggestion(WARD, province, ward, None), ward)
+                for hamlet in self._tree[province][ward]:
+                    self._add_entry(pairs, Suggestion(HAMLET, province, ward, hamlet), hamlet)
+        self._indexes = {level: _PrefixIndex(pairs[level]) for level in LEVELS}
+
+    @staticmethod
+    def _add_lookup(lookup, name):
+        folded = fold(name)
+        lookup.setdefault(folded, name)
+        lookup.setdefault(strip_admin_prefix(folded), name)
+
+    def _add_entry(self, pairs, entry, name):
+        ref = len(self._entries)
+        self._entries.append(entry)
+        pairs[entry.level].extend((key, ref) for key in _index_keys(name))
+
+    # ===== TRA CỨU =====
+
+    def __len__(self):
+        return len(self._entries)
+
+    def provinces(self):
+        return list(self._provinces)
+
+    def find_province(self, name):
+        """Tên tỉnh chuẩn trong dữ liệu (None nếu không có)"""
+        folded = fold(name)
+        return self._province_lookup.get(folded) or self._province_lookup.get(strip_admin_prefix(folded))
+
+    def find_ward(self, province, name):
+        province = self.find_province(province)
+        if province is None:
+            return None
+        folded = fold(name)
+        lookup = self._ward_lookup[province]
+        return lookup.get(folded) or lookup.get(strip_admin_prefix(folded))
+
+    def wards(self, province):
+        province = self.find_province(province)
+        return list(self._wards[province]) if province else []
+
+    def hamlets(self, province, ward):
+        province = self.find_province(province)
+        ward = self.find_ward(province, ward) if province else None
+        return list(self._tree[province][ward]) if ward else []
+
+    def suggest(self, prefix, limit=10, province=None):
+        """
+        Gợi ý theo tiền tố (không dấu, khớp đầu từ): tỉnh trước, rồi phường/xã, rồi thôn/xóm.
+        province: chỉ gợi ý trong tỉnh này.
+        """
+        prefix = fold(prefix)
+        if not prefix or limit <= 0:
+            return []
+        if province is not None:
+            province = self.find_province(province)
+            if province is None:
+                return []
+
+        results, seen = [], set()
+        for level in LEVELS:
+            for ref in self._indexes[level].scan(prefix):
+                if ref in seen:
+                    continue
+                entry = self._entries[ref]
+                if province is not None and entry.province != province:
+                    continue
+                seen.add(ref)
+                results.append(entry)
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+# ===== DỮ LIỆU SQLITE =====
+
+def read_rows(path):
+    """[(province, ward, hamlet)] từ file SQLite (mở chỉ đọc)"""
+    with closing(sqlite3.connect(f'file:{path}?mode=ro', uri=True)) as conn:
+        return conn.execute(
+            'SELECT province, ward, hamlet FROM address_level4 ORDER BY id'
+        ).fetchall()
+
+
+def write_rows(path, rows):
+    """Ghi dữ liệu mới ra file SQLite (cùng schema với file đi kèm repo)"""
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.executescript(
+            """
+            DROP TABLE IF EXISTS address_level4;
+            CREATE TABLE address_level4 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                province TEXT,
+                ward TEXT,
+                hamlet TEXT,
+                UNIQUE(province, ward, hamlet)
+            );
+            """
+        )
+        conn.executemany(
+            'INSERT OR IGNORE INTO address_level4 (province, ward, hamlet) VALUES (?, ?, ?)', rows,
+        )
+
+
+def diff_rows(old_rows, new_rows):
+    """{level: (thêm, bớt)} giữa 2 bộ dữ liệu, mỗi phần là set các tuple"""
+    def levels(rows):
+        provinces, wards, hamlets = set(), set(), set()
+        for province, ward, hamlet in rows:
+            provinces.add((province,))
+            if ward:
+                wards.add((province, ward))
+                if hamlet:
+                    hamlets.add((province, ward, hamlet))
+        return {PROVINCE: provinces, WARD: wards, HAMLET: hamlets}
+
+    old, new = levels(old_rows), levels(new_rows)
+    return {level: (new[level] - old[level], old[level] - new[level]) for level in LEVELS}
+
+
+# ===== INSTANCE DÙNG CHUNG =====
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Gazetteer của process (nạp từ settings.ADDRESS_DATASET_PATH lần đầu khi cần)"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                path = settings.ADDRESS_DATASET_PATH
+                try:
+                    rows = read_rows(path)
+                except sqlite3.Error:
+                    logger.exception('Could not load address dataset %s', path)
+                    rows = []
+                _gazetteer = Gazetteer(rows)
+    return _gazetteer
+
+
+def reset_gazetteer():
+    """Bỏ bản đang nạp; lần gọi get_gazetteer() kế tiếp đọc lại file"""
+    global _gazetteer
+    with _gazetteer_lock:
+        _gazetteer = None
@@ -0,0 +1,54 @@
+"""
+Chuẩn hóa tỉnh / phường xã của địa chỉ đã lưu (Address, AddressStore) theo danh mục địa chỉ
+Chạy: python manage.py normalize_addresses --dry-run   # chỉ thống kê
+      python manage.py normalize_addresses
+
+Mỗi cặp (tỉnh, phường xã) khác nhau chỉ chuẩn hóa 1 lần rồi cập nhật bằng 1 câu UPDATE cho mọi dòng
+cùng cặp (không gọi save() từng dòng). In các cặp không khớp được nhiều nhất để bổ sung ALIASES.
+"""
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from address.models import Address
+from address.normalize import get_normalizer
+from store.models import AddressStore
+
+
+class Command(BaseCommand):
+    help = 'Canonicalize province / ward names of saved buyer and store addresses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ thống kê, không cập nhật')
+        parser.add_argument('--top', type=int, default=20, help='Số cặp không khớp in ra')
+
+    def handle(self, *args, **options):
+        normalizer = get_normalizer()
+        for model in (Address, AddressStore):
+            pairs = model.objects.values('province', 'ward').annotate(rows=Count('pk')).order_by()
+            methods, unmatched, updated = Counter(), Counter(), 0
+
+            with transaction.atomic():
+                for pair in list(pairs):
+                    result = normalizer.match(pair['province'], pair['ward'])
+                    methods[result.province.method if result.province else 'unmatched'] += pair['rows']
+                    if result.province is None or result.ward is None:
+                        unmatched[(pair['province'], pair['ward'])] += pair['rows']
+
+                    province, ward = normalizer.canonical(pair['province'], pair['ward'])
+                    if (province, ward) == (pair['province'], pair['ward']):
+                        continue
+                    if not options['dry_run']:
+                        model.objects.filter(province=pair['province'], ward=pair['ward']).update(
+                            province=province, ward=ward,
+                        )
+                    updated += pair['rows']
+
+            label = model._meta.verbose_name_plural
+            action = 'would update' if options['dry_run'] else 'updated'
+            self.stdout.write(self.style.SUCCESS(f'{label}: {action} {updated} rows'))
+            self.stdout.write('  province match: ' + ', '.join(f'{k}={v}' for k, v in methods.most_common()))
+            for (province, ward), rows in unmatched.most_common(options['top']):
+                self.stdout.write(f'  unmatched: {province} / {ward} ({rows})')
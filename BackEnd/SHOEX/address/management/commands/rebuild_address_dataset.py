@@ -0,0 +1,111 @@
+"""
+Dựng lại danh mục địa chỉ (settings.ADDRESS_DATASET_PATH) và in khác biệt so với bản hiện tại
+Chạy: python manage.py rebuild_address_dataset --dry-run        # chỉ xem khác biệt
+      python manage.py rebuild_address_dataset                  # tỉnh + phường/xã từ provinces.open-api.vn
+      python manage.py rebuild_address_dataset --hamlets        # thêm thôn/xóm từ GHTK (chậm: 1 request / phường)
+      python manage.py rebuild_address_dataset --from-db new.db # lấy dữ liệu từ file SQLite khác
+
+Không lấy thôn/xóm thì giữ thôn/xóm cũ của các phường/xã còn tồn tại.
+File mới được ghi ra file tạm rồi thay thế nguyên tử; các process đang chạy cần khởi động lại để nạp bản mới.
+"""
+import os
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from address.gazetteer import LEVELS, diff_rows, read_rows, reset_gazetteer, write_rows
+
+PROVINCES_API = 'https://provinces.open-api.vn/api/v2/p/'
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the bundled Vietnamese address dataset and show what changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.ADDRESS_DATASET_PATH, help='File SQLite cần cập nhật')
+        parser.add_argument('--from-db', help='Lấy dữ liệu mới từ file SQLite này thay vì gọi API')
+        parser.add_argument('--source-url', default=PROVINCES_API, help='API tỉnh / phường xã')
+        parser.add_argument('--hamlets', action='store_true', help='Lấy thôn/xóm từ GHTK cho mọi phường/xã')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ in khác biệt, không ghi file')
+        parser.add_argument('--samples', type=int, default=10, help='Số dòng ví dụ in ra cho mỗi loại thay đổi')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        old_rows = read_rows(output) if os.path.exists(output) else []
+
+        started = time.monotonic()
+        if options['from_db']:
+            new_rows = read_rows(options['from_db'])
+        else:
+            wards = self._fetch_wards(options['source_url'])
+            if options['hamlets']:
+                new_rows = self._fetch_hamlets(wards)
+            else:
+                new_rows = self._keep_hamlets(wards, old_rows)
+        self.stdout.write(f'Fetched {len(new_rows)} rows in {time.monotonic() - started:.1f}s')
+
+        if not new_rows:
+            raise CommandError('New dataset is empty, keeping the current file')
+
+        self._report_diff(diff_rows(old_rows, new_rows), options['samples'])
+        if options['dry_run']:
+            return
+
+        tmp_path = f'{output}.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        write_rows(tmp_path, new_rows)
+        os.replace(tmp_path, output)
+        reset_gazetteer()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(new_rows)} rows to {output}'))
+
+    def _fetch_wards(self, source_url):
+        """[(province, ward)] từ provinces.open-api.vn (v2: tỉnh → phường/xã)"""
+        session = requests.Session()
+        try:
+            response = session.get(source_url, timeout=30)
+            response.raise_for_status()
+            wards = []
+            for province in response.json():
+                detail = session.get(f"{source_url}{province['code']}", params={'depth': 2}, timeout=30)
+                detail.raise_for_status()
+                wards.extend((province['name'], ward['name']) for ward in detail.json().get('wards', []))
+            return wards
+        except (requests.RequestException, ValueError, KeyError) as e:
+            raise CommandError(f'Could not fetch provinces: {e}')
+
+    def _keep_hamlets(self, wards, old_rows):
+        hamlets = {}
+        for province, ward, hamlet in old_rows:
+            if hamlet:
+                hamlets.setdefault((province, ward), []).append(hamlet)
+        rows = []
+        for province, ward in wards:
+            rows.extend((province, ward, hamlet) for hamlet in hamlets.get((province, ward), [None]))
+        return rows
+
+    def _fetch_hamlets(self, wards):
+        from shipments.carrier import CarrierError, get_ghtk_client
+
+        client = get_ghtk_client()
+        rows = []
+        for index, (province, ward) in enumerate(wards, 1):
+            try:
+                hamlets = client.get_address_level4(province, ward)
+            except CarrierError as e:
+                self.stderr.write(f'{province} - {ward}: {e}')
+                hamlets = []
+            rows.extend((province, ward, hamlet) for hamlet in hamlets or [None])
+            if index % 100 == 0:
+                self.stdout.write(f'{index}/{len(wards)} wards')
+        return rows
+
+    def _report_diff(self, diff, samples):
+        for level in LEVELS:
+            added, removed = diff[level]
+            self.stdout.write(f'{level}: +{len(added)} -{len(removed)}')
+            for sign, items in (('+', added), ('-', removed)):
+                for item in sorted(items)[:samples]:
+                    self.stdout.write(f'  {sign} ' + ' / '.join(item))
@@ -1,4 +1,5 @@
 from django.db import models
+from .normalize import normalize_address_fields
 
 
 class Address(models.Model):
@@ -94,6 +95,9 @@ class Address(models.Model):
     
     def save(self, *args, **kwargs):
         """Override save để đảm bảo chỉ có 1 địa chỉ mặc định per user"""
+        # Tỉnh / phường xã về tên chuẩn theo danh mục địa chỉ
+        normalize_address_fields(self)
+
         if self.is_default:
             # Bỏ default của các địa chỉ khác của cùng user
             Address.objects.filter(
@@ -0,0 +1,182 @@
+"""
+Chuẩn hóa tỉnh / phường xã về tên chuẩn trong danh mục (address/gazetteer.py)
+
+'Tp. HCM', 'Hồ Chí Minh', 'TP Ho Chi Minh', 'Sài Gòn' → cùng 1 tên chuẩn và cùng 1 khóa ('ho chi minh').
+Thứ tự so khớp (dừng ở bước đầu tiên khớp):
+  1. exact  - không dấu, bỏ tiền tố hành chính ('thanh pho', 'phuong'...), bỏ số 0 đầu, viết liền
+  2. alias  - bảng viết tắt / tên cũ (ALIASES + settings.ADDRESS_ALIASES)
+  3. token  - cùng tập từ, khác thứ tự
+  4. fuzzy  - gõ sai chính tả (difflib, ngưỡng FUZZY_CUTOFF, phải hơn hẳn ứng viên thứ 2)
+Không khớp → giữ nguyên chuỗi người dùng nhập (chỉ gom khoảng trắng).
+
+Dùng khi lưu Address / AddressStore, khi gửi địa chỉ cho GHTK và khi tạo khóa cache báo giá (place_key).
+"""
+import re
+import threading
+from collections import namedtuple
+from difflib import SequenceMatcher, get_close_matches
+
+from django.conf import settings
+
+from .gazetteer import fold, get_gazetteer, strip_admin_prefix
+
+FUZZY_CUTOFF = 0.85
+# Ứng viên tốt nhất phải hơn ứng viên thứ 2 ít nhất chừng này mới nhận
+FUZZY_MARGIN = 0.05
+CACHE_SIZE = 4096
+
+# Khóa (không dấu, đã bỏ tiền tố) → khóa tên chuẩn
+ALIASES = {
+    'hcm': 'ho chi minh',
+    'tphcm': 'ho chi minh',
+    'hcmc': 'ho chi minh',
+    'sai gon': 'ho chi minh',
+    'saigon': 'ho chi minh',
+    'sg': 'ho chi minh',
+    'ho chi minh city': 'ho chi minh',
+    'hn': 'ha noi',
+    'thu do ha noi': 'ha noi',
+    'tt hue': 'hue',
+    'thua thien hue': 'hue',
+}
+
+Match = namedtuple('Match', 'name method score')
+PlaceMatch = namedtuple('PlaceMatch', 'province ward')
+
+
+def clean(text):
+    """Gom khoảng trắng thừa"""
+    return re.sub(r'\s+', ' ', str(text or '')).strip()
+
+
+def _base_key(name):
+    """'Phường 01' → 'phuong 1'; 'Thành phố Hà Nội' → 'ha noi'"""
+    return re.sub(r'\b0+(\d)', r'\1', strip_admin_prefix(fold(name)))
+
+
+def _keys(name):
+    base = _base_key(name)
+    return {fold(name), base, base.replace(' ', '')}
+
+
+class _LevelIndex:
+    """Chỉ mục so khớp cho 1 danh sách tên (tỉnh, hoặc phường/xã của 1 tỉnh)"""
+
+    def __init__(self, names):
+        self.exact = {}
+        self.tokens = {}
+        self.base_keys = {}
+        ambiguous = set()
+        for name in names:
+            for key in _keys(name):
+                if self.exact.setdefault(key, name) != name:
+                    ambiguous.add(key)
+            base = _base_key(name)
+            self.base_keys.setdefault(base, name)
+            self.tokens.setdefault(frozenset(base.split()), name)
+        for key in ambiguous:
+            del self.exact[key]
+
+    def match(self, text, aliases):
+        folded = fold(text)
+        if not folded:
+            return None
+        base = _base_key(text)
+        for key in (folded, base, base.replace(' ', '')):
+            if key in self.exact:
+                return Match(self.exact[key], 'exact', 1.0)
+
+        for key in (folded, base, base.replace(' ', '')):
+            target = aliases.get(key)
+            if target is not None and target in self.exact:
+                return Match(self.exact[target], 'alias', 1.0)
+
+        name = self.tokens.get(frozenset(base.split()))
+        if name is not None:
+            return Match(name, 'token', 1.0)
+
+        candidates = get_close_matches(base, self.base_keys, n=2, cutoff=FUZZY_CUTOFF)
+        if candidates:
+            best = SequenceMatcher(None, base, candidates[0]).ratio()
+            second = SequenceMatcher(None, base, candidates[1]).ratio() if len(candidates) > 1 else 0
+            if best - second >= FUZZY_MARGIN:
+                return Match(self.base_keys[candidates[0]], 'fuzzy', round(best, 3))
+        return None
+
+
+class AddressNormalizer:
+    def __init__(self, gazetteer, aliases=None):
+        self.gazetteer = gazetteer
+        self.aliases = {fold(k): fold(v) for k, v in {**ALIASES, **(aliases or {})}.items()}
+        self._provinces = _LevelIndex(gazetteer.provinces())
+        self._wards = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _ward_index(self, province):
+        index = self._wards.get(province)
+        if index is None:
+            index = self._wards[province] = _LevelIndex(self.gazetteer.wards(province))
+        return index
+
+    def match(self, province, ward=None):
+        """PlaceMatch(Match | None, Match | None) cho cặp tỉnh / phường xã"""
+        cache_key = (province, ward)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        province_match = self._provinces.match(province, self.aliases) if province else None
+        ward_match = None
+        if province_match is not None and ward:
+            with self._lock:
+                index = self._ward_index(province_match.name)
+            ward_match = index.match(ward, self.aliases)
+        result = PlaceMatch(province_match, ward_match)
+
+        if len(self._cache) >= CACHE_SIZE:
+            self._cache.clear()
+        self._cache[cache_key] = result
+        return result
+
+    def canonical(self, province, ward=None):
+        """(tỉnh, phường xã) tên chuẩn; phần không khớp giữ nguyên như người dùng nhập"""
+        result = self.match(province, ward)
+        return (
+            result.province.name if result.province else clean(province),
+            result.ward.name if result.ward else clean(ward),
+        )
+
+
+_normalizer = None
+_normalizer_lock = threading.Lock()
+
+
+def get_normalizer():
+    """Normalizer của process; dựng lại khi gazetteer được nạp lại"""
+    global _normalizer
+    gazetteer = get_gazetteer()
+    normalizer = _normalizer
+    if normalizer is None or normalizer.gazetteer is not gazetteer:
+        with _normalizer_lock:
+            if _normalizer is None or _normalizer.gazetteer is not gazetteer:
+                _normalizer = AddressNormalizer(gazetteer, getattr(settings, 'ADDRESS_ALIASES', None))
+            normalizer = _normalizer
+    return normalizer
+
+
+def canonical_place(province, ward=None):
+    """(tỉnh, phường xã) tên chuẩn để gửi cho hãng vận chuyển / lưu DB"""
+    return get_normalizer().canonical(province, ward)
+
+
+def place_key(province, ward=None):
+    """Khóa ổn định cho cache / tra cứu: tên chuẩn, không dấu, bỏ tiền tố ('ho chi minh', 'sai gon')"""
+    province, ward = canonical_place(province, ward)
+    return _base_key(province), _base_key(ward)
+
+
+def normalize_address_fields(address):
+    """Chuẩn hóa province / ward / hamlet của Address hoặc AddressStore (gọi trước khi lưu)"""
+    address.province, address.ward = canonical_place(address.province, address.ward)
+    address.hamlet = clean(address.hamlet) or None
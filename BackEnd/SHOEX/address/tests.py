@@ -1,3 +1,110 @@
-from django.test import TestCase
+import os
+import tempfile
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from .gazetteer import Gazetteer, HAMLET, PROVINCE, WARD, diff_rows, fold, read_rows, write_rows
+from .models import Address
+from .normalize import AddressNormalizer, place_key
+
+ROWS = [
+    ('Thành phố Hà Nội', 'Phường Ba Đình', 'Lotte Center'),
+    ('Thành phố Hà Nội', 'Phường Ba Đình', 'Skyline Tower'),
+    ('Thành phố Hà Nội', 'Phường Ngọc Hà', None),
+    ('Thành phố Đà Nẵng', 'Phường Hải Châu', 'Chợ Hàn'),
+    ('Tỉnh Bắc Ninh', 'Phường Kinh Bắc', None),
+    ('Thành phố Hồ Chí Minh', 'Phường Sài Gòn', None),
+    ('Thành phố Hồ Chí Minh', 'Phường Bến Thành', None),
+    ('Thành phố Hồ Chí Minh', 'Phường 1', None),
+]
+
+
+class GazetteerTest(SimpleTestCase):
+    def setUp(self):
+        self.gazetteer = Gazetteer(ROWS)
+
+    def test_fold_removes_accents_and_punctuation(self):
+        self.assertEqual(fold('Thành phố  Đà-Nẵng'), 'thanh pho da nang')
+
+    def test_lookups_ignore_accents_and_admin_prefix(self):
+        self.assertEqual(self.gazetteer.provinces(), [
+            'Tỉnh Bắc Ninh', 'Thành phố Đà Nẵng', 'Thành phố Hà Nội', 'Thành phố Hồ Chí Minh',
+        ])
+        self.assertEqual(self.gazetteer.wards('ha noi'), ['Phường Ba Đình', 'Phường Ngọc Hà'])
+        self.assertEqual(self.gazetteer.wards('THÀNH PHỐ HÀ NỘI'), ['Phường Ba Đình', 'Phường Ngọc Hà'])
+        self.assertEqual(self.gazetteer.hamlets('Hà Nội', 'ba dinh'), ['Lotte Center', 'Skyline Tower'])
+        self.assertEqual(self.gazetteer.wards('Cần Thơ'), [])
+
+    def test_suggest_matches_word_prefixes_by_level(self):
+        levels = [(s.level, s.hamlet or s.ward or s.province) for s in self.gazetteer.suggest('ba d')]
+        self.assertEqual(levels, [(WARD, 'Phường Ba Đình')])
+
+        levels = [(s.level, s.hamlet or s.ward or s.province) for s in self.gazetteer.suggest('bac')]
+        self.assertEqual(levels, [(PROVINCE, 'Tỉnh Bắc Ninh'), (WARD, 'Phường Kinh Bắc')])
+
+        self.assertEqual([s.hamlet for s in self.gazetteer.suggest('to')], ['Skyline Tower'])
+        self.assertEqual(self.gazetteer.suggest('ha', limit=1)[0].level, PROVINCE)
+        self.assertEqual([s.level for s in self.gazetteer.suggest('cho', province='da nang')], [HAMLET])
+        self.assertEqual(self.gazetteer.suggest('cho', province='ha noi'), [])
+
+    def test_bundled_dataset_loads(self):
+        from django.conf import settings
+
+        gazetteer = Gazetteer(read_rows(settings.ADDRESS_DATASET_PATH))
+        self.assertTrue(gazetteer.provinces())
+        self.assertTrue(gazetteer.suggest('phuong'))
+
+    def test_rebuild_from_db_writes_dataset_and_reports_diff(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            current, new = os.path.join(tmp, 'current.db'), os.path.join(tmp, 'new.db')
+            write_rows(current, ROWS)
+            write_rows(new, ROWS[1:] + [('Tỉnh Bắc Ninh', 'Phường Kinh Bắc', 'Đền Đô')])
+
+            diff = diff_rows(read_rows(current), read_rows(new))
+            self.assertEqual(diff[HAMLET], (
+                {('Tỉnh Bắc Ninh', 'Phường Kinh Bắc', 'Đền Đô')},
+                {('Thành phố Hà Nội', 'Phường Ba Đình', 'Lotte Center')},
+            ))
+            self.assertEqual(diff[WARD], (set(), set()))
+
+            call_command('rebuild_address_dataset', output=current, from_db=new, stdout=open(os.devnull, 'w'))
+            self.assertEqual(sorted(read_rows(current), key=str), sorted(read_rows(new), key=str))
+
+
+class AddressNormalizerTest(SimpleTestCase):
+    def setUp(self):
+        self.normalizer = AddressNormalizer(Gazetteer(ROWS))
+
+    def test_spelling_variants_map_to_one_canonical_place(self):
+        for province in ('Tp. HCM', 'Hồ Chí Minh', 'TP Ho Chi Minh', 'thành phố hồ chí minh', 'Sài Gòn', 'TPHCM',
+                         'Minh Hồ Chí', 'Ho Chi Mihn'):
+            self.assertEqual(
+                self.normalizer.canonical(province, 'p. ben thanh'), ('Thành phố Hồ Chí Minh', 'Phường Bến Thành'),
+                province,
+            )
+        self.assertEqual(self.normalizer.canonical('HCM', 'Phường 01'), ('Thành phố Hồ Chí Minh', 'Phường 1'))
+
+    def test_match_reports_method(self):
+        result = self.normalizer.match('Ho Chi Mihn', 'Sai Gon')
+        self.assertEqual(result.province.method, 'fuzzy')
+        self.assertEqual(result.ward.method, 'exact')
+        self.assertEqual(self.normalizer.match('hcm').province.method, 'alias')
+
+    def test_unknown_places_are_kept_as_typed(self):
+        self.assertEqual(self.normalizer.canonical('  Tỉnh  Cà Mau ', 'Phường 5'), ('Tỉnh Cà Mau', 'Phường 5'))
+        self.assertEqual(self.normalizer.canonical('HCM', 'Phường Không Có'), ('Thành phố Hồ Chí Minh', 'Phường Không Có'))
+
+
+class AddressNormalizeOnSaveTest(TestCase):
+    def test_saved_address_and_cache_key_use_canonical_names(self):
+        from users.models import User
+
+        user = User.objects.create(username='buyer', email='buyer@example.com')
+        address = Address.objects.create(
+            user=user, province='ha noi', ward='p.  ba dinh', hamlet='  Lotte   Center ', detail='54 Liễu Giai',
+        )
+        address.refresh_from_db()
+        self.assertEqual((address.province, address.ward, address.hamlet),
+                         ('Thành phố Hà Nội', 'Phường Ba Đình', 'Lotte Center'))
+        self.assertEqual(place_key('TP Hà Nội', 'Ba Đình'), place_key('Thành phố Hà Nội', 'Phường Ba Đình'))
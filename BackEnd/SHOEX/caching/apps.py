@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class CachingConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'caching'
+
+    def ready(self):
+        # Invalidate theo tag khi model catalog thay đổi
+        import caching.signals
@@ -0,0 +1,190 @@
+"""
+Bus invalidate cache giữa các process qua Postgres LISTEN/NOTIFY
+
+- publish(tags): gửi NOTIFY trên kênh CHANNEL (trong transaction thì Postgres chỉ giao khi commit)
+- Mỗi process web (config/wsgi.py, config/asgi.py) chạy 1 thread listener với kết nối riêng,
+  nhận tin của process khác và gọi các handler đã subscribe() — tầng LRU của caching/cache.py,
+  cây danh mục products/category_tree.py...
+- Mất kết nối → thử lại có backoff; kết nối lại thì gọi handler với tags=None (xóa hết, vì có thể đã lỡ tin)
+
+Khi listener đang chạy, dữ liệu trong bộ nhớ process chỉ cũ trong độ trễ của NOTIFY (mili giây)
+thay vì TTL, nên giữ được lâu hơn mà không phải kiểm tra DB / Redis mỗi request.
+
+Tin nhắn: {"s": "<pid>@<host>", "t": ["product:12", ...]} (NOTIFY tối đa 8000 byte → chia nhiều tin).
+"""
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import time
+
+import psycopg2
+from django.conf import settings
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'shoex_cache_invalidation'
+MAX_PAYLOAD_BYTES = 7900
+POLL_SECONDS = 5
+MAX_BACKOFF_SECONDS = 30
+
+_handlers = []
+_listener = None
+_listener_lock = threading.Lock()
+_requested = False
+
+
+def sender_id():
+    """Định danh process (đổi sau fork)"""
+    return f'{os.getpid()}@{socket.gethostname()}'
+
+
+def enabled():
+    return settings.CACHE_BUS_ENABLED and connection.vendor == 'postgresql'
+
+
+def subscribe(handler):
+    """handler(tags): tags là set tag bị invalidate ở process khác, None = xóa toàn bộ"""
+    if handler not in _handlers:
+        _handlers.append(handler)
+
+
+def unsubscribe(handler):
+    if handler in _handlers:
+        _handlers.remove(handler)
+
+
+def encode(tags, sender=None):
+    """Danh sách payload JSON, mỗi payload không quá MAX_PAYLOAD_BYTES"""
+    sender = sender or sender_id()
+    payloads, batch = [], []
+    for tag in sorted(set(tags)):
+        candidate = json.dumps({'s': sender, 't': batch + [tag]}, ensure_ascii=False, separators=(',', ':'))
+        if batch and len(candidate.encode('utf-8')) > MAX_PAYLOAD_BYTES:
+            payloads.append(json.dumps({'s': sender, 't': batch}, ensure_ascii=False, separators=(',', ':')))
+            batch = []
+        batch.append(tag)
+    if batch:
+        payloads.append(json.dumps({'s': sender, 't': batch}, ensure_ascii=False, separators=(',', ':')))
+    return payloads
+
+
+def publish(tags):
+    """Báo cho process khác; lỗi chỉ ghi log (invalidate không được làm hỏng thao tác ghi)"""
+    if not tags or not enabled():
+        return
+    try:
+        with connection.cursor() as cursor:
+            for payload in encode(tags):
+                cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+    except Exception:
+        logger.exception('Could not publish cache invalidation')
+
+
+def dispatch(payload):
+    """Xử lý 1 tin nhận được (bỏ qua tin của chính process này)"""
+    try:
+        message = json.loads(payload)
+        sender, tags = message['s'], set(message['t'])
+    except (ValueError, KeyError, TypeError):
+        logger.warning('Invalid cache invalidation message: %r', payload[:200])
+        return
+    if sender != sender_id():
+        _call_handlers(tags)
+
+
+def _call_handlers(tags):
+    for handler in list(_handlers):
+        try:
+            handler(tags)
+        except Exception:
+            logger.exception('Cache invalidation handler %r failed', handler)
+
+
+class Listener(threading.Thread):
+    def __init__(self, params):
+        super().__init__(name='cache-invalidation-listener', daemon=True)
+        self.params = params
+        self.pid = os.getpid()
+        self.connected = threading.Event()
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        backoff = 1
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.params)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CHANNEL}')
+                # Tin gửi trong lúc chưa nghe / mất kết nối đã mất → bỏ toàn bộ dữ liệu trong process
+                _call_handlers(None)
+                self.connected.set()
+                backoff = 1
+                self._listen(conn)
+            except Exception:
+                logger.exception('Cache invalidation listener disconnected, retrying in %ss', backoff)
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+            finally:
+                self.connected.clear()
+                if conn is not None:
+                    conn.close()
+
+    def _listen(self, conn):
+        while not self._stopping.is_set():
+            if select.select([conn], [], [], POLL_SECONDS) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                dispatch(conn.notifies.pop(0).payload)
+
+
+def start_listener():
+    """Bật listener cho process hiện tại (gọi từ wsgi / asgi); an toàn khi gọi nhiều lần"""
+    global _listener, _requested
+    if not enabled():
+        return None
+    _requested = True
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive() or _listener.pid != os.getpid():
+            _listener = Listener(connections['default'].get_connection_params())
+            _listener.start()
+        return _listener
+
+
+def ensure_listener():
+    """Process con sau fork (gunicorn --preload) không mang theo thread → bật lại khi dùng cache lần đầu"""
+    if _requested and (_listener is None or _listener.pid != os.getpid()):
+        start_listener()
+
+
+def stop_listener(timeout=None):
+    global _listener, _requested
+    _requested = False
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        listener.join(timeout)
+
+
+def is_listening():
+    listener = _listener
+    return listener is not None and listener.pid == os.getpid() and listener.connected.is_set()
+
+
+def wait_until_listening(timeout=5):
+    listener = _listener
+    deadline = time.monotonic() + timeout
+    while listener is not None and time.monotonic() < deadline:
+        if listener.connected.wait(0.05):
+            return True
+    return False
@@ -0,0 +1,461 @@
+"""
+Cache 2 tầng, invalidate theo tag
+
+- Tầng 1: LRU trong process (TAGGED_CACHE_LOCAL_MAX_ENTRIES entry, sống tối đa TAGGED_CACHE_LOCAL_TTL giây),
+  đọc không tốn round-trip nào
+- Tầng 2: Django cache TAGGED_CACHE_ALIAS (Redis / file / bộ nhớ, xem CACHES trong settings), chung giữa các process
+
+Tag: 'product', 'product:12', 'category', 'store:abc'... (caching/signals.py invalidate theo post_save/post_delete).
+Mỗi tag có mốc invalidate gần nhất (time_ns) ở tầng chung; entry ghi lại thời điểm bắt đầu tính
+→ còn hợp lệ khi chưa tag nào của nó bị invalidate kể từ lúc đó. Vì vậy tag có thể suy ra từ kết quả
+(VD product:<id> khi tra theo slug) mà không có race: dữ liệu đổi sau khi bắt đầu tính thì mốc tag muộn hơn.
+Invalidate xóa ngay entry cùng tag ở tầng 1 của process hiện tại và báo process khác qua caching/bus.py
+(Postgres NOTIFY). Process có listener đang chạy giữ entry cục bộ tới TAGGED_CACHE_BUS_LOCAL_TTL giây;
+không có listener thì chỉ TAGGED_CACHE_LOCAL_TTL giây (giới hạn độ cũ khi không nhận được tin).
+Tầng chung là bộ nhớ trong process (LocMemCache, khi không có REDIS_URL / CACHE_DIR) thì mốc tag
+của nó cũng chỉ thấy invalidate của process này → tin từ bus cập nhật cả mốc tag ở tầng chung.
+
+Chống dồn request (single-flight): cùng key trong 1 process chỉ 1 thread tính, các thread khác chờ;
+giữa các process dùng khóa add() ở tầng chung, process đến sau chờ entry xuất hiện (quá hạn chờ thì tự tính).
+
+Giá trị được pickle 1 lần khi ghi, mỗi lần đọc nhận bản sao riêng (resolver có thể gắn cache lên model instance).
+
+Dùng:
+    @cached('category_by_slug', tags=['category'])
+    def category_by_slug(slug): ...
+
+    @cached_resolver('product_detail', tags=lambda product: product_tags(product))
+    def resolve_product(root, info, id=None, slug=None): ...   # key theo argument, bỏ root/info
+
+Đếm hit/miss: stats() (process hiện tại), manage.py cache_stats (cộng dồn mọi process).
+"""
+import functools
+import hashlib
+import json
+import logging
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from . import bus
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'tagged'
+LOCK_POLL_INTERVAL = 0.05  # giây
+STATS_FLUSH_SECONDS = 30
+STATS_REGISTRY_KEY = f'{KEY_PREFIX}:stats:keys'
+EVENTS = ('local_hit', 'shared_hit', 'miss', 'stale', 'wait')
+
+MISSING = object()
+
+
+def _normalize(value):
+    """Argument → cấu trúc JSON ổn định (dict sort theo key, graphene Enum → value, model → pk)"""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_normalize(v) for v in value), key=lambda v: json.dumps(v, default=str))
+    if hasattr(value, '_meta') and hasattr(value, 'pk'):
+        return value.pk
+    if hasattr(value, 'value') and not isinstance(value, (str, bytes)):
+        return _normalize(value.value)  # graphene Enum
+    return value
+
+
+def make_key(name, *args, **kwargs):
+    payload = json.dumps(_normalize([list(args), kwargs]), sort_keys=True, default=str)
+    digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{name}:{digest}'
+
+
+def tag_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+class LocalLRU:
+    """LRU trong process: key → (hết hạn theo monotonic, tags, giá trị đã pickle)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._by_tag = {}
+        self._lock = threading.Lock()
+        self.generation = 0  # tăng mỗi lần invalidate / clear
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return MISSING
+            self._entries.move_to_end(key)
+        return pickle.loads(entry[2])
+
+    def set(self, key, data, ttl, tags, generation=None):
+        """generation: giá trị self.generation lúc bắt đầu kiểm tra mốc tag; đã có invalidate xen giữa thì không ghi"""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, tags, data)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        """Xóa mọi entry có ít nhất 1 tag trong tags; trả về số entry đã xóa"""
+        with self._lock:
+            self.generation += 1
+            keys = set()
+            for tag in tags:
+                keys.update(self._by_tag.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+
+class _Flight:
+    """1 lần tính đang chạy trong process (các thread cùng key chờ event)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class TaggedCache:
+    def __init__(self, shared, local_max_entries, local_ttl, default_ttl, lock_timeout, listening_local_ttl=None):
+        self.shared = shared
+        self.shared_is_local = isinstance(shared, LocMemCache)
+        self.local = LocalLRU(local_max_entries)
+        self.local_ttl = local_ttl
+        self.listening_local_ttl = listening_local_ttl or local_ttl
+        self.default_ttl = default_ttl
+        self.lock_timeout = lock_timeout
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._counters = Counter()
+        self._unflushed = Counter()
+        self._counters_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self._shared_cleared_at = 0  # time_ns; entry tầng chung trong process bắt đầu trước mốc này là cũ
+
+    # ===== ĐỌC / GHI =====
+
+    def get_or_compute(self, key, compute, tags=(), ttl=None, name='default'):
+        """
+        Giá trị của key; chưa có / hết hạn / bị invalidate thì gọi compute() (single-flight) rồi lưu.
+        tags: iterable, hoặc callable(giá trị) → iterable (tag suy ra từ kết quả)
+        """
+        value = self.local.get(key)
+        if value is not MISSING:
+            self._count(name, 'local_hit')
+            return value
+        value = self._shared_get(key, name)
+        if value is not MISSING:
+            self._count(name, 'shared_hit')
+            return value
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self._count(name, 'wait')
+            flight.done.wait(self.lock_timeout)
+            value = self.local.get(key)
+            if value is not MISSING:
+                return value
+            # Thread dẫn đầu lỗi / quá lâu / kết quả đã bị invalidate → tự tính
+            return self._compute(key, compute, tags, ttl, name)
+        try:
+            return self._compute_shared(key, compute, tags, ttl, name)
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def get(self, key, name='default'):
+        """Chỉ đọc (MISSING khi chưa có); dùng với set() khi không phải kết quả nào cũng được cache"""
+        value = self.local.get(key)
+        if value is not MISSING:
+            self._count(name, 'local_hit')
+            return value
+        value = self._shared_get(key, name)
+        self._count(name, 'shared_hit' if value is not MISSING else 'miss')
+        return value
+
+    def set(self, key, value, tags=(), ttl=None, started_at=None):
+        """
+        Ghi giá trị; started_at (time_ns) là lúc bắt đầu đọc dữ liệu nguồn.
+        Không ghi nếu 1 tag đã bị invalidate sau started_at (giá trị có thể đã cũ).
+        """
+        tags = tuple(sorted(set(tags)))
+        ttl = ttl or self.default_ttl
+        started_at = started_at or time.time_ns()
+        generation = self.local.generation
+        if not self._fresh(started_at, tags, create_missing=True):
+            return False
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self.shared.set(key, (started_at, tags, data), ttl)
+        self.local.set(key, data, min(ttl, self._local_ttl()), tags, generation)
+        return True
+
+    def start(self, tags=()):
+        """
+        started_at cho set(): tạo trước mốc còn thiếu của tags, nếu không cache lồng bên trong
+        (resolver có @cached) tạo mốc muộn hơn lúc bắt đầu và entry ngoài bị coi là cũ
+        """
+        started_at = time.time_ns()
+        self._fresh(started_at, tuple(sorted(set(tags))), create_missing=True)
+        return started_at
+
+    def invalidate(self, *tags):
+        tags = set(tags)
+        if not tags:
+            return
+        now = time.time_ns()
+        self.shared.set_many({tag_key(tag): now for tag in tags}, None)
+        self.local.invalidate(tags)
+
+    def clear_local(self):
+        self.local.clear()
+
+    def evict_local(self, tags):
+        """
+        Handler của bus: tag bị invalidate ở process khác (None: không biết đã lỡ gì → xóa hết).
+        Tầng chung trong process không nhận được mốc của process khác → cập nhật mốc tại đây.
+        """
+        if tags is None:
+            if self.shared_is_local:
+                self._shared_cleared_at = time.time_ns()
+            self.local.clear()
+            return
+        if self.shared_is_local:
+            now = time.time_ns()
+            self.shared.set_many({tag_key(tag): now for tag in tags}, None)
+        self.local.invalidate(tags)
+
+    def _local_ttl(self):
+        return self.listening_local_ttl if bus.is_listening() else self.local_ttl
+
+    # ===== NỘI BỘ =====
+
+    def _shared_get(self, key, name):
+        entry = self.shared.get(key)
+        if entry is None:
+            return MISSING
+        started_at, tags, data = entry
+        generation = self.local.generation
+        if not self._fresh(started_at, tags):
+            self._count(name, 'stale')
+            return MISSING
+        self.local.set(key, data, self._local_ttl(), tags, generation)
+        return pickle.loads(data)
+
+    def _fresh(self, started_at, tags, create_missing=False):
+        """
+        Chưa tag nào bị invalidate từ started_at.
+        Mốc tag bị mất (cache bị cull / restart) → coi như vừa invalidate, trừ khi đang ghi (create_missing):
+        khi đó đặt mốc ngay trước started_at để entry mới dùng được.
+        """
+        if started_at <= self._shared_cleared_at:
+            return False
+        if not tags:
+            return True
+        keys = [tag_key(tag) for tag in tags]
+        marks = self.shared.get_many(keys)
+        missing = [key for key in keys if key not in marks]
+        if missing:
+            if not create_missing:
+                return False
+            for key in missing:
+                self.shared.add(key, started_at - 1, None)
+            marks.update(self.shared.get_many(missing))
+        return all(marks.get(key, started_at) < started_at for key in keys)
+
+    def _compute_shared(self, key, compute, tags, ttl, name):
+        """Khóa giữa các process: process đến sau chờ entry do process đang giữ khóa ghi"""
+        lock_key = f'{key}:lock'
+        if self.shared.add(lock_key, 1, self.lock_timeout):
+            try:
+                return self._compute(key, compute, tags, ttl, name)
+            finally:
+                self.shared.delete(lock_key)
+
+        self._count(name, 'wait')
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = self._shared_get(key, name)
+            if value is not MISSING:
+                return value
+            if self.shared.get(lock_key) is None:
+                break
+        return self._compute(key, compute, tags, ttl, name)
+
+    def _compute(self, key, compute, tags, ttl, name):
+        started_at = time.time_ns() if callable(tags) else self.start(tags)
+        value = compute()
+        self._count(name, 'miss')
+        self.set(key, value, tags(value) if callable(tags) else tags, ttl, started_at)
+        return value
+
+    # ===== THỐNG KÊ =====
+
+    def _count(self, name, event):
+        with self._counters_lock:
+            self._counters[(name, event)] += 1
+            self._unflushed[(name, event)] += 1
+            if time.monotonic() - self._flushed_at < STATS_FLUSH_SECONDS:
+                return
+            pending, self._unflushed = self._unflushed, Counter()
+            self._flushed_at = time.monotonic()
+        self._flush(pending)
+
+    def _flush(self, pending):
+        """Cộng dồn bộ đếm của process vào tầng chung (cho manage.py cache_stats)"""
+        try:
+            registry = set(self.shared.get(STATS_REGISTRY_KEY) or ())
+            for (name, event), count in pending.items():
+                key = f'{KEY_PREFIX}:stats:{name}:{event}'
+                self.shared.add(key, 0, None)
+                self.shared.incr(key, count)
+                registry.add((name, event))
+            self.shared.set(STATS_REGISTRY_KEY, sorted(registry), None)
+        except Exception:
+            logger.exception('Could not flush cache stats')
+
+    def stats(self):
+        """{tên: {sự kiện: số lần}} của process hiện tại"""
+        with self._counters_lock:
+            result = {}
+            for (name, event), count in self._counters.items():
+                result.setdefault(name, dict.fromkeys(EVENTS, 0))[event] = count
+            return result
+
+    def flush_stats(self):
+        with self._counters_lock:
+            pending, self._unflushed = self._unflushed, Counter()
+            self._flushed_at = time.monotonic()
+        self._flush(pending)
+
+
+def shared_stats(shared=None):
+    """{tên: {sự kiện: số lần}} cộng dồn mọi process (đã flush)"""
+    shared = shared or caches[settings.TAGGED_CACHE_ALIAS]
+    registry = shared.get(STATS_REGISTRY_KEY) or []
+    counts = shared.get_many([f'{KEY_PREFIX}:stats:{name}:{event}' for name, event in registry])
+    result = {}
+    for name, event in registry:
+        result.setdefault(name, dict.fromkeys(EVENTS, 0))[event] = counts.get(f'{KEY_PREFIX}:stats:{name}:{event}', 0)
+    return result
+
+
+def reset_shared_stats(shared=None):
+    shared = shared or caches[settings.TAGGED_CACHE_ALIAS]
+    registry = shared.get(STATS_REGISTRY_KEY) or []
+    shared.delete_many([f'{KEY_PREFIX}:stats:{name}:{event}' for name, event in registry] + [STATS_REGISTRY_KEY])
+
+
+# ===== INSTANCE DÙNG CHUNG =====
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TaggedCache(
+                    caches[settings.TAGGED_CACHE_ALIAS],
+                    local_max_entries=settings.TAGGED_CACHE_LOCAL_MAX_ENTRIES,
+                    local_ttl=settings.TAGGED_CACHE_LOCAL_TTL,
+                    default_ttl=settings.TAGGED_CACHE_DEFAULT_TTL,
+                    lock_timeout=settings.TAGGED_CACHE_LOCK_TIMEOUT,
+                    listening_local_ttl=settings.TAGGED_CACHE_BUS_LOCAL_TTL,
+                )
+                bus.subscribe(_cache.evict_local)
+    bus.ensure_listener()
+    return _cache
+
+
+def reset_cache():
+    """Bỏ instance hiện tại (test / đổi settings); lần gọi get_cache() kế tiếp tạo lại"""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            bus.unsubscribe(_cache.evict_local)
+        _cache = None
+
+
+def invalidate(*tags):
+    """Invalidate ở process này + báo các process khác (NOTIFY)"""
+    get_cache().invalidate(*tags)
+    bus.publish(tags)
+
+
+def invalidate_on_commit(*tags):
+    """Invalidate sau khi transaction hiện tại commit (đọc trước commit không được lưu lại với mốc mới)"""
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+def stats():
+    return get_cache().stats()
+
+
+def cached(name, tags=(), ttl=None):
+    """Cache kết quả hàm theo argument"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return get_cache().get_or_compute(
+                make_key(name, *args, **kwargs), lambda: fn(*args, **kwargs), tags, ttl, name,
+            )
+        return wrapper
+    return decorator
+
+
+def cached_resolver(name, tags=(), ttl=None):
+    """Cache resolver graphene (root, info, **argument) theo argument; root / info không vào key"""
+    def decorator(resolver):
+        @functools.wraps(resolver)
+        def wrapper(root, info, **kwargs):
+            return get_cache().get_or_compute(
+                make_key(name, **kwargs), lambda: resolver(root, info, **kwargs), tags, ttl, name,
+            )
+        return wrapper
+    return decorator
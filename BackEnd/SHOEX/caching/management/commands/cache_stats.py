@@ -0,0 +1,34 @@
+"""
+Hit / miss của cache theo tag (caching/cache.py), cộng dồn mọi process
+Chạy: python manage.py cache_stats
+      python manage.py cache_stats --reset
+
+Mỗi process đẩy bộ đếm lên tầng chung sau mỗi STATS_FLUSH_SECONDS nên số liệu trễ tối đa chừng đó.
+Chỉ có ý nghĩa khi tầng chung thật sự chung (REDIS_URL / CACHE_DIR).
+"""
+from django.core.management.base import BaseCommand
+
+from caching import cache
+from caching.cache import EVENTS
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the tagged cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Xóa bộ đếm sau khi in')
+
+    def handle(self, *args, **options):
+        stats = cache.shared_stats()
+        if not stats:
+            self.stdout.write('No cache statistics yet')
+        else:
+            self.stdout.write(f'{"name":<24}' + ''.join(f'{event:>12}' for event in EVENTS) + f'{"hit %":>8}')
+            for name, counts in sorted(stats.items()):
+                hits = counts['local_hit'] + counts['shared_hit']
+                lookups = hits + counts['miss']
+                ratio = f'{100 * hits / lookups:.1f}' if lookups else '-'
+                self.stdout.write(f'{name:<24}' + ''.join(f'{counts[event]:>12}' for event in EVENTS) + f'{ratio:>8}')
+        if options['reset']:
+            cache.reset_shared_stats()
+            self.stdout.write(self.style.SUCCESS('Cache statistics reset'))
@@ -0,0 +1,71 @@
+"""
+Invalidate cache theo tag khi dữ liệu catalog thay đổi
+
+Mỗi model có tag chung ('product') cho kết quả phụ thuộc cả bảng (danh sách, facet)
+và tag theo bản ghi ('product:12') cho kết quả của 1 bản ghi (chi tiết sản phẩm).
+Biến thể, ảnh gallery và ảnh theo tùy chọn thuộc về sản phẩm nên dùng tag của sản phẩm cha;
+ImageAsset (ảnh gốc + các cỡ, products/images.py) dùng tag của mọi sản phẩm đang trỏ tới nó.
+
+Thay đổi không qua save()/delete() (UPDATE hàng loạt, checkout) invalidate ở chỗ
+tính lại ProductStats (products/stats.py).
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from brand.models import Brand
+from discount.models import Voucher
+from products.models import Category, ImageAsset, Product, ProductAttributeOption, ProductImage, ProductVariant
+from store.models import Store
+
+from .cache import invalidate_on_commit
+
+
+def product_tags(product):
+    """Tag của 1 sản phẩm đã cache (gồm category / brand / store được select_related kèm)"""
+    tags = ['product', f'product:{product.pk}', f'category:{product.category_id}', f'store:{product.store_id}']
+    if product.brand_id:
+        tags.append(f'brand:{product.brand_id}')
+    return tags
+
+
+def _instance_tags(sender, instance):
+    if sender in (ProductVariant, ProductImage, ProductAttributeOption):
+        return ['product', f'product:{instance.product_id}']
+    label = sender._meta.model_name
+    return [label, f'{label}:{instance.pk}']
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductAttributeOption)
+@receiver(post_delete, sender=ProductAttributeOption)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Voucher)
+@receiver(post_delete, sender=Voucher)
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    invalidate_on_commit(*_instance_tags(sender, instance))
+
+
+def asset_tags(asset):
+    """Tag các sản phẩm có ảnh gallery / ảnh tùy chọn dùng asset này"""
+    product_ids = set(ProductImage.objects.filter(asset=asset).values_list('product_id', flat=True))
+    product_ids.update(ProductAttributeOption.objects.filter(asset=asset).values_list('product_id', flat=True))
+    return [f'product:{product_id}' for product_id in sorted(product_ids)]
+
+
+# Xóa asset: SET_NULL chạy trước post_delete nên phải lấy sản phẩm ở pre_delete
+@receiver(post_save, sender=ImageAsset)
+@receiver(pre_delete, sender=ImageAsset)
+def invalidate_asset_cache(sender, instance, **kwargs):
+    tags = asset_tags(instance)
+    if tags:
+        invalidate_on_commit('product', *tags)
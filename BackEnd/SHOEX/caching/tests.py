@@ -0,0 +1,321 @@
+import functools
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from caching import bus, cache
+from caching.cache import TaggedCache
+from graphql_api.core.views import operation_policy
+from products.images import generate_derivatives
+from products import bulk_updates
+from products.models import Category, Product, ProductImage, ProductVariant
+from products.tests import _jpeg_upload
+from store.models import Store
+from users.models import User
+
+
+def _tagged_cache(shared):
+    return TaggedCache(shared, local_max_entries=100, local_ttl=60, default_ttl=300, lock_timeout=2)
+
+
+class TaggedCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.shared = LocMemCache('tagged-cache-test', {})
+        self.shared.clear()
+        self.calls = 0
+
+    def _compute(self, value='v'):
+        def compute():
+            self.calls += 1
+            return {'value': value}
+        return compute
+
+    def test_tiers_and_tag_invalidation(self):
+        tagged = _tagged_cache(self.shared)
+        other_process = _tagged_cache(self.shared)
+
+        self.assertEqual(tagged.get_or_compute('k', self._compute(), tags=['product:1']), {'value': 'v'})
+        tagged.get_or_compute('k', self._compute(), tags=['product:1'])
+        other_process.get_or_compute('k', self._compute(), tags=['product:1'])
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(tagged.stats()['default']['local_hit'], 1)
+        self.assertEqual(other_process.stats()['default']['shared_hit'], 1)
+
+        # Process khác invalidate: tầng chung thấy ngay, tầng cục bộ sau local_ttl (ở đây: xóa tay)
+        other_process.invalidate('product:1')
+        other_process.get_or_compute('k', self._compute('new'), tags=['product:1'])
+        self.assertEqual(self.calls, 2)
+        tagged.clear_local()
+        self.assertEqual(tagged.get_or_compute('k', self._compute('newer'), tags=['product:1']), {'value': 'new'})
+
+        # Tag không liên quan không ảnh hưởng; bản trả về là bản sao
+        tagged.invalidate('product:2')
+        value = tagged.get_or_compute('k', self._compute(), tags=['product:1'])
+        value['value'] = 'mutated'
+        self.assertEqual(tagged.get_or_compute('k', self._compute(), tags=['product:1']), {'value': 'new'})
+        self.assertEqual(self.calls, 2)
+
+    def test_bus_eviction_with_process_local_shared_tier(self):
+        # Mỗi worker có tầng chung LocMemCache riêng (CACHES mặc định): chỉ tin bus mới báo được invalidate
+        worker = _tagged_cache(self.shared)
+        other_shared = LocMemCache('tagged-cache-test-other', {})
+        other_shared.clear()
+        other_worker = _tagged_cache(other_shared)
+        for tagged in (worker, other_worker):
+            tagged.get_or_compute('k', self._compute(), tags=['product'])
+            tagged.get_or_compute('j', self._compute(), tags=['category'])
+        self.assertEqual(self.calls, 4)
+
+        other_worker.invalidate('product')
+        worker.evict_local({'product'})  # tin NOTIFY của other_worker
+        self.assertEqual(worker.get_or_compute('k', self._compute('new'), tags=['product']), {'value': 'new'})
+        self.assertEqual(worker.get_or_compute('j', self._compute('new'), tags=['category']), {'value': 'v'})
+
+        # Listener kết nối lại (có thể đã lỡ tin) → không tin entry nào ở tầng chung cũ
+        worker.evict_local(None)
+        self.assertEqual(worker.get_or_compute('j', self._compute('newer'), tags=['category']), {'value': 'newer'})
+        self.assertEqual(worker.get_or_compute('j', self._compute('newest'), tags=['category']), {'value': 'newer'})
+        self.assertEqual(self.calls, 6)
+
+    def test_invalidation_during_compute_is_not_cached(self):
+        tagged = _tagged_cache(self.shared)
+
+        def compute():
+            self.calls += 1
+            tagged.invalidate('category')  # dữ liệu đổi trong lúc đang tính
+            return self.calls
+
+        self.assertEqual(tagged.get_or_compute('k', compute, tags=['category']), 1)
+        self.assertEqual(tagged.get_or_compute('k', compute, tags=['category']), 2)
+
+    def test_single_flight(self):
+        tagged = _tagged_cache(self.shared)
+        started = threading.Barrier(8)
+        results = []
+
+        def slow():
+            self.calls += 1
+            time.sleep(0.2)
+            return 42
+
+        def worker():
+            started.wait()
+            results.append(tagged.get_or_compute('hot', slow, tags=['product']))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(tagged.stats()['default']['wait'], 7)
+
+
+class CatalogCacheTest(TestCase):
+    QUERY = 'query($id: ID) { product(id: $id) { name category { name } } }'
+
+    @classmethod
+    def setUpTestData(cls):
+        store = Store.objects.create(
+            store_id='cache-store', name='Cache Store', slug='cache-store', email='cache@example.com', join_date=timezone.now()
+        )
+        cls.category = Category.objects.create(name='Giày cache')
+        cls.product = Product.objects.create(
+            store=store, category=cls.category, name='Giày A', description='d', base_price=Decimal('100000')
+        )
+
+    def setUp(self):
+        caches['default'].clear()
+        cache.reset_cache()
+
+    def _product(self):
+        from graphql_api.api import schema
+
+        result = schema.execute(self.QUERY, variable_values={'id': self.product.pk}, context_value=RequestFactory().get('/graphql/'))
+        self.assertIsNone(result.errors)
+        return result.data['product']
+
+    def test_product_detail_is_cached_until_signal(self):
+        self.assertEqual(self._product()['name'], 'Giày A')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._product()['name'], 'Giày A')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.product.pk).update(name='Giày B')  # không signal → vẫn bản cũ
+        self.assertEqual(self._product()['name'], 'Giày A')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Giày đổi tên'
+            self.category.save()
+        self.assertEqual(self._product(), {'name': 'Giày B', 'category': {'name': 'Giày đổi tên'}})
+        self.assertEqual(cache.stats()['product_detail']['miss'], 2)
+
+
+@override_settings(GRAPHQL_RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTest(TestCase):
+    QUERY = 'query Detail($id: ID) { product(id: $id) { name } }'
+
+    @classmethod
+    def setUpTestData(cls):
+        store = Store.objects.create(
+            store_id='resp-store', name='Resp Store', slug='resp-store', email='resp@example.com', join_date=timezone.now()
+        )
+        cls.product = Product.objects.create(
+            store=store, category=Category.objects.create(name='Giày resp'), name='Giày A', description='d',
+            base_price=Decimal('100000'),
+        )
+
+    def setUp(self):
+        caches['default'].clear()
+        cache.reset_cache()
+
+    def _get(self, **headers):
+        params = {'query': self.QUERY, 'variables': f'{{"id": {self.product.pk}}}'}
+        return self.client.get('/graphql/', params, HTTP_ACCEPT='application/json', **headers)
+
+    def test_anonymous_get_is_cached_with_etag(self):
+        first = self._get()
+        self.assertEqual(first.json(), {'data': {'product': {'name': 'Giày A'}}})
+        with CaptureQueriesContext(connection) as ctx:
+            second = self._get()
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(cache.stats()['graphql_response']['miss'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Giày B'
+            self.product.save()
+        changed = self._get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json(), {'data': {'product': {'name': 'Giày B'}}})
+
+    def test_image_changes_invalidate_cached_product(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        query = 'query Images($id: ID) { product(id: $id) { galleryImages { imageUrl } } }'
+
+        def gallery():
+            params = {'query': query, 'variables': f'{{"id": {self.product.pk}}}'}
+            response = self.client.get('/graphql/', params, HTTP_ACCEPT='application/json')
+            return [image['imageUrl'] for image in response.json()['data']['product']['galleryImages']]
+
+        with override_settings(MEDIA_ROOT=media_root):
+            self.assertEqual(gallery(), [])
+            self.assertEqual(gallery(), [])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                image = ProductImage.objects.create(product=self.product, image=_jpeg_upload((1000, 1000)))
+            urls = gallery()
+            self.assertEqual(len(urls), 1)
+            self.assertTrue(urls[0].endswith(image.asset.original.url), urls)
+
+            # Job tạo xong các cỡ (chỉ lưu ImageAsset) → bỏ cache, trả ảnh cỡ detail
+            with self.captureOnCommitCallbacks(execute=True):
+                generate_derivatives([image.asset])
+            self.assertTrue(gallery()[0].endswith(f'{image.asset.content_hash}_detail.jpg'))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                image.delete()
+            self.assertEqual(gallery(), [])
+        self.assertEqual(cache.stats()['graphql_response']['miss'], 4)
+
+    def test_bulk_price_update_evicts_cached_product(self):
+        variant = ProductVariant.objects.create(
+            product=self.product, sku='resp-40', price=Decimal('100000'), stock=5, option_combinations={'Size': '40'},
+        )
+        params = {
+            'query': 'query BySlug($slug: String) { product(slug: $slug) { variants { edges { node { price stock } } } } }',
+            'variables': f'{{"slug": "{self.product.slug}"}}',
+        }
+
+        def variants():
+            data = self.client.get('/graphql/', params, HTTP_ACCEPT='application/json').json()['data']
+            return [edge['node'] for edge in data['product']['variants']['edges']]
+
+        self.assertEqual(variants(), [{'price': '100000.00', 'stock': 5}])
+        self.assertEqual(variants(), [{'price': '100000.00', 'stock': 5}])
+
+        # UPDATE theo tập, không post_save: chỉ có lần tính lại ProductStats sau commit invalidate
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_updates.set_prices([(variant.pk, Decimal('90000'))])
+        self.assertEqual(variants(), [{'price': '90000.00', 'stock': 5}])
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_updates.adjust_stock([(variant.pk, -2)])
+        self.assertEqual(variants(), [{'price': '90000.00', 'stock': 3}])
+        self.assertEqual(cache.stats()['graphql_response']['miss'], 3)
+
+    def test_bypass(self):
+        from graphql_api.api import schema
+
+        policy = functools.partial(operation_policy, schema.graphql_schema)
+        self.assertIsNone(policy('mutation { logout { success } }'))
+        self.assertIsNone(policy('{ products { edges { node { name } } } me { id } }'))
+        self.assertEqual(policy('{ products { edges { node { name } } } categories { edges { node { name } } } }')[0], 30)
+
+        self.client.force_login(User.objects.create(username='buyer', email='buyer@example.com'))
+        response = self._get()
+        self.assertEqual(response.json(), {'data': {'product': {'name': 'Giày A'}}})
+        self.assertFalse(response.has_header('ETag'))
+        self.assertNotIn('graphql_response', cache.stats())
+
+
+class InvalidationBusTest(TransactionTestCase):
+    def setUp(self):
+        self.received = []
+        self.arrived = threading.Event()
+        bus.subscribe(self._handler)
+        bus.start_listener()
+        self.assertTrue(bus.wait_until_listening())
+        self.received.clear()  # bỏ lần xóa toàn bộ khi vừa kết nối
+        self.arrived.clear()
+
+    def tearDown(self):
+        bus.stop_listener(timeout=10)  # đóng kết nối LISTEN để drop được DB test
+        bus.unsubscribe(self._handler)
+
+    def _handler(self, tags):
+        self.received.append(tags)
+        self.arrived.set()
+
+    def _notify(self, tags, sender):
+        with connection.cursor() as cursor:
+            for payload in bus.encode(tags, sender=sender):
+                cursor.execute('SELECT pg_notify(%s, %s)', [bus.CHANNEL, payload])
+
+    def test_remote_invalidation_evicts_local_tier(self):
+        tagged = _tagged_cache(LocMemCache('bus-test', {}))
+        bus.subscribe(tagged.evict_local)
+        self.addCleanup(bus.unsubscribe, tagged.evict_local)
+        tagged.set('a', 1, tags=['product:1'])
+        tagged.set('b', 2, tags=['product:2'])
+
+        self._notify(['product:1'], sender=bus.sender_id())  # tin của chính process → bỏ qua
+        self._notify(['product:1'], sender='other@host')
+        self.assertTrue(self.arrived.wait(5))
+        self.assertEqual(self.received, [{'product:1'}])
+        self.assertIs(tagged.local.get('a'), cache.MISSING)
+        self.assertEqual(tagged.local.get('b'), 2)
+
+        # Payload lớn được chia thành nhiều NOTIFY
+        tags = [f'product:{i}' for i in range(2000)]
+        self.assertGreater(len(bus.encode(tags)), 1)
+        self.arrived.clear()
+        self._notify(tags, sender='other@host')
+        deadline = time.monotonic() + 5
+        while sum(len(t) for t in self.received[1:]) < 2000 and time.monotonic() < deadline:
+            self.arrived.wait(0.05)
+        self.assertEqual(set().union(*self.received[1:]), set(tags))
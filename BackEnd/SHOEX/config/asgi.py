@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Nhận invalidate cache từ process khác (Postgres LISTEN/NOTIFY)
+from caching.bus import start_listener  # noqa: E402
+
+start_listener()
@@ -23,6 +23,22 @@ GHTK_BASE_URL = os.getenv(
     "GHTK_BASE_URL",
     "https://services.giaohangtietkiem.vn"
 )
+# Client GHTK (shipments/carrier.py)
+GHTK_MAX_RETRIES = int(os.getenv("GHTK_MAX_RETRIES", "2"))
+GHTK_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("GHTK_CIRCUIT_FAILURE_THRESHOLD", "5"))
+GHTK_CIRCUIT_RESET_SECONDS = int(os.getenv("GHTK_CIRCUIT_RESET_SECONDS", "30"))
+# Scheduler đồng bộ trạng thái (manage.py sync_shipment_status)
+GHTK_SYNC_CONCURRENCY = int(os.getenv("GHTK_SYNC_CONCURRENCY", "8"))
+GHTK_SYNC_MAX_RPS = float(os.getenv("GHTK_SYNC_MAX_RPS", "10"))
+# Cache báo giá phí ship (shipments/fee_quotes.py)
+GHTK_FEE_CACHE_TTL = int(os.getenv("GHTK_FEE_CACHE_TTL", str(6 * 3600)))       # giây, còn mới
+GHTK_FEE_STALE_TTL = int(os.getenv("GHTK_FEE_STALE_TTL", str(24 * 3600)))      # giây, được trả bản cũ + làm mới nền
+GHTK_FEE_NEGATIVE_TTL = int(os.getenv("GHTK_FEE_NEGATIVE_TTL", "3600"))         # giây, "không hỗ trợ giao"
+GHTK_FEE_WEIGHT_STEP = float(os.getenv("GHTK_FEE_WEIGHT_STEP", "0.5"))          # kg
+GHTK_FEE_VALUE_STEP = int(os.getenv("GHTK_FEE_VALUE_STEP", "100000"))           # VND
+# Báo giá checkout nhiều cửa hàng (orders/checkout_quote.py)
+CHECKOUT_QUOTE_WORKERS = int(os.getenv("CHECKOUT_QUOTE_WORKERS", "16"))         # thread gọi GHTK dùng chung
+CHECKOUT_QUOTE_TIMEOUT = float(os.getenv("CHECKOUT_QUOTE_TIMEOUT", "5"))        # giây, deadline chung cho mọi store
 # PAYMENT- VNPAY
 VNP_URL =os.getenv("VNP_URL", "https://sandbox.vnpayment.vn/paymentv2/vpcpay.html")
 VNP_TMN_CODE =os.getenv("VNP_TMN_CODE")
@@ -32,6 +48,8 @@ VNP_IPN_URL =os.getenv("VNP_IPN_URL","https://m2smm85s-3000.asse.devtunnels.ms/a
 VNP_RETURN_URL_STORE=os.getenv("VNP_RETURN_URL_STORE","https://m2smm85s-3000.asse.devtunnels.ms/seller/dashboard")
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
+# Danh mục địa chỉ (address/gazetteer.py), cập nhật bằng manage.py rebuild_address_dataset
+ADDRESS_DATASET_PATH = os.getenv("ADDRESS_DATASET_PATH", str(BASE_DIR.parent.parent / "vietnam_addresses.db"))
 AUTH_USER_MODEL = "users.User"
 
 # Quick-start development settings - unsuitable for production
@@ -47,6 +65,21 @@ ALLOWED_HOSTS = []
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Các cỡ ảnh tạo nền cho sản phẩm / tùy chọn / review (products/images.py): tên → (rộng, cao) tối đa
+IMAGE_DERIVATIVE_SIZES = {
+    'thumbnail': (150, 150),
+    'card': (400, 400),
+    'detail': (800, 800),
+    'zoom': (1600, 1600),
+}
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+IMAGE_WORKER_PROCESSES = int(os.getenv("IMAGE_WORKER_PROCESSES", str(os.cpu_count() or 1)))
+# Nhập catalog từ file (products/catalog_import.py): số dòng mỗi lô (1 transaction),
+# thời gian tối đa mỗi job trước khi nối tiếp bằng job mới, số lỗi theo dòng được lưu lại
+CATALOG_IMPORT_CHUNK_SIZE = int(os.getenv("CATALOG_IMPORT_CHUNK_SIZE", "1000"))
+CATALOG_IMPORT_SLICE_SECONDS = int(os.getenv("CATALOG_IMPORT_SLICE_SECONDS", "120"))
+CATALOG_IMPORT_MAX_ERRORS = 1000
 # Application definition
 
 
@@ -57,6 +90,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # SearchVector, GinIndex, unaccent
     'corsheaders',  # Thêm CORS support
     "graphene_django",
     "graphene_file_upload",  # Thêm để support file upload trong GraphQL
@@ -73,6 +107,9 @@ INSTALLED_APPS = [
     "address",
     "brand",
     "settlements",
+    "jobs",      # Hàng đợi job nền (manage.py run_jobs)
+    "caching",   # Cache 2 tầng invalidate theo tag (signal của catalog)
+    "graphql_api",  # management command: export_schema, extract_persisted_queries
 ]
 
 MIDDLEWARE = [
@@ -136,6 +173,44 @@ DATABASES = {
     }
 }
 
+# Cache dùng chung giữa các process: Redis khi có REDIS_URL, thư mục file khi có CACHE_DIR,
+# không có gì thì bộ nhớ trong process (dev / test)
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_DIR = os.getenv("CACHE_DIR")
+if REDIS_URL:
+    _default_cache = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+elif CACHE_DIR:
+    _default_cache = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+else:
+    _default_cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 10000}}
+CACHES = {'default': {**_default_cache, 'KEY_PREFIX': 'shoex'}}
+# Cache 2 tầng theo tag (caching/cache.py): tầng chung, số entry / thời gian sống của tầng LRU trong process,
+# TTL mặc định, thời gian chờ tối đa khi process khác đang tính cùng key
+TAGGED_CACHE_ALIAS = 'default'
+TAGGED_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("TAGGED_CACHE_LOCAL_MAX_ENTRIES", "5000"))
+TAGGED_CACHE_LOCAL_TTL = int(os.getenv("TAGGED_CACHE_LOCAL_TTL", "5"))          # giây
+TAGGED_CACHE_DEFAULT_TTL = int(os.getenv("TAGGED_CACHE_DEFAULT_TTL", "300"))    # giây
+TAGGED_CACHE_LOCK_TIMEOUT = 5                                                  # giây
+
+# Bus invalidate giữa các process qua Postgres LISTEN/NOTIFY (caching/bus.py); khi listener chạy,
+# tầng cục bộ giữ entry tới TAGGED_CACHE_BUS_LOCAL_TTL thay vì TAGGED_CACHE_LOCAL_TTL
+CACHE_BUS_ENABLED = os.getenv("CACHE_BUS_ENABLED", "1") == "1"
+TAGGED_CACHE_BUS_LOCAL_TTL = int(os.getenv("TAGGED_CACHE_BUS_LOCAL_TTL", "300"))  # giây
+
+# Cache JSON response của truy vấn catalog ẩn danh ở view /graphql/ (graphql_api/core/views.py)
+GRAPHQL_RESPONSE_CACHE_ENABLED = os.getenv("GRAPHQL_RESPONSE_CACHE_ENABLED", "1") == "1"
+# Persisted query (graphql_api/core/persisted_queries.py): manifest {sha256: query} do
+# manage.py extract_persisted_queries sinh ra; ONLY=1 (production) chỉ chạy query trong manifest
+GRAPHQL_PERSISTED_QUERIES_FILE = os.getenv(
+    "GRAPHQL_PERSISTED_QUERIES_FILE", str(BASE_DIR / 'graphql_api' / 'persisted_queries.json')
+)
+GRAPHQL_PERSISTED_QUERIES_ONLY = os.getenv("GRAPHQL_PERSISTED_QUERIES_ONLY", "0") == "1"
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.getenv("GRAPHQL_DOCUMENT_CACHE_SIZE", "1000"))  # document đã parse + validate
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -1,12 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
-from graphene_file_upload.django import FileUploadGraphQLView
 from django.conf import settings
 from django.conf.urls.static import static
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
 from graphql_api.api import schema
+from graphql_api.core.views import ShoexGraphQLView
 
 def home_view(request):
     return HttpResponse("""
@@ -26,7 +26,7 @@ urlpatterns = [
     path(
         'graphql/',
         csrf_exempt(
-            FileUploadGraphQLView.as_view(graphiql=True, schema=schema)
+            ShoexGraphQLView.as_view(graphiql=True, schema=schema)
         )
     ),
 
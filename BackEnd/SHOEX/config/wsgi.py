@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Nhận invalidate cache từ process khác (Postgres LISTEN/NOTIFY)
+from caching.bus import start_listener  # noqa: E402
+
+start_listener()
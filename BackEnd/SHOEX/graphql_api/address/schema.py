@@ -1,8 +1,9 @@
 
 import graphene
 from graphene import relay
-from .types import AddressType
+from .types import AddressType, AddressSuggestionType
 from address.models import Address
+from address.gazetteer import get_gazetteer
 from .mutations.mutations import (
     AddAddressMutation,
     UpdateAddressMutation,
@@ -32,6 +33,26 @@ class AddressQueries(graphene.ObjectType):
         address_id=graphene.Int(required=True),
         description="Lấy địa chỉ theo ID"
     )
+
+    # Danh mục địa chỉ (nạp sẵn trong bộ nhớ, không gọi API ngoài)
+    provinces = graphene.List(
+        graphene.String,
+        description="Danh sách tỉnh/thành phố"
+    )
+
+    wards = graphene.List(
+        graphene.String,
+        province=graphene.String(required=True),
+        description="Danh sách phường/xã của tỉnh (tên tỉnh không cần dấu)"
+    )
+
+    suggest_address = graphene.List(
+        AddressSuggestionType,
+        prefix=graphene.String(required=True),
+        province=graphene.String(),
+        limit=graphene.Int(default_value=10),
+        description="Gợi ý tỉnh / phường xã / thôn xóm theo tiền tố, không phân biệt dấu"
+    )
     
     def resolve_my_addresses(self, info):
         """Lấy tất cả địa chỉ của user"""
@@ -63,6 +84,15 @@ class AddressQueries(graphene.ObjectType):
         except Address.DoesNotExist:
             return None
 
+    def resolve_provinces(self, info):
+        return get_gazetteer().provinces()
+
+    def resolve_wards(self, info, province):
+        return get_gazetteer().wards(province)
+
+    def resolve_suggest_address(self, info, prefix, province=None, limit=10):
+        return get_gazetteer().suggest(prefix, limit=min(max(limit, 0), 50), province=province)
+
 
 class AddressMutations(graphene.ObjectType):
     """Address mutations"""
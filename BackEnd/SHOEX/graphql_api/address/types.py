@@ -14,4 +14,15 @@ class AddressType(DjangoObjectType):
 
     def resolve_full_address(self, info):
         """Trả về địa chỉ đầy đủ"""
-        return self.full_address
\ No newline at end of file
+        return self.full_address
+
+class AddressSuggestionType(graphene.ObjectType):
+    """Gợi ý địa chỉ từ danh mục (address/gazetteer.py)"""
+    level = graphene.String(description="province / ward / hamlet")
+    province = graphene.String()
+    ward = graphene.String()
+    hamlet = graphene.String()
+    label = graphene.String(description="Chuỗi hiển thị: thôn/xóm, phường/xã, tỉnh")
+
+    def resolve_label(self, info):
+        return ', '.join(part for part in (self.hamlet, self.ward, self.province) if part)
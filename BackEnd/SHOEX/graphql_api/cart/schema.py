@@ -1,8 +1,10 @@
 import graphene
 from graphene import relay
 from django.db.models import Q
+from address.models import Address
 from cart.models import Cart, CartItem
-from .types import CartType, CartItemType, CartCountableConnection
+from orders.checkout_quote import build_checkout_quote, CheckoutQuoteError
+from .types import CartType, CartItemType, CartCountableConnection, CheckoutQuoteType
 
 
 class CartQueries(graphene.ObjectType):
@@ -19,6 +21,15 @@ class CartQueries(graphene.ObjectType):
         CartItemType,
         description="Lấy danh sách items trong giỏ hàng"
     )
+
+    # Báo giá checkout: tiền hàng + voucher + phí ship mọi cửa hàng
+    checkout_quote = graphene.Field(
+        CheckoutQuoteType,
+        cart_id=graphene.ID(required=True),
+        address_id=graphene.ID(required=True),
+        voucher_codes=graphene.List(graphene.String),
+        description="Báo giá checkout cho giỏ hàng (phí ship các cửa hàng được tính song song)"
+    )
     
     def resolve_my_cart(self, info):
         """Lấy giỏ hàng của user hiện tại"""
@@ -52,6 +63,28 @@ class CartQueries(graphene.ObjectType):
         except Cart.DoesNotExist:
             return []
 
+    def resolve_checkout_quote(self, info, cart_id, address_id, voucher_codes=None):
+        """Báo giá checkout; store nào không tính được phí ship có `error` riêng"""
+        user = info.context.user
+
+        if not user or not user.is_authenticated:
+            raise Exception("Authentication required")
+
+        cart = Cart.objects.filter(cart_id=cart_id, user=user).first()
+        if not cart:
+            raise Exception("Cart not found")
+
+        address = Address.objects.filter(address_id=address_id, user=user).first()
+        if not address:
+            raise Exception("Invalid address")
+
+        try:
+            return build_checkout_quote(
+                user=user, cart=cart, address=address, voucher_codes=voucher_codes,
+            )
+        except CheckoutQuoteError as e:
+            raise Exception(str(e))
+
 
 class CartMutations(graphene.ObjectType):
     """Mutations cho Cart"""
@@ -2,6 +2,7 @@ import graphene
 from graphene_django import DjangoObjectType
 from graphene import relay
 from cart.models import Cart, CartItem
+from graphql_api.shipment.type.inputType import ShippingFeeResult, ExtraFeeType
 
 
 class CartItemType(DjangoObjectType):
@@ -45,3 +46,57 @@ class CartCountableConnection(relay.Connection):
     """Connection cho pagination Cart"""
     class Meta:
         node = CartType
+
+
+# ===== Báo giá checkout (orders/checkout_quote.py) =====
+
+class CheckoutStoreQuoteType(graphene.ObjectType):
+    """Tiền hàng + phí ship của 1 cửa hàng trong giỏ"""
+    store_id = graphene.ID()
+    store_name = graphene.String()
+    items_total = graphene.Decimal()
+    weight = graphene.Decimal(description="Tổng khối lượng (kg)")
+    shipping_fee = graphene.Decimal()
+    shipping = graphene.Field(ShippingFeeResult, description="Chi tiết báo giá GHTK")
+    error = graphene.String(description="Lý do không báo giá được phí ship (nếu có)")
+
+    def resolve_shipping(self, info):
+        quote = self['quote']
+        if quote is None:
+            return None
+        return ShippingFeeResult(
+            name=quote['name'],
+            totalFee=quote['total_fee'],
+            baseFee=quote['base_fee'],
+            insuranceFee=quote['insurance_fee'],
+            deliverySupported=quote['delivery_supported'],
+            extraFees=[ExtraFeeType(**fee) for fee in quote.get('extra_fees', [])],
+        )
+
+
+class CheckoutVoucherQuoteType(graphene.ObjectType):
+    code = graphene.String()
+    applied = graphene.Boolean()
+    message = graphene.String()
+    discount_type = graphene.String()
+    discount = graphene.Decimal(description="Số tiền giảm trên tiền hàng")
+    shipping_discount = graphene.Decimal(description="Số tiền giảm trên phí ship")
+    store_ids = graphene.List(graphene.ID, description="Cửa hàng được áp dụng")
+
+    def resolve_discount_type(self, info):
+        return self['voucher'].discount_type if self['voucher'] else None
+
+    def resolve_store_ids(self, info):
+        return self['scope']
+
+
+class CheckoutQuoteType(graphene.ObjectType):
+    """Báo giá checkout: tiền hàng, voucher và phí ship trong 1 lần gọi"""
+    stores = graphene.List(CheckoutStoreQuoteType)
+    vouchers = graphene.List(CheckoutVoucherQuoteType)
+    items_total = graphene.Decimal()
+    shipping_total = graphene.Decimal()
+    discount_total = graphene.Decimal()
+    shipping_discount = graphene.Decimal()
+    grand_total = graphene.Decimal()
+    complete = graphene.Boolean(description="True nếu mọi cửa hàng đều có phí ship")
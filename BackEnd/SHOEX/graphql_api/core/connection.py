@@ -1,3 +1,12 @@
+import base64
+import hashlib
+import json
+
+import graphene
+from django.core.cache import cache
+from django.db.models import F, Q, QuerySet
+from django.db.models.expressions import OrderBy
+from graphql import GraphQLError
 from graphene import relay
 
 
@@ -11,4 +20,211 @@ def create_connection_slice(iterable, info, args, connection_type, edge_type=Non
     return connection_type(
         edges=[],
         page_info={'has_next_page': False, 'has_previous_page': False}
-    )
\ No newline at end of file
+    )
+
+
+# ===== KEYSET (CURSOR) PAGINATION =====
+
+KEYSET_DEFAULT_PAGE_SIZE = 20
+KEYSET_MAX_PAGE_SIZE = 100
+TOTAL_COUNT_CACHE_TTL = 60  # giây
+_KEY_ALIAS = '_keyset_{}'
+
+
+class CountableConnection(relay.Connection):
+    """
+    Connection có totalCount.
+    COUNT(*) chỉ chạy khi client yêu cầu totalCount và được cache TTL ngắn
+    theo câu SQL, nên trang tiếp theo không phải đếm lại.
+    """
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int(description="Tổng số bản ghi (cache ngắn hạn)")
+
+    def resolve_total_count(root, info):
+        iterable = getattr(root, 'iterable', None)
+        if isinstance(iterable, QuerySet):
+            return cached_count(iterable)
+        if iterable is None:
+            return None
+        return len(iterable)
+
+
+def cached_count(queryset, ttl=TOTAL_COUNT_CACHE_TTL):
+    """COUNT(*) của queryset (bỏ order_by), cache theo SQL + params"""
+    qs = queryset.order_by()
+    sql, params = qs.query.sql_with_params()
+    digest = hashlib.md5(f"{sql}|{params!r}".encode('utf-8')).hexdigest()
+    key = f"qs_count:{qs.model._meta.label_lower}:{digest}"
+    total = cache.get(key)
+    if total is None:
+        total = qs.count()
+        cache.set(key, total, ttl)
+    return total
+
+
+def _ordering_keys(queryset):
+    """
+    Chuyển order_by của queryset thành danh sách (expression, descending, nulls_last),
+    luôn kết thúc bằng khóa chính để thứ tự là duy nhất.
+    """
+    ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    pk_name = queryset.model._meta.pk.name
+    keys = []
+    names = set()
+    for item in ordering:
+        if isinstance(item, str):
+            if item == '?':
+                raise GraphQLError("Keyset pagination không hỗ trợ sắp xếp ngẫu nhiên")
+            descending = item.startswith('-')
+            name = item.lstrip('-+')
+            names.add(name)
+            # Mặc định của PostgreSQL: ASC → NULLS LAST, DESC → NULLS FIRST
+            keys.append((F(name), descending, not descending))
+        elif isinstance(item, OrderBy):
+            nulls_last = item.nulls_last if (item.nulls_last or item.nulls_first) else not item.descending
+            if isinstance(item.expression, F):
+                names.add(item.expression.name)
+            keys.append((item.expression, item.descending, bool(nulls_last)))
+        else:
+            keys.append((item, False, True))
+    if not names & {pk_name, 'pk'}:
+        keys.append((F(pk_name), bool(keys and keys[0][1]), True))
+    return keys
+
+
+def encode_keyset_cursor(values):
+    payload = json.dumps(values, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_keyset_cursor(cursor, expected_length):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError):
+        raise GraphQLError("Cursor không hợp lệ")
+    if not isinstance(values, list) or len(values) != expected_length:
+        raise GraphQLError("Cursor không khớp với cách sắp xếp hiện tại")
+    return values
+
+
+def _after_condition(keys, values, reverse=False, inclusive=False):
+    """
+    Điều kiện "đứng sau cursor" theo thứ tự từ điển:
+    (k0 > v0) OR (k0 = v0 AND k1 > v1) OR ...
+    reverse=True → "đứng trước cursor" (dùng cho before/last).
+    inclusive=True → gồm cả bản ghi tại đúng cursor.
+    """
+    condition = Q(pk__in=[])
+    equal_prefix = Q()
+    for idx, ((_, descending, nulls_last), value) in enumerate(zip(keys, values)):
+        alias = _KEY_ALIAS.format(idx)
+        forward = descending != reverse  # True → giá trị sau nhỏ hơn
+        nulls_after = nulls_last != reverse
+        if value is None:
+            after = Q(**{f'{alias}__isnull': False}) if not nulls_after else Q(pk__in=[])
+            equal = Q(**{f'{alias}__isnull': True})
+        else:
+            after = Q(**{f'{alias}__lt' if forward else f'{alias}__gt': value})
+            if nulls_after:
+                after |= Q(**{f'{alias}__isnull': True})
+            equal = Q(**{alias: value})
+        condition |= equal_prefix & after
+        equal_prefix &= equal
+    if inclusive:
+        condition |= equal_prefix
+    return condition
+
+
+class KeysetConnectionField(relay.ConnectionField):
+    """
+    ConnectionField phân trang theo keyset thay vì OFFSET/LIMIT.
+    Resolver trả về QuerySet đã order_by; cursor mã hóa giá trị các khóa sắp xếp
+    (+ khóa chính), nên trang N có chi phí như trang 1 (WHERE (key, pk) > cursor LIMIT n).
+    """
+
+    @classmethod
+    def resolve_connection(cls, connection_type, args, resolved):
+        if isinstance(resolved, connection_type):
+            return resolved
+        if not isinstance(resolved, QuerySet):
+            return super().resolve_connection(connection_type, args, resolved)
+
+        first = args.get('first')
+        last = args.get('last')
+        after = args.get('after')
+        before = args.get('before')
+        for value in (first, last):
+            if value is not None and value < 0:
+                raise GraphQLError("first/last phải >= 0")
+
+        keys = _ordering_keys(resolved)
+        qs = resolved.annotate(**{
+            _KEY_ALIAS.format(idx): expression for idx, (expression, _, _) in enumerate(keys)
+        }).order_by(*[
+            OrderBy(F(_KEY_ALIAS.format(idx)), descending=descending,
+                    nulls_last=nulls_last or None, nulls_first=(not nulls_last) or None)
+            for idx, (_, descending, nulls_last) in enumerate(keys)
+        ])
+
+        ordered = qs
+        after_values = decode_keyset_cursor(after, len(keys)) if after else None
+        before_values = decode_keyset_cursor(before, len(keys)) if before else None
+        if after:
+            qs = qs.filter(_after_condition(keys, after_values))
+        if before:
+            qs = qs.filter(_after_condition(keys, before_values, reverse=True))
+
+        backwards = last is not None and first is None
+        page_size = min(last if backwards else (first or KEYSET_DEFAULT_PAGE_SIZE), KEYSET_MAX_PAGE_SIZE)
+        if backwards:
+            qs = qs.reverse()
+
+        rows = list(qs[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+
+        edges = [
+            connection_type.Edge(
+                node=row,
+                cursor=encode_keyset_cursor([getattr(row, _KEY_ALIAS.format(idx)) for idx in range(len(keys))]),
+            )
+            for row in rows
+        ]
+        # Chiều ngược lại với chiều đang phân trang: còn bản ghi tại / trước cursor after
+        # (sau cursor before) hay không → 1 query EXISTS, không cần khi không có cursor
+        if backwards:
+            has_previous_page = has_more
+            has_next_page = before_values is not None and ordered.filter(
+                _after_condition(keys, before_values, inclusive=True)
+            ).exists()
+        else:
+            has_next_page = has_more
+            has_previous_page = after_values is not None and ordered.filter(
+                _after_condition(keys, after_values, reverse=True, inclusive=True)
+            ).exists()
+        page_info = relay.PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        )
+        connection = connection_type(edges=edges, page_info=page_info)
+        connection.iterable = resolved
+        return connection
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection_type, root, info, **args):
+        """
+        Sau khi có trang kết quả, gọi hook prime_loaders(info, nodes) của node type (nếu có)
+        để các DataLoader của field con load cả trang trong 1 query.
+        """
+        connection = super().connection_resolver(resolver, connection_type, root, info, **args)
+        node_type = getattr(getattr(connection, '_meta', None), 'node', None)
+        prime = getattr(node_type, 'prime_loaders', None)
+        if prime is not None:
+            prime(info, [edge.node for edge in connection.edges])
+        return connection
@@ -0,0 +1,68 @@
+"""
+DataLoader đồng bộ cho GraphQL (graphene 3 / graphql-core 3 chạy sync)
+
+promise.DataLoader trả về Promise (awaitable) nên không dùng được với view sync.
+BatchLoader gom các key đã "prime" (VD: toàn bộ product trong trang hiện tại)
+rồi load tất cả trong một query ở lần .load() đầu tiên, kết quả cache theo request.
+"""
+
+
+class BatchLoader:
+    """
+    Loader gom batch theo request.
+
+    Lớp con cài đặt batch_load_fn(keys) -> list giá trị cùng thứ tự với keys.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._queue = {}  # dict giữ thứ tự, dùng như ordered set
+
+    def prime_many(self, keys):
+        """Đăng ký trước các key sẽ cần để lần load đầu tiên lấy cả batch"""
+        for key in keys:
+            if key not in self._cache:
+                self._queue[key] = None
+
+    def load(self, key):
+        if key not in self._cache:
+            self._queue[key] = None
+            self._dispatch()
+        return self._cache.get(key)
+
+    def load_many(self, keys):
+        keys = list(keys)
+        self.prime_many(keys)
+        if self._queue:
+            self._dispatch()
+        return [self._cache.get(key) for key in keys]
+
+    def clear(self, key=None):
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+    def _dispatch(self):
+        keys = list(self._queue)
+        self._queue.clear()
+        if not keys:
+            return
+        values = self.batch_load_fn(keys)
+        self._cache.update(zip(keys, values))
+
+    def batch_load_fn(self, keys):
+        raise NotImplementedError
+
+
+def get_loaders(info, namespace, factory):
+    """
+    Lấy dict loaders của request hiện tại (tạo lần đầu).
+    Loaders được gắn lên info.context.<namespace> nên sống đúng 1 request.
+    """
+    context = info.context
+    loaders = getattr(context, namespace, None)
+    if loaders is None:
+        loaders = factory()
+        setattr(context, namespace, loaders)
+    return loaders
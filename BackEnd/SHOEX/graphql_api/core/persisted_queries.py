@@ -0,0 +1,112 @@
+"""
+Persisted query + cache document đã parse / validate cho /graphql/ (graphql_api/core/views.py)
+
+Persisted query (giao thức APQ của Apollo): client gửi
+    extensions={"persistedQuery": {"version": 1, "sha256Hash": "<sha256 của query>"}}
+không kèm query → server tra query đã đăng ký; body / URL GET ngắn hơn nhiều trên mobile.
+- Đăng ký sẵn: file manifest GRAPHQL_PERSISTED_QUERIES_FILE ({hash: query}), sinh bằng
+  python manage.py extract_persisted_queries (quét các operation của frontend)
+- Đăng ký tự động: hash chưa biết → lỗi PersistedQueryNotFound, client gửi lại kèm query,
+  server kiểm tra hash rồi lưu vào Django cache
+- GRAPHQL_PERSISTED_QUERIES_ONLY (production): chỉ chạy query có trong manifest,
+  từ chối query tùy ý và không đăng ký tự động
+
+Document: parse + validate với schema lớn của graphql_api/api.py tốn CPU hơn cả resolver
+ở nhiều query nhỏ → giữ kết quả trong LRU theo nội dung query (GRAPHQL_DOCUMENT_CACHE_SIZE).
+"""
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from graphene_django.settings import graphene_settings
+from graphene_django.views import HttpError
+from graphql import GraphQLError, parse, validate
+
+PERSISTED_QUERY_TTL = 7 * 24 * 3600  # giây, query đăng ký tự động
+NOT_FOUND_MESSAGE = 'PersistedQueryNotFound'
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+# ===== DOCUMENT =====
+
+@functools.lru_cache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+def get_document(schema, query, rules=None):
+    """(document, errors) của query với schema (graphql-core GraphQLSchema); lỗi parse → document None"""
+    try:
+        document = parse(query)
+    except GraphQLError as error:
+        return None, (error,)
+    return document, tuple(validate(schema, document, rules, graphene_settings.MAX_VALIDATION_ERRORS))
+
+
+def document_cache_info():
+    return get_document.cache_info()
+
+
+# ===== MANIFEST / ĐĂNG KÝ =====
+
+@functools.lru_cache(maxsize=None)
+def load_manifest(path=None):
+    """{hash: query} từ file manifest (không có file → rỗng); đọc 1 lần mỗi process"""
+    path = path or settings.GRAPHQL_PERSISTED_QUERIES_FILE
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def lookup(sha256_hash):
+    query = load_manifest().get(sha256_hash)
+    if query is None and not settings.GRAPHQL_PERSISTED_QUERIES_ONLY:
+        query = cache.get(f'persisted_query:{sha256_hash}')
+    return query
+
+
+def register(sha256_hash, query):
+    cache.set(f'persisted_query:{sha256_hash}', query, PERSISTED_QUERY_TTL)
+
+
+def _extensions(request, data):
+    extensions = request.GET.get('extensions') or data.get('extensions')
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise HttpError(HttpResponseBadRequest('Extensions are invalid JSON.'))
+    return extensions if isinstance(extensions, dict) else {}
+
+
+def resolve_query(request, data, query):
+    """
+    Query cần chạy sau khi xét persisted query của request (query: nội dung client gửi, có thể rỗng).
+    Raise HttpError khi hash sai / không tìm thấy / ngoài allow-list.
+    """
+    persisted = _extensions(request, data).get('persistedQuery')
+    if not persisted:
+        if query and settings.GRAPHQL_PERSISTED_QUERIES_ONLY and query_hash(query) not in load_manifest():
+            raise HttpError(HttpResponseForbidden(), 'Query is not in the persisted query allow-list.')
+        return query
+
+    sha256_hash = persisted.get('sha256Hash') if isinstance(persisted, dict) else None
+    if not sha256_hash or persisted.get('version', 1) != 1:
+        raise HttpError(HttpResponseBadRequest(), 'Unsupported persisted query.')
+    if not query:
+        query = lookup(sha256_hash)
+        if query is None:
+            # APQ: client nhận lỗi này sẽ gửi lại kèm query
+            raise HttpError(HttpResponse(status=200), NOT_FOUND_MESSAGE)
+        return query
+    if query_hash(query) != sha256_hash:
+        raise HttpError(HttpResponseBadRequest(), 'Provided sha256Hash does not match query.')
+    if sha256_hash not in load_manifest():
+        if settings.GRAPHQL_PERSISTED_QUERIES_ONLY:
+            raise HttpError(HttpResponseForbidden(), 'Query is not in the persisted query allow-list.')
+        register(sha256_hash, query)
+    return query
@@ -0,0 +1,190 @@
+"""
+View GraphQL của API (/graphql/): FileUploadGraphQLView + persisted query / cache document
+(graphql_api/core/persisted_queries.py) + cache response cho truy vấn catalog ẩn danh
+
+Phần lớn traffic products / product / categories / featuredProducts là khách chưa đăng nhập,
+giống hệt nhau giữa các user. Với các operation này view trả luôn JSON đã serialize từ cache
+(caching/cache.py), bỏ qua parse / validate / resolver / SQL.
+
+- Chỉ operation query mà mọi field gốc nằm trong RESPONSE_CACHE_FIELDS (opt-in theo field);
+  TTL ngắn nhất và hợp tag của các field đó. Mutation, user đã đăng nhập, batch, GraphiQL,
+  ?pretty đều đi thẳng.
+- Key: sha256 của query + operationName + variables + trạng thái đăng nhập
+- Chỉ cache response thành công (status 200, không có errors); ghi catalog invalidate theo tag
+  như các cache khác (caching/signals.py, products/stats.py)
+- GET: trả ETag (hash của JSON) và 304 khi If-None-Match khớp
+
+Tắt bằng GRAPHQL_RESPONSE_CACHE_ENABLED=0. Hit / miss: manage.py cache_stats (tên 'graphql_response').
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import HttpError
+from graphene_file_upload.django import FileUploadGraphQLView
+from graphql import ExecutionResult, FieldNode, OperationType, execute, get_operation_ast, validate_schema
+
+from caching.cache import MISSING, get_cache, make_key
+
+from .persisted_queries import get_document, query_hash, resolve_query
+
+RESPONSE_CACHE_NAME = 'graphql_response'
+
+CATALOG_TAGS = ('product', 'category', 'brand', 'store')
+
+# field gốc → (TTL giây, tag invalidate)
+RESPONSE_CACHE_FIELDS = {
+    'products': (30, CATALOG_TAGS),
+    'featuredProducts': (30, CATALOG_TAGS),
+    'product': (60, CATALOG_TAGS),
+    'categories': (300, ('category', 'product')),
+    '__typename': (300, ()),
+}
+
+
+@functools.lru_cache(maxsize=512)
+def operation_policy(schema, query, operation_name=None):
+    """(ttl, tags) nếu operation được cache, None nếu không (nhớ theo query để miss không phải xét lại)"""
+    document, errors = get_document(schema, query)
+    if document is None or errors:
+        return None
+    operation = get_operation_ast(document, operation_name)
+    if operation is None or operation.operation != OperationType.QUERY:
+        return None
+    ttls, tags = [], set()
+    for selection in operation.selection_set.selections:
+        if not isinstance(selection, FieldNode) or selection.name.value not in RESPONSE_CACHE_FIELDS:
+            return None
+        ttl, field_tags = RESPONSE_CACHE_FIELDS[selection.name.value]
+        ttls.append(ttl)
+        tags.update(field_tags)
+    if not ttls:
+        return None
+    return min(ttls), tuple(sorted(tags))
+
+
+def auth_state(request):
+    """Phần key theo người gọi; None = không cache (đã đăng nhập)"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return None
+    return 'anonymous'
+
+
+class ShoexGraphQLView(FileUploadGraphQLView):
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        etag = getattr(request, '_response_cache_etag', None)
+        if etag is None or request.method != 'GET':
+            return response
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return get_conditional_response(request, etag=etag, response=response)
+
+    def get_response(self, request, data, show_graphiql=False):
+        entry = None if show_graphiql or self.batch else self._response_cache_entry(request, data)
+        if entry is None:
+            return super().get_response(request, data, show_graphiql)
+
+        key, ttl, tags = entry
+        tagged = get_cache()
+        cached = tagged.get(key, name=RESPONSE_CACHE_NAME)
+        if cached is MISSING:
+            started_at = tagged.start(tags)
+            result, status_code = super().get_response(request, data, show_graphiql)
+            if status_code != 200 or getattr(request, '_graphql_has_errors', True):
+                return result, status_code
+            cached = (result, '"%s"' % hashlib.sha1(result.encode('utf-8')).hexdigest())
+            tagged.set(key, cached, tags, ttl, started_at)
+        request._response_cache_etag = cached[1]
+        return cached[0], 200
+
+    def get_graphql_params(self, request, data):
+        """Như GraphQLView + persisted query; nhớ trên request vì cache response và thực thi đều gọi"""
+        params = None if self.batch else getattr(request, '_graphql_params', None)
+        if params is None:
+            query, variables, operation_name, id = super().get_graphql_params(request, data)
+            params = request._graphql_params = (resolve_query(request, data, query), variables, operation_name, id)
+        return params
+
+    def execute_graphql_request(self, request, *args, **kwargs):
+        result = self._execute_graphql_request(request, *args, **kwargs)
+        request._graphql_has_errors = result is None or bool(result.errors)
+        return result
+
+    def _execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        """GraphQLView.execute_graphql_request, lấy document đã parse + validate từ LRU"""
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest('Must provide query string.'))
+
+        schema = self.schema.graphql_schema
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        rules = tuple(self.validation_rules) if self.validation_rules else None
+        document, errors = get_document(schema, query, rules)
+        if document is None:
+            return ExecutionResult(errors=list(errors))
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if request.method.lower() == 'get' and operation_ast is not None and operation_ast.operation != OperationType.QUERY:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseNotAllowed(
+                ['POST'], f'Can only perform a {operation_ast.operation.value} operation from a POST request.'
+            ))
+        if errors:
+            return ExecutionResult(data=None, errors=list(errors))
+
+        try:
+            execute_options = {
+                'root_value': self.get_root_value(request),
+                'context_value': self.get_context(request),
+                'variable_values': variables,
+                'operation_name': operation_name,
+                'middleware': self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options['execution_context_class'] = self.execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+            return execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    def _response_cache_entry(self, request, data):
+        """(key, ttl, tags) khi request này được phục vụ từ cache"""
+        if not settings.GRAPHQL_RESPONSE_CACHE_ENABLED or request.GET.get('pretty'):
+            return None
+        state = auth_state(request)
+        if state is None:
+            return None
+        query, variables, operation_name, _ = self.get_graphql_params(request, data)
+        if not query:
+            return None
+        policy = operation_policy(self.schema.graphql_schema, query, operation_name)
+        if policy is None:
+            return None
+        key = make_key(RESPONSE_CACHE_NAME, query_hash(query), operation_name, variables or {}, state)
+        return key, policy[0], policy[1]
@@ -0,0 +1,142 @@
+"""
+QuerySet cho các danh sách admin (users / stores / orders / products)
+
+Mọi số liệu theo từng dòng (số đơn, chi tiêu, owner, tồn kho...) được tính bằng
+subquery tương quan hoặc prefetch, nên 1 trang luôn tốn số query cố định
+bất kể số dòng. Sắp xếp mới nhất trước, dùng với KeysetConnectionField.
+"""
+from decimal import Decimal
+
+from django.db.models import (
+    Count, DecimalField, Exists, IntegerField, OuterRef, Prefetch, Q, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce
+
+from address.models import Address
+from orders.models import Order, SubOrder, OrderItem
+from products.category_tree import expand_category_ids
+from products.models import Product, ProductImage
+from store.models import Store, StoreUser, StoreAnalytics, AddressStore
+from users.models import User
+
+
+def _subquery_sum(queryset, group_field, field, output_field):
+    """SUM(field) của queryset (đã filter theo OuterRef) gom theo group_field, NULL → 0"""
+    aggregate = queryset.order_by().values(group_field).annotate(total=Sum(field)).values('total')
+    zero = Value(Decimal('0')) if isinstance(output_field, DecimalField) else Value(0)
+    return Coalesce(Subquery(aggregate, output_field=output_field), zero, output_field=output_field)
+
+
+def _subquery_count(queryset, group_field):
+    aggregate = queryset.order_by().values(group_field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(aggregate, output_field=IntegerField()), Value(0))
+
+
+def admin_users_queryset(filter=None):
+    owners = StoreUser.objects.filter(user=OuterRef('pk'), role='owner').order_by('pk')
+    orders = Order.objects.filter(buyer=OuterRef('pk'))
+    addresses = Address.objects.filter(user=OuterRef('pk')).order_by('-is_default', 'address_id')
+
+    qs = User.objects.annotate(
+        owned_store_name=Subquery(owners.values('store__name')[:1]),
+        order_count=_subquery_count(orders, 'buyer'),
+        spending=_subquery_sum(orders, 'buyer', 'total_amount', DecimalField(max_digits=15, decimal_places=2)),
+        address_province=Subquery(addresses.values('province')[:1]),
+        address_phone=Subquery(addresses.values('phone_number')[:1]),
+    ).order_by('-date_joined')
+
+    filter = filter or {}
+    if filter.get('search'):
+        term = filter['search']
+        qs = qs.filter(
+            Q(username__icontains=term) | Q(email__icontains=term) |
+            Q(first_name__icontains=term) | Q(last_name__icontains=term)
+        )
+    if filter.get('status'):
+        qs = qs.filter(is_active=filter['status'] == 'active')
+    if filter.get('role'):
+        is_admin = Q(is_superuser=True) | Q(is_staff=True)
+        is_owner = Exists(owners.values('pk'))
+        role = filter['role']
+        if role == 'admin':
+            qs = qs.filter(is_admin)
+        elif role == 'seller':
+            qs = qs.exclude(is_admin).filter(is_owner)
+        else:
+            qs = qs.exclude(is_admin).exclude(is_owner)
+    return qs
+
+
+def admin_stores_queryset(filter=None):
+    # Doanh thu / số đơn đọc từ rollup StoreAnalytics (store/rollups.py)
+    analytics = StoreAnalytics.objects.filter(store=OuterRef('pk'))
+    qs = Store.objects.annotate(
+        revenue_total=_subquery_sum(analytics, 'store', 'revenue', DecimalField(max_digits=15, decimal_places=2)),
+        order_total=_subquery_sum(analytics, 'store', 'orders', IntegerField()),
+        product_total=_subquery_count(Product.objects.filter(store=OuterRef('pk')), 'store'),
+    ).prefetch_related(
+        Prefetch(
+            'store_users',
+            queryset=StoreUser.objects.filter(role='owner').select_related('user').order_by('pk'),
+            to_attr='owner_memberships',
+        ),
+        Prefetch(
+            'addresses',
+            queryset=AddressStore.objects.order_by('-is_default', 'address_id'),
+            to_attr='ordered_addresses',
+        ),
+    ).order_by('-created_at')
+
+    filter = filter or {}
+    if filter.get('search'):
+        term = filter['search']
+        qs = qs.filter(Q(name__icontains=term) | Q(email__icontains=term))
+    if filter.get('status'):
+        qs = qs.filter(is_active=filter['status'] == 'active')
+    return qs
+
+
+def admin_orders_queryset(filter=None):
+    qs = SubOrder.objects.select_related(
+        'order__buyer', 'order__address', 'order__payment', 'store', 'shipment',
+    ).annotate(
+        item_quantity=_subquery_sum(
+            OrderItem.objects.filter(sub_order=OuterRef('pk')), 'sub_order', 'quantity', IntegerField()
+        ),
+    ).order_by('-created_at')
+
+    filter = filter or {}
+    if filter.get('search'):
+        term = filter['search']
+        qs = qs.filter(
+            Q(order__buyer__username__icontains=term) | Q(order__buyer__email__icontains=term) |
+            Q(store__name__icontains=term)
+        )
+    if filter.get('status'):
+        qs = qs.filter(shipment__status=filter['status'])
+    if filter.get('store_id'):
+        qs = qs.filter(store_id=filter['store_id'])
+    return qs
+
+
+def admin_products_queryset(filter=None):
+    thumbnails = ProductImage.objects.filter(product=OuterRef('pk')).order_by(
+        '-is_thumbnail', 'display_order', 'created_at'
+    )
+    # Tồn kho / đã bán đọc từ ProductStats (products/stats.py)
+    qs = Product.objects.select_related('store', 'category').annotate(
+        stock_total=Coalesce('stats__total_stock', Value(0)),
+        sold_total=Coalesce('stats__sold_count', Value(0)),
+        thumbnail_name=Subquery(thumbnails.values('image')[:1]),
+    ).order_by('-created_at')
+
+    filter = filter or {}
+    if filter.get('search'):
+        qs = qs.filter(name__icontains=filter['search'])
+    if filter.get('status'):
+        qs = qs.filter(is_active=filter['status'] == 'approved')
+    if filter.get('store_id'):
+        qs = qs.filter(store_id=filter['store_id'])
+    if filter.get('category_id'):
+        qs = qs.filter(category_id__in=expand_category_ids([filter['category_id']]))
+    return qs
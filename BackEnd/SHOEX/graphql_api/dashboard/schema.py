@@ -4,8 +4,14 @@ from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import timedelta
 from .types import DashboardStats, RevenueData, TopStore, CategoryData, RecentActivity, AdminStoreType, AdminUserType, AdminOrderType, AdminProductType, AdminAnalyticsType
+from .types import (
+    AdminStoreConnection, AdminUserConnection, AdminOrderConnection, AdminProductConnection,
+    AdminStoreFilterInput, AdminUserFilterInput, AdminOrderFilterInput, AdminProductFilterInput,
+)
+from .admin_querysets import admin_stores_queryset, admin_users_queryset, admin_orders_queryset, admin_products_queryset
+from graphql_api.core.connection import KeysetConnectionField
 from orders.models import Order, SubOrder
-from store.models import Store, StoreUser
+from store.models import Store, StoreUser, StoreAnalytics, CategorySalesDaily, ProvinceSalesDaily, PlatformSalesMonthly
 from django.contrib.auth import get_user_model
 from products.models import Product, Category
 from address.models import Address
@@ -22,48 +28,61 @@ class DashboardQuery(graphene.ObjectType):
     admin_analytics = Field(AdminAnalyticsType, range=graphene.String(), limit=graphene.Int())
     admin_vouchers = List('graphql_api.discount.types.VoucherType')
     admin_voucher_by_id = graphene.Field('graphql_api.discount.types.VoucherType', voucher_id=graphene.ID(required=True))
-    admin_users = graphene.List(AdminUserType)
+
+    # Phân trang keyset + bộ lọc
+    admin_stores_connection = KeysetConnectionField(AdminStoreConnection, filter=AdminStoreFilterInput())
+    admin_users_connection = KeysetConnectionField(AdminUserConnection, filter=AdminUserFilterInput())
+    admin_orders_connection = KeysetConnectionField(AdminOrderConnection, filter=AdminOrderFilterInput())
+    admin_products_connection = KeysetConnectionField(AdminProductConnection, filter=AdminProductFilterInput())
 
     def resolve_admin_dashboard(self, info):
         user = info.context.user
-        # 1. Total Stats
-        total_orders = Order.objects.count()
+        # 1. Total Stats (đọc từ rollup tháng)
+        totals = PlatformSalesMonthly.objects.aggregate(
+            orders=Sum('orders'),
+            revenue=Sum('revenue'),
+        )
+        total_orders = totals['orders'] or 0
         # Revenue: Sum of subtotal of all SubOrders (since SubOrder represents actual store revenue)
-        total_revenue_agg = SubOrder.objects.aggregate(Sum('subtotal'))
-        total_revenue = total_revenue_agg['subtotal__sum'] or 0
+        total_revenue = totals['revenue'] or 0
         
         total_stores = Store.objects.count()
         total_users = User.objects.count()
 
-        # 2. Revenue Last 30 Days
+        # 2. Revenue Last 30 Days (1 query GROUP BY ngày trên StoreAnalytics)
+        today = timezone.localdate()
+        first_day = today - timedelta(days=29)
+        by_day = {
+            row['date']: row
+            for row in StoreAnalytics.objects.filter(date__gte=first_day, date__lte=today)
+            .values('date').annotate(rev=Sum('revenue'), cnt=Sum('orders'))
+        }
         revenue_data = []
-        today = timezone.now().date()
         for i in range(29, -1, -1):
             date = today - timedelta(days=i)
-            # Filter suborders created on this date
-            day_orders = SubOrder.objects.filter(created_at__date=date)
-            # Use 'subtotal' instead of 'total_amount'
-            rev = day_orders.aggregate(Sum('subtotal'))['subtotal__sum'] or 0
-            cnt = day_orders.count()
+            row = by_day.get(date, {})
             revenue_data.append(RevenueData(
                 day=date.strftime("%d/%m"),
-                revenue=float(rev),
-                orders=cnt
+                revenue=float(row.get('rev') or 0),
+                orders=row.get('cnt') or 0
             ))
 
         # 3. Top Stores (by revenue)
-        # Identify top 5 stores based on suborders subtotal
-        top_stores_qs = Store.objects.annotate(
-            revenue=Sum('sub_orders__subtotal'),
-            order_count=Count('sub_orders')
-        ).order_by('-revenue')[:5]
+        top_rows = list(
+            StoreAnalytics.objects.values('store_id').annotate(
+                revenue_sum=Sum('revenue'),
+                order_count=Sum('orders')
+            ).filter(order_count__gt=0).order_by('-revenue_sum')[:5]
+        )
+        stores = Store.objects.in_bulk([row['store_id'] for row in top_rows], field_name='store_id')
         
         top_stores = []
-        for s in top_stores_qs:
+        for row in top_rows:
+            s = stores[row['store_id']]
             top_stores.append(TopStore(
                 name=s.name,
-                revenue=float(s.revenue or 0),
-                orders=s.order_count,
+                revenue=float(row['revenue_sum'] or 0),
+                orders=row['order_count'],
                 # Rating is possibly a field or calculated. defaulting to 5.0 if not found
                 rating=getattr(s, 'rating', 5.0) 
             ))
@@ -118,277 +137,99 @@ class DashboardQuery(graphene.ObjectType):
             recent_activities=activities
         )
 
+    # Danh sách đầy đủ (giữ cho client cũ) - cùng QuerySet với bản connection,
+    # số query cố định nhưng trả về toàn bộ bảng; client mới dùng *Connection.
     def resolve_admin_stores(self, info):
         """Resolve list of all stores with aggregated stats"""
         # Note: No permission check as requested by user ("tạm thời ai cũng được")
-        
-        # Get all stores with aggregated revenue and order count
-        qs = Store.objects.annotate(
-            revenue=Sum('sub_orders__subtotal'),
-            order_count=Count('sub_orders'),
-            product_count=Count('products')
-        )
-
-        results = []
-        for s in qs:
-            # Attempt to find owner (StoreUser with role owner)
-            # This might be N+1 query, but acceptable for admin panel with pagination (though here we return all)
-            # If performance becomes issue, we can prefetch
-            owner_name = "Unknown"
-            owner_phone = ""
-            owner_email = ""
-            
-            try:
-                # Find the owner user
-                owner_relation = StoreUser.objects.filter(store=s, role='owner').select_related('user').first()
-                if owner_relation and owner_relation.user:
-                    u = owner_relation.user
-                    owner_name = u.get_full_name() or u.username
-                    owner_email = u.email
-                    owner_phone = getattr(u, 'phone', '') or '' # Assuming phone might be on profile or user model
-            except Exception:
-                pass
-            
-            # Address: take first address of store
-            store_address = "N/A"
-            try:
-                addr = s.addresses.filter(is_default=True).first() or s.addresses.first()
-                if addr:
-                    store_address = f"{addr.city_province}" # Just displaying City/Province as in mock
-            except Exception:
-                pass
-                
-            results.append(AdminStoreType(
-                id=s.store_id,
-                name=s.name,
-                owner_name=owner_name,
-                email=owner_email or "N/A",
-                phone=owner_phone or "N/A",
-                address=store_address,
-                status='active' if s.is_active else 'suspended', # Simple mapping for now
-                revenue=float(s.revenue or 0),
-                orders=s.order_count,
-                products=s.product_count,
-                rating=getattr(s, 'rating', 5.0),
-                join_date=s.created_at.strftime("%Y-%m-%d"),
-                avatar=s.avatar.url if s.avatar else ""
-            ))
-            
-        return results
+        return admin_stores_queryset()
 
     def resolve_admin_users(self, info):
         """Resolve list of all users with aggregated stats"""
         # No permission check as requested
-        
-        users = User.objects.all().order_by('-date_joined')
-        results = []
-        
-        for u in users:
-            # Determine role
-            role = 'customer'
-            store_name = ""
-            
-            if u.is_superuser or u.is_staff:
-                role = 'admin'
-            else:
-                # Check if seller
-                store_ownership = StoreUser.objects.filter(user=u, role='owner').first()
-                if store_ownership:
-                    role = 'seller'
-                    store_name = store_ownership.store.name
-            
-            # Determine status
-            status = 'active' if u.is_active else 'banned'
-            
-            # Aggregate stats
-            # Orders: Count of Orders where user is the customer
-            orders_count = Order.objects.filter(buyer=u).count()
-            
-            # Spending: Sum of total_amount of Orders
-            spending_agg = Order.objects.filter(buyer=u).aggregate(total=Sum('total_amount'))
-            spending = spending_agg['total'] or 0
-            
-            # Address: take from user profile or first address
-            address = "N/A"
-            phone = getattr(u, 'phone', '') or ''
-            
-            # Address model related_name is 'user_addresses'
-            if hasattr(u, 'user_addresses') and u.user_addresses.exists():
-                 addr = u.user_addresses.filter(is_default=True).first() or u.user_addresses.first()
-                 if addr:
-                     address = f"{addr.province}"
-                     if addr.phone_number:
-                         phone = addr.phone_number
-
-            results.append(AdminUserType(
-                id=u.id,
-                name=u.get_full_name() or u.username,
-                email=u.email,
-                phone=phone,
-                role=role,
-                status=status,
-                orders=orders_count,
-                spending=float(spending),
-                join_date=u.date_joined.strftime("%Y-%m-%d"),
-                last_active=u.last_login.strftime("%Y-%m-%d") if u.last_login else "",
-                address=address,
-                store_name=store_name
-            ))
-            
-        return results
+        return admin_users_queryset()
 
     def resolve_admin_orders(self, info):
         """Resolve list of all orders (SubOrders) with aggregated stats"""
-        # Fetch SubOrders to get store-specific orders
-        sub_orders = SubOrder.objects.all().select_related('order', 'store', 'order__buyer', 'order__address', 'shipment').order_by('-created_at')
-        
-        results = []
-        for sub in sub_orders:
-            # Determine Status from Shipment
-            status = 'pending'
-            if hasattr(sub, 'shipment'):
-                status = sub.shipment.status
-            
-            # Determine Payment Method from Order -> Payment
-            payment_method = 'unknown'
-            if hasattr(sub.order, 'payment'):
-                payment_method = sub.order.payment.payment_method
-            
-            # Address
-            shipping_address = "N/A"
-            if sub.order.address:
-                shipping_address = sub.order.address.province
-            
-            # Products count
-            products_count = sub.items.aggregate(count=Sum('quantity'))['count'] or 0
-            
-            # Format ID
-            order_id_str = f"ORD{sub.order.order_id}-S{sub.sub_order_id}"
-
-            results.append(AdminOrderType(
-                id=order_id_str,
-                customer=sub.order.buyer.get_full_name() or sub.order.buyer.username,
-                store=sub.store.name,
-                products=products_count,
-                total=float(sub.subtotal),
-                status=status,
-                payment_method=payment_method,
-                shipping_address=shipping_address,
-                date=sub.created_at.strftime("%Y-%m-%d")
-            ))
-            
-        return results
+        return admin_orders_queryset()
 
     def resolve_admin_products(self, info):
         """Resolve list of all products with aggregated stats"""
-        from orders.models import OrderItem
-        
-        products = Product.objects.all().select_related('store', 'category').order_by('-created_at')
-        
-        results = []
-        for p in products:
-            # Calculate total stock from variants
-            stock = p.variants.aggregate(total=Sum('stock'))['total'] or 0
-            
-            # Calculate sold count from OrderItems
-            sold = OrderItem.objects.filter(variant__product=p).aggregate(total=Sum('quantity'))['total'] or 0
-            
-            # Get first image
-            image_url = ""
-            first_image = p.gallery_images.filter(is_thumbnail=True).first() or p.gallery_images.first()
-            if first_image and first_image.image:
-                image_url = first_image.image.url
-            
-            # Determine status (using is_active as proxy for approval status)
-            # In real scenario, you might have a separate approval_status field
-            status = 'approved' if p.is_active else 'rejected'
-            
-            results.append(AdminProductType(
-                id=p.product_id,
-                name=p.name,
-                store=p.store.name,
-                category=p.category.name,
-                price=float(p.base_price),
-                stock=stock,
-                sold=sold,
-                rating=float(p.rating),
-                reviews=p.review_count,
-                status=status,
-                image=image_url
-            ))
-            
-        return results
+        return admin_products_queryset()
+
+    def resolve_admin_stores_connection(self, info, filter=None, **kwargs):
+        return admin_stores_queryset(filter)
+
+    def resolve_admin_users_connection(self, info, filter=None, **kwargs):
+        return admin_users_queryset(filter)
+
+    def resolve_admin_orders_connection(self, info, filter=None, **kwargs):
+        return admin_orders_queryset(filter)
+
+    def resolve_admin_products_connection(self, info, filter=None, **kwargs):
+        return admin_products_queryset(filter)
 
     def resolve_admin_analytics(self, info, range='30d', limit=12):
-        """Resolve analytics data with revenue growth calculation"""
+        """Resolve analytics data with revenue growth calculation (đọc từ bảng rollup)"""
         from .types import RevenueTrendType, CategoryPerformanceType, RegionalDistributionType, UserGrowthType, KeyMetricsType
-        from orders.models import OrderItem
         from dateutil.relativedelta import relativedelta
         
+        today = timezone.localdate()
+        current_month_start = today.replace(day=1)
+        month_count = max(limit, 12)
+        first_month = current_month_start - relativedelta(months=month_count)
+        monthly = {
+            row.month: row
+            for row in PlatformSalesMonthly.objects.filter(month__gte=first_month)
+        }
+
+        def month_revenue(month_start):
+            row = monthly.get(month_start)
+            return row.revenue if row else 0
+
         # Calculate revenue trend for last N months
         revenue_trend = []
-        today = timezone.now().date()
-        
         for i in range(limit - 1, -1, -1):
             month_date = today - relativedelta(months=i)
             month_start = month_date.replace(day=1)
-            if i == 0:
-                month_end = today
-            else:
-                month_end = (month_start + relativedelta(months=1)) - timedelta(days=1)
-            
-            # Get orders for this month
-            month_orders = SubOrder.objects.filter(
-                created_at__gte=month_start,
-                created_at__lte=month_end
-            )
-            
-            revenue = month_orders.aggregate(total=Sum('subtotal'))['total'] or 0
-            orders_count = month_orders.count()
+            row = monthly.get(month_start)
+            revenue = month_revenue(month_start)
             
             # Calculate growth (compare with previous month)
             growth = 0.0
             if i > 0:
-                prev_month_start = month_start - relativedelta(months=1)
-                prev_month_end = month_start - timedelta(days=1)
-                prev_revenue = SubOrder.objects.filter(
-                    created_at__gte=prev_month_start,
-                    created_at__lte=prev_month_end
-                ).aggregate(total=Sum('subtotal'))['total'] or 0
-                
+                prev_revenue = month_revenue(month_start - relativedelta(months=1))
                 if prev_revenue > 0:
                     growth = ((revenue - prev_revenue) / prev_revenue) * 100
             
             revenue_trend.append(RevenueTrendType(
                 month=month_date.strftime("%m/%Y"),
                 revenue=float(revenue),
-                orders=orders_count,
+                orders=row.sub_orders if row else 0,
                 growth=float(growth)
             ))
         
         # Category performance
         category_performance = []
-        categories = Category.objects.annotate(
-            total_sales=Sum('products__variants__order_items__price_at_order'),
-            total_orders=Count('products__variants__order_items', distinct=True)
+        categories = CategorySalesDaily.objects.values('category__name').annotate(
+            total_sales=Sum('revenue'),
+            total_orders=Sum('order_items')
         ).order_by('-total_sales')[:5]
         
         for cat in categories:
             category_performance.append(CategoryPerformanceType(
-                name=cat.name,
-                sales=float(cat.total_sales or 0),
-                orders=cat.total_orders or 0
+                name=cat['category__name'],
+                sales=float(cat['total_sales'] or 0),
+                orders=cat['total_orders'] or 0
             ))
         
         # Regional distribution (by province from addresses)
         regional_data = []
-        total_orders = Order.objects.count()
+        total_orders = PlatformSalesMonthly.objects.aggregate(total=Sum('orders'))['total'] or 0
         
         if total_orders > 0:
-            regions = Address.objects.filter(
-                address_orders__isnull=False
-            ).values('province').annotate(
-                count=Count('address_orders')
+            regions = ProvinceSalesDaily.objects.exclude(province='').values('province').annotate(
+                count=Sum('orders')
             ).order_by('-count')[:5]
             
             for reg in regions:
@@ -403,57 +244,33 @@ class DashboardQuery(graphene.ObjectType):
         user_growth = []
         for i in range(11, -1, -1):
             month_date = today - relativedelta(months=i)
-            month_start = month_date.replace(day=1)
-            month_end = (month_start + relativedelta(months=1)) - timedelta(days=1)
-            
-            # Count customers (users who made orders)
-            customers = User.objects.filter(
-                orders__created_at__gte=month_start,
-                orders__created_at__lte=month_end
-            ).distinct().count()
-            
-            # Count sellers (users who own stores)
-            sellers = StoreUser.objects.filter(
-                role='owner',
-                created_at__gte=month_start,
-                created_at__lte=month_end
-            ).count()
-            
+            row = monthly.get(month_date.replace(day=1))
             user_growth.append(UserGrowthType(
                 month=month_date.strftime("%m/%Y"),
-                customers=customers,
-                sellers=sellers
+                # customers: người mua có đơn trong tháng; sellers: chủ shop mới
+                customers=row.active_buyers if row else 0,
+                sellers=row.new_store_owners if row else 0
             ))
         
         # Key metrics
         # Revenue growth (current month vs last month)
-        current_month_start = today.replace(day=1)
-        current_revenue = SubOrder.objects.filter(
-            created_at__gte=current_month_start
-        ).aggregate(total=Sum('subtotal'))['total'] or 0
-        
-        last_month_start = current_month_start - relativedelta(months=1)
-        last_month_end = current_month_start - timedelta(days=1)
-        last_revenue = SubOrder.objects.filter(
-            created_at__gte=last_month_start,
-            created_at__lte=last_month_end
-        ).aggregate(total=Sum('subtotal'))['total'] or 0
+        current_revenue = month_revenue(current_month_start)
+        last_revenue = month_revenue(current_month_start - relativedelta(months=1))
         
         revenue_growth = 0.0
         if last_revenue > 0:
             revenue_growth = ((current_revenue - last_revenue) / last_revenue) * 100
         
         # Average order value
-        total_orders_count = Order.objects.count()
-        total_revenue = Order.objects.aggregate(total=Sum('total_amount'))['total'] or 0
-        avg_order_value = (total_revenue / total_orders_count) if total_orders_count > 0 else 0
+        totals = PlatformSalesMonthly.objects.aggregate(total=Sum('order_total'), count=Sum('orders'))
+        total_orders_count = totals['count'] or 0
+        avg_order_value = (totals['total'] / total_orders_count) if total_orders_count > 0 else 0
         
-        # Retention rate (users who made more than 1 order)
-        repeat_customers = User.objects.annotate(
-            order_count=Count('orders')
-        ).filter(order_count__gt=1).count()
-        total_customers = User.objects.filter(orders__isnull=False).distinct().count()
-        retention_rate = (repeat_customers / total_customers * 100) if total_customers > 0 else 0
+        # Retention rate (người mua có từ 2 đơn trong tháng hiện tại)
+        current = monthly.get(current_month_start)
+        retention_rate = 0
+        if current and current.active_buyers > 0:
+            retention_rate = current.repeat_buyers / current.active_buyers * 100
         
         key_metrics = KeyMetricsType(
             revenue_growth=float(revenue_growth),
@@ -675,14 +492,8 @@ class LockStore(graphene.Mutation):
             store.status = 'suspended'
             store.save()
             
-            # Return store info (mapped to AdminStoreType just for ID/Status update if needed)
-            # Minimal mapping for response
-            admin_store = AdminStoreType(
-                id=store.store_id,
-                name=store.name,
-                status='suspended'
-            )
-            
+            admin_store = admin_stores_queryset().get(pk=store.pk)
+
             return LockStore(success=True, message="Store locked successfully", store=admin_store)
         except Store.DoesNotExist:
             return LockStore(success=False, message="Store not found")
@@ -705,7 +516,7 @@ class BanUser(graphene.Mutation):
             user.is_active = False 
             user.save()
             
-            return BanUser(success=True, message="User banned successfully")
+            return BanUser(success=True, message="User banned successfully", user=admin_users_queryset().get(pk=user.pk))
         except User.DoesNotExist:
             return BanUser(success=False, message="User not found")
         except Exception as e:
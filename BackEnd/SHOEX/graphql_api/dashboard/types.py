@@ -1,4 +1,7 @@
 import graphene
+from django.core.files.storage import default_storage
+
+from graphql_api.core.connection import CountableConnection
 
 class RevenueData(graphene.ObjectType):
     day = graphene.String()
@@ -35,6 +38,10 @@ class DashboardStats(graphene.ObjectType):
     product_by_category = graphene.List(CategoryData)
     recent_activities = graphene.List(RecentActivity)
 
+# ===== ADMIN LISTS =====
+# Root của các type dưới đây là model instance đã annotate sẵn (admin_querysets.py),
+# mỗi field chỉ đọc thuộc tính → không phát sinh query theo từng dòng.
+
 class AdminStoreType(graphene.ObjectType):
     id = graphene.ID() # store_id
     name = graphene.String()
@@ -50,6 +57,51 @@ class AdminStoreType(graphene.ObjectType):
     join_date = graphene.String()
     avatar = graphene.String()
 
+    @staticmethod
+    def _owner(root):
+        owners = getattr(root, 'owner_memberships', None)
+        return owners[0].user if owners else None
+
+    def resolve_id(root, info):
+        return root.store_id
+
+    def resolve_owner_name(root, info):
+        owner = AdminStoreType._owner(root)
+        return (owner.get_full_name() or owner.username) if owner else "Unknown"
+
+    def resolve_email(root, info):
+        owner = AdminStoreType._owner(root)
+        return (owner.email if owner else "") or "N/A"
+
+    def resolve_phone(root, info):
+        owner = AdminStoreType._owner(root)
+        return (owner.phone if owner else "") or "N/A"
+
+    def resolve_address(root, info):
+        addresses = getattr(root, 'ordered_addresses', None)
+        return addresses[0].province if addresses else "N/A"
+
+    def resolve_status(root, info):
+        return 'active' if root.is_active else 'suspended'
+
+    def resolve_revenue(root, info):
+        return float(getattr(root, 'revenue_total', 0) or 0)
+
+    def resolve_orders(root, info):
+        return getattr(root, 'order_total', 0)
+
+    def resolve_products(root, info):
+        return getattr(root, 'product_total', 0)
+
+    def resolve_rating(root, info):
+        return float(root.rating) if root.rating is not None else 5.0
+
+    def resolve_join_date(root, info):
+        return root.created_at.strftime("%Y-%m-%d")
+
+    def resolve_avatar(root, info):
+        return root.avatar.url if root.avatar else ""
+
 class AdminUserType(graphene.ObjectType):
     id = graphene.ID()
     name = graphene.String()
@@ -64,6 +116,40 @@ class AdminUserType(graphene.ObjectType):
     address = graphene.String()
     store_name = graphene.String()
 
+    def resolve_name(root, info):
+        return root.get_full_name() or root.username
+
+    def resolve_phone(root, info):
+        return getattr(root, 'address_phone', None) or root.phone or ''
+
+    def resolve_role(root, info):
+        if root.is_superuser or root.is_staff:
+            return 'admin'
+        return 'seller' if getattr(root, 'owned_store_name', None) else 'customer'
+
+    def resolve_status(root, info):
+        return 'active' if root.is_active else 'banned'
+
+    def resolve_orders(root, info):
+        return getattr(root, 'order_count', 0)
+
+    def resolve_spending(root, info):
+        return float(getattr(root, 'spending', 0) or 0)
+
+    def resolve_join_date(root, info):
+        return root.date_joined.strftime("%Y-%m-%d")
+
+    def resolve_last_active(root, info):
+        return root.last_login.strftime("%Y-%m-%d") if root.last_login else ""
+
+    def resolve_address(root, info):
+        return getattr(root, 'address_province', None) or "N/A"
+
+    def resolve_store_name(root, info):
+        if root.is_superuser or root.is_staff:
+            return ""
+        return getattr(root, 'owned_store_name', None) or ""
+
 class AdminOrderType(graphene.ObjectType):
     id = graphene.ID()
     customer = graphene.String()
@@ -75,6 +161,37 @@ class AdminOrderType(graphene.ObjectType):
     shipping_address = graphene.String()
     date = graphene.String()
 
+    def resolve_id(root, info):
+        return f"ORD{root.order_id}-S{root.sub_order_id}"
+
+    def resolve_customer(root, info):
+        buyer = root.order.buyer
+        return buyer.get_full_name() or buyer.username
+
+    def resolve_store(root, info):
+        return root.store.name
+
+    def resolve_products(root, info):
+        return getattr(root, 'item_quantity', 0)
+
+    def resolve_total(root, info):
+        return float(root.subtotal)
+
+    def resolve_status(root, info):
+        shipment = getattr(root, 'shipment', None)
+        return shipment.status if shipment else 'pending'
+
+    def resolve_payment_method(root, info):
+        payment = getattr(root.order, 'payment', None)
+        return payment.payment_method if payment else 'unknown'
+
+    def resolve_shipping_address(root, info):
+        address = root.order.address
+        return address.province if address else "N/A"
+
+    def resolve_date(root, info):
+        return root.created_at.strftime("%Y-%m-%d")
+
 class AdminProductType(graphene.ObjectType):
     id = graphene.ID()
     name = graphene.String()
@@ -88,6 +205,76 @@ class AdminProductType(graphene.ObjectType):
     status = graphene.String()
     image = graphene.String()
 
+    def resolve_id(root, info):
+        return root.product_id
+
+    def resolve_store(root, info):
+        return root.store.name
+
+    def resolve_category(root, info):
+        return root.category.name
+
+    def resolve_price(root, info):
+        return float(root.base_price)
+
+    def resolve_stock(root, info):
+        return getattr(root, 'stock_total', 0)
+
+    def resolve_sold(root, info):
+        return getattr(root, 'sold_total', 0)
+
+    def resolve_rating(root, info):
+        return float(root.rating)
+
+    def resolve_reviews(root, info):
+        return root.review_count
+
+    def resolve_status(root, info):
+        # Determine status (using is_active as proxy for approval status)
+        return 'approved' if root.is_active else 'rejected'
+
+    def resolve_image(root, info):
+        name = getattr(root, 'thumbnail_name', None)
+        return default_storage.url(name) if name else ""
+
+
+class AdminUserFilterInput(graphene.InputObjectType):
+    search = graphene.String(description="Tìm theo username / email / họ tên")
+    role = graphene.String(description="admin | seller | customer")
+    status = graphene.String(description="active | banned")
+
+class AdminStoreFilterInput(graphene.InputObjectType):
+    search = graphene.String(description="Tìm theo tên / email cửa hàng")
+    status = graphene.String(description="active | suspended")
+
+class AdminOrderFilterInput(graphene.InputObjectType):
+    search = graphene.String(description="Tìm theo người mua / tên cửa hàng")
+    status = graphene.String(description="Trạng thái vận chuyển")
+    store_id = graphene.ID()
+
+class AdminProductFilterInput(graphene.InputObjectType):
+    search = graphene.String(description="Tìm theo tên sản phẩm")
+    status = graphene.String(description="approved | rejected")
+    store_id = graphene.ID()
+    category_id = graphene.ID(description="Gồm cả danh mục con")
+
+
+class AdminUserConnection(CountableConnection):
+    class Meta:
+        node = AdminUserType
+
+class AdminStoreConnection(CountableConnection):
+    class Meta:
+        node = AdminStoreType
+
+class AdminOrderConnection(CountableConnection):
+    class Meta:
+        node = AdminOrderType
+
+class AdminProductConnection(CountableConnection):
+    class Meta:
+        node = AdminProductType
+
 class RevenueTrendType(graphene.ObjectType):
     month = graphene.String()
     revenue = graphene.Float()
@@ -0,0 +1,89 @@
+"""
+Sinh manifest persisted query ({sha256: query}) từ các operation GraphQL của frontend
+Chạy: python manage.py extract_persisted_queries
+      python manage.py extract_persisted_queries ../../FE_web/services --output persisted_queries.json
+      python manage.py extract_persisted_queries --check     (CI: báo lỗi nếu manifest chưa cập nhật)
+
+Lấy template literal `query ... / mutation ... / fragment ...` trong .ts/.tsx/.js/.jsx và nội dung file
+.graphql/.gql. Hash tính trên đúng chuỗi client gửi nên frontend phải gửi nguyên văn literal đó.
+Literal có ${...} (ghép giá trị vào query) bị bỏ qua — chuyển sang variables thì mới persist được.
+Query không hợp lệ với schema hiện tại cũng bị bỏ qua (kèm cảnh báo).
+
+Mặc định giữ các hash đã có trong manifest (app mobile bản cũ vẫn gửi hash cũ); --replace để bỏ.
+"""
+import json
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from graphql_api.api import schema
+from graphql_api.core.persisted_queries import get_document, query_hash
+
+SOURCE_SUFFIXES = {'.ts', '.tsx', '.js', '.jsx'}
+DOCUMENT_SUFFIXES = {'.graphql', '.gql'}
+SKIP_DIRS = {'node_modules', '.next', 'build', 'dist'}
+TEMPLATE_LITERAL = re.compile(r'`([^`]*)`')
+OPERATION_START = re.compile(r'^\s*(query|mutation|subscription|fragment)\b')
+
+
+def iter_operations(root):
+    """(file, dòng, query) của mọi literal / file GraphQL dưới root"""
+    for path in sorted(Path(root).rglob('*')):
+        if not path.is_file() or SKIP_DIRS.intersection(path.parts):
+            continue
+        if path.suffix in DOCUMENT_SUFFIXES:
+            yield path, 1, path.read_text(encoding='utf-8')
+        elif path.suffix in SOURCE_SUFFIXES:
+            text = path.read_text(encoding='utf-8', errors='replace')
+            for match in TEMPLATE_LITERAL.finditer(text):
+                if OPERATION_START.match(match.group(1)):
+                    yield path, text.count('\n', 0, match.start()) + 1, match.group(1)
+
+
+class Command(BaseCommand):
+    help = 'Extract GraphQL operations of the frontend into the persisted query manifest'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*', default=[str(Path(settings.BASE_DIR).parent.parent / 'FE_web')],
+            help='Thư mục / file mã nguồn frontend (mặc định FE_web)',
+        )
+        parser.add_argument('--output', default=settings.GRAPHQL_PERSISTED_QUERIES_FILE, help='File manifest')
+        parser.add_argument('--replace', action='store_true', help='Bỏ các hash cũ không còn trong mã nguồn')
+        parser.add_argument('--check', action='store_true', help='Không ghi; lỗi nếu manifest cần cập nhật')
+
+    def handle(self, *args, **options):
+        output = Path(options['output'])
+        existing = json.loads(output.read_text(encoding='utf-8')) if output.exists() else {}
+        manifest = {} if options['replace'] else dict(existing)
+        found = skipped = 0
+
+        for root in options['paths']:
+            if not Path(root).exists():
+                raise CommandError(f'{root} does not exist')
+            for path, line, query in iter_operations(root):
+                if '${' in query:
+                    skipped += 1
+                    self.stderr.write(self.style.WARNING(f'{path}:{line}: uses ${{...}} interpolation, skipped'))
+                    continue
+                document, errors = get_document(schema.graphql_schema, query)
+                if errors:
+                    skipped += 1
+                    self.stderr.write(self.style.WARNING(f'{path}:{line}: invalid ({errors[0].message}), skipped'))
+                    continue
+                manifest[query_hash(query)] = query
+                found += 1
+
+        added = len(manifest.keys() - existing.keys())
+        removed = len(existing.keys() - manifest.keys())
+        summary = f'{found} operations, {skipped} skipped, {added} added, {removed} removed'
+        if options['check']:
+            if added or removed:
+                raise CommandError(f'{output} is out of date: {summary}')
+            self.stdout.write(self.style.SUCCESS(f'{output} is up to date ({summary})'))
+            return
+
+        output.write_text(json.dumps(dict(sorted(manifest.items())), ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(manifest)} persisted queries to {output} ({summary})'))
@@ -19,3 +19,4 @@ class CreateOrderInput(graphene.InputObjectType):
     total_amount = graphene.Decimal(required=True)
     shipping_fee = graphene.Decimal(required=True)
     sub_orders = graphene.List(SubOrderInput, required=True)
+    voucher_codes = graphene.List(graphene.String)
@@ -1,4 +1,6 @@
 # orders/graphql/mutations.py
+import logging
+
 import graphene
 from django.db import transaction
 from decimal import Decimal
@@ -11,10 +13,13 @@ from address.models import Address
 from products.models import ProductVariant
 from store.models import Store, StoreUser
 
+from orders.reservation import place_order, ReservationError
 from ..Type.inputType import CreateOrderInput, SubOrderInput, OrderItemInput
 from ..ultis.create_ghtk_order import create_ghtk_orders, create_ghtk_order_for_suborder
 from ..ultis.CancelSubOrder import cancel_ghtk_order
 
+logger = logging.getLogger(__name__)
+
 
 class ConfirmSubOrderShipment(graphene.Mutation):
     class Arguments:
@@ -31,28 +36,28 @@ class ConfirmSubOrderShipment(graphene.Mutation):
             return cls(success=False, message="Unauthenticated", result=None)
 
         try:
-            with transaction.atomic():
-                sub = SubOrder.objects.select_related('store', 'shipment', 'order').get(pk=int(subOrderId))
-                shipment = getattr(sub, 'shipment', None)
-                if not shipment:
-                    return cls(success=False, message='Shipment for suborder not found', result=None)
+            sub = SubOrder.objects.select_related('store', 'shipment', 'order').get(pk=int(subOrderId))
+            shipment = getattr(sub, 'shipment', None)
+            if not shipment:
+                return cls(success=False, message='Shipment for suborder not found', result=None)
 
-                # Permission: allow staff or active StoreUser membership for this store
-                allowed = False
-                if getattr(user, 'is_staff', False):
-                    allowed = True
-                else:
-                    allowed = StoreUser.objects.filter(store=sub.store, user=user, status='active').exists()
+            # Permission: allow staff or active StoreUser membership for this store
+            allowed = False
+            if getattr(user, 'is_staff', False):
+                allowed = True
+            else:
+                allowed = StoreUser.objects.filter(store=sub.store, user=user, status='active').exists()
 
-                if not allowed:
-                    return cls(success=False, message='Permission denied', result=None)
+            if not allowed:
+                return cls(success=False, message='Permission denied', result=None)
 
-                # Only allow confirming when shipment is pending
-                if shipment.status != 'pending':
-                    return cls(success=False, message='Shipment is not pending', result=None)
+            # Only allow confirming when shipment is pending
+            if shipment.status != 'pending':
+                return cls(success=False, message='Shipment is not pending', result=None)
 
-                # Call helper to create GHTK order for this suborder (this will update shipment.status -> 'shipping')
-                res = create_ghtk_order_for_suborder(sub.sub_order_id)
+            # Call helper to create GHTK order for this suborder (this will update shipment.status -> 'shipping')
+            # Không bọc transaction: request GHTK không được giữ transaction / lock DB
+            res = create_ghtk_order_for_suborder(sub.sub_order_id)
 
             return cls(success=True, message='Shipment confirmed and GHTK order created', result=res)
         except SubOrder.DoesNotExist:
@@ -74,82 +79,35 @@ class CreateOrder(graphene.Mutation):
         if not user or not user.is_authenticated:
             return cls(success=False, message="Unauthenticated")
 
-        with transaction.atomic():
-
-            # 1. Address
-            try:
-                # Address model uses `address_id` (not `id`) as the field name in DB
-                # Query by the actual field name to avoid "Cannot resolve keyword 'id'" error.
-                address = Address.objects.get(address_id=input.address_id, user=user)
-            except Address.DoesNotExist:
-                return cls(success=False, message="Invalid address")
-
-            # 2. Create Order
-            order = Order.objects.create(
-                buyer=user,
-                total_amount=input.total_amount,
-                shipping_fee=input.shipping_fee,
-                address=address,
-            )
-
-            # 3. Create SubOrders + Items
-            for sub in input.sub_orders:
-                # Store model uses `store_id` field name; avoid lookup by non-existent `id` field
-                store = Store.objects.get(store_id=sub.store_id)
-
-                sub_order = SubOrder.objects.create(
-                    order=order,
-                    store=store,
-                    shipping_fee=sub.shipping_fee,
-                    subtotal=sub.subtotal,
-                )
-
-                total_weight = Decimal('0.0')
-
-                for item in sub.items:
-                    variant = ProductVariant.objects.select_for_update().get(
-                        variant_id=item.variant_id
-                    )
-
-                    if variant.stock < item.quantity:
-                        raise Exception(f"Out of stock: {variant.sku}")
-
-                    OrderItem.objects.create(
-                        order=order,
-                        sub_order=sub_order,
-                        variant=variant,
-                        quantity=item.quantity,
-                        price_at_order=item.price_at_order,
-                    )
-
-                    # 1. Cộng khối lượng
-                    total_weight += variant.weight * item.quantity
-
-                    # Trừ kho
-                    variant.stock -= item.quantity
-                    variant.save(update_fields=['stock'])
-
-                # 4. Shipment cho từng store (pending_confirmation)
-                Shipment.objects.create(
-                    user=user,
-                    sub_order=sub_order,
-                    store=store,
-                    pick_money=sub_order.shipping_fee + sub_order.subtotal,
-                    value=sub_order.subtotal,
-                    transport='road ',
-                    status='pending',  # nội bộ người bán xử lý
-                    total_weight=total_weight,
-                    
-                )
-
-            # 5. Payment (1 payment / order)
-            Payment.objects.create(
-                order=order,
+        # 1. Address
+        try:
+            # Address model uses `address_id` (not `id`) as the field name in DB
+            # Query by the actual field name to avoid "Cannot resolve keyword 'id'" error.
+            address = Address.objects.get(address_id=input.address_id, user=user)
+        except Address.DoesNotExist:
+            return cls(success=False, message="Invalid address")
+
+        # 2. Order + SubOrders + Items + Shipments + Payment, trừ kho theo lô
+        # Giá/subtotal/total tính lại phía server (price_at_order, subtotal, total_amount của client bị bỏ qua),
+        # voucher kiểm tra + trừ vào tổng tiền trong cùng transaction
+        try:
+            order = place_order(
                 user=user,
+                address=address,
                 payment_method=input.payment_method,
-                amount=input.total_amount,
-                status='pending',
+                shipping_fee=input.shipping_fee,
+                sub_orders=[
+                    {
+                        'store_id': str(sub.store_id),
+                        'shipping_fee': sub.shipping_fee,
+                        'items': [(int(item.variant_id), item.quantity) for item in sub.items],
+                    }
+                    for sub in input.sub_orders
+                ],
+                voucher_codes=input.voucher_codes,
             )
+        except (ReservationError, ValueError) as e:
+            return cls(success=False, message=str(e))
 
         return cls(
             success=True,
@@ -194,29 +152,34 @@ class CancelOrder(graphene.Mutation):
             return cls(success=False, message="Unauthenticated")
 
         try:
-            with transaction.atomic():
-                order = Order.objects.select_related('payment').prefetch_related('sub_orders__shipment').get(pk=int(orderId))
+            order = Order.objects.select_related('payment').prefetch_related('sub_orders__shipment').get(pk=int(orderId))
+
+            # Cancel shipments that have external tracking_code (GHTK) via carrier API first,
+            # outside the transaction; on failure fallback to local cancel below.
+            carrier_cancelled = set()
+            for sub in order.sub_orders.all():
+                shipment = getattr(sub, 'shipment', None)
+                if shipment and shipment.tracking_code:
+                    try:
+                        # cancel_ghtk_order updates shipment.status and creates tracking log
+                        cancel_ghtk_order(shipment_id=shipment.shipment_id, reason='Cancelled by order cancellation')
+                        carrier_cancelled.add(shipment.shipment_id)
+                    except Exception:
+                        # fallback to local cancellation but log the error
+                        logger.exception('Cancel GHTK failed for shipment %s', shipment.shipment_id)
 
+            with transaction.atomic():
                 # Cancel payment if exists
                 payment = getattr(order, 'payment', None)
                 if payment:
                     payment.status = 'cancelled'
                     payment.save(update_fields=['status', 'updated_at'] if hasattr(payment, 'updated_at') else ['status'])
 
-                # Cancel all shipments for suborders. If a shipment has external tracking_code (GHTK),
-                # attempt to cancel via carrier API first; on failure fallback to local cancel.
+                # Cancel all remaining shipments locally
                 for sub in order.sub_orders.all():
                     shipment = getattr(sub, 'shipment', None)
-                    if not shipment:
+                    if not shipment or shipment.shipment_id in carrier_cancelled:
                         continue
-                    if shipment.tracking_code:
-                        try:
-                            cancel_ghtk_order(shipment_id=shipment.shipment_id, reason='Cancelled by order cancellation')
-                            # cancel_ghtk_order updates shipment.status and creates tracking log
-                            continue
-                        except Exception as e:
-                            # fallback to local cancellation but log the error
-                            print(f"Cancel GHTK failed for shipment {shipment.shipment_id}: {e}")
                     shipment.status = 'cancelled'
                     shipment.updated_at = timezone.now()
                     shipment.save(update_fields=['status', 'updated_at'])
@@ -242,24 +205,25 @@ class CancelSubOrder(graphene.Mutation):
             return cls(success=False, message="Unauthenticated")
 
         try:
-            with transaction.atomic():
-                sub = SubOrder.objects.select_related('order').prefetch_related('order__sub_orders__shipment').get(pk=int(subOrderId))
-                shipment = getattr(sub, 'shipment', None)
-                if not shipment:
-                    return cls(success=False, message='Shipment for suborder not found')
+            sub = SubOrder.objects.select_related('order').prefetch_related('order__sub_orders__shipment').get(pk=int(subOrderId))
+            shipment = getattr(sub, 'shipment', None)
+            if not shipment:
+                return cls(success=False, message='Shipment for suborder not found')
+
+            # If shipment is linked to external carrier (tracking_code), try cancel via carrier API
+            # (outside the transaction)
+            cancelled_by_carrier = False
+            if shipment.tracking_code:
+                try:
+                    cancel_ghtk_order(shipment_id=shipment.shipment_id, reason='Cancelled by suborder cancellation')
+                    cancelled_by_carrier = True
+                except Exception:
+                    logger.exception('Cancel GHTK failed for shipment %s', shipment.shipment_id)
 
-                # If shipment is linked to external carrier (tracking_code), try cancel via carrier API
-                if shipment.tracking_code:
-                    try:
-                        cancel_ghtk_order(shipment_id=shipment.shipment_id, reason='Cancelled by suborder cancellation')
-                    except Exception as e:
-                        print(f"Cancel GHTK failed for shipment {shipment.shipment_id}: {e}")
-                        # fallback to local cancellation
-                        shipment.status = 'cancelled'
-                        shipment.updated_at = timezone.now()
-                        shipment.save(update_fields=['status', 'updated_at'])
-                else:
-                    shipment.status = 'cancelled'
+            with transaction.atomic():
+                # fallback to local cancellation
+                shipment.status = 'cancelled'
+                if not cancelled_by_carrier:
                     shipment.updated_at = timezone.now()
                     shipment.save(update_fields=['status', 'updated_at'])
 
@@ -3,7 +3,14 @@ from graphene import relay
 from django.db.models import Q
 from orders.models import Order, SubOrder
 from .Type.types import OrderType, SubOrderType
-from .ultis.updateStatusOrder import update_status_for_order, update_status_for_suborder
+from shipments.status_sync import ACTIVE_STATUSES
+from shipments.tasks import enqueue_status_refresh
+
+
+def _needs_refresh(sub_order):
+    shipment = getattr(sub_order, 'shipment', None)
+    return bool(shipment and shipment.tracking_code and shipment.status in ACTIVE_STATUSES)
+
 
 class OrderMutations(graphene.ObjectType):
     """Mutations cho Cart"""
@@ -33,23 +40,16 @@ class OrderQueries(graphene.ObjectType):
         if not user or not getattr(user, 'is_authenticated', False):
             return []
         # Lấy danh sách đơn hàng của user
-        orders = Order.objects.filter(buyer=user).order_by('-created_at').prefetch_related('sub_orders__shipment')
-        print(f"Found {orders.count()} orders for user {user.username} ({user.id})")
-        # Cập nhật trạng thái cho các đơn có shipment chưa ở trạng thái cuối
-        for order in orders:
-            try:
-                for sub in order.sub_orders.all():
-                    shipment = getattr(sub, 'shipment', None)
-                    if shipment and shipment.status in ('pending', 'shipping', 'out_for_delivery'):
-                        try:
-                            update_status_for_order(order.order_id)
-                        except Exception:
-                            # không block nếu update lỗi
-                            pass
-                        break
-            except Exception:
-                # an toàn: nếu có lỗi khi duyệt sub_orders thì tiếp tục
-                pass
+        orders = list(
+            Order.objects.filter(buyer=user).order_by('-created_at').prefetch_related('sub_orders__shipment')
+        )
+        # Trả trạng thái đang lưu; đơn có shipment chưa ở trạng thái cuối được đồng bộ nền
+        enqueue_status_refresh([
+            sub.sub_order_id
+            for order in orders
+            for sub in order.sub_orders.all()
+            if _needs_refresh(sub)
+        ])
 
         return orders
 
@@ -84,13 +84,9 @@ class OrderQueries(graphene.ObjectType):
             if is_payment:
                 qs = qs.filter(settlement_item__isnull=True)
 
-            # Update each suborder's shipment status (non-blocking)
-            for s in qs:
-                try:
-                    update_status_for_suborder(s.sub_order_id)
-                except Exception:
-                    # ignore errors to avoid blocking the API response
-                    pass
+            qs = list(qs.select_related('shipment'))
+            # Đồng bộ trạng thái GHTK ở job nền, không chờ hãng
+            enqueue_status_refresh([s.sub_order_id for s in qs if _needs_refresh(s)])
 
             return qs
         except Exception:
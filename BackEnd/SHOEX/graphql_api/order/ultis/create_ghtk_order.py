@@ -1,10 +1,12 @@
-import requests
-from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from orders.models import Order, SubOrder
 from shipments.models import Shipment, ShipmentTracking
+from shipments.status_sync import schedule_after_create, SYNC_FIELDS
 from store.models import AddressStore
 from payments.models import Payment
+from shipments.carrier import get_ghtk_client
+from address.normalize import canonical_place
 
 
 def create_ghtk_orders(*, order_id: int):
@@ -37,6 +39,9 @@ def create_ghtk_order_for_suborder(sub_order_id: int):
     """
     Create a single GHTK order for the given SubOrder id.
     Returns a dict with sub_order_id, shipment_id and tracking_code on success.
+
+    Không gọi trong transaction.atomic: request tới GHTK chạy ngoài transaction,
+    chỉ phần ghi Shipment / ShipmentTracking / Payment nằm trong 1 transaction ngắn.
     """
     sub_order = (
         SubOrder.objects
@@ -76,13 +81,12 @@ def create_ghtk_order_for_suborder(sub_order_id: int):
 
     # ===== 4. COD =====
     payment = Payment.objects.filter(order=order).first()
-    if payment and getattr(payment, 'payment_method', '').lower() == 'cod':
-        pick_money = int(shipment.pick_money)
-        if payment.paid_at is None:
-            payment.paid_at = timezone.now()
-            payment.save(update_fields=["paid_at"])
-    else:
-        pick_money = 0
+    is_cod = bool(payment and getattr(payment, 'payment_method', '').lower() == 'cod')
+    pick_money = int(shipment.pick_money) if is_cod else 0
+
+    # Tên tỉnh / phường chuẩn theo danh mục (địa chỉ cũ có thể chưa được chuẩn hóa)
+    pick_province, pick_ward = canonical_place(store_address.province, store_address.ward)
+    province, ward = canonical_place(user_address.province, user_address.ward)
 
     payload = {
         "products": products,
@@ -92,18 +96,18 @@ def create_ghtk_order_for_suborder(sub_order_id: int):
             # PICK
             "pick_name": sub_order.store.name,
             "pick_address": store_address.detail,
-            "pick_province": store_address.province,
+            "pick_province": pick_province,
             "pick_district": '',
-            "pick_ward": store_address.ward,
+            "pick_ward": pick_ward,
             "pick_street": store_address.hamlet or "Khác",
             "pick_tel": store_address.phone,
 
             # RECEIVE
             "name": order.buyer.full_name,
             "address": user_address.detail,
-            "province": user_address.province,
+            "province": province,
             "district": '',
-            "ward": user_address.ward,
+            "ward": ward,
             "hamlet": user_address.hamlet or "Khác",
             "tel": user_address.phone_number,
 
@@ -119,42 +123,36 @@ def create_ghtk_order_for_suborder(sub_order_id: int):
         }
     }
 
-    print('Creating GHTK order with payload:', payload)
-    headers = {
-        "Token": settings.GHTK_API_TOKEN,
-        "X-Client-Source": settings.GHTK_PARTNER_CODE,
-        "Content-Type": "application/json",
-    }
-
-    url = f"{settings.GHTK_BASE_URL}/services/shipment/order/?ver=1.5"
-
-    res = requests.post(url, json=payload, headers=headers, timeout=15)
-    data = res.json()
-
-    if not data.get("success"):
-        raise Exception(data.get("message", "GHTK error"))
-
+    data = get_ghtk_client().create_order(payload)
     ghtk_order = data["order"]
 
-    # ===== Update Shipment =====
-    shipment.tracking_code = ghtk_order.get("label")
-    shipment.status = "shipping"
-    shipment.updated_at = timezone.now()
-    shipment.save(update_fields=["tracking_code", "status", "updated_at"])
-
-    # ===== Tracking =====
-    ShipmentTracking.objects.create(
-        shipment=shipment,
-        label_id=ghtk_order.get("label"),
-        partner_id=ghtk_order.get("partner_id"),
-        carrier_status=str(ghtk_order.get("status_id")),
-        carrier_status_text="Đã tạo đơn GHTK",
-        raw_response=data,
-        weight=shipment.total_weight,
-        message=data.get("message") or data.get("warning_message"),
-        estimated_pick_time=ghtk_order.get("estimated_pick_time"),
-        estimated_deliver_time=ghtk_order.get("estimated_deliver_time"),
-    )
+    with transaction.atomic():
+        if is_cod and payment.paid_at is None:
+            payment.paid_at = timezone.now()
+            payment.save(update_fields=["paid_at"])
+
+        # ===== Update Shipment =====
+        shipment.tracking_code = ghtk_order.get("label")
+        shipment.status = "shipping"
+        shipment.updated_at = timezone.now()
+        # Bắt đầu lịch đồng bộ trạng thái (shipments/status_sync.py)
+        status_id = ghtk_order.get("status_id")
+        schedule_after_create(shipment, str(status_id) if status_id is not None else None, shipment.updated_at)
+        shipment.save(update_fields=["tracking_code", "status", "updated_at", *SYNC_FIELDS])
+
+        # ===== Tracking =====
+        ShipmentTracking.objects.create(
+            shipment=shipment,
+            label_id=ghtk_order.get("label"),
+            partner_id=ghtk_order.get("partner_id"),
+            carrier_status=str(ghtk_order.get("status_id")),
+            carrier_status_text="Đã tạo đơn GHTK",
+            raw_response=data,
+            weight=shipment.total_weight,
+            message=data.get("message") or data.get("warning_message"),
+            estimated_pick_time=ghtk_order.get("estimated_pick_time"),
+            estimated_deliver_time=ghtk_order.get("estimated_deliver_time"),
+        )
 
     result = {
         "sub_order_id": sub_order.sub_order_id,
@@ -16,6 +16,12 @@ from .bulk_variants_mutations import (
     BulkStockTransfer
 )
 
+from .catalog_import_mutations import (
+    StartCatalogImport,
+    CatalogImportType,
+    catalog_import_for_user
+)
+
 __all__ = [
     # Product bulk operations
     'BulkProductCreate',
@@ -31,6 +37,11 @@ __all__ = [
     'BulkProductDelete',
     'BulkStockTransfer',
     
+    # Catalog import (file)
+    'StartCatalogImport',
+    'CatalogImportType',
+    'catalog_import_for_user',
+    
     # Result types
     'BulkOperationResult'
 ]
\ No newline at end of file
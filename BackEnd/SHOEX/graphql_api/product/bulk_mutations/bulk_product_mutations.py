@@ -3,6 +3,7 @@ from graphene import InputObjectType, Mutation
 from django.db import transaction
 from django.core.exceptions import ValidationError
 from products.models import Product, ProductVariant, Category
+from products import bulk_updates
 from ..types.product import ProductType, ProductVariantType
 from ..mutations.product_mutations import ProductCreateInput, ProductVariantCreateInput
 
@@ -46,6 +47,16 @@ class BulkPriceUpdateInput(InputObjectType):
 
 # ===== RESULT TYPES =====
 
+class BulkItemResultType(graphene.ObjectType):
+    """Kết quả của từng ID trong bulk operation (theo thứ tự input)"""
+    id = graphene.Int()
+    success = graphene.Boolean()
+    message = graphene.String(description="Lý do lỗi (None nếu thành công)")
+    stock = graphene.Int(description="Tồn kho sau cập nhật")
+    price = graphene.Decimal(description="Giá sau cập nhật")
+    is_active = graphene.Boolean(description="Trạng thái sau cập nhật")
+
+
 class BulkOperationResult(graphene.ObjectType):
     """Kết quả cho bulk operations"""
     success_count = graphene.Int(description="Số lượng thành công")
@@ -53,6 +64,35 @@ class BulkOperationResult(graphene.ObjectType):
     total_count = graphene.Int(description="Tổng số items")
     errors = graphene.List(graphene.String, description="Danh sách lỗi")
     success = graphene.Boolean(description="Thành công hay không")
+    results = graphene.List(BulkItemResultType, description="Kết quả từng ID")
+
+
+def build_bulk_result(results, label):
+    """BulkOperationResult từ list products.bulk_updates.ItemResult"""
+    items = [
+        BulkItemResultType(id=r.id, success=r.success, message=r.message, **(r.value or {}))
+        for r in results
+    ]
+    success_count = sum(1 for r in results if r.success)
+    return BulkOperationResult(
+        success_count=success_count,
+        error_count=len(results) - success_count,
+        total_count=len(results),
+        errors=[f"{label} {r.id}: {r.message}" for r in results if not r.success],
+        success=success_count > 0,
+        results=items,
+    )
+
+
+def unauthenticated_result():
+    return BulkOperationResult(
+        success_count=0,
+        error_count=0,
+        total_count=0,
+        errors=["Authentication required"],
+        success=False,
+        results=[],
+    )
 
 
 class BulkProductCreateResult(graphene.ObjectType):
@@ -365,7 +405,7 @@ class BulkProductVariantCreate(Mutation):
 
 
 class BulkStockUpdate(Mutation):
-    """Bulk cập nhật tồn kho nhiều variants"""
+    """Bulk cập nhật tồn kho nhiều variants (cộng / trừ, 1 câu UPDATE mỗi lô, không cho âm)"""
     
     class Arguments:
         updates = graphene.List(BulkStockUpdateInput, required=True)
@@ -376,76 +416,18 @@ class BulkStockUpdate(Mutation):
         user = info.context.user
         
         if not user.is_authenticated:
-            return BulkOperationResult(
-                success_count=0,
-                error_count=0,
-                total_count=0,
-                errors=["Authentication required"],
-                success=False
-            )
-        
-        total_count = len(updates)
-        success_count = 0
-        error_count = 0
-        errors = []
-        
-        try:
-            with transaction.atomic():
-                for i, update_data in enumerate(updates):
-                    try:
-                        # Get variant
-                        try:
-                            variant = ProductVariant.objects.get(variant_id=update_data.variant_id)
-                        except ProductVariant.DoesNotExist:
-                            error_count += 1
-                            errors.append(f"Stock update {i+1}: Variant not found")
-                            continue
-                        
-                        # Check permission
-                        if variant.product.seller != user and not user.is_staff:
-                            error_count += 1
-                            errors.append(f"Stock update {i+1}: Permission denied")
-                            continue
-                        
-                        # Calculate new stock
-                        new_stock = variant.stock + update_data.stock_change
-                        
-                        if new_stock < 0:
-                            error_count += 1
-                            errors.append(f"Stock update {i+1}: Stock cannot be negative")
-                            continue
-                        
-                        variant.stock = new_stock
-                        variant.save()
-                        
-                        # TODO: Log stock history
-                        
-                        success_count += 1
-                        
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Stock update {i+1}: {str(e)}")
-                
-        except Exception as e:
-            return BulkOperationResult(
-                success_count=0,
-                error_count=total_count,
-                total_count=total_count,
-                errors=[f"Transaction failed: {str(e)}"],
-                success=False
-            )
+            return unauthenticated_result()
         
-        return BulkOperationResult(
-            success_count=success_count,
-            error_count=error_count,
-            total_count=total_count,
-            errors=errors,
-            success=success_count > 0
+        results = bulk_updates.adjust_stock(
+            [(update.variant_id, update.stock_change) for update in updates],
+            store_ids=bulk_updates.managed_store_ids(user),
         )
+        # TODO: Log stock history
+        return build_bulk_result(results, "Variant")
 
 
 class BulkPriceUpdate(Mutation):
-    """Bulk cập nhật giá nhiều variants"""
+    """Bulk cập nhật giá nhiều variants (1 câu UPDATE mỗi lô)"""
     
     class Arguments:
         updates = graphene.List(BulkPriceUpdateInput, required=True)
@@ -456,74 +438,18 @@ class BulkPriceUpdate(Mutation):
         user = info.context.user
         
         if not user.is_authenticated:
-            return BulkOperationResult(
-                success_count=0,
-                error_count=0,
-                total_count=0,
-                errors=["Authentication required"],
-                success=False
-            )
-        
-        total_count = len(updates)
-        success_count = 0
-        error_count = 0
-        errors = []
+            return unauthenticated_result()
         
-        try:
-            with transaction.atomic():
-                for i, update_data in enumerate(updates):
-                    try:
-                        # Get variant
-                        try:
-                            variant = ProductVariant.objects.get(variant_id=update_data.variant_id)
-                        except ProductVariant.DoesNotExist:
-                            error_count += 1
-                            errors.append(f"Price update {i+1}: Variant not found")
-                            continue
-                        
-                        # Check permission
-                        if variant.product.seller != user and not user.is_staff:
-                            error_count += 1
-                            errors.append(f"Price update {i+1}: Permission denied")
-                            continue
-                        
-                        # Validate price
-                        if update_data.new_price <= 0:
-                            error_count += 1
-                            errors.append(f"Price update {i+1}: Price must be positive")
-                            continue
-                        
-                        variant.price = update_data.new_price
-                        variant.save()
-                        
-                        # TODO: Log price history
-                        
-                        success_count += 1
-                        
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Price update {i+1}: {str(e)}")
-                
-        except Exception as e:
-            return BulkOperationResult(
-                success_count=0,
-                error_count=total_count,
-                total_count=total_count,
-                errors=[f"Transaction failed: {str(e)}"],
-                success=False
-            )
-        
-        return BulkOperationResult(
-            success_count=success_count,
-            error_count=error_count,
-            total_count=total_count,
-            errors=errors,
-            success=success_count > 0
+        results = bulk_updates.set_prices(
+            [(update.variant_id, update.new_price) for update in updates],
+            store_ids=bulk_updates.managed_store_ids(user),
         )
+        # TODO: Log price history
+        return build_bulk_result(results, "Variant")
 
 
 class BulkProductStatusUpdate(Mutation):
-    """Bulk cập nhật trạng thái sản phẩm (active/inactive)"""
+    """Bulk cập nhật trạng thái sản phẩm (active/inactive), kèm toàn bộ variants"""
     
     class Arguments:
         product_ids = graphene.List(graphene.Int, required=True)
@@ -535,62 +461,9 @@ class BulkProductStatusUpdate(Mutation):
         user = info.context.user
         
         if not user.is_authenticated:
-            return BulkOperationResult(
-                success_count=0,
-                error_count=0,
-                total_count=0,
-                errors=["Authentication required"],
-                success=False
-            )
-        
-        total_count = len(product_ids)
-        success_count = 0
-        error_count = 0
-        errors = []
+            return unauthenticated_result()
         
-        try:
-            with transaction.atomic():
-                for i, product_id in enumerate(product_ids):
-                    try:
-                        # Get product
-                        try:
-                            product = Product.objects.get(product_id=product_id)
-                        except Product.DoesNotExist:
-                            error_count += 1
-                            errors.append(f"Product {product_id}: Not found")
-                            continue
-                        
-                        # Check permission
-                        if product.seller != user and not user.is_staff:
-                            error_count += 1
-                            errors.append(f"Product {product_id}: Permission denied")
-                            continue
-                        
-                        product.is_active = is_active
-                        product.save()
-                        
-                        # Also update variants status
-                        product.variants.update(is_active=is_active)
-                        
-                        success_count += 1
-                        
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Product {product_id}: {str(e)}")
-                
-        except Exception as e:
-            return BulkOperationResult(
-                success_count=0,
-                error_count=total_count,
-                total_count=total_count,
-                errors=[f"Transaction failed: {str(e)}"],
-                success=False
-            )
-        
-        return BulkOperationResult(
-            success_count=success_count,
-            error_count=error_count,
-            total_count=total_count,
-            errors=errors,
-            success=success_count > 0
-        )
\ No newline at end of file
+        results = bulk_updates.set_product_status(
+            product_ids, is_active, store_ids=bulk_updates.managed_store_ids(user),
+        )
+        return build_bulk_result(results, "Product")
@@ -1,5 +1,6 @@
 import graphene
 from django.db import transaction
+from products import bulk_updates
 from products.models import Product, ProductVariant
 from ..types.product import ProductVariantType
 from .bulk_product_mutations import (
@@ -9,7 +10,9 @@ from .bulk_product_mutations import (
     BulkStockUpdate,
     BulkPriceUpdate,
     BulkProductStatusUpdate,
-    BulkOperationResult
+    BulkOperationResult,
+    build_bulk_result,
+    unauthenticated_result
 )
 
 
@@ -28,62 +31,12 @@ class BulkVariantStatusUpdate(graphene.Mutation):
         user = info.context.user
         
         if not user.is_authenticated:
-            return BulkOperationResult(
-                success_count=0,
-                error_count=0,
-                total_count=0,
-                errors=["Authentication required"],
-                success=False
-            )
-        
-        total_count = len(variant_ids)
-        success_count = 0
-        error_count = 0
-        errors = []
-        
-        try:
-            with transaction.atomic():
-                for i, variant_id in enumerate(variant_ids):
-                    try:
-                        # Get variant
-                        try:
-                            variant = ProductVariant.objects.get(variant_id=variant_id)
-                        except ProductVariant.DoesNotExist:
-                            error_count += 1
-                            errors.append(f"Variant {variant_id}: Not found")
-                            continue
-                        
-                        # Check permission
-                        if variant.product.seller != user and not user.is_staff:
-                            error_count += 1
-                            errors.append(f"Variant {variant_id}: Permission denied")
-                            continue
-                        
-                        variant.is_active = is_active
-                        variant.save()
-                        
-                        success_count += 1
-                        
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Variant {variant_id}: {str(e)}")
-                
-        except Exception as e:
-            return BulkOperationResult(
-                success_count=0,
-                error_count=total_count,
-                total_count=total_count,
-                errors=[f"Transaction failed: {str(e)}"],
-                success=False
-            )
+            return unauthenticated_result()
         
-        return BulkOperationResult(
-            success_count=success_count,
-            error_count=error_count,
-            total_count=total_count,
-            errors=errors,
-            success=success_count > 0
+        results = bulk_updates.set_variant_status(
+            variant_ids, is_active, store_ids=bulk_updates.managed_store_ids(user),
         )
+        return build_bulk_result(results, "Variant")
 
 
 class BulkVariantDelete(graphene.Mutation):
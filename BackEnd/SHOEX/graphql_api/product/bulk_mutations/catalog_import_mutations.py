@@ -0,0 +1,91 @@
+import graphene
+from graphene_file_upload.scalars import Upload
+
+from products.bulk_updates import STORE_MANAGER_ROLES
+from products.catalog_import import CatalogImportError, start_import
+from products.models import CatalogImport
+from store.models import Store, StoreUser
+
+
+def can_manage_catalog(user, store_id):
+    """Staff hoặc owner/admin/manager của cửa hàng"""
+    if not user or not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    return StoreUser.objects.filter(store_id=store_id, user=user, role__in=STORE_MANAGER_ROLES).exists()
+
+
+# ===== TYPES =====
+
+class CatalogImportRowErrorType(graphene.ObjectType):
+    """Lỗi của 1 dòng trong file nhập"""
+    row = graphene.Int(description="Số dòng trong file")
+    sku = graphene.String()
+    message = graphene.String()
+
+
+class CatalogImportType(graphene.ObjectType):
+    """Tiến độ / kết quả 1 lần nhập catalog"""
+    import_id = graphene.Int()
+    store_id = graphene.String()
+    file_format = graphene.String()
+    status = graphene.String(description="pending, running, done, failed")
+    total_rows = graphene.Int()
+    processed_rows = graphene.Int()
+    progress = graphene.Float(description="Phần trăm đã xử lý")
+    created_products = graphene.Int()
+    created_variants = graphene.Int()
+    updated_variants = graphene.Int()
+    error_count = graphene.Int()
+    errors = graphene.List(CatalogImportRowErrorType, description="Lỗi theo dòng (tối đa CATALOG_IMPORT_MAX_ERRORS)")
+    message = graphene.String()
+    created_at = graphene.DateTime()
+    started_at = graphene.DateTime()
+    finished_at = graphene.DateTime()
+
+    def resolve_progress(self, info):
+        if self.status == 'done':
+            return 100.0
+        if not self.total_rows:
+            return 0.0
+        return round(100.0 * self.processed_rows / self.total_rows, 1)
+
+
+# ===== MUTATIONS =====
+
+class StartCatalogImport(graphene.Mutation):
+    """Nhập catalog từ file CSV / XLSX / JSONL (chạy nền, theo dõi bằng query catalogImport)"""
+
+    class Arguments:
+        store_id = graphene.String(required=True)
+        file = Upload(required=True)
+
+    success = graphene.Boolean()
+    catalog_import = graphene.Field(CatalogImportType)
+    errors = graphene.List(graphene.String)
+
+    def mutate(self, info, store_id, file):
+        user = info.context.user
+        if not user.is_authenticated:
+            return StartCatalogImport(success=False, errors=["Authentication required"])
+
+        store = Store.objects.filter(store_id=store_id).first()
+        if store is None:
+            return StartCatalogImport(success=False, errors=["Store not found"])
+        if not can_manage_catalog(user, store.store_id):
+            return StartCatalogImport(success=False, errors=["Permission denied for store"])
+
+        try:
+            catalog_import = start_import(store, file, user=user)
+        except CatalogImportError as e:
+            return StartCatalogImport(success=False, errors=[str(e)])
+        return StartCatalogImport(success=True, catalog_import=catalog_import, errors=[])
+
+
+def catalog_import_for_user(user, import_id):
+    """Query catalogImport: chỉ người quản lý cửa hàng xem được"""
+    catalog_import = CatalogImport.objects.filter(pk=import_id).first()
+    if catalog_import is None or not can_manage_catalog(user, catalog_import.store_id):
+        return None
+    return catalog_import
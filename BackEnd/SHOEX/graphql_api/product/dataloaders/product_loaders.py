@@ -1,10 +1,12 @@
 from collections import defaultdict
-from promise import Promise
-from promise.dataloader import DataLoader
+from django.db.models import Sum, Min, Max
+from django.utils import timezone
 from products.models import Product, Category, ProductVariant, ProductAttribute, ProductAttributeOption, ProductImage
+from products.variant_matrix import stored_matrices
+from graphql_api.core.dataloaders import BatchLoader, get_loaders
 
 
-class CategoryByIdLoader(DataLoader):
+class CategoryByIdLoader(BatchLoader):
     """
     DataLoader để load Category theo ID
     Tối ưu cho việc load category của nhiều products cùng lúc
@@ -14,28 +16,24 @@ class CategoryByIdLoader(DataLoader):
         categories = Category.objects.filter(
             category_id__in=category_ids
         ).in_bulk(field_name='category_id')
-        
+
         # Trả về theo đúng thứ tự của category_ids
-        return Promise.resolve([
-            categories.get(category_id) for category_id in category_ids
-        ])
+        return [categories.get(category_id) for category_id in category_ids]
 
 
-class ProductByIdLoader(DataLoader):
+class ProductByIdLoader(BatchLoader):
     """
     DataLoader để load Product theo ID
     """
     def batch_load_fn(self, product_ids):
         products = Product.objects.filter(
             product_id__in=product_ids
-        ).select_related('seller', 'category').in_bulk(field_name='product_id')
-        
-        return Promise.resolve([
-            products.get(product_id) for product_id in product_ids
-        ])
+        ).select_related('store', 'category', 'brand').in_bulk(field_name='product_id')
+
+        return [products.get(product_id) for product_id in product_ids]
 
 
-class ProductsByCategoryIdLoader(DataLoader):
+class ProductsByCategoryIdLoader(BatchLoader):
     """
     DataLoader để load Products theo Category ID
     Dùng cho resolver products của Category
@@ -45,41 +43,37 @@ class ProductsByCategoryIdLoader(DataLoader):
         products = Product.objects.filter(
             category_id__in=category_ids,
             is_active=True
-        ).select_related('seller', 'category')
-        
+        ).select_related('store', 'category')
+
         # Nhóm products theo category_id
         products_by_category = defaultdict(list)
         for product in products:
             products_by_category[product.category_id].append(product)
-        
+
         # Trả về theo đúng thứ tự category_ids
-        return Promise.resolve([
-            products_by_category[category_id] for category_id in category_ids
-        ])
+        return [products_by_category[category_id] for category_id in category_ids]
 
 
-class ProductVariantsByProductIdLoader(DataLoader):
+class ProductVariantsByProductIdLoader(BatchLoader):
     """
-    DataLoader để load ProductVariants theo Product ID
+    DataLoader để load ProductVariants (active) theo Product ID
     Tối ưu cho việc load variants của nhiều products
     """
     def batch_load_fn(self, product_ids):
         variants = ProductVariant.objects.filter(
             product_id__in=product_ids,
             is_active=True
-        ).select_related('product')
-        
+        )
+
         # Nhóm variants theo product_id
         variants_by_product = defaultdict(list)
         for variant in variants:
             variants_by_product[variant.product_id].append(variant)
-        
-        return Promise.resolve([
-            variants_by_product[product_id] for product_id in product_ids
-        ])
+
+        return [variants_by_product[product_id] for product_id in product_ids]
 
 
-class ProductVariantByIdLoader(DataLoader):
+class ProductVariantByIdLoader(BatchLoader):
     """
     DataLoader để load ProductVariant theo ID
     """
@@ -87,34 +81,29 @@ class ProductVariantByIdLoader(DataLoader):
         variants = ProductVariant.objects.filter(
             variant_id__in=variant_ids
         ).select_related('product').in_bulk(field_name='variant_id')
-        
-        return Promise.resolve([
-            variants.get(variant_id) for variant_id in variant_ids
-        ])
 
+        return [variants.get(variant_id) for variant_id in variant_ids]
 
-class ProductAttributeOptionsByProductIdLoader(DataLoader):
+
+class ProductAttributeOptionsByProductIdLoader(BatchLoader):
     """
-    DataLoader để load ProductAttributeOptions theo Product ID
-    Dùng để lấy các tùy chọn thuộc tính của sản phẩm
+    DataLoader để load ProductAttributeOptions theo Product ID (kèm attribute)
+    Dùng chung cho color/size options, color images, available attributes, variant image
     """
     def batch_load_fn(self, product_ids):
         options = ProductAttributeOption.objects.filter(
-            attribute__product_id__in=product_ids
-        ).select_related('attribute').order_by('attribute__display_order', 'display_order')
-        
-        # Nhóm options theo product_id
+            product_id__in=product_ids
+        ).select_related('attribute', 'asset')
+
+        # Nhóm options theo product_id (giữ ordering mặc định của model)
         options_by_product = defaultdict(list)
         for option in options:
-            product_id = option.attribute.product_id
-            options_by_product[product_id].append(option)
-        
-        return Promise.resolve([
-            options_by_product[product_id] for product_id in product_ids
-        ])
+            options_by_product[option.product_id].append(option)
+
+        return [options_by_product[product_id] for product_id in product_ids]
 
 
-class ProductAttributeByIdLoader(DataLoader):
+class ProductAttributeByIdLoader(BatchLoader):
     """
     DataLoader để load ProductAttribute theo ID
     """
@@ -122,33 +111,29 @@ class ProductAttributeByIdLoader(DataLoader):
         attributes = ProductAttribute.objects.filter(
             attribute_id__in=attribute_ids
         ).in_bulk(field_name='attribute_id')
-        
-        return Promise.resolve([
-            attributes.get(attribute_id) for attribute_id in attribute_ids
-        ])
 
+        return [attributes.get(attribute_id) for attribute_id in attribute_ids]
 
-class ProductImagesByProductIdLoader(DataLoader):
+
+class ProductImagesByProductIdLoader(BatchLoader):
     """
     DataLoader để load ProductImages theo Product ID
-    Dùng để lấy gallery images của sản phẩm
+    Dùng để lấy gallery images (ảnh đại diện luôn đứng đầu) của sản phẩm
     """
     def batch_load_fn(self, product_ids):
         images = ProductImage.objects.filter(
             product_id__in=product_ids
-        ).order_by('display_order', 'image_id')
-        
+        ).select_related('asset')
+
         # Nhóm images theo product_id
         images_by_product = defaultdict(list)
         for image in images:
             images_by_product[image.product_id].append(image)
-        
-        return Promise.resolve([
-            images_by_product[product_id] for product_id in product_ids
-        ])
+
+        return [images_by_product[product_id] for product_id in product_ids]
 
 
-class SubcategoriesByCategoryIdLoader(DataLoader):
+class SubcategoriesByCategoryIdLoader(BatchLoader):
     """
     DataLoader để load subcategories theo Category ID
     Dùng cho category tree
@@ -158,45 +143,37 @@ class SubcategoriesByCategoryIdLoader(DataLoader):
             parent_id__in=category_ids,
             is_active=True
         )
-        
+
         # Nhóm subcategories theo parent_id
         subcategories_by_parent = defaultdict(list)
         for subcategory in subcategories:
             subcategories_by_parent[subcategory.parent_id].append(subcategory)
-        
-        return Promise.resolve([
-            subcategories_by_parent[category_id] for category_id in category_ids
-        ])
+
+        return [subcategories_by_parent[category_id] for category_id in category_ids]
 
 
-class SellerByIdLoader(DataLoader):
+class StoreByIdLoader(BatchLoader):
     """
-    DataLoader để load User (Seller) theo ID
-    Tối ưu cho việc load thông tin người bán
+    DataLoader để load Store (người bán) theo store_id
     """
-    def batch_load_fn(self, seller_ids):
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        
-        sellers = User.objects.filter(
-            id__in=seller_ids
-        ).in_bulk()
-        
-        return Promise.resolve([
-            sellers.get(seller_id) for seller_id in seller_ids
-        ])
+    def batch_load_fn(self, store_ids):
+        from store.models import Store
+
+        stores = Store.objects.filter(
+            store_id__in=store_ids
+        ).in_bulk(field_name='store_id')
+
+        return [stores.get(store_id) for store_id in store_ids]
 
 
 # ===== AGGREGATE DATALOADERS =====
 
-class ProductStockByProductIdLoader(DataLoader):
+class ProductStockByProductIdLoader(BatchLoader):
     """
     DataLoader để tính tổng stock theo Product ID
     Tối ưu cho resolve_total_stock
     """
     def batch_load_fn(self, product_ids):
-        from django.db.models import Sum
-        
         # Query stock tổng theo product
         stock_data = ProductVariant.objects.filter(
             product_id__in=product_ids,
@@ -204,26 +181,22 @@ class ProductStockByProductIdLoader(DataLoader):
         ).values('product_id').annotate(
             total_stock=Sum('stock')
         )
-        
+
         # Tạo mapping
         stock_by_product = {
-            item['product_id']: item['total_stock'] or 0 
+            item['product_id']: item['total_stock'] or 0
             for item in stock_data
         }
-        
-        return Promise.resolve([
-            stock_by_product.get(product_id, 0) for product_id in product_ids
-        ])
+
+        return [stock_by_product.get(product_id, 0) for product_id in product_ids]
 
 
-class ProductPriceRangeByProductIdLoader(DataLoader):
+class ProductPriceRangeByProductIdLoader(BatchLoader):
     """
     DataLoader để tính price range theo Product ID
     Tối ưu cho resolve_min_price, resolve_max_price
     """
     def batch_load_fn(self, product_ids):
-        from django.db.models import Min, Max
-        
         # Query price range theo product
         price_data = ProductVariant.objects.filter(
             product_id__in=product_ids,
@@ -232,7 +205,7 @@ class ProductPriceRangeByProductIdLoader(DataLoader):
             min_price=Min('price'),
             max_price=Max('price')
         )
-        
+
         # Tạo mapping
         price_ranges = {}
         for item in price_data:
@@ -240,71 +213,91 @@ class ProductPriceRangeByProductIdLoader(DataLoader):
                 'min': item['min_price'],
                 'max': item['max_price']
             }
-        
-        return Promise.resolve([
-            price_ranges.get(product_id, {'min': 0, 'max': 0}) 
+
+        return [
+            price_ranges.get(product_id, {'min': None, 'max': None})
             for product_id in product_ids
-        ])
+        ]
+
+
+class ProductVariantMatrixByProductIdLoader(BatchLoader):
+    """
+    DataLoader đọc ma trận biến thể (ProductStats.variant_matrix) theo Product ID
+    Dùng cho resolve_variant_matrix khi product không kèm sẵn stats
+    """
+    def batch_load_fn(self, product_ids):
+        matrices = stored_matrices(product_ids)
+        return [matrices[product_id] for product_id in product_ids]
 
 
-class ProductsBySellerLoader(DataLoader):
+class ProductMaxDiscountLoader(BatchLoader):
     """
-    DataLoader để load Products theo Seller ID
+    DataLoader tính % giảm giá cao nhất cho product
+    Key: (product_id, category_id, store_id, base_price)
+    3 query cho cả batch (voucher theo product / category / store) thay vì 1 query mỗi product
+    """
+    def batch_load_fn(self, keys):
+        from discount.models import VoucherProduct, VoucherCategory, VoucherStore
+        from ..types.utils import compute_max_discount
+
+        today = timezone.now().date()
+        active = {
+            'voucher__is_active': True,
+            'voucher__start_date__lte': today,
+            'voucher__end_date__gte': today,
+        }
+        voucher_fields = ('voucher_id', 'voucher__discount_type', 'voucher__discount_value')
+
+        def group(model, field, ids):
+            grouped = defaultdict(dict)
+            rows = model.objects.filter(**{f'{field}__in': ids}, **active).values(field, *voucher_fields)
+            for row in rows:
+                grouped[row[field]][row['voucher_id']] = (
+                    row['voucher__discount_type'], row['voucher__discount_value']
+                )
+            return grouped
+
+        by_product = group(VoucherProduct, 'product_id', {k[0] for k in keys})
+        by_category = group(VoucherCategory, 'category_id', {k[1] for k in keys})
+        by_store = group(VoucherStore, 'store_id', {k[2] for k in keys})
+
+        results = []
+        for product_id, category_id, store_id, base_price in keys:
+            # Gộp theo voucher_id (tương đương .distinct() trong get_max_discount)
+            vouchers = {}
+            vouchers.update(by_product.get(product_id, {}))
+            vouchers.update(by_category.get(category_id, {}))
+            vouchers.update(by_store.get(store_id, {}))
+            results.append(compute_max_discount(base_price, vouchers.values()))
+        return results
+
+
+class ProductsBySellerLoader(BatchLoader):
+    """
+    DataLoader để load Products theo Store ID (người bán)
     Tối ưu cho queries liên quan đến seller
     """
-    def batch_load_fn(self, seller_ids):
-        products_by_seller = {}
-        
-        # Query products theo seller
+    def batch_load_fn(self, store_ids):
+        products_by_store = defaultdict(list)
+
+        # Query products theo store
         products = Product.objects.filter(
-            seller_id__in=seller_ids,
+            store_id__in=store_ids,
             is_active=True
         ).select_related('category')
-        
-        # Group theo seller_id
+
         for product in products:
-            if product.seller_id not in products_by_seller:
-                products_by_seller[product.seller_id] = []
-            products_by_seller[product.seller_id].append(product)
-        
-        return Promise.resolve([
-            products_by_seller.get(seller_id, []) 
-            for seller_id in seller_ids
-        ])
+            products_by_store[product.store_id].append(product)
 
-
-class ProductVariantsByProductLoader(DataLoader):
-    """
-    DataLoader để load ProductVariants theo Product ID
-    Alias cho ProductVariantsByProductIdLoader
-    """
-    def batch_load_fn(self, product_ids):
-        variants_by_product = {}
-        
-        # Query variants theo product
-        variants = ProductVariant.objects.filter(
-            product_id__in=product_ids,
-            is_active=True
-        ).select_related('product')
-        
-        # Group theo product_id
-        for variant in variants:
-            if variant.product_id not in variants_by_product:
-                variants_by_product[variant.product_id] = []
-            variants_by_product[variant.product_id].append(variant)
-        
-        return Promise.resolve([
-            variants_by_product.get(product_id, []) 
-            for product_id in product_ids
-        ])
+        return [products_by_store.get(store_id, []) for store_id in store_ids]
 
 
 # ===== HELPER FUNCTIONS =====
 
-def get_dataloader_context():
+def create_product_loaders():
     """
-    Tạo context chứa tất cả dataloaders
-    Sử dụng trong GraphQL context
+    Tạo dict chứa tất cả dataloaders của product
+    Mỗi request có một bộ riêng (xem get_product_loaders)
     """
     return {
         'category_by_id_loader': CategoryByIdLoader(),
@@ -312,13 +305,66 @@ def get_dataloader_context():
         'products_by_category_id_loader': ProductsByCategoryIdLoader(),
         'products_by_seller_loader': ProductsBySellerLoader(),
         'product_variants_by_product_id_loader': ProductVariantsByProductIdLoader(),
-        'product_variants_by_product_loader': ProductVariantsByProductLoader(),
         'product_variant_by_id_loader': ProductVariantByIdLoader(),
         'product_attribute_options_by_product_id_loader': ProductAttributeOptionsByProductIdLoader(),
         'product_attribute_by_id_loader': ProductAttributeByIdLoader(),
         'product_images_by_product_id_loader': ProductImagesByProductIdLoader(),
         'subcategories_by_category_id_loader': SubcategoriesByCategoryIdLoader(),
-        'seller_by_id_loader': SellerByIdLoader(),
+        'store_by_id_loader': StoreByIdLoader(),
         'product_stock_by_product_id_loader': ProductStockByProductIdLoader(),
         'product_price_range_by_product_id_loader': ProductPriceRangeByProductIdLoader(),
-    }
\ No newline at end of file
+        'product_variant_matrix_by_product_id_loader': ProductVariantMatrixByProductIdLoader(),
+        'product_max_discount_loader': ProductMaxDiscountLoader(),
+    }
+
+
+# Giữ tên cũ cho code đang import
+get_dataloader_context = create_product_loaders
+
+
+def get_product_loaders(info):
+    """Get product loaders từ GraphQL context (tạo 1 lần / request)"""
+    return get_loaders(info, 'product_loaders', create_product_loaders)
+
+
+def discount_key(product):
+    """Key cho ProductMaxDiscountLoader"""
+    return (product.product_id, product.category_id, product.store_id, product.base_price)
+
+
+# Loaders nhận key là product_id, được prime theo cả trang sản phẩm
+PRODUCT_ID_LOADERS = (
+    'product_variants_by_product_id_loader',
+    'product_attribute_options_by_product_id_loader',
+    'product_images_by_product_id_loader',
+    'product_variant_matrix_by_product_id_loader',
+)
+
+
+def prime_product_loaders(info, products):
+    """
+    Đăng ký trước toàn bộ product của trang hiện tại, để resolver của product đầu tiên
+    load dữ liệu cho cả trang trong 1 query / loader.
+    """
+    products = [p for p in products if p is not None]
+    if not products:
+        return
+    loaders = get_product_loaders(info)
+    product_ids = [p.product_id for p in products]
+    for name in PRODUCT_ID_LOADERS:
+        loaders[name].prime_many(product_ids)
+    loaders['product_max_discount_loader'].prime_many(discount_key(p) for p in products)
+
+
+def prime_variant_loaders(info, variants):
+    """Prime loaders theo product cha của một trang variants"""
+    variants = [v for v in variants if v is not None]
+    if not variants:
+        return
+    loaders = get_product_loaders(info)
+    product_ids = {v.product_id for v in variants}
+    loaders['product_attribute_options_by_product_id_loader'].prime_many(product_ids)
+    loaders['product_images_by_product_id_loader'].prime_many(product_ids)
+    loaders['product_max_discount_loader'].prime_many(
+        discount_key(v.product) for v in variants
+    )
@@ -0,0 +1,158 @@
+"""
+Facet counts cho sidebar lọc sản phẩm (productFacets)
+
+Dùng chung apply_product_filters với `products`, rồi đếm trong 2 lượt GROUP BY:
+  1. Product: (category, brand, price bucket) → gộp ra 3 facet
+  2. ProductVariant.option_combinations (jsonb_each_text) → size / color
+Kết quả cache theo filter đã chuẩn hóa (caching/cache.py), bỏ khi product / biến thể / danh mục / brand đổi
+(kể cả UPDATE không qua save(): checkout, cập nhật hàng loạt, nhập catalog — qua lần tính lại ProductStats).
+"""
+import hashlib
+import json
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count, Case, When, Value, IntegerField
+
+from caching.cache import get_cache
+from ..ultis.ultis import get_base_product_queryset
+from .filtering import apply_product_filters
+
+FACET_CACHE_TTL = 60  # giây
+FACET_CACHE_TAGS = ('product', 'category', 'brand')
+FACET_CACHE_PREFIX = 'product_facets'
+
+# Khoảng giá (VND) theo base_price, khớp với filter price_range: (nhãn, min, max)
+PRICE_BUCKETS = [
+    ('0-200k', Decimal('0'), Decimal('200000')),
+    ('200k-500k', Decimal('200000'), Decimal('500000')),
+    ('500k-1m', Decimal('500000'), Decimal('1000000')),
+    ('1m-2m', Decimal('1000000'), Decimal('2000000')),
+    ('2m+', Decimal('2000000'), None),
+]
+
+# Key trong option_combinations không thống nhất ("Size", "Color", "Màu Sắc"...)
+OPTION_KEY_ALIASES = {
+    'size': 'size',
+    'kích thước': 'size',
+    'color': 'color',
+    'màu': 'color',
+    'màu sắc': 'color',
+}
+
+
+def _normalize(value):
+    """Chuẩn hóa input filter thành cấu trúc JSON ổn định (bỏ None, sort key/list)"""
+    if hasattr(value, 'value') and not isinstance(value, (str, bytes)):
+        value = value.value  # graphene Enum
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items()) if v is not None}
+    if isinstance(value, (list, tuple)):
+        return sorted((_normalize(v) for v in value), key=lambda v: json.dumps(v, default=str))
+    return value
+
+
+def facet_cache_key(filters):
+    payload = json.dumps(_normalize(dict(filters or {})), sort_keys=True, default=str)
+    digest = hashlib.md5(payload.encode('utf-8')).hexdigest()
+    return f"{FACET_CACHE_PREFIX}:{digest}"
+
+
+def _price_bucket_expression():
+    whens = []
+    for idx, (_, low, high) in enumerate(PRICE_BUCKETS):
+        cond = {'base_price__gte': low}
+        if high is not None:
+            cond['base_price__lt'] = high
+        whens.append(When(then=Value(idx), **cond))
+    return Case(*whens, default=Value(None), output_field=IntegerField())
+
+
+def _product_facets(qs):
+    """
+    Lượt 1: đếm theo (category, brand, price bucket) trên tập product đã lọc.
+    Filter theo biến thể (giảm giá, size, màu) join variants → DISTINCT áp sau GROUP BY nên phải đếm distinct.
+    """
+    rows = qs.annotate(price_bucket=_price_bucket_expression())\
+        .values('category_id', 'category__name', 'brand_id', 'brand__name', 'price_bucket')\
+        .annotate(total=Count('product_id', distinct=True))\
+        .order_by()
+
+    categories, brands, prices = {}, {}, defaultdict(int)
+    for r in rows:
+        cat = categories.setdefault(r['category_id'], {'value': str(r['category_id']), 'label': r['category__name'], 'count': 0})
+        cat['count'] += r['total']
+        if r['brand_id'] is not None:
+            brand = brands.setdefault(r['brand_id'], {'value': str(r['brand_id']), 'label': r['brand__name'], 'count': 0})
+            brand['count'] += r['total']
+        if r['price_bucket'] is not None:
+            prices[r['price_bucket']] += r['total']
+
+    price_facets = []
+    for idx, (label, low, high) in enumerate(PRICE_BUCKETS):
+        price_facets.append({
+            'value': label,
+            'label': label,
+            'count': prices.get(idx, 0),
+            'min_price': low,
+            'max_price': high,
+        })
+
+    by_count = lambda item: (-item['count'], item['label'] or '')
+    return sorted(categories.values(), key=by_count), sorted(brands.values(), key=by_count), price_facets
+
+
+def _option_facets(qs):
+    """Lượt 2: đếm số product phân biệt theo từng (key, value) trong option_combinations"""
+    ids_sql, ids_params = qs.order_by().values('product_id').query.sql_with_params()
+    sql = f"""
+        SELECT lower(opt.key), opt.value, COUNT(DISTINCT v.product_id)
+        FROM products_productvariant AS v
+        CROSS JOIN LATERAL jsonb_each_text(v.option_combinations) AS opt(key, value)
+        WHERE v.is_active
+          AND jsonb_typeof(v.option_combinations) = 'object'
+          AND v.product_id IN ({ids_sql})
+        GROUP BY lower(opt.key), opt.value
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ids_params)
+        rows = cursor.fetchall()
+
+    facets = {'size': defaultdict(int), 'color': defaultdict(int)}
+    for key, value, total in rows:
+        axis = OPTION_KEY_ALIASES.get(key.strip())
+        if axis:
+            facets[axis][value] += total
+
+    def to_list(counts):
+        return [
+            {'value': v, 'label': v, 'count': c}
+            for v, c in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+        ]
+    return to_list(facets['size']), to_list(facets['color'])
+
+
+def compute_product_facets(filters=None):
+    """Trả về dict facet cho tập sản phẩm khớp filter (có cache)"""
+    return get_cache().get_or_compute(
+        facet_cache_key(filters), lambda: _compute_facets(filters),
+        tags=FACET_CACHE_TAGS, ttl=FACET_CACHE_TTL, name=FACET_CACHE_PREFIX,
+    )
+
+
+def _compute_facets(filters):
+    qs = get_base_product_queryset().prefetch_related(None)
+    if filters:
+        qs = apply_product_filters(qs, filters)
+
+    categories, brands, price_ranges = _product_facets(qs)
+    sizes, colors = _option_facets(qs)
+    return {
+        'total': sum(c['count'] for c in categories),
+        'categories': categories,
+        'brands': brands,
+        'sizes': sizes,
+        'colors': colors,
+        'price_ranges': price_ranges,
+    }
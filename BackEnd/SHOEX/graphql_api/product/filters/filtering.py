@@ -3,6 +3,9 @@ from graphene import InputObjectType
 from django.db.models import Q, Sum, Avg, F, Case, When, Value, BooleanField
 from django.db.models.functions import Coalesce
 from products.models import Product, Category
+from products.search import filter_by_search
+from products.category_tree import get_category_tree, expand_category_ids
+from ..ultis.ultis import HOT_SOLD_THRESHOLD
 from django.utils import timezone
 from django.utils.timezone import make_aware, is_naive
 from datetime import timedelta
@@ -73,12 +76,8 @@ class ProductFilterInput(InputObjectType):
 
     # ===== GET SUBCATEGORY IDS =====
 def get_subcategory_ids(category_id):
-    subcategories = Category.objects.filter(parent_id=category_id, is_active=True)
-    ids = []
-    for sub in subcategories:
-        ids.append(sub.category_id)
-        ids.extend(get_subcategory_ids(sub.category_id))
-    return ids
+    """ID toàn bộ danh mục con cháu (active), đọc từ cây danh mục cache"""
+    return get_category_tree().descendant_ids(int(category_id))
 
 # ===== APPLY PRODUCT FILTERS =====
 # TẠM THỜI BỎ QUA CÁC TRƯỜNG THIẾU TRONG ProductFilterInput (store_id, store_name)
@@ -109,11 +108,10 @@ def apply_product_filters(queryset, filters):
         logger.debug('apply_product_filters input: %s', debug_payload)
     except Exception:
         logger.debug('apply_product_filters received filters (unable to enumerate)')
-    print('Applying product filters:', filters)
     # ===== TÌM KIẾM (Search) =====
     if getattr(filters, "search", None):
-        queryset = queryset.filter(Q(name__icontains=filters.search) |
-                                   Q(description__icontains=filters.search))
+        # Full-text qua search_vector (GIN index) thay vì ILIKE quét toàn bảng
+        queryset = filter_by_search(queryset, filters.search)
 
     # ===== DANH MỤC (Category) =====
     
@@ -121,19 +119,18 @@ def apply_product_filters(queryset, filters):
     if getattr(filters, "category_id", None):
         cat_id = filters.category_id
         if getattr(filters, "include_subcategories", True):
-            # Lấy tất cả ID danh mục con (sử dụng đệ quy)
-            all_ids = [cat_id] + get_subcategory_ids(cat_id)
+            # Lấy tất cả ID danh mục con (cây danh mục cache, không query)
+            all_ids = expand_category_ids([cat_id])
             queryset = queryset.filter(category_id__in=all_ids)
         else:
             queryset = queryset.filter(category_id=cat_id)
 
     # Lọc theo danh sách category_ids
     if getattr(filters, "category_ids", None):
-        ids = []
-        for cid in filters.category_ids:
-            ids.append(cid)
-            if getattr(filters, "include_subcategories", True):
-                ids.extend(get_subcategory_ids(cid))
+        ids = expand_category_ids(
+            filters.category_ids,
+            include_subcategories=getattr(filters, "include_subcategories", True)
+        )
         queryset = queryset.filter(category_id__in=ids)
 
     # ===== NGƯỜI BÁN (Brand) =====
@@ -145,10 +142,7 @@ def apply_product_filters(queryset, filters):
             logger.debug('apply_product_filters - store_id incoming type=%s value=%s', type(filters.store_id), filters.store_id)
         except Exception:
             logger.debug('apply_product_filters - store_id present (unable to inspect)')
-        before_count = queryset.count()
         queryset = queryset.filter(store_id=filters.store_id)
-        after_count = queryset.count()
-        logger.debug('apply_product_filters - applied store_id filter: before=%s after=%s', before_count, after_count)
 
     # ===== GIÁ CẢ (Price Range) =====
     # Dùng base_price hoặc giá bán (price) tùy theo logic kinh doanh. 
@@ -171,13 +165,14 @@ def apply_product_filters(queryset, filters):
     # ===== TRẠNG THÁI (Stock & Discount) =====
 
     # Còn hàng (has_stock)
+    # Dùng total_stock trong ProductStats (có index) thay vì join variants + DISTINCT
     if getattr(filters, "has_stock", None) is not None:
         if filters.has_stock:
             # Lọc sản phẩm có ít nhất một variant còn hàng
-            queryset = queryset.filter(variants__stock__gt=0).distinct()
+            queryset = queryset.filter(stats__total_stock__gt=0)
         else:
             # Lọc sản phẩm KHÔNG có variant nào còn hàng
-            queryset = queryset.exclude(variants__stock__gt=0).distinct()
+            queryset = queryset.exclude(stats__total_stock__gt=0)
 
     # Có giảm giá (has_discount)
     if getattr(filters, "has_discount", None):
@@ -192,7 +187,7 @@ def apply_product_filters(queryset, filters):
     # Giả định có trường is_hot trên mô hình Product
     if getattr(filters, "is_hot", None):
         if filters.is_hot:
-            queryset = queryset.filter(is_hot=True)
+            queryset = queryset.filter(stats__sold_count_last_30__gte=HOT_SOLD_THRESHOLD)
 
     # Sản phẩm mới (is_new)
     # Giả định có trường is_new trên mô hình Product
@@ -201,15 +196,14 @@ def apply_product_filters(queryset, filters):
             queryset = queryset.filter(is_new=True)
 
     # ===== ĐÁNH GIÁ (Rating) =====
-    # Yêu cầu Product QuerySet phải được annotate với 'avg_rating' trước đó.
+    # Lọc trực tiếp trên cột có index của ProductStats.
     if getattr(filters, "min_rating", None):
-        queryset = queryset.filter(avg_rating__gte=filters.min_rating)
+        queryset = queryset.filter(stats__avg_rating__gte=filters.min_rating)
 
     # ===== SỐ LƯỢNG ĐÃ BÁN (Sold Count) =====
-    # Yêu cầu Product QuerySet phải được annotate với 'sold_count_last_30' trước đó.
     # Lưu ý: Tôi đang giả định 'min_sold' áp dụng cho sold_count_last_30 như trong code cũ.
     if getattr(filters, "min_sold", None):
-        queryset = queryset.filter(sold_count_last_30__gte=filters.min_sold)
+        queryset = queryset.filter(stats__sold_count_last_30__gte=filters.min_sold)
 
     # ===== THỜI GIAN TẠO (created_at) =====
     # Support explicit datetime range filters (`created_from`/`created_to`).
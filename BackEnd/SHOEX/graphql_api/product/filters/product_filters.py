@@ -4,6 +4,7 @@ from django_filters import FilterSet, CharFilter, NumberFilter, BooleanFilter, O
 from django.db import models
 from django.db.models import Q, Min, Max, Count, F
 from products.models import Product, Category, ProductVariant
+from products.category_tree import get_category_tree
 
 
 class ProductFilterSet(FilterSet):
@@ -329,18 +330,10 @@ def apply_product_sorting(queryset, sort_input):
 
 def get_subcategory_ids(category_id):
     """
-    Lấy tất cả subcategory IDs của một category
-    Recursive function để lấy all levels
+    Lấy tất cả subcategory IDs của một category (all levels)
+    Đọc từ cây danh mục cache thay vì đệ quy 1 query / node
     """
-    subcategories = Category.objects.filter(parent_id=category_id, is_active=True)
-    subcategory_ids = []
-    
-    for subcategory in subcategories:
-        subcategory_ids.append(subcategory.category_id)
-        # Recursive call cho subcategories của subcategory
-        subcategory_ids.extend(get_subcategory_ids(subcategory.category_id))
-    
-    return subcategory_ids
+    return get_category_tree().descendant_ids(int(category_id))
 
 
 # ===== CATEGORY HELPERS =====
@@ -5,7 +5,8 @@ from django.db import transaction
 from django.core.exceptions import ValidationError
 
 from products.models import Product, ProductImage, ProductAttributeOption
-from products.utils import validate_image, resize_image
+from products.utils import validate_image
+from products.images import ingest_image
 from ..types.product import ProductImageType, ProductAttributeOptionType
 
 
@@ -25,25 +26,26 @@ class UploadProductImage(graphene.Mutation):
     @classmethod
     def mutate(cls, root, info, product_id, image, **kwargs):
         try:
+            # Validate product tồn tại
+            try:
+                product = Product.objects.get(product_id=product_id)
+            except Product.DoesNotExist:
+                return UploadProductImage(
+                    errors=[ErrorType(message="Sản phẩm không tồn tại")]
+                )
+            
+            # Validate ảnh
+            validation = validate_image(image)
+            if not validation['valid']:
+                return UploadProductImage(
+                    errors=[ErrorType(message=validation['error'])]
+                )
+            
+            # Lưu ảnh gốc ngoài transaction (dùng lại nếu trùng nội dung);
+            # các cỡ thumbnail/card/detail/zoom được job nền tạo sau
+            asset = ingest_image(image)
+            
             with transaction.atomic():
-                # Validate product tồn tại
-                try:
-                    product = Product.objects.get(product_id=product_id)
-                except Product.DoesNotExist:
-                    return UploadProductImage(
-                        errors=[ErrorType(message="Sản phẩm không tồn tại")]
-                    )
-                
-                # Validate ảnh
-                validation = validate_image(image)
-                if not validation['valid']:
-                    return UploadProductImage(
-                        errors=[ErrorType(message=validation['error'])]
-                    )
-                
-                # Resize ảnh
-                resized_image = resize_image(image)
-                
                 # Xử lý thumbnail unique
                 is_thumbnail = kwargs.get('is_thumbnail', False)
                 if is_thumbnail:
@@ -56,7 +58,8 @@ class UploadProductImage(graphene.Mutation):
                 # Tạo ProductImage
                 product_image = ProductImage.objects.create(
                     product=product,
-                    image=resized_image,
+                    image=asset.original.name,
+                    asset=asset,
                     is_thumbnail=is_thumbnail,
                     alt_text=kwargs.get('alt_text', f"{product.name} - Ảnh"),
                     display_order=kwargs.get('display_order', 0)
@@ -83,30 +86,30 @@ class UploadAttributeOptionImage(graphene.Mutation):
     @classmethod
     def mutate(cls, root, info, option_id, image):
         try:
-            with transaction.atomic():
-                # Validate option tồn tại
-                try:
-                    option = ProductAttributeOption.objects.get(option_id=option_id)
-                except ProductAttributeOption.DoesNotExist:
-                    return UploadAttributeOptionImage(
-                        errors=[ErrorType(message="Tùy chọn không tồn tại")]
-                    )
-                
-                # Validate ảnh
-                validation = validate_image(image)
-                if not validation['valid']:
-                    return UploadAttributeOptionImage(
-                        errors=[ErrorType(message=validation['error'])]
-                    )
-                
-                # Resize ảnh (nhỏ hơn cho options)
-                resized_image = resize_image(image, max_width=300, max_height=200)
-                
-                # Cập nhật option
-                option.image = resized_image
-                option.save()
-                
-                return UploadAttributeOptionImage(attribute_option=option)
+            # Validate option tồn tại
+            try:
+                option = ProductAttributeOption.objects.get(option_id=option_id)
+            except ProductAttributeOption.DoesNotExist:
+                return UploadAttributeOptionImage(
+                    errors=[ErrorType(message="Tùy chọn không tồn tại")]
+                )
+            
+            # Validate ảnh
+            validation = validate_image(image)
+            if not validation['valid']:
+                return UploadAttributeOptionImage(
+                    errors=[ErrorType(message=validation['error'])]
+                )
+            
+            # Lưu ảnh gốc (các cỡ nhỏ cho options được tạo nền)
+            asset = ingest_image(image)
+            
+            # Cập nhật option
+            option.image = asset.original.name
+            option.asset = asset
+            option.save()
+            
+            return UploadAttributeOptionImage(attribute_option=option)
                 
         except Exception as e:
             return UploadAttributeOptionImage(
@@ -256,28 +256,21 @@ class CreateProductFull(Mutation):
 
                 # images (gallery)
                 if getattr(input, 'images', None):
-                    from products.utils import validate_image, resize_image
+                    from products.utils import validate_image
+                    from products.images import ingest_image
                     for img_in in input.images:
                         v = validate_image(img_in.image)
                         if not v['valid']:
                             raise ValueError(f"Image validation failed: {v['error']}")
-                        resized = resize_image(img_in.image)
-                        # ensure ContentFile has a name
-                        try:
-                            orig_name = getattr(img_in.image, 'name', None) or 'image.jpg'
-                            base = orig_name.rsplit('.', 1)[0]
-                            resized.name = f"{base}.jpg"
-                        except Exception:
-                            try:
-                                resized.name = 'image.jpg'
-                            except Exception:
-                                pass
+                        # Lưu ảnh gốc (dùng lại nếu trùng nội dung); các cỡ được tạo nền
+                        asset = ingest_image(img_in.image)
                         # if thumbnail, unset existing thumbnails
                         if getattr(img_in, 'isThumbnail', False):
                             ProductImage.objects.filter(product=product, is_thumbnail=True).update(is_thumbnail=False)
                         ProductImage.objects.create(
                             product=product,
-                            image=resized,
+                            image=asset.original.name,
+                            asset=asset,
                             is_thumbnail=getattr(img_in, 'isThumbnail', False),
                             alt_text=getattr(img_in, 'altText', None),
                             display_order=getattr(img_in, 'displayOrder', 0)
@@ -285,7 +278,8 @@ class CreateProductFull(Mutation):
 
                 # attribute options
                 if getattr(input, 'attributeOptions', None):
-                    from products.utils import validate_image, resize_image
+                    from products.utils import validate_image
+                    from products.images import ingest_image
                     for opt in input.attributeOptions:
                         # attributeId may be numeric (attribute_id) or a code/name like 'color'
                         raw_attr_id = getattr(opt, 'attributeId')
@@ -326,18 +320,9 @@ class CreateProductFull(Mutation):
                             v = validate_image(opt.image)
                             if not v['valid']:
                                 raise ValueError(f"Attribute option image: {v['error']}")
-                            resized = resize_image(opt.image, max_width=300, max_height=200)
-                            # ensure ContentFile has a name
-                            try:
-                                orig_name = getattr(opt.image, 'name', None) or 'option.jpg'
-                                base = orig_name.rsplit('.', 1)[0]
-                                resized.name = f"{base}.jpg"
-                            except Exception:
-                                try:
-                                    resized.name = 'option.jpg'
-                                except Exception:
-                                    pass
-                            option_kwargs['image'] = resized
+                            asset = ingest_image(opt.image)
+                            option_kwargs['image'] = asset.original.name
+                            option_kwargs['asset'] = asset
 
                         ProductAttributeOption.objects.create(**option_kwargs)
 
@@ -498,26 +483,20 @@ class UpdateProductFull(Mutation):
 
                 # images (gallery) - append new images
                 if getattr(input, 'images', None):
-                    from products.utils import validate_image, resize_image
+                    from products.utils import validate_image
+                    from products.images import ingest_image
                     for img_in in input.images:
                         v = validate_image(img_in.image)
                         if not v['valid']:
                             raise ValueError(f"Image validation failed: {v['error']}")
-                        resized = resize_image(img_in.image)
-                        try:
-                            orig_name = getattr(img_in.image, 'name', None) or 'image.jpg'
-                            base = orig_name.rsplit('.', 1)[0]
-                            resized.name = f"{base}.jpg"
-                        except Exception:
-                            try:
-                                resized.name = 'image.jpg'
-                            except Exception:
-                                pass
+                        # Lưu ảnh gốc (dùng lại nếu trùng nội dung); các cỡ được tạo nền
+                        asset = ingest_image(img_in.image)
                         if getattr(img_in, 'isThumbnail', False):
                             ProductImage.objects.filter(product=product, is_thumbnail=True).update(is_thumbnail=False)
                         ProductImage.objects.create(
                             product=product,
-                            image=resized,
+                            image=asset.original.name,
+                            asset=asset,
                             is_thumbnail=getattr(img_in, 'isThumbnail', False),
                             alt_text=getattr(img_in, 'altText', None),
                             display_order=getattr(img_in, 'displayOrder', 0)
@@ -525,7 +504,8 @@ class UpdateProductFull(Mutation):
 
                 # attribute options - append new options
                 if getattr(input, 'attributeOptions', None):
-                    from products.utils import validate_image, resize_image
+                    from products.utils import validate_image
+                    from products.images import ingest_image
                     for opt in input.attributeOptions:
                         raw_attr_id = getattr(opt, 'attributeId')
                         attribute = None
@@ -561,17 +541,9 @@ class UpdateProductFull(Mutation):
                             v = validate_image(opt.image)
                             if not v['valid']:
                                 raise ValueError(f"Attribute option image: {v['error']}")
-                            resized = resize_image(opt.image, max_width=300, max_height=200)
-                            try:
-                                orig_name = getattr(opt.image, 'name', None) or 'option.jpg'
-                                base = orig_name.rsplit('.', 1)[0]
-                                resized.name = f"{base}.jpg"
-                            except Exception:
-                                try:
-                                    resized.name = 'option.jpg'
-                                except Exception:
-                                    pass
-                            option_kwargs['image'] = resized
+                            asset = ingest_image(opt.image)
+                            option_kwargs['image'] = asset.original.name
+                            option_kwargs['asset'] = asset
 
                         # Avoid creating duplicate attribute option values for same product+attribute+value
                         try:
@@ -584,6 +556,7 @@ class UpdateProductFull(Mutation):
                                 # If frontend provided a new image file, update the existing option's image
                                 if 'image' in option_kwargs and option_kwargs['image'] is not None:
                                     existing.image = option_kwargs['image']
+                                    existing.asset = option_kwargs['asset']
                                     existing.display_order = option_kwargs.get('display_order', existing.display_order)
                                     if option_kwargs.get('value_code') is not None:
                                         existing.value_code = option_kwargs.get('value_code')
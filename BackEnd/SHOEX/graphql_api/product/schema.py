@@ -7,10 +7,14 @@ from datetime import timedelta
 from graphene import relay
 from promise import Promise
 from django.db.models.functions import Coalesce
+from caching.cache import cached, cached_resolver
+from caching.signals import product_tags
 # ===== DJANGO MODELS =====
 from products.models import Product, ProductVariant, Category, ProductAttribute
+from products.search import search_products
 from brand.models import Brand
 from graphene_django import DjangoConnectionField
+from graphql_api.core.connection import KeysetConnectionField
 from .sort.sorting import ProductSortInput, apply_product_sorting
 from orders.models import OrderItem  # giả sử OrderItem có field created_at và variant liên kết ProductVariant
 from reviews.models import Review
@@ -22,7 +26,8 @@ from .types.product import (
     ProductCountableConnection,
     ProductVariantCountableConnection,
     CategoryType,
-    CategoryCountableConnection
+    CategoryCountableConnection,
+    ProductFacetsType
 )
 from .types.product import ProductAttributeType
 
@@ -39,6 +44,7 @@ from .filters.filtering import (
     # Product filters
     ProductFilterInput,
     apply_product_filters)
+from .filters.facets import compute_product_facets
 # ===== MUTATIONS =====
 # Product & Variant mutations
 from .mutations.product_mutations import (
@@ -83,11 +89,51 @@ from .bulk_mutations import (
     # Stock & Price bulk operations
     BulkStockUpdate,
     BulkPriceUpdate,
-    BulkStockTransfer
+    BulkStockTransfer,
+    
+    # Catalog import từ file
+    StartCatalogImport,
+    CatalogImportType,
+    catalog_import_for_user
 )
 
 # ===== DATALOADERS =====
 
+@cached('category_list', tags=['category', 'product'])
+def category_list(filter_data, sort_by):
+    """Danh mục theo filter / sortBy của query categories (list để cache; số sản phẩm đổi theo tag 'product')"""
+    qs = Category.objects.all()
+
+    # --- 1️⃣ Lọc theo filter ---
+    if filter_data:
+        if 'isActive' in filter_data:
+            qs = qs.filter(is_active=filter_data['isActive'])
+        if 'parentId' in filter_data:
+            # parentId = None → danh mục gốc
+            parent_id = filter_data['parentId']
+            if parent_id is None:
+                qs = qs.filter(parent__isnull=True)
+            else:
+                qs = qs.filter(parent_id=parent_id)
+        if 'search' in filter_data:
+            qs = qs.filter(name__icontains=filter_data['search'])
+        if 'hasProducts' in filter_data and filter_data['hasProducts']:
+            qs = qs.annotate(product_count=Count('products')).filter(product_count__gt=0)
+
+    # --- 2️⃣ Sắp xếp (sort) ---
+    if sort_by == 'name_asc':
+        qs = qs.order_by('name')
+    elif sort_by == 'name_desc':
+        qs = qs.order_by('-name')
+    elif sort_by == 'created_at_desc':
+        qs = qs.order_by('-created_at')
+    elif sort_by == 'product_count_desc':
+        qs = qs.annotate(product_count=Count('products')).order_by('-product_count')
+
+    return list(qs)
+
+
+
 class ProductQueries(graphene.ObjectType):
     """Queries cho products và categories trong SHOEX"""
     
@@ -128,7 +174,7 @@ class ProductQueries(graphene.ObjectType):
     )
     
     # Product collection query
-    products = graphene.ConnectionField(
+    products = KeysetConnectionField(
         ProductCountableConnection,
         filter=ProductFilterInput(description="Bộ lọc sản phẩm"),
         sort_by=graphene.Argument(
@@ -138,6 +184,20 @@ class ProductQueries(graphene.ObjectType):
         description="Danh sách tất cả sản phẩm với pagination"
     )
     
+    # Facet counts cho sidebar lọc
+    product_facets = graphene.Field(
+        ProductFacetsType,
+        filter=ProductFilterInput(description="Bộ lọc sản phẩm (giống products)"),
+        description="Số lượng sản phẩm theo danh mục, thương hiệu, size, màu, khoảng giá"
+    )
+    
+    # Tiến độ nhập catalog từ file (startCatalogImport)
+    catalog_import = graphene.Field(
+        CatalogImportType,
+        import_id=graphene.Int(required=True),
+        description="Tiến độ, kết quả và lỗi theo dòng của 1 lần nhập catalog"
+    )
+    
     # ===== PRODUCT VARIANT QUERIES =====
     # Single variant query
     product_variant = graphene.Field(
@@ -148,7 +208,7 @@ class ProductQueries(graphene.ObjectType):
     )
     
     # Variant collection query
-    product_variants = graphene.ConnectionField(
+    product_variants = KeysetConnectionField(
         ProductVariantCountableConnection,
         filter=ProductVariantFilterInput(description="Bộ lọc biến thể"),
         sort_by=graphene.Argument(
@@ -160,14 +220,14 @@ class ProductQueries(graphene.ObjectType):
     
     # ===== SPECIALIZED PRODUCT QUERIES =====
     # Featured products
-    featured_products = graphene.ConnectionField(
+    featured_products = KeysetConnectionField(
         ProductCountableConnection,
         first=graphene.Int(description="Số lượng sản phẩm nổi bật"),
         description="Sản phẩm nổi bật (rating cao, bán chạy)"
     )
     
     # Products by seller
-    products_by_seller = graphene.ConnectionField(
+    products_by_seller = KeysetConnectionField(
         ProductCountableConnection,
         seller_id=graphene.Argument(graphene.ID, required=True, description="ID của seller"),
         filter=ProductFilterInput(description="Bộ lọc sản phẩm"),
@@ -175,7 +235,7 @@ class ProductQueries(graphene.ObjectType):
     )
     
     # Products by category
-    products_by_category = graphene.ConnectionField(
+    products_by_category = KeysetConnectionField(
         ProductCountableConnection,
         category_id=graphene.Argument(graphene.ID, required=True, description="ID của danh mục"),
         filter=ProductFilterInput(description="Bộ lọc sản phẩm"),
@@ -184,7 +244,7 @@ class ProductQueries(graphene.ObjectType):
     
     # ===== SEARCH QUERIES =====
     # Full-text product search
-    search_products = graphene.ConnectionField(
+    search_products = KeysetConnectionField(
         ProductCountableConnection,
         query=graphene.Argument(graphene.String, required=True, description="Từ khóa tìm kiếm"),
         filter=ProductFilterInput(description="Bộ lọc sản phẩm"),
@@ -193,6 +253,7 @@ class ProductQueries(graphene.ObjectType):
     
     # ===== CATEGORY RESOLVERS =====
     
+    @cached_resolver('category_detail', tags=['category'])
     def resolve_category(self, info, id=None, slug=None):
         """Resolve single category by ID or slug"""
         if id:
@@ -209,38 +270,8 @@ class ProductQueries(graphene.ObjectType):
     
 
     def resolve_categories(self, info, **kwargs):
-        """Resolve categories list with filtering and sorting"""
-        qs = Category.objects.all()
-
-        # --- 1️⃣ Lọc theo filter ---
-        filter_data = kwargs.get('filter', {})
-        if filter_data:
-            if 'isActive' in filter_data:
-                qs = qs.filter(is_active=filter_data['isActive'])
-            if 'parentId' in filter_data:
-                # parentId = None → danh mục gốc
-                parent_id = filter_data['parentId']
-                if parent_id is None:
-                    qs = qs.filter(parent__isnull=True)
-                else:
-                    qs = qs.filter(parent_id=parent_id)
-            if 'search' in filter_data:
-                qs = qs.filter(name__icontains=filter_data['search'])
-            if 'hasProducts' in filter_data and filter_data['hasProducts']:
-                qs = qs.annotate(product_count=Count('products')).filter(product_count__gt=0)
-
-        # --- 2️⃣ Sắp xếp (sort) ---
-        sort_by = kwargs.get('sortBy', 'name_asc')
-        if sort_by == 'name_asc':
-            qs = qs.order_by('name')
-        elif sort_by == 'name_desc':
-            qs = qs.order_by('-name')
-        elif sort_by == 'created_at_desc':
-            qs = qs.order_by('-created_at')
-        elif sort_by == 'product_count_desc':
-            qs = qs.annotate(product_count=Count('products')).order_by('-product_count')
-
-        return qs
+        """Resolve categories list with filtering and sorting (cache theo filter + sortBy)"""
+        return category_list(kwargs.get('filter', {}), kwargs.get('sortBy', 'name_asc'))
 
     def resolve_product_attributes(self, info, filter=None):
         """Trả về danh sách ProductAttribute (có thể lọc theo tên)"""
@@ -252,6 +283,7 @@ class ProductQueries(graphene.ObjectType):
     
     # ===== PRODUCT RESOLVERS =====
     
+    @cached_resolver('product_detail', tags=lambda product: product_tags(product) if product else ['product'])
     def resolve_product(self, info, id=None, slug=None):
         """Resolve single product by ID or slug, lấy từ qs base annotate"""
         qs = get_base_product_queryset()
@@ -267,6 +299,13 @@ class ProductQueries(graphene.ObjectType):
                 return None
         return None
     
+    def resolve_product_facets(self, info, filter=None):
+        """Facet counts cho tập sản phẩm khớp filter (cache TTL ngắn)"""
+        return compute_product_facets(filter)
+    
+    def resolve_catalog_import(self, info, import_id):
+        return catalog_import_for_user(info.context.user, import_id)
+    
     # ===== PRODUCT VARIANT RESOLVERS =====
     
     def resolve_product_variant(self, info, id=None, sku=None):
@@ -296,12 +335,6 @@ class ProductQueries(graphene.ObjectType):
         sort_by = kwargs.get('sort_by', 'created_at_desc')
         qs = apply_product_sorting(qs, sort_by)
 
-        # Debug: In ra 3 sản phẩm đầu để kiểm tra sort
-        import logging
-        logger = logging.getLogger(__name__)
-        for i, p in enumerate(qs[:3]):
-            logger.info(f"Product {i}: ID={p.product_id}, variant_min_price={getattr(p, 'variant_min_price', 'N/A')}, base_price={p.base_price}")
-
         return qs
     
     def resolve_product_variants(self, info, **kwargs):
@@ -327,51 +360,41 @@ class ProductQueries(graphene.ObjectType):
     
     def resolve_featured_products(self, info, **kwargs):
         """Resolve featured products based on ratings and sales"""
-        first = kwargs.get('first', 20)
-        
         # TODO: Implement proper featured logic based on ratings, sales, etc.
-        # For now, return newest products
-        qs = Product.objects.filter(is_active=True).order_by('-created_at')[:first]
-        return qs
+        # For now, return newest products (KeysetConnectionField cắt trang theo first)
+        return get_base_product_queryset().order_by('-created_at', '-product_id')
     
     def resolve_products_by_seller(self, info, seller_id, **kwargs):
         """Resolve products by specific seller"""
-        qs = Product.objects.filter(
-            store_id=seller_id,
-            is_active=True
-        ).select_related('category', 'store')
-        
-        return qs
+        qs = get_base_product_queryset().filter(store_id=seller_id)
+
+        filter_data = kwargs.get("filter")
+        if filter_data:
+            qs = apply_product_filters(qs, filter_data)
+
+        return qs.order_by('-created_at', '-product_id')
     
     def resolve_products_by_category(self, info, category_id, **kwargs):
         """Resolve products by specific category"""
-        qs = Product.objects.filter(
-            category_id=category_id,
-            is_active=True
-        ).select_related('category', 'store')
-        
-        return qs
+        qs = get_base_product_queryset().filter(category_id=category_id)
+
+        filter_data = kwargs.get("filter")
+        if filter_data:
+            qs = apply_product_filters(qs, filter_data)
+
+        return qs.order_by('-created_at', '-product_id')
     
     # ===== SEARCH RESOLVERS =====
     
     def resolve_search_products(self, info, query, **kwargs):
-        """Full-text search products with relevance ranking"""
-        qs = Product.objects.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query),
-            is_active=True
-        ).select_related('category', 'store')
-        
-        # Boost exact matches for better relevance
-        qs = qs.extra(
-            select={
-                'name_match': "CASE WHEN name ILIKE %s THEN 1 ELSE 0 END",
-            },
-            select_params=[f'%{query}%'],
-            order_by=['-name_match', '-created_at']
-        )
-        
-        return qs
+        """Full-text search (tsvector + GIN, bỏ dấu tiếng Việt) xếp hạng theo ts_rank"""
+        qs = get_base_product_queryset()
+
+        filter_data = kwargs.get("filter")
+        if filter_data:
+            qs = apply_product_filters(qs, filter_data)
+
+        return search_products(qs, query)
 
 
 class ProductMutations(graphene.ObjectType):
@@ -416,6 +439,9 @@ class ProductMutations(graphene.ObjectType):
     bulk_stock_update = BulkStockUpdate.Field()
     bulk_price_update = BulkPriceUpdate.Field()
     bulk_stock_transfer = BulkStockTransfer.Field()
+    
+    # Nhập catalog từ file CSV / XLSX / JSONL (chạy nền)
+    start_catalog_import = StartCatalogImport.Field()
     bulk_product_variant_create = BulkProductVariantCreate.Field()
     bulk_stock_update = BulkStockUpdate.Field()
     bulk_price_update = BulkPriceUpdate.Field()
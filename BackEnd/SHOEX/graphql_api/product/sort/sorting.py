@@ -1,4 +1,5 @@
 import graphene
+from django.db.models import F
 class ProductSortInput(graphene.Enum):
     PRICE_ASC = "price_asc"
     PRICE_DESC = "price_desc"
@@ -7,11 +8,12 @@ class ProductSortInput(graphene.Enum):
     NEWEST = "newest"             # mới nhất
 
 def apply_product_sorting(qs, sort_key):
+    # Sắp xếp theo cột có index của ProductStats (không sort trên aggregate)
     SORT_MAP = {
         "price_asc": "base_price",
         "price_desc": "-base_price",
-        "sales_desc": "-sold_count",
-        "best_selling": "-sold_count_last_30",
+        "sales_desc": F("stats__sold_count").desc(nulls_last=True),
+        "best_selling": F("stats__sold_count_last_30").desc(nulls_last=True),
         "newest": "-created_at",
     }
     
@@ -19,7 +21,5 @@ def apply_product_sorting(qs, sort_key):
     if hasattr(sort_key, 'value'):
         sort_key = sort_key.value
     
-    print(f"Applying sort: {sort_key}")
     sort_field = SORT_MAP.get(sort_key, "-created_at")
-    print(f"Sort field: {sort_field}")
-    return qs.order_by(sort_field)
+    return qs.order_by(sort_field, "-product_id")
@@ -1,5 +1,4 @@
 from discount.models import Voucher
-import json
 import graphene
 from graphene import relay
 from graphene_django import DjangoObjectType
@@ -9,12 +8,18 @@ from products.models import (
     ProductImage
 )
 from brand.models import Brand
+from products.category_tree import get_category_tree
+from products import images as image_pipeline
+from products.variant_matrix import parse_options
     
-from .utils import get_max_discount
+from ..dataloaders.product_loaders import (
+    get_product_loaders, discount_key, prime_product_loaders, prime_variant_loaders
+)
 from django.db.models import Q, Max
 from django.utils import timezone
 from decimal import Decimal
 from graphql_api.brand.type.type import BrandType
+from graphql_api.core.connection import CountableConnection
 # class BrandType(DjangoObjectType):
 #     class Meta:
 #         model = Brand
@@ -67,15 +72,123 @@ class CategoryType(DjangoObjectType):
         return None
     
     def resolve_full_path(self, info):
-        path = [self]  # bắt đầu từ chính category hiện tại
-        parent = self.parent
-        while parent:
-            path.insert(0, parent)  # chèn parent lên đầu danh sách
-            parent = parent.parent
-        return path
+        """Breadcrumb gốc → chính nó, đọc từ cây danh mục cache (không query)"""
+        ancestors = get_category_tree().ancestors(self.category_id, include_self=False)
+        return ancestors + [self]  # kết thúc bằng chính category hiện tại
+
     def resolve_subcategories(self, info):
         """Resolve subcategories - danh mục con"""
-        return self.subcategories.filter(is_active=True).order_by('name')
+        tree = get_category_tree()
+        children = [tree.get(child_id) for child_id in tree.children.get(self.category_id, [])]
+        return sorted((c for c in children if c.is_active), key=lambda c: c.name)
+
+
+def _absolute_url(info, url):
+    try:
+        if info.context:
+            return info.context.build_absolute_uri(url)
+    except Exception:
+        pass
+    return url
+
+
+def _pipeline_image_url(info, obj, size_name):
+    """
+    imageUrl của ProductImage / ProductAttributeOption: cỡ size_name khi asset (products/images.py)
+    đã tạo xong các cỡ, ảnh gốc khi asset còn đang xử lý / ảnh cũ chưa có asset.
+    """
+    asset = obj.asset if obj.asset_id else None
+    if asset is not None and asset.status == 'ready':
+        return _absolute_url(info, image_pipeline.variant_url(asset, size_name))
+    if obj.image and hasattr(obj.image, 'url'):
+        return _absolute_url(info, obj.image.url)
+    return None
+
+
+class ImageVariantType(graphene.ObjectType):
+    """1 cỡ ảnh đã tạo sẵn (JPEG + WebP)"""
+    name = graphene.String()
+    width = graphene.Int()
+    height = graphene.Int()
+    url = graphene.String()
+    webp_url = graphene.String()
+
+
+class ResponsiveImageType(graphene.ObjectType):
+    """Ảnh nhiều cỡ cho <img srcset> / <picture>; chưa tạo xong các cỡ thì trả về ảnh gốc"""
+    ready = graphene.Boolean(description="Đã tạo xong các cỡ")
+    width = graphene.Int(description="Chiều rộng ảnh gốc")
+    height = graphene.Int(description="Chiều cao ảnh gốc")
+    src = graphene.String(
+        size=graphene.String(default_value='detail'),
+        webp=graphene.Boolean(default_value=False),
+        description="URL 1 cỡ (thumbnail, card, detail, zoom)",
+    )
+    srcset = graphene.String(description="srcset JPEG")
+    webp_srcset = graphene.String(description="srcset WebP (None khi chưa có)")
+    variants = graphene.List(ImageVariantType)
+
+    def resolve_ready(self, info):
+        return self.status == 'ready'
+
+    def resolve_src(self, info, size='detail', webp=False):
+        return _absolute_url(info, image_pipeline.variant_url(self, size, 'webp' if webp else 'jpeg'))
+
+    def resolve_srcset(self, info):
+        return image_pipeline.srcset(self, 'jpeg', absolute=lambda url: _absolute_url(info, url))
+
+    def resolve_webp_srcset(self, info):
+        return image_pipeline.srcset(self, 'webp', absolute=lambda url: _absolute_url(info, url))
+
+    def resolve_variants(self, info):
+        variants = sorted(self.derivatives.items(), key=lambda item: item[1]['width'])
+        return [
+            {
+                'name': name,
+                'width': variant['width'],
+                'height': variant['height'],
+                'url': _absolute_url(info, image_pipeline.variant_url(self, name, 'jpeg')),
+                'webp_url': _absolute_url(info, image_pipeline.variant_url(self, name, 'webp')),
+            }
+            for name, variant in variants
+        ]
+
+
+class VariantAxisType(graphene.ObjectType):
+    """1 trục của bộ chọn biến thể (màu, size...)"""
+    name = graphene.String(description="Key trong option_combinations")
+    attribute = graphene.String(description="ProductAttribute.name tương ứng (color, size...)")
+    values = graphene.List(graphene.String, description="Các giá trị theo thứ tự hiển thị")
+
+
+class VariantMatrixEntryType(graphene.ObjectType):
+    """1 kết hợp giá trị = 1 biến thể"""
+    variant_id = graphene.Int()
+    stock = graphene.Int()
+    price = graphene.Decimal()
+    in_stock = graphene.Boolean()
+    options = graphene.List(graphene.Int, description="Chỉ số giá trị theo thứ tự axes (null: biến thể không có trục này)")
+
+
+class VariantMatrixType(graphene.ObjectType):
+    """Ma trận biến thể cho bộ chọn size/màu (products/variant_matrix.py)"""
+    axes = graphene.List(VariantAxisType)
+    variants = graphene.List(VariantMatrixEntryType)
+
+    def resolve_axes(self, info):
+        return self['axes']
+
+    def resolve_variants(self, info):
+        return [
+            {
+                'variant_id': variant_id,
+                'stock': stock,
+                'price': Decimal(price),
+                'in_stock': stock > 0,
+                'options': options,
+            }
+            for variant_id, stock, price, options in self['variants']
+        ]
 
 
 class ProductImageType(DjangoObjectType):
@@ -87,18 +200,14 @@ class ProductImageType(DjangoObjectType):
     
     # Thêm field tùy chỉnh để trả về URL ảnh
     image_url = graphene.String(description="URL của ảnh")
+    responsive = graphene.Field(ResponsiveImageType, description="Ảnh nhiều cỡ (None với ảnh cũ chưa có asset)")
+    
+    def resolve_responsive(self, info):
+        return self.asset
     
     def resolve_image_url(self, info):
-        """Trả về URL của ảnh"""
-        if self.image and hasattr(self.image, 'url'):
-            image_url = self.image.url
-            try:
-                if info.context:
-                    return info.context.build_absolute_uri(image_url)
-            except Exception:
-                pass
-            return image_url
-        return None
+        """URL ảnh cỡ 'detail' (ảnh gốc khi chưa tạo xong các cỡ)"""
+        return _pipeline_image_url(info, self, 'detail')
 
 
 class ProductAttributeType(DjangoObjectType):
@@ -143,18 +252,14 @@ class ProductAttributeOptionType(DjangoObjectType):
     
     # Thêm field tùy chỉnh để trả về URL ảnh
     image_url = graphene.String(description="URL của ảnh tùy chọn")
+    responsive = graphene.Field(ResponsiveImageType, description="Ảnh tùy chọn nhiều cỡ")
+    
+    def resolve_responsive(self, info):
+        return self.asset
     
     def resolve_image_url(self, info):
-        """Trả về URL của ảnh tùy chọn"""
-        if self.image and hasattr(self.image, 'url'):
-            image_url = self.image.url
-            try:
-                if info.context:
-                    return info.context.build_absolute_uri(image_url)
-            except Exception:
-                pass
-            return image_url
-        return None
+        """URL ảnh tùy chọn cỡ 'card' (ảnh gốc khi chưa tạo xong các cỡ)"""
+        return _pipeline_image_url(info, self, 'card')
     
     # Thêm thông tin động
     variant_count = graphene.Int(description="Số variants có tùy chọn này")
@@ -194,51 +299,32 @@ class ProductVariantType(DjangoObjectType):
         """Kiểm tra còn hàng"""
         return self.is_in_stock
     def resolve_discount_percentage(self, info):
-        # Lấy object product
-        product = self.product
-        # Gọi resolver discount của ProductType
-        discount = get_max_discount(product)
-        return discount
+        # Dùng chung loader discount với ProductType (1 batch cho cả trang)
+        return _product_discount(info, self.product)
 
     def resolve_final_price(self, info):
-        discount = Decimal(get_max_discount(self.product))  # convert float -> Decimal
+        discount = Decimal(_product_discount(info, self.product))  # convert float -> Decimal
         return self.price * (Decimal('1.0') - discount / Decimal('100.0'))
     
     def resolve_color_name(self, info):
-        if not self.option_combinations:
-            return None
-
-        # Nếu option_combinations là str, parse nó
-        if isinstance(self.option_combinations, str):
-            try:
-                data = json.loads(self.option_combinations)
-            except json.JSONDecodeError:
-                return None
-        else:
-            data = self.option_combinations
-
-        return data.get("Color") or data.get("Màu Sắc")
+        options = _variant_options(self)
+        return options.get("Color") or options.get("color") or options.get("Màu Sắc")
 
     def resolve_size_name(self, info):
-        if not self.option_combinations:
-            return None
+        options = _variant_options(self)
+        return options.get("Size") or options.get("size")
 
-        if isinstance(self.option_combinations, str):
-            try:
-                data = json.loads(self.option_combinations)
-            except json.JSONDecodeError:
-                return None
-        else:
-            data = self.option_combinations
-
-        return data.get("Size")
-        
     def resolve_color_image_url(self, info):
         """
-        Quan trọng: Gọi property `variant_image` thông minh từ Model.
+        Model.get_variant_image với options/ảnh của product cha đọc qua DataLoader
+        thay vì 2-3 query mỗi variant.
         Đồng thời convert sang Absolute URL (có http://...)
         """
-        image_url = self.variant_image  # Gọi logic từ Model
+        loaders = get_product_loaders(info)
+        image_url = self.get_variant_image(
+            loaders['product_attribute_options_by_product_id_loader'].load(self.product_id),
+            loaders['product_images_by_product_id_loader'].load(self.product_id),
+        )
         if image_url:
             # Nếu chạy trong context request, tạo full domain url
             if info.context:
@@ -257,12 +343,17 @@ class ProductVariantType(DjangoObjectType):
         else:
             return "in_stock"
 
+    @classmethod
+    def prime_loaders(cls, info, nodes):
+        """Gọi bởi KeysetConnectionField sau khi lấy 1 trang variants"""
+        prime_variant_loaders(info, nodes)
+
 
 class ProductType(DjangoObjectType):
     """Sản phẩm chính - Thiết kế theo Shopee/TikTok/Lazada"""
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ('search_vector',)
         interfaces = (relay.Node,)
     
     # ===== GIÁ CẢ & KHUYẾN MÃI =====
@@ -284,6 +375,7 @@ class ProductType(DjangoObjectType):
     available_attributes = graphene.List(ProductAttributeType, description="Các thuộc tính có sẵn")
     color_options = graphene.List(ProductAttributeOptionType, description="Tùy chọn màu sắc")
     size_options = graphene.List(ProductAttributeOptionType, description="Tùy chọn kích thước")
+    variant_matrix = graphene.Field(VariantMatrixType, description="Ma trận biến thể cho bộ chọn size/màu")
     
     # ===== THỐNG KÊ =====
     total_sold = graphene.Int(description="Tổng số đã bán")
@@ -297,6 +389,9 @@ class ProductType(DjangoObjectType):
     
     # ===== TRẠNG THÁI =====
     availability_status = graphene.String(description="Trạng thái hàng")
+
+    # ===== TÌM KIẾM =====
+    search_highlight = graphene.String(description="Đoạn mô tả khớp từ khóa (có thẻ <mark>), chỉ có trong searchProducts")
     
     # ===== THÔNG TIN BỔ SUNG =====
     tags = graphene.List(graphene.String, description="Tags sản phẩm")
@@ -312,95 +407,86 @@ class ProductType(DjangoObjectType):
     def resolve_price_range(self, info):
         """Khoảng giá từ variants"""
         # Sử dụng annotation nếu có, fallback về property
-        min_p = getattr(self, 'variant_min_price', None) or self.min_price
-        max_p = getattr(self, 'variant_max_price', None) or self.max_price
+        min_p, max_p = _price_range(info, self)
         if min_p == max_p:
             return f"{min_p:,.0f}đ"
         return f"{min_p:,.0f}đ - {max_p:,.0f}đ"
     
     def resolve_min_price(self, info):
         """Giá thấp nhất (ưu tiên annotation variant_min_price)"""
-        return getattr(self, 'variant_min_price', None) or self.min_price
+        return _price_range(info, self)[0]
     
     def resolve_max_price(self, info):
         """Giá cao nhất (ưu tiên annotation variant_max_price)"""
-        return getattr(self, 'variant_max_price', None) or self.max_price
+        return _price_range(info, self)[1]
 
 
     def resolve_discount_percentage(self, info):
-        return get_max_discount(self)
+        return _product_discount(info, self)
 
     def resolve_final_price(self, info):
-        discount = Decimal(get_max_discount(self))  # convert float -> Decimal
+        discount = Decimal(_product_discount(info, self))  # convert float -> Decimal
         return self.base_price * (Decimal('1.0') - discount / Decimal('100.0'))
 
     def resolve_has_discount(self, info):
         """Có giảm giá không"""
         # Always use the resolver for discount_percentage, not a model attribute
-        discount = get_max_discount(self)
+        discount = _product_discount(info, self)
         return discount > 0
     
     # ===== HÌNH ẢNH THEO MODEL MỚI =====
     def resolve_gallery_images(self, info):
         """Tất cả ảnh gallery"""
-        return self.gallery_images.all()
+        return _images(info, self)
     
     def resolve_thumbnail_image(self, info):
         """Ảnh đại diện"""
-        return self.gallery_images.filter(is_thumbnail=True).first()
+        return _thumbnail_of(_images(info, self))
     
     def resolve_color_images(self, info):
         """Ảnh theo màu sắc"""
-        return self.attribute_options.filter(
-            attribute__has_image=True,
-            is_available=True
-        )
+        return [o for o in _available_options(info, self) if o.attribute.has_image]
     
     # ===== THUỘC TÍNH & TÙY CHỌN =====
     def resolve_attribute_options(self, info):
         """Tất cả tùy chọn thuộc tính"""
-        return self.attribute_options.filter(is_available=True)
+        return _available_options(info, self)
     
     def resolve_available_attributes(self, info):
         """Các thuộc tính có sẵn"""
-        attribute_ids = self.attribute_options.filter(
-            is_available=True
-        ).values_list('attribute_id', flat=True).distinct()
-        return ProductAttribute.objects.filter(attribute_id__in=attribute_ids)
+        attributes = {}
+        for option in _available_options(info, self):
+            attributes.setdefault(option.attribute_id, option.attribute)
+        return sorted(attributes.values(), key=lambda a: (a.display_order, a.name))
     
     def resolve_color_options(self, info):
         """Tùy chọn màu sắc"""
-        return self.attribute_options.filter(
-            attribute__name='color',
-            is_available=True
-        )
+        return [o for o in _available_options(info, self) if o.attribute.name == 'color']
     
     def resolve_size_options(self, info):
         """Tùy chọn kích thước"""
-        return self.attribute_options.filter(
-            attribute__name='size',
-            is_available=True
-        )
+        return [o for o in _available_options(info, self) if o.attribute.name == 'size']
+
+    def resolve_variant_matrix(self, info):
+        """Ma trận biến thể (ProductStats.variant_matrix, 1 query cho cả trang)"""
+        return _variant_matrix(info, self)
     
     # ===== THỐNG KÊ =====
     def resolve_total_sold(self, info):
         return self.sold_count
     
     def resolve_total_stock(self, info):
-        """Tổng tồn kho (sử dụng property từ model)"""
-        return self.total_stock
+        """Tổng tồn kho (ưu tiên ProductStats, fallback tính từ variants)"""
+        return _total_stock(info, self)
     
     def resolve_variant_count(self, info):
         """Số lượng biến thể"""
-        return self.variants.filter(is_active=True).count()
+        return len(_variants(info, self))
     
     def resolve_available_colors_count(self, info):
         """Số màu có sẵn"""
         # ensure we filter by DB value (lowercase 'color')
-        return self.attribute_options.filter(
-            attribute__name='color',
-            is_available=True
-        ).count()
+        return len(ProductType.resolve_color_options(self, info))
     
     # ===== ĐÁNH GIÁ =====
     def resolve_rating_average(self, info):
@@ -414,20 +500,24 @@ class ProductType(DjangoObjectType):
     # ===== TRẠNG THÁI =====
     def resolve_availability_status(self, info):
         """Trạng thái hàng"""
-        total_stock = self.total_stock
-        if total_stock > 0:
+        if _total_stock(info, self) > 0:
             return "in_stock"
-        elif self.variants.filter(is_active=True).exists():
+        elif _variants(info, self):
             return "out_of_stock"
         else:
             return "unavailable"
     
+    # ===== TÌM KIẾM =====
+    def resolve_search_highlight(self, info):
+        """Annotation search_headline từ products.search.search_products"""
+        return getattr(self, 'search_headline', None)
+
     # ===== THÔNG TIN BỔ SUNG =====
     def resolve_tags(self, info):
         """Tags sản phẩm"""
         tags = [self.category.name, self.brand.name] if self.brand else [self.category.name]
         # Thêm tags từ attributes
-        attributes = self.resolve_available_attributes(info)
+        attributes = ProductType.resolve_available_attributes(self, info)
         for attr in attributes:
             tags.append(attr.name)
         
@@ -441,6 +531,91 @@ class ProductType(DjangoObjectType):
         """Thông tin bảo hành"""
         return "Bảo hành 6 tháng từ nhà sản xuất"
 
+    @classmethod
+    def prime_loaders(cls, info, nodes):
+        """Gọi bởi KeysetConnectionField sau khi lấy 1 trang sản phẩm"""
+        prime_product_loaders(info, nodes)
+
+
+# ===== HELPERS: đọc quan hệ của product qua DataLoader =====
+
+def _product_discount(info, product):
+    return get_product_loaders(info)['product_max_discount_loader'].load(discount_key(product))
+
+
+def _images(info, product):
+    return get_product_loaders(info)['product_images_by_product_id_loader'].load(product.product_id)
+
+
+def _thumbnail_of(images):
+    return next((image for image in images if image.is_thumbnail), None)
+
+
+def _variants(info, product):
+    return get_product_loaders(info)['product_variants_by_product_id_loader'].load(product.product_id)
+
+
+def _available_options(info, product):
+    options = get_product_loaders(info)['product_attribute_options_by_product_id_loader'].load(product.product_id)
+    return [option for option in options if option.is_available]
+
+
+def _price_range(info, product):
+    """(min, max) giá: annotation của get_base_product_queryset, fallback qua loader"""
+    min_p = getattr(product, 'variant_min_price', None)
+    max_p = getattr(product, 'variant_max_price', None)
+    if min_p is None or max_p is None:
+        price_range = get_product_loaders(info)['product_price_range_by_product_id_loader'].load(product.product_id)
+        min_p = price_range['min'] or product.base_price
+        max_p = price_range['max'] or product.base_price
+    return min_p, max_p
+
+
+def _variant_matrix(info, product):
+    stats = product._state.fields_cache.get('stats')
+    if stats is not None and 'variant_matrix' in stats.__dict__ and stats.variant_matrix is not None:
+        return stats.variant_matrix
+    return get_product_loaders(info)['product_variant_matrix_by_product_id_loader'].load(product.product_id)
+
+
+def _variant_options(variant):
+    """option_combinations đã parse (cache trên instance, dùng chung cho mọi field của variant)"""
+    if '_parsed_options' not in variant.__dict__:
+        variant._parsed_options = parse_options(variant.option_combinations)
+    return variant._parsed_options
+
+
+def _total_stock(info, product):
+    stats = getattr(product, 'stats', None) if 'stats' in product._state.fields_cache else None
+    if stats is not None:
+        return stats.total_stock
+    return sum(variant.stock for variant in _variants(info, product))
+
+
+# ===== FACET TYPES (sidebar lọc sản phẩm) =====
+
+class FacetBucketType(graphene.ObjectType):
+    """Một giá trị facet và số sản phẩm khớp"""
+    value = graphene.String(description="Giá trị dùng để lọc (ID / tên)")
+    label = graphene.String(description="Nhãn hiển thị")
+    count = graphene.Int(description="Số sản phẩm")
+
+
+class PriceFacetBucketType(FacetBucketType):
+    """Khoảng giá"""
+    min_price = graphene.Decimal(description="Giá từ")
+    max_price = graphene.Decimal(description="Giá đến (null = không giới hạn)")
+
+
+class ProductFacetsType(graphene.ObjectType):
+    """Số lượng sản phẩm theo từng facet cho tập kết quả hiện tại"""
+    total = graphene.Int(description="Tổng số sản phẩm khớp filter")
+    categories = graphene.List(FacetBucketType, description="Theo danh mục")
+    brands = graphene.List(FacetBucketType, description="Theo thương hiệu")
+    sizes = graphene.List(FacetBucketType, description="Theo size")
+    colors = graphene.List(FacetBucketType, description="Theo màu sắc")
+    price_ranges = graphene.List(PriceFacetBucketType, description="Theo khoảng giá")
+
 
 # ===== INPUT TYPES FOR MUTATIONS =====
 
@@ -582,7 +757,7 @@ class ProductConnection(relay.Connection):
     class Meta:
         node = ProductType
 
-class ProductCountableConnection(relay.Connection):
+class ProductCountableConnection(CountableConnection):
     class Meta:
         node = ProductType
 
@@ -598,6 +773,6 @@ class ProductVariantConnection(relay.Connection):
     class Meta:
         node = ProductVariantType
 
-class ProductVariantCountableConnection(relay.Connection):
+class ProductVariantCountableConnection(CountableConnection):
     class Meta:
         node = ProductVariantType
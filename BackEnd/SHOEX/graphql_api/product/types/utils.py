@@ -4,24 +4,19 @@ from django.utils import timezone
 from discount.models import Voucher
 from django.db.models import Q
 
-def get_max_discount(product):
-    today = timezone.now().date()
-    vouchers = Voucher.objects.filter(
-        Q(voucher_products__product=product) |
-        Q(voucher_categories__category=product.category) |
-        Q(voucher_stores__store=product.store),
-        is_active=True,
-        start_date__lte=today,
-        end_date__gte=today
-    ).distinct()
 
+def compute_max_discount(base_price, vouchers):
+    """
+    % giảm giá cao nhất từ danh sách (discount_type, discount_value)
+    Dùng chung cho get_max_discount và ProductMaxDiscountLoader
+    """
     max_discount = Decimal('0.0')
-    for v in vouchers:
-        if v.discount_type == 'percent':
-            discount = v.discount_value
+    for discount_type, discount_value in vouchers:
+        if discount_type == 'percent':
+            discount = discount_value
         else:  # fixed amount
-            if product.base_price > 0:
-                discount = (v.discount_value / product.base_price) * 100
+            if base_price > 0:
+                discount = (discount_value / base_price) * 100
             else:
                 discount = Decimal('0.0')
 
@@ -32,3 +27,20 @@ def get_max_discount(product):
     max_discount = max_discount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
     return float(max_discount)
+
+
+def get_max_discount(product):
+    today = timezone.now().date()
+    vouchers = Voucher.objects.filter(
+        Q(voucher_products__product=product) |
+        Q(voucher_categories__category=product.category) |
+        Q(voucher_stores__store=product.store),
+        is_active=True,
+        start_date__lte=today,
+        end_date__gte=today
+    ).distinct()
+
+    return compute_max_discount(
+        product.base_price,
+        ((v.discount_type, v.discount_value) for v in vouchers)
+    )
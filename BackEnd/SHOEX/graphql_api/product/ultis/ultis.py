@@ -1,6 +1,6 @@
 from datetime import timedelta
 from django.utils import timezone
-from django.db.models import Sum, Avg, Q, Case, When, Value, BooleanField, Min, Max, DecimalField, F
+from django.db.models import Q, Case, When, Value, BooleanField, DecimalField, F, IntegerField, FloatField
 from django.db.models.functions import Coalesce
 from products.models import Product
 
@@ -9,26 +9,25 @@ DAYS_FOR_NEW = 30
 HOT_SOLD_THRESHOLD = 50
 
 def get_base_product_queryset():
+    """
+    Queryset gốc cho listing/detail sản phẩm.
+    Các chỉ số (sold_count, avg_rating, min/max price...) đọc từ read model ProductStats
+    (1 JOIN theo khóa chính) thay vì SUM/AVG/MIN/MAX qua variants → order_items → reviews.
+    """
     thirty_days_ago = timezone.now() - timedelta(days=DAYS_FOR_NEW)
 
     qs = Product.objects.filter(is_active=True)\
-        .select_related("category", "store", "brand")\
+        .select_related("category", "store", "brand", "stats")\
+        .defer("search_vector", "stats__variant_matrix")\
         .prefetch_related("variants", "attribute_options")\
         .annotate(
-            sold_count=Coalesce(Sum('variants__order_items__quantity'), 0),
-            sold_count_last_30=Coalesce(
-                Sum(
-                    'variants__order_items__quantity',
-                    filter=Q(variants__order_items__order__created_at__gte=thirty_days_ago)
-                ), 0
-            ),
-            avg_rating=Coalesce(
-                Avg('variants__order_items__reviews__rating'), 0.0
-            )
+            sold_count=Coalesce(F('stats__sold_count'), 0, output_field=IntegerField()),
+            sold_count_last_30=Coalesce(F('stats__sold_count_last_30'), 0, output_field=IntegerField()),
+            avg_rating=Coalesce(F('stats__avg_rating'), 0.0, output_field=FloatField())
         )\
         .annotate(
             is_hot=Case(
-                When(sold_count_last_30__gte=HOT_SOLD_THRESHOLD, then=Value(True)),
+                When(stats__sold_count_last_30__gte=HOT_SOLD_THRESHOLD, then=Value(True)),
                 default=Value(False),
                 output_field=BooleanField()
             ),
@@ -39,16 +38,16 @@ def get_base_product_queryset():
             )
         )\
         .annotate(
-            # Annotate min/max price từ variants để có thể sort
+            # min/max price từ variants active (đã tính sẵn trong ProductStats)
             variant_min_price=Coalesce(
-                Min('variants__price', filter=Q(variants__is_active=True)),
+                F('stats__min_price'),
                 F('base_price'),
                 output_field=DecimalField()
             ),
             variant_max_price=Coalesce(
-                Max('variants__price', filter=Q(variants__is_active=True)),
+                F('stats__max_price'),
                 F('base_price'),
                 output_field=DecimalField()
             )
         )
-    return qs
\ No newline at end of file
+    return qs
@@ -1,4 +1,3 @@
-from graphql_api.order.ultis.updateStatusOrder import update_status_for_suborder
 import graphene
 from decimal import Decimal
 
@@ -7,6 +6,8 @@ from django.db import transaction
 from settlements.models import Settlement, SettlementItem
 from store.models import Store
 from orders.models import SubOrder
+from jobs.models import Job
+from shipments.tasks import enqueue_status_refresh
 
 
 class CreateSettlement(graphene.Mutation):
@@ -18,7 +19,6 @@ class CreateSettlement(graphene.Mutation):
     status = graphene.String()
 
     @classmethod
-    @transaction.atomic
     def mutate(cls, root, info, store_id):
         # 1. Lấy store
         try:
@@ -36,13 +36,14 @@ class CreateSettlement(graphene.Mutation):
                 # settlement_item__isnull=True,
             )
         )
-        for s in sub_orders:
-                try:
-                    update_status_for_suborder(s.sub_order_id)
-                except Exception:
-                    # ignore errors to avoid blocking the API response
-                    pass
+        # Trạng thái đang lưu được dùng ngay; đồng bộ GHTK (bắt hoàn hàng sau khi giao) chạy nền, ưu tiên cao
+        enqueue_status_refresh(sub_orders.values_list('sub_order_id', flat=True), priority=Job.PRIORITY_HIGH)
 
+        with transaction.atomic():
+            return cls._create_settlement(store, sub_orders.all())
+
+    @classmethod
+    def _create_settlement(cls, store, sub_orders):
         if not sub_orders.exists():
             raise Exception("Không có đơn hàng nào đủ điều kiện rút tiền")
 
@@ -1,4 +1,4 @@
-from .ultis.callAPI_ghtk import calculate_ghtk_fee
+from shipments.fee_quotes import get_fee_quote
 import graphene
 from .type.inputType import ShippingFeeResult, ExtraFeeType,ShippingFeeInput
 from store.models import AddressStore
@@ -11,7 +11,6 @@ class ShipmentQuery(graphene.ObjectType):
 
     def resolve_calculateShippingFee(self, info, input):
         user = info.context.user
-        print(input)
         if not user or not user.is_authenticated:
             raise Exception("Authentication required")
 
@@ -53,13 +52,11 @@ class ShipmentQuery(graphene.ObjectType):
         }
 
         try:
-            # Debug: log payload sent to GHTK
-            print('GHTK fee calculation payload:', payload)
-            result = calculate_ghtk_fee(**payload)
+            # Báo giá qua cache (shipments/fee_quotes.py); chỉ gọi GHTK khi chưa có trong cache
+            result = get_fee_quote(**payload)
         except Exception as e:
             # Raise a clearer error including provider message for easier debugging
             msg = str(e)
-            print('GHTK call failed:', msg)
             raise Exception(f"GHTK error when calculating fee: {msg}")
 
         return ShippingFeeResult(
@@ -1,5 +1,5 @@
-import requests
-from django.conf import settings
+from address.normalize import canonical_place
+from shipments.carrier import get_ghtk_client
 
 
 def calculate_ghtk_fee(
@@ -23,13 +23,9 @@ def calculate_ghtk_fee(
     """
     Gọi API tính phí GHTK
     """
-
-    url = f"{settings.GHTK_BASE_URL}/services/shipment/fee"
-
-    headers = {
-        "Token": settings.GHTK_API_TOKEN,
-        "X-Client-Source": settings.GHTK_PARTNER_CODE,
-    }
+    # Tên tỉnh / phường chuẩn theo danh mục → GHTK nhận đúng địa danh, không phải thử lại
+    pick_province, pick_ward = canonical_place(pick_province, pick_ward)
+    province, ward = canonical_place(province, ward)
 
     params = {
         "pick_address_id": pick_address_id,
@@ -55,15 +51,8 @@ def calculate_ghtk_fee(
     if tags:
         params["tags"] = tags
 
-    response = requests.get(url, headers=headers, params=params, timeout=10)
-
-    if response.status_code != 200:
-        raise Exception(f"GHTK HTTP error {response.status_code}")
-
-    data = response.json()
-
-    if not data.get("success"):
-        raise Exception(f"GHTK error: {data.get('message')}")
+    # Raise CarrierError (HTTP / nghiệp vụ) hoặc CarrierUnavailable (timeout, circuit mở)
+    data = get_ghtk_client().calculate_fee(params)
 
     fee = data["fee"]
 
@@ -84,7 +73,6 @@ def calculate_ghtk_fee(
     total_fee = base_fee + insurance_fee + sum(
         ef["amount"] for ef in extra_fees
     )
-    print(fee.get("delivery"))
     return {
         "name": fee.get("name"),
         "base_fee": base_fee,
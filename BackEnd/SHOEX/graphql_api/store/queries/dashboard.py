@@ -1,10 +1,10 @@
 import graphene
-from datetime import datetime, timedelta
+from datetime import timedelta
 from decimal import Decimal
-from django.db.models import Sum, Count, Q
 from django.utils import timezone
 
-from store.models import Store
+from store import rollups
+from store.models import Store, StoreAnalytics
 from orders.models import SubOrder
 from products.models import Product
 
@@ -55,35 +55,37 @@ class StoreDashboardQuery(graphene.ObjectType):
         except Store.DoesNotExist:
             return None
 
-        # Calculate date range
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
+        # Khoảng ngày (theo lịch, gồm hôm nay)
+        end_day = timezone.localdate()
+        start_day = end_day - timedelta(days=days - 1)
 
-        # SubOrders in date range
-        suborders_in_range = SubOrder.objects.filter(
-            store=store,
-            created_at__gte=start_date,
-            created_at__lte=end_date
-        )
+        # Rollup theo ngày của store (store/rollups.py): 1 dòng / ngày có đơn
+        daily = {
+            row.date: row
+            for row in StoreAnalytics.objects.filter(
+                store=store,
+                date__gte=start_day,
+                date__lte=end_day
+            )
+        }
 
         # === METRICS ===
         # Total revenue: sum of (subtotal + shipping_fee) for completed suborders
-        revenue_qs = suborders_in_range.filter(
-            shipment__status='completed'
-        ).aggregate(
-            total=Sum('subtotal'),
-            shipping=Sum('shipping_fee')
-        )
-        total_revenue = Decimal(str(revenue_qs['total'] or 0)) + Decimal(str(revenue_qs['shipping'] or 0))
+        total_revenue = sum((row.completed_revenue for row in daily.values()), Decimal('0'))
 
         # Total orders count
-        total_orders = suborders_in_range.count()
+        total_orders = sum(row.orders for row in daily.values())
 
         # Total products
         total_products = Product.objects.filter(store=store, is_active=True).count()
 
         # Total unique customers (distinct buyer from orders)
-        total_customers = suborders_in_range.values('order__buyer').distinct().count()
+        range_start, range_end = rollups.day_bounds(start_day, end_day)
+        total_customers = SubOrder.objects.filter(
+            store=store,
+            created_at__gte=range_start,
+            created_at__lt=range_end
+        ).values('order__buyer').distinct().count()
 
         metrics = StoreDashboardMetricsType(
             total_revenue_7d=total_revenue,
@@ -98,20 +100,8 @@ class StoreDashboardQuery(graphene.ObjectType):
         weekday_labels = ['CN', 'T2', 'T3', 'T4', 'T5', 'T6', 'T7']
         
         for i in range(days):
-            day_date = (start_date + timedelta(days=i)).date()
-            day_end = datetime.combine(day_date, datetime.max.time())
-            day_start = datetime.combine(day_date, datetime.min.time())
-            
-            day_revenue_qs = SubOrder.objects.filter(
-                store=store,
-                created_at__gte=timezone.make_aware(day_start),
-                created_at__lte=timezone.make_aware(day_end),
-                shipment__status='completed'
-            ).aggregate(
-                total=Sum('subtotal'),
-                shipping=Sum('shipping_fee')
-            )
-            day_revenue = Decimal(str(day_revenue_qs['total'] or 0)) + Decimal(str(day_revenue_qs['shipping'] or 0))
+            day_date = start_day + timedelta(days=i)
+            row = daily.get(day_date)
             
             # Label: T2, T3, ... CN
             weekday_idx = day_date.weekday()
@@ -120,7 +110,7 @@ class StoreDashboardQuery(graphene.ObjectType):
             revenue_by_day.append(DailyRevenueType(
                 date=day_date,
                 label=label,
-                value=day_revenue
+                value=row.completed_revenue if row else Decimal('0')
             ))
 
         # Orders by shipment status
@@ -133,9 +123,14 @@ class StoreDashboardQuery(graphene.ObjectType):
             'returned': ('Trả hàng', '#EF4444'),
         }
 
+        status_counts = {}
+        for row in daily.values():
+            for status, count in row.status_counts.items():
+                status_counts[status] = status_counts.get(status, 0) + count
+
         orders_by_status = []
         for status, (label_vi, color) in status_mapping.items():
-            count = suborders_in_range.filter(shipment__status=status).count()
+            count = status_counts.get(status, 0)
             if count > 0:  # Only include statuses with orders
                 orders_by_status.append(OrderStatusCountType(
                     status=status,
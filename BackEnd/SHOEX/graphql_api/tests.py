@@ -0,0 +1,157 @@
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from caching import cache
+from graphql_api.api import schema
+from graphql_api.core.persisted_queries import get_document, load_manifest, query_hash
+from orders.models import Order, SubOrder, OrderItem
+from products.models import Category, Product, ProductVariant
+from store.models import Store, StoreUser
+from users.models import User
+
+QUERY = 'query Ping { __typename }'
+
+
+def _extensions(query):
+    return json.dumps({'persistedQuery': {'version': 1, 'sha256Hash': query_hash(query)}})
+
+
+@override_settings(GRAPHQL_RESPONSE_CACHE_ENABLED=False)
+class PersistedQueryTest(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        cache.reset_cache()
+        load_manifest.cache_clear()
+        self.addCleanup(load_manifest.cache_clear)
+
+    def _get(self, **params):
+        return self.client.get('/graphql/', params, HTTP_ACCEPT='application/json')
+
+    def test_automatic_registration(self):
+        response = self._get(extensions=_extensions(QUERY))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['errors'][0]['message'], 'PersistedQueryNotFound')
+
+        response = self.client.post(
+            '/graphql/', {'query': QUERY, 'extensions': {'persistedQuery': {'version': 1, 'sha256Hash': query_hash(QUERY)}}},
+            content_type='application/json', HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.json(), {'data': {'__typename': 'Query'}})
+
+        hits = get_document.cache_info().hits
+        self.assertEqual(self._get(extensions=_extensions(QUERY)).json(), {'data': {'__typename': 'Query'}})
+        self.assertGreater(get_document.cache_info().hits, hits)
+
+        mismatch = self._get(query='{ __typename }', extensions=_extensions(QUERY))
+        self.assertEqual(mismatch.status_code, 400)
+
+    def test_allow_list(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp, 'api.ts')
+            source.write_text(
+                f'const ping = `{QUERY}`;\n'
+                'const login = `mutation { login(input: {username: "${u}"}) { success } }`;\n'
+                'const broken = `query { noSuchField }`;\n',
+                encoding='utf-8',
+            )
+            manifest = Path(tmp, 'persisted_queries.json')
+            call_command('extract_persisted_queries', tmp, output=str(manifest), stdout=StringIO(), stderr=StringIO())
+            self.assertEqual(json.loads(manifest.read_text(encoding='utf-8')), {query_hash(QUERY): QUERY})
+
+            with override_settings(GRAPHQL_PERSISTED_QUERIES_ONLY=True, GRAPHQL_PERSISTED_QUERIES_FILE=str(manifest)):
+                load_manifest.cache_clear()
+                self.assertEqual(self._get(extensions=_extensions(QUERY)).json(), {'data': {'__typename': 'Query'}})
+                self.assertEqual(self._get(query=QUERY).json(), {'data': {'__typename': 'Query'}})
+                self.assertEqual(self._get(query='{ __typename }').status_code, 403)
+
+
+class AdminListTest(TestCase):
+    """Danh sách admin phân trang keyset, số liệu từng dòng tính trong cùng query"""
+
+    USERS = """
+    query($first: Int, $after: String, $filter: AdminUserFilterInput) {
+      adminUsersConnection(first: $first, after: $after, filter: $filter) {
+        totalCount
+        edges { node { name role orders spending storeName } }
+        pageInfo { hasNextPage endCursor }
+      }
+    }
+    """
+    ORDERS = """
+    query($first: Int) {
+      adminOrdersConnection(first: $first) { edges { node { id customer store products total } } }
+    }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.store = Store.objects.create(
+            store_id='admin-store', name='Admin Store', slug='admin-store', email='admin-store@example.com', join_date=now,
+        )
+        users = {}
+        for offset, username in enumerate(['staff', 'seller', 'buyer', 'newbie']):
+            users[username] = User.objects.create(
+                username=username, email=f'{username}@example.com', date_joined=now - timedelta(days=10 - offset),
+                is_staff=username == 'staff',
+            )
+        StoreUser.objects.create(store=cls.store, user=users['seller'], role='owner', status='active')
+
+        product = Product.objects.create(
+            store=cls.store, category=Category.objects.create(name='Giày'), name='Giày admin', description='d', base_price=100000,
+        )
+        variant = ProductVariant.objects.create(
+            product=product, sku='ADMIN-40', price=Decimal('50000'), stock=10, option_combinations={'Size': '40'},
+        )
+        for total, quantities in ((Decimal('100000'), (1, 1)), (Decimal('50000'), (1,))):
+            order = Order.objects.create(buyer=users['buyer'], total_amount=total)
+            sub_order = SubOrder.objects.create(order=order, store=cls.store, subtotal=total)
+            for quantity in quantities:
+                OrderItem.objects.create(
+                    order=order, sub_order=sub_order, variant=variant, quantity=quantity, price_at_order=Decimal('50000'),
+                )
+
+    def _execute(self, query, **variables):
+        result = schema.execute(query, variables=variables, context_value=RequestFactory().get('/graphql/'))
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def test_users_are_paged_with_row_stats(self):
+        data = self._execute(self.USERS, first=1, filter={'role': 'customer'})['adminUsersConnection']
+        self.assertEqual(data['totalCount'], 2)
+        self.assertEqual(data['edges'][0]['node'], {'name': 'newbie', 'role': 'customer', 'orders': 0, 'spending': 0.0, 'storeName': ''})
+        self.assertTrue(data['pageInfo']['hasNextPage'])
+
+        data = self._execute(self.USERS, first=1, after=data['pageInfo']['endCursor'], filter={'role': 'customer'})['adminUsersConnection']
+        self.assertEqual(data['edges'][0]['node'], {'name': 'buyer', 'role': 'customer', 'orders': 2, 'spending': 150000.0, 'storeName': ''})
+        self.assertFalse(data['pageInfo']['hasNextPage'])
+
+        roles = {edge['node']['name']: edge['node']['role'] for edge in self._execute(self.USERS, first=10)['adminUsersConnection']['edges']}
+        self.assertEqual(roles, {'newbie': 'customer', 'buyer': 'customer', 'seller': 'seller', 'staff': 'admin'})
+
+    def test_page_query_count_does_not_grow_with_rows(self):
+        for query in (self.USERS, self.ORDERS):
+            caches['default'].clear()  # totalCount được cache theo SQL
+            with CaptureQueriesContext(connection) as one:
+                self._execute(query, first=1)
+            caches['default'].clear()
+            with CaptureQueriesContext(connection) as many:
+                data = self._execute(query, first=10)
+            self.assertEqual(len(many), len(one), query)
+
+        nodes = [edge['node'] for edge in data['adminOrdersConnection']['edges']]
+        self.assertEqual([(n['customer'], n['store'], n['products'], n['total']) for n in nodes], [
+            ('buyer', 'Admin Store', 1, 50000.0),
+            ('buyer', 'Admin Store', 2, 100000.0),
+        ])
@@ -0,0 +1,25 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('job_id', 'task', 'status', 'priority', 'attempts', 'max_attempts', 'run_at', 'finished_at', 'created_at')
+    list_filter = ('status', 'task', 'priority')
+    search_fields = ('job_id', 'task', 'dedup_key')
+    readonly_fields = ('locked_at', 'locked_by', 'last_error', 'finished_at', 'created_at')
+    ordering = ('-created_at',)
+    actions = ['retry_now']
+
+    @admin.action(description='Chạy lại ngay các job đã chọn')
+    def retry_now(self, request, queryset):
+        active_keys = Job.objects.filter(status__in=Job.ACTIVE_STATUSES, dedup_key__isnull=False).values('dedup_key')
+        now = timezone.now()
+        count = queryset.filter(status=Job.QUEUED).update(run_at=now)
+        # Job đã xong/thất bại: bỏ qua nếu đã có job khác cùng khóa đang chờ
+        count += queryset.filter(status__in=[Job.DONE, Job.FAILED]).exclude(dedup_key__in=active_keys).update(
+            status=Job.QUEUED, run_at=now, attempts=0, finished_at=None,
+        )
+        self.message_user(request, f'Đã đưa {count} job vào hàng đợi')
@@ -0,0 +1,64 @@
+"""
+Worker chạy job nền (jobs/queue.py)
+Chạy: python manage.py run_jobs
+      python manage.py run_jobs --once          # chạy hết job tới hạn rồi thoát (cron / test)
+      python manage.py run_jobs --task shipments.refresh_status --batch 20
+
+Có thể chạy nhiều worker song song: mỗi worker claim job bằng FOR UPDATE SKIP LOCKED.
+Dừng bằng Ctrl+C / SIGTERM: worker chạy xong batch hiện tại rồi thoát.
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs import queue
+
+PURGE_EVERY_SECONDS = 600
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Chạy hết job tới hạn rồi thoát')
+        parser.add_argument('--batch', type=int, default=10, help='Số job claim mỗi lần')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Số giây nghỉ khi hàng đợi trống')
+        parser.add_argument('--task', action='append', dest='tasks', help='Chỉ chạy task này (lặp lại được)')
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        worker = queue.worker_name()
+        self.stdout.write(f'Worker {worker} started')
+        counts = {}
+        last_maintenance = 0
+
+        while not self._stopping:
+            if time.monotonic() - last_maintenance >= PURGE_EVERY_SECONDS:
+                queue.requeue_stale()
+                queue.purge_finished()
+                last_maintenance = time.monotonic()
+
+            jobs = queue.claim(options['batch'], worker=worker, tasks=options['tasks'])
+            for job in jobs:
+                status = queue.run_job(job)
+                counts[status] = counts.get(status, 0) + 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'  {job.task}#{job.job_id}: {status}')
+
+            if not jobs:
+                if options['once']:
+                    break
+                close_old_connections()
+                time.sleep(options['sleep'])
+
+        summary = ', '.join(f'{status}={count}' for status, count in sorted(counts.items())) or 'no jobs'
+        self.stdout.write(f'Worker {worker} stopped ({summary})')
+
+    def _stop(self, signum, frame):
+        self._stopping = True
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('job_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('task', models.CharField(help_text='Tên đăng ký bằng @task trong <app>/tasks.py', max_length=100, verbose_name='Tên task')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Tham số')),
+                ('dedup_key', models.CharField(blank=True, help_text='Chỉ có 1 job đang chờ/đang chạy cho mỗi khóa', max_length=200, null=True, verbose_name='Khóa chống trùng')),
+                ('priority', models.SmallIntegerField(default=5, help_text='Số nhỏ chạy trước', verbose_name='Độ ưu tiên')),
+                ('status', models.CharField(choices=[('queued', 'Chờ chạy'), ('running', 'Đang chạy'), ('done', 'Hoàn thành'), ('failed', 'Thất bại')], default='queued', max_length=10, verbose_name='Trạng thái')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Số lần đã chạy')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='Số lần chạy tối đa')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Chạy từ lúc')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Bắt đầu chạy lúc')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100, verbose_name='Worker')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Lỗi gần nhất')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Kết thúc lúc')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Job nền',
+                'verbose_name_plural': 'Job nền',
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['priority', 'run_at'], name='job_queue_idx'), models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('dedup_key',), name='job_active_dedup_key_uniq')],
+            },
+        ),
+    ]
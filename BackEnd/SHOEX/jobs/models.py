@@ -0,0 +1,86 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Job nền lưu trong DB, worker (manage.py run_jobs) lấy theo
+    priority (số nhỏ chạy trước) rồi run_at bằng SELECT ... FOR UPDATE SKIP LOCKED
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Chờ chạy'),
+        (RUNNING, 'Đang chạy'),
+        (DONE, 'Hoàn thành'),
+        (FAILED, 'Thất bại'),
+    ]
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    PRIORITY_HIGH = 0
+    PRIORITY_NORMAL = 5
+    PRIORITY_LOW = 9
+
+    job_id = models.BigAutoField(primary_key=True)
+    task = models.CharField(
+        max_length=100,
+        verbose_name="Tên task",
+        help_text="Tên đăng ký bằng @task trong <app>/tasks.py"
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Tham số"
+    )
+    dedup_key = models.CharField(
+        max_length=200,
+        blank=True,
+        null=True,
+        verbose_name="Khóa chống trùng",
+        help_text="Chỉ có 1 job đang chờ/đang chạy cho mỗi khóa"
+    )
+    priority = models.SmallIntegerField(
+        default=PRIORITY_NORMAL,
+        verbose_name="Độ ưu tiên",
+        help_text="Số nhỏ chạy trước"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        verbose_name="Trạng thái"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Số lần đã chạy")
+    max_attempts = models.PositiveSmallIntegerField(default=5, verbose_name="Số lần chạy tối đa")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Chạy từ lúc")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Bắt đầu chạy lúc")
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name="Worker")
+    last_error = models.TextField(blank=True, default='', verbose_name="Lỗi gần nhất")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Kết thúc lúc")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Job nền"
+        verbose_name_plural = "Job nền"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='job_active_dedup_key_uniq',
+            ),
+        ]
+        indexes = [
+            # Hàng đợi: chỉ index job đang chờ
+            models.Index(
+                fields=['priority', 'run_at'],
+                condition=models.Q(status='queued'),
+                name='job_queue_idx',
+            ),
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task}#{self.job_id} ({self.status})"
@@ -0,0 +1,205 @@
+"""
+Hàng đợi job nền lưu trong DB (Postgres)
+
+Khai báo task trong <app>/tasks.py:
+
+    @task('shipments.refresh_status', max_attempts=5)
+    def refresh_status(sub_order_id):
+        ...
+
+Đưa vào hàng đợi (trong transaction thì job chỉ hiện ra khi commit):
+
+    enqueue('shipments.refresh_status', {'sub_order_id': 1},
+            dedup_key='shipment-status:1', priority=Job.PRIORITY_HIGH)
+
+- dedup_key: đã có job cùng khóa đang chờ/đang chạy → bỏ qua (ON CONFLICT DO NOTHING)
+- Lỗi → chạy lại sau backoff (10s, 20s, 40s... tối đa 1 giờ) cho tới max_attempts
+- Task raise RetryLater(delay=...) → hẹn chạy lại sau delay giây
+- Hết max_attempts → gọi handler đăng ký bằng @<task>.on_failure (error, **payload), VD đánh dấu bản ghi lỗi
+- Worker: manage.py run_jobs (chạy nhiều process song song được)
+"""
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+# Job 'running' quá lâu (worker chết giữa chừng) → đưa lại vào hàng đợi
+STALE_AFTER = timedelta(minutes=10)
+
+_registry = {}
+
+
+class RetryLater(Exception):
+    """Task chưa chạy được lúc này (hãng lỗi, circuit mở...): hẹn chạy lại"""
+
+    def __init__(self, message='', delay=None):
+        super().__init__(message)
+        self.delay = delay
+
+
+class Task:
+    def __init__(self, name, func, priority, max_attempts):
+        self.name = name
+        self.func = func
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.failure_handler = None
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, payload=None, **kwargs):
+        kwargs.setdefault('priority', self.priority)
+        return enqueue(self.name, payload, **kwargs)
+
+    def on_failure(self, handler):
+        """Decorator: handler(error, **payload) chạy khi job thất bại hẳn (hết số lần thử)"""
+        self.failure_handler = handler
+        return handler
+
+
+def task(name, priority=Job.PRIORITY_NORMAL, max_attempts=5):
+    """Đăng ký hàm làm task; payload (dict) được truyền vào dưới dạng keyword arguments"""
+    def decorator(func):
+        registered = Task(name, func, priority, max_attempts)
+        _registry[name] = registered
+        return registered
+    return decorator
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def _job(name, payload, dedup_key, priority, delay, now):
+    registered = _registry.get(name)
+    if registered is None:
+        raise ValueError(f"Task chưa được đăng ký: {name}")
+    return Job(
+        task=name,
+        payload=payload or {},
+        dedup_key=dedup_key,
+        priority=registered.priority if priority is None else priority,
+        max_attempts=registered.max_attempts,
+        run_at=now + timedelta(seconds=delay),
+        created_at=now,
+    )
+
+
+def enqueue(name, payload=None, *, dedup_key=None, priority=None, delay=0):
+    """Thêm 1 job; trả về job_id, hoặc None nếu trùng dedup_key với job đang chờ/đang chạy"""
+    ids = enqueue_many(name, [(payload, dedup_key)], priority=priority, delay=delay)
+    return ids[0] if ids else None
+
+
+def enqueue_many(name, items, *, priority=None, delay=0):
+    """
+    Thêm nhiều job cùng task trong 1 query.
+    items: list (payload, dedup_key). Trả về job_id của các job được thêm (bỏ qua job trùng khóa)
+    """
+    now = timezone.now()
+    jobs = [_job(name, payload, dedup_key, priority, delay, now) for payload, dedup_key in items]
+    if not jobs:
+        return []
+
+    fields = [f for f in Job._meta.concrete_fields if not f.primary_key]
+    values = [f.get_db_prep_save(getattr(job, f.attname), connection) for job in jobs for f in fields]
+    columns = ', '.join(f.column for f in fields)
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(jobs))
+    # ON CONFLICT không chỉ định cột: áp dụng cho unique index một phần job_active_dedup_key_uniq
+    sql = (
+        f"INSERT INTO {Job._meta.db_table} ({columns}) VALUES {placeholders} "
+        f"ON CONFLICT DO NOTHING RETURNING {Job._meta.pk.column}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, values)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def requeue_stale(now=None):
+    now = now or timezone.now()
+    count = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - STALE_AFTER).update(
+        status=Job.QUEUED, locked_at=None, locked_by='', run_at=now,
+    )
+    if count:
+        logger.warning('Requeued %s stale job(s)', count)
+    return count
+
+
+def claim(batch_size=10, worker=None, tasks=None):
+    """Lấy tối đa batch_size job tới hạn, đánh dấu running; các worker khác bỏ qua dòng đang khóa"""
+    now = timezone.now()
+    with transaction.atomic():
+        qs = Job.objects.select_for_update(skip_locked=True).filter(status=Job.QUEUED, run_at__lte=now)
+        if tasks:
+            qs = qs.filter(task__in=tasks)
+        jobs = list(qs.order_by('priority', 'run_at', 'job_id')[:batch_size])
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.RUNNING, locked_at=now, locked_by=worker or worker_name(),
+                attempts=F('attempts') + 1,
+            )
+    for job in jobs:
+        job.status = Job.RUNNING
+        job.attempts += 1
+    return jobs
+
+
+def _backoff(attempts):
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def run_job(job):
+    """Chạy 1 job đã claim; trả về trạng thái mới"""
+    registered = _registry.get(job.task)
+    try:
+        if registered is None:
+            raise LookupError(f"Task chưa được đăng ký: {job.task}")
+        registered.func(**job.payload)
+    except Exception as e:
+        now = timezone.now()
+        error = traceback.format_exc() if not isinstance(e, RetryLater) else f"RetryLater: {e}"
+        retry = registered is not None and job.attempts < job.max_attempts
+        if retry:
+            delay = e.delay if isinstance(e, RetryLater) and e.delay is not None else _backoff(job.attempts)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, run_at=now + timedelta(seconds=delay),
+                locked_at=None, locked_by='', last_error=error,
+            )
+            logger.info('Job %s failed (attempt %s), retry in %.0fs: %s', job, job.attempts, delay, e)
+            return Job.QUEUED
+        Job.objects.filter(pk=job.pk).update(status=Job.FAILED, finished_at=now, last_error=error)
+        logger.error('Job %s failed permanently after %s attempt(s): %s', job, job.attempts, e)
+        if registered is not None and registered.failure_handler is not None:
+            try:
+                registered.failure_handler(e, **job.payload)
+            except Exception:
+                logger.exception('Failure handler of job %s failed', job)
+        return Job.FAILED
+
+    Job.objects.filter(pk=job.pk).update(status=Job.DONE, finished_at=timezone.now())
+    return Job.DONE
+
+
+def purge_finished(older_than=timedelta(days=1), failed_older_than=timedelta(days=7)):
+    now = timezone.now()
+    done, _ = Job.objects.filter(status=Job.DONE, finished_at__lt=now - older_than).delete()
+    failed, _ = Job.objects.filter(status=Job.FAILED, finished_at__lt=now - failed_older_than).delete()
+    return done + failed
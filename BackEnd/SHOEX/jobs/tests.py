@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import task, enqueue, enqueue_many, claim, run_job, requeue_stale, RetryLater
+
+calls = []
+
+
+@task('tests.record', max_attempts=3)
+def record(value, fail=None):
+    calls.append(value)
+    if fail == 'error':
+        raise ValueError('boom')
+    if fail == 'later':
+        raise RetryLater('carrier down', delay=120)
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_dedup_key_skips_active_duplicates(self):
+        first = enqueue('tests.record', {'value': 1}, dedup_key='k1')
+        self.assertIsNotNone(first)
+        self.assertIsNone(enqueue('tests.record', {'value': 1}, dedup_key='k1'))
+
+        ids = enqueue_many('tests.record', [({'value': 1}, 'k1'), ({'value': 2}, 'k2'), ({'value': 3}, None)])
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(Job.objects.count(), 3)
+
+        # Job xong rồi thì khóa được dùng lại
+        Job.objects.filter(pk=first).update(status=Job.DONE)
+        self.assertIsNotNone(enqueue('tests.record', {'value': 1}, dedup_key='k1'))
+
+    def test_claims_by_priority_then_run_at(self):
+        enqueue('tests.record', {'value': 'low'}, priority=Job.PRIORITY_LOW)
+        enqueue('tests.record', {'value': 'normal'})
+        enqueue('tests.record', {'value': 'high'}, priority=Job.PRIORITY_HIGH)
+        enqueue('tests.record', {'value': 'later'}, priority=Job.PRIORITY_HIGH, delay=60)
+
+        for job in claim(batch_size=10, worker='test'):
+            self.assertEqual(run_job(job), Job.DONE)
+
+        self.assertEqual(calls, ['high', 'normal', 'low'])
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+        self.assertEqual(claim(worker='test'), [])
+
+    def test_failure_backs_off_then_fails_after_max_attempts(self):
+        job_id = enqueue('tests.record', {'value': 1, 'fail': 'error'})
+
+        for attempt in range(1, 4):
+            Job.objects.filter(pk=job_id).update(run_at=timezone.now())
+            [job] = claim(worker='test')
+            status = run_job(job)
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+            if attempt < 3:
+                self.assertEqual(status, Job.QUEUED)
+                self.assertGreater(job.run_at, timezone.now())
+                self.assertIn('ValueError: boom', job.last_error)
+
+        self.assertEqual(status, Job.FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retry_later_uses_requested_delay(self):
+        job_id = enqueue('tests.record', {'value': 1, 'fail': 'later'})
+        [job] = claim(worker='test')
+        self.assertEqual(run_job(job), Job.QUEUED)
+
+        job = Job.objects.get(pk=job_id)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=110))
+        self.assertEqual(job.last_error, 'RetryLater: carrier down')
+
+    def test_stale_running_job_is_requeued(self):
+        job_id = enqueue('tests.record', {'value': 1})
+        claim(worker='dead')
+        Job.objects.filter(pk=job_id).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale(), 1)
+        [job] = claim(worker='test')
+        self.assertEqual(job.attempts, 2)
@@ -0,0 +1,275 @@
+"""
+Báo giá checkout trong 1 lần gọi: tiền hàng + voucher + phí ship cho mọi cửa hàng trong giỏ
+
+- Dòng giỏ hàng (giá hiện tại, khối lượng, store) lấy bằng 1 query
+- Địa chỉ lấy hàng mặc định của mọi store: 1 query; voucher theo mã: 1 query (+ lượt dùng của user)
+- Báo giá GHTK cho từng store chạy song song (shipments.fee_quotes, có cache) với 1 deadline chung
+  → giỏ 5 cửa hàng tốn ~1 RTT tới GHTK thay vì 5
+- Store nào lỗi / quá hạn chỉ bị đánh dấu lỗi trong kết quả, không làm hỏng cả báo giá
+"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from cart.models import CartItem
+from discount.models import Voucher, UserVoucher
+from shipments.carrier import CarrierError
+from shipments.fee_quotes import get_fee_quote
+from store.models import AddressStore
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class CheckoutQuoteError(Exception):
+    """Giỏ hàng / địa chỉ không dùng được để báo giá"""
+
+
+def _get_executor():
+    """Pool dùng chung cho mọi request: số request song song tới GHTK có giới hạn"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CHECKOUT_QUOTE_WORKERS, thread_name_prefix='checkout-quote',
+            )
+        return _executor
+
+
+# ===== GIỎ HÀNG =====
+
+def load_store_groups(cart):
+    """
+    {store_id: {'store_name', 'items_total', 'weight', 'product_ids', 'category_ids'}} theo thứ tự
+    thêm vào giỏ; giá / khối lượng lấy từ variant hiện tại (giống place_order).
+    """
+    rows = CartItem.objects.filter(
+        cart=cart, variant__is_active=True,
+    ).order_by('item_id').values_list(
+        'quantity', 'variant__price', 'variant__weight',
+        'variant__product_id', 'variant__product__category_id',
+        'variant__product__store_id', 'variant__product__store__name',
+    )
+
+    groups = OrderedDict()
+    for quantity, price, weight, product_id, category_id, store_id, store_name in rows:
+        group = groups.setdefault(store_id, {
+            'store_name': store_name, 'items_total': ZERO, 'weight': ZERO,
+            'product_ids': set(), 'category_ids': set(),
+        })
+        group['items_total'] += price * quantity
+        group['weight'] += (weight or ZERO) * quantity
+        group['product_ids'].add(product_id)
+        group['category_ids'].add(category_id)
+    return groups
+
+
+# ===== VOUCHER =====
+
+def _voucher_scope(voucher, groups):
+    """Các store mà voucher áp dụng được"""
+    store_ids = {link.store_id for link in voucher.voucher_stores.all()}
+    product_ids = {link.product_id for link in voucher.voucher_products.all()}
+    category_ids = {link.category_id for link in voucher.voucher_categories.all()}
+    if not (store_ids or product_ids or category_ids):
+        # Voucher platform không giới hạn → cả giỏ; voucher store phải gắn với store cụ thể
+        return list(groups) if voucher.type == 'platform' else []
+    return [
+        store_id for store_id, group in groups.items()
+        if store_id in store_ids
+        or group['product_ids'] & product_ids
+        or group['category_ids'] & category_ids
+    ]
+
+
+def evaluate_vouchers(user, codes, groups):
+    """
+    Kiểm tra mã voucher với giỏ hàng.
+    Trả về list dict theo thứ tự mã: code, voucher, applied, message, scope (store_ids), discount.
+    Với voucher freeship, discount được tính sau khi có phí ship (apply_shipping_vouchers).
+    """
+    codes = list(dict.fromkeys(code.strip() for code in codes or [] if code and code.strip()))
+    if not codes:
+        return []
+
+    today = timezone.now().date()
+    vouchers = {
+        voucher.code: voucher
+        for voucher in Voucher.objects.filter(code__in=codes)
+        .prefetch_related('voucher_stores', 'voucher_products', 'voucher_categories')
+    }
+    used_counts = dict(
+        UserVoucher.objects.filter(user=user, voucher__code__in=codes)
+        .values_list('voucher__code', 'used_count')
+    )
+
+    results = []
+    for code in codes:
+        voucher = vouchers.get(code)
+        result = {'code': code, 'voucher': voucher, 'applied': False, 'message': None,
+                  'scope': [], 'discount': ZERO, 'shipping_discount': ZERO}
+        results.append(result)
+
+        if voucher is None:
+            result['message'] = 'Voucher không tồn tại'
+            continue
+        if not voucher.is_active or not (voucher.start_date <= today <= voucher.end_date):
+            result['message'] = 'Voucher đã hết hạn hoặc chưa bắt đầu'
+            continue
+        # usage_limit là số lượt còn lại (UseVoucher / place_order trừ dần mỗi lần dùng)
+        if voucher.usage_limit is not None and voucher.usage_limit <= 0:
+            result['message'] = 'Voucher đã hết lượt sử dụng'
+            continue
+        if used_counts.get(code, 0) >= voucher.per_user_limit:
+            result['message'] = 'Bạn đã dùng hết lượt của voucher này'
+            continue
+
+        scope = _voucher_scope(voucher, groups)
+        scope_total = sum((groups[store_id]['items_total'] for store_id in scope), ZERO)
+        if not scope:
+            result['message'] = 'Voucher không áp dụng cho sản phẩm trong giỏ'
+            continue
+        if scope_total < voucher.min_order_amount:
+            result['message'] = f'Đơn tối thiểu {voucher.min_order_amount:,.0f}đ'
+            continue
+
+        result['applied'] = True
+        result['scope'] = scope
+        if voucher.discount_type == 'percent':
+            discount = (scope_total * voucher.discount_value / 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+            if voucher.max_discount:
+                discount = min(discount, voucher.max_discount)
+            result['discount'] = min(discount, scope_total)
+        elif voucher.discount_type == 'fixed':
+            result['discount'] = min(voucher.discount_value, scope_total)
+    return results
+
+
+def apply_shipping_vouchers(voucher_results, store_quotes):
+    """Voucher freeship: giảm phí ship của các store trong phạm vi (tối đa discount_value nếu > 0)"""
+    for result in voucher_results:
+        voucher = result['voucher']
+        if not result['applied'] or voucher.discount_type != 'freeship':
+            continue
+        shipping = sum((store_quotes[store_id]['shipping_fee'] for store_id in result['scope']), ZERO)
+        cap = voucher.discount_value if voucher.discount_value > 0 else shipping
+        result['shipping_discount'] = min(shipping, cap)
+
+
+# ===== PHÍ SHIP =====
+
+def _fee_params(pick_address, to_address, group):
+    return {
+        'pick_address_id': str(pick_address.address_id),
+        'pick_address': pick_address.detail,
+        'pick_province': pick_address.province,
+        'pick_ward': pick_address.ward,
+        'pick_street': pick_address.hamlet or '',
+        'address': to_address.detail,
+        'province': to_address.province,
+        'ward': to_address.ward,
+        'street': to_address.hamlet or '',
+        'weight': float(group['weight']),
+        'value': int(group['items_total']),
+    }
+
+
+def _quote_in_thread(params):
+    try:
+        return get_fee_quote(**params)
+    finally:
+        # Thread của pool có kết nối DB riêng (job làm mới báo giá cũ) → trả lại ngay
+        connection.close()
+
+
+def quote_shipping(groups, to_address, timeout=None):
+    """
+    Báo giá GHTK song song cho mọi store; chờ tối đa `timeout` giây tính từ lúc gửi.
+    Trả về {store_id: {'quote': dict | None, 'shipping_fee': Decimal, 'error': str | None}}
+    """
+    timeout = settings.CHECKOUT_QUOTE_TIMEOUT if timeout is None else timeout
+    pick_addresses = {
+        address.store_id: address
+        for address in AddressStore.objects.filter(store_id__in=list(groups), is_default=True)
+    }
+
+    results, futures = {}, {}
+    executor = _get_executor()
+    for store_id, group in groups.items():
+        pick_address = pick_addresses.get(store_id)
+        if pick_address is None:
+            results[store_id] = {'quote': None, 'shipping_fee': ZERO, 'error': 'Cửa hàng chưa có địa chỉ lấy hàng'}
+            continue
+        futures[executor.submit(_quote_in_thread, _fee_params(pick_address, to_address, group))] = store_id
+
+    done, _ = wait(futures, timeout=timeout)
+    for future, store_id in futures.items():
+        if future not in done:
+            # Không hủy được request đang chạy; kết quả của nó vẫn vào cache cho lần sau
+            future.cancel()
+            results[store_id] = {'quote': None, 'shipping_fee': ZERO, 'error': 'Hết thời gian chờ báo giá'}
+            continue
+        try:
+            quote = future.result()
+        except CarrierError as e:
+            results[store_id] = {'quote': None, 'shipping_fee': ZERO, 'error': str(e)}
+            continue
+        except Exception:
+            logger.exception('Fee quote failed for store %s', store_id)
+            results[store_id] = {'quote': None, 'shipping_fee': ZERO, 'error': 'Không tính được phí ship'}
+            continue
+        if not quote['delivery_supported']:
+            results[store_id] = {'quote': quote, 'shipping_fee': ZERO, 'error': 'GHTK không hỗ trợ giao tới địa chỉ này'}
+        else:
+            results[store_id] = {'quote': quote, 'shipping_fee': Decimal(quote['total_fee']), 'error': None}
+    return results
+
+
+# ===== TỔNG HỢP =====
+
+def build_checkout_quote(*, user, cart, address, voucher_codes=None, timeout=None):
+    """Báo giá đầy đủ cho trang checkout (dict; xem graphql_api/cart CheckoutQuoteType)"""
+    groups = load_store_groups(cart)
+    if not groups:
+        raise CheckoutQuoteError('Giỏ hàng trống')
+
+    voucher_results = evaluate_vouchers(user, voucher_codes, groups)
+    store_quotes = quote_shipping(groups, address, timeout=timeout)
+    apply_shipping_vouchers(voucher_results, store_quotes)
+
+    items_total = sum((group['items_total'] for group in groups.values()), ZERO)
+    shipping_total = sum((quote['shipping_fee'] for quote in store_quotes.values()), ZERO)
+    # Tổng giảm không vượt quá tiền hàng / phí ship
+    discount_total = min(items_total, sum((r['discount'] for r in voucher_results), ZERO))
+    shipping_discount = min(shipping_total, sum((r['shipping_discount'] for r in voucher_results), ZERO))
+
+    stores = [
+        {
+            'store_id': store_id,
+            'store_name': group['store_name'],
+            'items_total': group['items_total'],
+            'weight': group['weight'],
+            **store_quotes[store_id],
+        }
+        for store_id, group in groups.items()
+    ]
+    return {
+        'stores': stores,
+        'vouchers': voucher_results,
+        'items_total': items_total,
+        'shipping_total': shipping_total,
+        'discount_total': discount_total,
+        'shipping_discount': shipping_discount,
+        'grand_total': items_total + shipping_total - discount_total - shipping_discount,
+        'complete': all(store['error'] is None for store in stores),
+    }
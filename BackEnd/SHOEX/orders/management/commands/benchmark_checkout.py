@@ -0,0 +1,135 @@
+"""
+Benchmark đặt hàng đồng thời trên cùng 1 SKU (flash sale)
+Chạy: python manage.py benchmark_checkout --buyers 20 --checkouts 25 --stock 300
+
+Tạo dữ liệu tạm (store / product / variant / buyers có prefix "bench-"), cho nhiều thread
+cùng gọi orders.reservation.place_order, in ra số checkout/giây và kiểm tra không bán vượt kho.
+Dữ liệu tạm bị xóa khi kết thúc (trừ khi có --keep). Cần PostgreSQL.
+"""
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, close_old_connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from orders.models import Order
+from orders.reservation import place_order, OutOfStockError
+from products.models import Category, Product, ProductVariant
+from store.models import Store
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent checkouts of a single SKU'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=20, help='Số thread mua đồng thời')
+        parser.add_argument('--checkouts', type=int, default=25, help='Số lần đặt hàng mỗi buyer')
+        parser.add_argument('--stock', type=int, default=300, help='Tồn kho ban đầu của SKU')
+        parser.add_argument('--quantity', type=int, default=1, help='Số lượng mỗi đơn')
+        parser.add_argument('--keep', action='store_true', help='Giữ lại dữ liệu benchmark')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_checkout cần PostgreSQL (SELECT ... FOR UPDATE)')
+
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        store, variant, buyers = self._setup(tag, options)
+        try:
+            stats = self._run(store, variant, buyers, options)
+            self._report(variant, options, stats)
+        finally:
+            if not options['keep']:
+                self._cleanup(tag, store, buyers)
+
+    def _setup(self, tag, options):
+        store = Store.objects.create(
+            store_id=tag, name=tag, slug=tag, email=f'{tag}@example.com', join_date=timezone.now()
+        )
+        category = Category.objects.create(name=tag)
+        product = Product.objects.create(
+            store=store, category=category, name=tag, description=tag, base_price=Decimal('100000')
+        )
+        variant = ProductVariant.objects.create(
+            product=product, sku=tag, price=Decimal('100000'), stock=options['stock'],
+            option_combinations={'Size': '42'}
+        )
+        buyers = [
+            User.objects.create(username=f'{tag}-{i}', email=f'{tag}-{i}@example.com')
+            for i in range(options['buyers'])
+        ]
+        return store, variant, buyers
+
+    def _run(self, store, variant, buyers, options):
+        results = {'ok': 0, 'out_of_stock': 0, 'error': 0}
+        latencies = []
+        lock = threading.Lock()
+        start_gate = threading.Barrier(len(buyers))
+
+        def buyer_loop(user):
+            close_old_connections()
+            start_gate.wait()
+            try:
+                for _ in range(options['checkouts']):
+                    begin = time.perf_counter()
+                    try:
+                        place_order(
+                            user=user, address=None, payment_method='cod', shipping_fee=Decimal('0'),
+                            sub_orders=[{
+                                'store_id': store.store_id,
+                                'shipping_fee': Decimal('0'),
+                                'items': [(variant.variant_id, options['quantity'])],
+                            }],
+                        )
+                        outcome = 'ok'
+                    except OutOfStockError:
+                        outcome = 'out_of_stock'
+                    except Exception as e:  # lỗi thật (deadlock, ...) được đếm riêng
+                        self.stderr.write(f'{user.username}: {e}')
+                        outcome = 'error'
+                    with lock:
+                        results[outcome] += 1
+                        latencies.append(time.perf_counter() - begin)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer_loop, args=(user,)) for user in buyers]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results['elapsed'] = time.perf_counter() - began
+        results['latencies'] = sorted(latencies)
+        return results
+
+    def _report(self, variant, options, stats):
+        variant.refresh_from_db(fields=['stock'])
+        sold = variant.order_items.aggregate(total=Sum('quantity'))['total'] or 0
+        latencies = stats['latencies']
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+        expected_stock = options['stock'] - stats['ok'] * options['quantity']
+        self.stdout.write(f"buyers={options['buyers']} checkouts/buyer={options['checkouts']} stock={options['stock']}")
+        self.stdout.write(
+            f"ok={stats['ok']} out_of_stock={stats['out_of_stock']} errors={stats['error']} "
+            f"elapsed={stats['elapsed']:.2f}s"
+        )
+        self.stdout.write(f"throughput={stats['ok'] / stats['elapsed']:.1f} checkouts/s "
+                          f"p50={pct(0.5):.1f}ms p95={pct(0.95):.1f}ms p99={pct(0.99):.1f}ms")
+        if variant.stock != expected_stock or variant.stock < 0 or sold != options['stock'] - variant.stock:
+            raise CommandError(f'Stock mismatch: stock={variant.stock} expected={expected_stock} sold={sold}')
+        self.stdout.write(self.style.SUCCESS(f'Stock consistent: {variant.stock} left, no overselling'))
+
+    def _cleanup(self, tag, store, buyers):
+        Order.objects.filter(buyer__in=buyers).delete()
+        Product.objects.filter(store=store).delete()
+        Category.objects.filter(name=tag).delete()
+        store.delete()
+        User.objects.filter(pk__in=[u.pk for u in buyers]).delete()
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('address', '0004_address_name'),
+        ('orders', '0008_order_address'),
+        ('store', '0005_sales_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suborder',
+            index=models.Index(fields=['store', 'created_at'], name='suborder_store_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suborder',
+            index=models.Index(fields=['created_at'], name='suborder_created_at_idx'),
+        ),
+    ]
@@ -50,6 +50,9 @@ class Order(models.Model):
         verbose_name = "Đơn hàng"
         verbose_name_plural = "Đơn hàng"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='order_created_at_idx'),
+        ]
         
     def __str__(self):
         return f"Order #{self.order_id} - {self.buyer.email}"
@@ -100,7 +103,11 @@ class SubOrder(models.Model):
     class Meta:
         verbose_name = "Đơn hàng con"
         verbose_name_plural = "Đơn hàng con"
-        
+        indexes = [
+            models.Index(fields=['store', 'created_at'], name='suborder_store_created_idx'),
+            models.Index(fields=['created_at'], name='suborder_created_at_idx'),
+        ]
+
     def __str__(self):
         return f"SubOrder #{self.sub_order_id} - {self.store.name}"
 
@@ -0,0 +1,270 @@
+"""
+Giữ kho + tạo đơn hàng trong 1 transaction ngắn
+
+- Khóa tất cả variants của giỏ bằng 1 câu SELECT ... FOR UPDATE, sắp theo variant_id
+  (mọi checkout khóa theo cùng thứ tự → không deadlock khi 2 giỏ chứa cùng SKU)
+- Trừ kho bằng 1 câu UPDATE ... WHERE stock >= qty cho cả giỏ
+- Giá / subtotal tính lại từ DB, không tin giá client gửi lên
+- Voucher khóa + kiểm tra trong cùng transaction (luật của orders.checkout_quote),
+  giảm giá trừ vào total_amount / Payment, lượt dùng ghi nhận như UseVoucher
+- SubOrder, OrderItem, Shipment tạo bằng bulk_create
+"""
+from collections import OrderedDict, defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from discount.models import Voucher, UserVoucher, OrderVoucher
+from products.models import ProductVariant
+from products import stats
+from shipments.models import Shipment
+from store.models import Store
+from payments.models import Payment
+from .checkout_quote import evaluate_vouchers, apply_shipping_vouchers
+from .models import Order, SubOrder, OrderItem
+
+
+class ReservationError(Exception):
+    """Giỏ hàng không hợp lệ (variant không tồn tại, sai store, số lượng <= 0...)"""
+
+
+class OutOfStockError(ReservationError):
+    def __init__(self, shortages):
+        # shortages: [(sku, requested, available)]
+        self.shortages = shortages
+        skus = ', '.join(sku for sku, _, _ in shortages)
+        super().__init__(f"Out of stock: {skus}")
+
+
+def _merge_quantities(sub_orders):
+    """{variant_id: tổng quantity}; 1 SKU có thể xuất hiện nhiều lần trong input"""
+    quantities = {}
+    for sub in sub_orders:
+        for variant_id, quantity in sub['items']:
+            if quantity <= 0:
+                raise ReservationError(f"Invalid quantity for variant {variant_id}")
+            quantities[variant_id] = quantities.get(variant_id, 0) + quantity
+    return quantities
+
+
+def lock_variants(variant_ids):
+    """SELECT ... FOR UPDATE toàn bộ variants, thứ tự variant_id cố định"""
+    return ProductVariant.objects.select_for_update(of=('self',)).filter(
+        variant_id__in=variant_ids,
+        is_active=True,
+    ).annotate(
+        store_id=F('product__store_id'),
+        category_id=F('product__category_id'),
+    ).order_by('variant_id').in_bulk(field_name='variant_id')
+
+
+def decrement_stock(quantities):
+    """
+    Trừ kho cả giỏ trong 1 câu UPDATE có điều kiện stock >= qty.
+    Trả về tập variant_id đã trừ được.
+    """
+    if not quantities:
+        return set()
+    table = ProductVariant._meta.db_table
+    rows = ', '.join(['(%s, %s)'] * len(quantities))
+    params = [value for item in sorted(quantities.items()) for value in item]
+    sql = f"""
+        UPDATE {table} AS v
+        SET stock = v.stock - r.qty
+        FROM (VALUES {rows}) AS r(variant_id, qty)
+        WHERE v.variant_id = r.variant_id AND v.stock >= r.qty
+        RETURNING v.variant_id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def reserve_vouchers(user, codes, groups, shipping_fees):
+    """
+    Khóa voucher theo mã (SELECT ... FOR UPDATE, thứ tự voucher_id) rồi kiểm tra với giỏ như báo giá checkout.
+    groups: {store_id: {'items_total', 'product_ids', 'category_ids'}}; shipping_fees: {store_id: phí ship}
+    Trả về kết quả evaluate_vouchers (đã tính freeship); mã nào không dùng được → ReservationError.
+    """
+    codes = [code for code in codes or [] if code and code.strip()]
+    if not codes:
+        return []
+    list(Voucher.objects.select_for_update().filter(code__in=[c.strip() for c in codes]).order_by('voucher_id'))
+
+    results = evaluate_vouchers(user, codes, groups)
+    rejected = [r for r in results if not r['applied']]
+    if rejected:
+        raise ReservationError('; '.join(f"{r['code']}: {r['message']}" for r in rejected))
+    apply_shipping_vouchers(results, {store_id: {'shipping_fee': fee} for store_id, fee in shipping_fees.items()})
+    return results
+
+
+def record_voucher_usage(user, order, voucher_results):
+    """OrderVoucher + used_count của user + usage_limit còn lại (giống UseVoucher)"""
+    for result in voucher_results:
+        voucher = result['voucher']
+        OrderVoucher.objects.create(
+            order=order, voucher=voucher, discount_amount=result['discount'] + result['shipping_discount'],
+        )
+        user_voucher, _ = UserVoucher.objects.get_or_create(user=user, voucher=voucher)
+        UserVoucher.objects.filter(pk=user_voucher.pk).update(used_count=F('used_count') + 1)
+        Voucher.objects.filter(pk=voucher.pk, usage_limit__gt=0).update(usage_limit=F('usage_limit') - 1)
+
+
+def _split(amount, weights, into):
+    """Chia amount cho các store theo tỉ lệ weights ({store_id: Decimal}), store cuối nhận phần lẻ"""
+    total = sum(weights.values(), Decimal('0'))
+    if not amount or not total:
+        return
+    remaining = amount
+    store_ids = list(weights)
+    for store_id in store_ids[:-1]:
+        share = (amount * weights[store_id] / total).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+        into[store_id] += share
+        remaining -= share
+    into[store_ids[-1]] += remaining
+
+
+def place_order(*, user, address, payment_method, shipping_fee, sub_orders, voucher_codes=None):
+    """
+    Tạo Order + SubOrder + OrderItem + Shipment + Payment và trừ kho.
+
+    sub_orders: [{'store_id', 'shipping_fee', 'items': [(variant_id, quantity)]}], mỗi store 1 phần tử
+    voucher_codes: mã voucher áp dụng cho đơn (giảm giá trừ vào total_amount / Payment)
+    Raise ReservationError / OutOfStockError (transaction được rollback).
+    """
+    quantities = _merge_quantities(sub_orders)
+    if not quantities:
+        raise ReservationError("Order has no items")
+    # Giảm giá voucher / tiền thu hộ tính theo store: 1 store 2 SubOrder sẽ bị trừ giảm giá 2 lần
+    store_ids = [sub['store_id'] for sub in sub_orders]
+    duplicated = sorted({store_id for store_id in store_ids if store_ids.count(store_id) > 1})
+    if duplicated:
+        raise ReservationError(f"Duplicate store in sub orders: {', '.join(map(str, duplicated))}")
+
+    with transaction.atomic():
+        variants = lock_variants(sorted(quantities))
+        missing = [variant_id for variant_id in quantities if variant_id not in variants]
+        if missing:
+            raise ReservationError(f"Variant not found: {', '.join(map(str, missing))}")
+
+        shortages = [
+            (variants[variant_id].sku, quantity, variants[variant_id].stock)
+            for variant_id, quantity in quantities.items()
+            if variants[variant_id].stock < quantity
+        ]
+        if shortages:
+            raise OutOfStockError(shortages)
+
+        store_ids = {sub['store_id'] for sub in sub_orders}
+        stores = Store.objects.in_bulk(store_ids, field_name='store_id')
+        if len(stores) != len(store_ids):
+            raise ReservationError("Store not found")
+
+        # Tính tiền phía server: giá hiện tại của variant
+        plans = []
+        for sub in sub_orders:
+            lines = OrderedDict()
+            for variant_id, quantity in sub['items']:
+                variant = variants[variant_id]
+                if variant.store_id != sub['store_id']:
+                    raise ReservationError(f"Variant {variant.sku} does not belong to store {sub['store_id']}")
+                lines[variant_id] = lines.get(variant_id, 0) + quantity
+            subtotal = sum((variants[v].price * q for v, q in lines.items()), Decimal('0'))
+            weight = sum((variants[v].weight * q for v, q in lines.items()), Decimal('0'))
+            plans.append((stores[sub['store_id']], Decimal(sub['shipping_fee']), lines, subtotal, weight))
+
+        # Voucher: cùng luật với báo giá checkout, áp dụng trên giá vừa tính lại
+        groups = {}
+        for store, _, lines, subtotal, _ in plans:
+            group = groups.setdefault(store.store_id, {'items_total': Decimal('0'), 'product_ids': set(), 'category_ids': set()})
+            group['items_total'] += subtotal
+            group['product_ids'].update(variants[v].product_id for v in lines)
+            group['category_ids'].update(variants[v].category_id for v in lines)
+        store_fees = defaultdict(Decimal)
+        for store, fee, _, _, _ in plans:
+            store_fees[store.store_id] += fee
+        voucher_results = reserve_vouchers(user, voucher_codes, groups, store_fees)
+
+        # Trừ kho (rows đã khóa nên điều kiện stock >= qty chỉ là chốt chặn cuối)
+        decremented = decrement_stock(quantities)
+        if len(decremented) != len(quantities):
+            failed = [variants[v] for v in quantities if v not in decremented]
+            raise OutOfStockError([(v.sku, quantities[v.variant_id], v.stock) for v in failed])
+
+        items_total = sum((subtotal for _, _, _, subtotal, _ in plans), Decimal('0'))
+        # Tổng giảm không vượt quá tiền hàng / phí ship (như build_checkout_quote)
+        discount_total = min(items_total, sum((r['discount'] for r in voucher_results), Decimal('0')))
+        shipping_discount = min(Decimal(shipping_fee), sum((r['shipping_discount'] for r in voucher_results), Decimal('0')))
+        total_amount = items_total + Decimal(shipping_fee) - discount_total - shipping_discount
+
+        # Phần giảm của từng store → tiền thu hộ (pick_money) của shipment
+        store_discounts = defaultdict(Decimal)
+        for result in voucher_results:
+            _split(result['discount'], {s: groups[s]['items_total'] for s in result['scope']}, store_discounts)
+            _split(result['shipping_discount'], {s: store_fees[s] for s in result['scope']}, store_discounts)
+        order = Order.objects.create(
+            buyer=user,
+            total_amount=total_amount,
+            shipping_fee=shipping_fee,
+            address=address,
+        )
+
+        created_subs = SubOrder.objects.bulk_create([
+            SubOrder(order=order, store=store, shipping_fee=fee, subtotal=subtotal)
+            for store, fee, _, subtotal, _ in plans
+        ])
+
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                sub_order=sub_order,
+                variant=variants[variant_id],
+                quantity=quantity,
+                price_at_order=variants[variant_id].price,
+            )
+            for sub_order, (_, _, lines, _, _) in zip(created_subs, plans)
+            for variant_id, quantity in lines.items()
+        ])
+
+        # Shipment cho từng store (pending_confirmation)
+        Shipment.objects.bulk_create([
+            Shipment(
+                user=user,
+                sub_order=sub_order,
+                store=store,
+                pick_money=max(sub_order.shipping_fee + sub_order.subtotal - store_discounts[store.store_id], Decimal('0')),
+                value=sub_order.subtotal,
+                transport='road ',
+                status='pending',  # nội bộ người bán xử lý
+                total_weight=weight,
+            )
+            for sub_order, (store, _, _, _, weight) in zip(created_subs, plans)
+        ])
+
+        record_voucher_usage(user, order, voucher_results)
+
+        # Payment (1 payment / order)
+        Payment.objects.create(
+            order=order,
+            user=user,
+            payment_method=payment_method,
+            amount=total_amount,
+            status='pending',
+        )
+
+        # bulk_create / UPDATE không bắn signal → tự cập nhật ProductStats sau commit
+        sold = {}
+        for variant_id, quantity in quantities.items():
+            product_id = variants[variant_id].product_id
+            sold[product_id] = sold.get(product_id, 0) + quantity
+        transaction.on_commit(lambda: _refresh_stats_after_order(sold))
+
+    return order
+
+
+def _refresh_stats_after_order(sold):
+    for product_id, quantity in sold.items():
+        stats.record_sale(product_id, quantity)
+    stats.refresh_product_stats(list(sold), fields=stats.VARIANT_FIELDS)
@@ -1,3 +1,204 @@
+import threading
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import unquote_plus
+
 from django.test import TestCase
+from django.utils import timezone
+
+from address.models import Address
+from cart.models import Cart, CartItem
+from discount.models import Voucher, VoucherStore, OrderVoucher, UserVoucher
+from payments.models import Payment
+from products.models import Category, Product, ProductVariant
+from shipments.testing import FakeGHTKMixin
+from store.models import Store, AddressStore
+from users.models import User
+from .checkout_quote import build_checkout_quote
+from .models import Order
+from .reservation import place_order, ReservationError
+
+
+class CheckoutQuoteTest(FakeGHTKMixin, TestCase):
+    PROVINCES = ['Hà Nội', 'Đà Nẵng', 'Cần Thơ']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='buyer', email='buyer@example.com')
+        cls.address = Address.objects.create(
+            user=cls.user, province='TP. Hồ Chí Minh', ward='Phường Sài Gòn', detail='2 Nguyễn Huệ', is_default=True,
+        )
+        category = Category.objects.create(name='Giày')
+        cls.cart = Cart.objects.create(user=cls.user)
+        cls.stores = []
+        for index, province in enumerate(cls.PROVINCES):
+            store = Store.objects.create(
+                store_id=f'store{index}', name=f'Store {index}', slug=f'store-{index}',
+                email=f'store{index}@example.com', join_date=timezone.now(),
+            )
+            AddressStore.objects.create(store=store, province=province, ward='Phường 1', detail='1 Lê Lợi', is_default=True)
+            product = Product.objects.create(
+                store=store, category=category, name=f'Giày {index}', description='d', base_price=200000,
+            )
+            variant = ProductVariant.objects.create(
+                product=product, sku=uuid.uuid4().hex[:10], price=Decimal('150000'), stock=10,
+                weight=Decimal('0.4'), option_combinations={'Size': '40'},
+            )
+            CartItem.objects.create(cart=cls.cart, variant=variant, quantity=2)
+            cls.stores.append(store)
+
+    def _voucher(self, code, discount_type, value, **kwargs):
+        today = timezone.now().date()
+        return Voucher.objects.create(
+            code=code, type=kwargs.pop('type', 'platform'), discount_type=discount_type, discount_value=value,
+            start_date=today - timedelta(days=1), end_date=today + timedelta(days=1), **kwargs,
+        )
+
+    def test_store_quotes_are_fetched_concurrently(self):
+        # GHTK giả chỉ trả lời khi cả 3 request cùng đang chờ: báo giá tuần tự sẽ lỗi ở store đầu tiên
+        arrived, lock, all_arrived = [], threading.Lock(), threading.Event()
+
+        def responder(path):
+            with lock:
+                arrived.append(path)
+                if len(arrived) == len(self.PROVINCES):
+                    all_arrived.set()
+            return None if all_arrived.wait(10) else (500, {'success': False})
+
+        self.fake.responder = responder
+        quote = build_checkout_quote(user=self.user, cart=self.cart, address=self.address, timeout=30)
+
+        self.assertEqual(len(self.fake.requests), 3)
+        self.assertTrue(quote['complete'])
+        self.assertEqual(quote['items_total'], Decimal('900000'))
+        self.assertEqual(quote['shipping_total'], Decimal('90000'))
+        self.assertEqual(quote['grand_total'], Decimal('990000'))
+        # Khối lượng 2 x 0.4kg, giá trị 300.000đ của từng store gửi đúng lên GHTK
+        self.assertTrue(all('weight=1.0' in path and 'value=300000' in path for _, path, _, _ in self.fake.requests))
+
+    def test_slow_store_times_out_without_failing_the_quote(self):
+        # Request tới Cần Thơ bị giữ tới khi test cho phép → chắc chắn quá deadline
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def responder(path):
+            if 'Cần Thơ' in unquote_plus(path):
+                release.wait(30)
+
+        self.fake.responder = responder
+
+        quote = build_checkout_quote(user=self.user, cart=self.cart, address=self.address, timeout=2)
+
+        errors = {store['store_id']: store['error'] for store in quote['stores']}
+        self.assertIsNone(errors['store0'])
+        self.assertIsNone(errors['store1'])
+        self.assertEqual(errors['store2'], 'Hết thời gian chờ báo giá')
+        self.assertFalse(quote['complete'])
+        self.assertEqual(quote['shipping_total'], Decimal('60000'))
+        self.assertEqual(quote['grand_total'], Decimal('960000'))
+
+        # Request quá hạn vẫn chạy tiếp: lần báo giá sau chờ chính request đó (single-flight) / đọc cache
+        # nó ghi, không gọi GHTK thêm lần nào
+        release.set()
+        quote = build_checkout_quote(user=self.user, cart=self.cart, address=self.address, timeout=30)
+        self.assertTrue(quote['complete'])
+        self.assertEqual(len(self.fake.requests), 3)
+
+    def test_vouchers_are_validated_and_applied(self):
+        self._voucher('SALE10', 'percent', 10, max_discount=50000)
+        store_voucher = self._voucher('STORE0', 'fixed', 20000, type='store')
+        VoucherStore.objects.create(voucher=store_voucher, store=self.stores[0])
+        self._voucher('SHIP', 'freeship', 0)
+        self._voucher('BIG', 'fixed', 10000, min_order_amount=5000000)
+        self._voucher('SOLDOUT', 'fixed', 10000, usage_limit=0)
+        # usage_limit là số lượt còn lại: lượt đã ghi OrderVoucher không bị trừ lần nữa
+        last = self._voucher('LAST', 'fixed', 5000, usage_limit=1)
+        OrderVoucher.objects.create(
+            order=Order.objects.create(buyer=User.objects.create(username='other', email='other@example.com'), total_amount=0),
+            voucher=last, discount_amount=5000,
+        )
+
+        quote = build_checkout_quote(
+            user=self.user, cart=self.cart, address=self.address,
+            voucher_codes=['SALE10', 'STORE0', 'SHIP', 'BIG', 'SOLDOUT', 'LAST', 'NOPE'],
+        )
+
+        vouchers = {v['code']: v for v in quote['vouchers']}
+        self.assertEqual(vouchers['SALE10']['discount'], Decimal('50000'))
+        self.assertEqual(vouchers['STORE0']['discount'], Decimal('20000'))
+        self.assertEqual(vouchers['STORE0']['scope'], ['store0'])
+        self.assertEqual(vouchers['SHIP']['shipping_discount'], Decimal('90000'))
+        self.assertEqual(vouchers['LAST']['discount'], Decimal('5000'))
+        self.assertFalse(vouchers['BIG']['applied'])
+        self.assertFalse(vouchers['SOLDOUT']['applied'])
+        self.assertFalse(vouchers['NOPE']['applied'])
+        self.assertEqual(quote['discount_total'], Decimal('75000'))
+        self.assertEqual(quote['grand_total'], Decimal('825000'))
+
+
+class PlaceOrderVoucherTest(TestCase):
+    """Voucher được kiểm tra và trừ vào số tiền phải trả ngay trong transaction đặt hàng"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='voucher-buyer', email='voucher-buyer@example.com')
+        cls.address = Address.objects.create(
+            user=cls.user, province='Hà Nội', ward='Phường 1', detail='1 Tràng Tiền', is_default=True,
+        )
+        cls.store = Store.objects.create(
+            store_id='voucher-store', name='Voucher Store', slug='voucher-store',
+            email='voucher-store@example.com', join_date=timezone.now(),
+        )
+        product = Product.objects.create(
+            store=cls.store, category=Category.objects.create(name='Giày'), name='Giày voucher', description='d', base_price=200000,
+        )
+        cls.variant = ProductVariant.objects.create(
+            product=product, sku='VOUCHER-40', price=Decimal('200000'), stock=5, option_combinations={'Size': '40'},
+        )
+        today = timezone.now().date()
+        cls.voucher = Voucher.objects.create(
+            code='SALE10', type='platform', discount_type='percent', discount_value=10, max_discount=30000,
+            usage_limit=5, start_date=today - timedelta(days=1), end_date=today + timedelta(days=1),
+        )
+
+    def _place(self, codes):
+        return place_order(
+            user=self.user, address=self.address, payment_method='cod', shipping_fee=Decimal('30000'),
+            sub_orders=[{'store_id': self.store.store_id, 'shipping_fee': Decimal('30000'), 'items': [(self.variant.pk, 2)]}],
+            voucher_codes=codes,
+        )
+
+    def test_discount_is_charged_and_usage_recorded(self):
+        order = self._place(['SALE10'])
+
+        # 400.000 tiền hàng + 30.000 ship - min(10%, 30.000)
+        self.assertEqual(order.total_amount, Decimal('400000'))
+        self.assertEqual(Payment.objects.get(order=order).amount, Decimal('400000'))
+        self.assertEqual(order.sub_orders.get().shipment.pick_money, Decimal('400000'))
+        self.assertEqual(OrderVoucher.objects.get(order=order).discount_amount, Decimal('30000'))
+        self.assertEqual(UserVoucher.objects.get(user=self.user, voucher=self.voucher).used_count, 1)
+        self.voucher.refresh_from_db()
+        self.assertEqual(self.voucher.usage_limit, 4)
+
+        # per_user_limit = 1: lần đặt thứ 2 bị từ chối, không trừ kho
+        with self.assertRaises(ReservationError):
+            self._place(['SALE10'])
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock, 3)
+
+    def test_same_store_twice_is_rejected(self):
+        sub_order = {'store_id': self.store.store_id, 'shipping_fee': Decimal('15000'), 'items': [(self.variant.pk, 1)]}
+        with self.assertRaises(ReservationError):
+            place_order(
+                user=self.user, address=self.address, payment_method='cod', shipping_fee=Decimal('30000'),
+                sub_orders=[sub_order, dict(sub_order)], voucher_codes=['SALE10'],
+            )
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock, 5)
+        self.assertFalse(OrderVoucher.objects.exists())
 
-# Create your tests here.
+    def test_unknown_voucher_rejects_the_order(self):
+        with self.assertRaises(ReservationError):
+            self._place(['NOPE'])
+        self.assertFalse(Payment.objects.exists())
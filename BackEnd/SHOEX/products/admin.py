@@ -9,7 +9,7 @@ from itertools import product as cartesian_product
 
 from .models import (
     Category, Product, ProductAttribute, ProductAttributeOption,
-    ProductVariant, ProductImage
+    ProductVariant, ProductImage, ImageAsset, CatalogImport
 )
 
 
@@ -242,4 +242,26 @@ class ProductAttributeOptionAdmin(admin.ModelAdmin):
 
 
 # ĐĂNG KÝ THÊM NẾU MUỐN
-admin.site.register(ProductImage)  # hoặc tạo riêng nếu cần
\ No newline at end of file
+admin.site.register(ProductImage)  # hoặc tạo riêng nếu cần
+
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    list_display = ('asset_id', 'image_preview', 'width', 'height', 'status', 'created_at', 'processed_at')
+    list_filter = ('status',)
+    search_fields = ('content_hash',)
+    readonly_fields = ('content_hash', 'derivatives', 'error', 'processed_at')
+
+    def image_preview(self, obj):
+        if obj.original:
+            return format_html('<img src="{}" width=40 height=40 />', obj.original.url)
+        return "-"
+    image_preview.short_description = "Ảnh"
+
+
+@admin.register(CatalogImport)
+class CatalogImportAdmin(admin.ModelAdmin):
+    list_display = ('import_id', 'store', 'file_format', 'status', 'processed_rows', 'total_rows', 'error_count', 'created_at')
+    list_filter = ('status', 'file_format')
+    search_fields = ('store__name', 'store__store_id')
+    readonly_fields = ('processed_rows', 'total_rows', 'created_products', 'created_variants', 'updated_variants',
+                       'error_count', 'errors', 'message', 'started_at', 'finished_at')
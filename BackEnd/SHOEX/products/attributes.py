@@ -0,0 +1,20 @@
+"""
+Tên thuộc tính biến thể dùng chung cho nhập catalog (catalog_import.py) và ma trận biến thể (variant_matrix.py)
+
+Key trong option_combinations / cột option:* của file nhập không thống nhất ("Size", "Màu Sắc", "màu"...):
+so khớp qua normalize_key và ánh xạ tên tiếng Việt về ProductAttribute.name qua ATTRIBUTE_ALIASES.
+"""
+
+# Tên key trong option_combinations → ProductAttribute.name (giữ đồng bộ với OPTION_KEY_ALIASES của facets)
+ATTRIBUTE_ALIASES = {
+    'kích thước': 'size',
+    'màu': 'color',
+    'màu sắc': 'color',
+    'chất liệu': 'material',
+    'kiểu dáng': 'style',
+}
+
+
+def normalize_key(text):
+    """Key so khớp tên (danh mục, thương hiệu, thuộc tính): gộp khoảng trắng, không phân biệt hoa thường"""
+    return ' '.join(str(text).split()).casefold()
@@ -0,0 +1,242 @@
+"""
+Cập nhật hàng loạt tồn kho / giá / trạng thái bằng SQL theo tập (không get() + save() từng dòng)
+
+Mỗi lô BULK_UPDATE_CHUNK_SIZE id là 1 câu lệnh, 1 transaction ngắn:
+  WITH input AS (VALUES ...)                         -- id + giá trị mới
+       locked AS (SELECT ... ORDER BY id FOR UPDATE)  -- khóa theo thứ tự id như orders/reservation.py
+       updated AS (UPDATE ... FROM input, locked ... RETURNING ...)
+  SELECT input LEFT JOIN locked LEFT JOIN updated     -- kết quả cho từng id (không tồn tại / không có quyền / ...)
+Lô sau không giữ khóa của lô trước → checkout không bị chặn lâu.
+
+Tồn kho không âm được chặn ở điều kiện UPDATE và ở CHECK constraint productvariant_stock_non_negative.
+ProductStats (giá min/max, tổng tồn kho) được tính lại sau commit như signal của ProductVariant.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from store.models import StoreUser
+from . import stats
+from .models import Product, ProductVariant
+
+BULK_UPDATE_CHUNK_SIZE = 1000
+STORE_MANAGER_ROLES = ('owner', 'admin', 'manager')
+# ProductVariant.price: max_digits=12, decimal_places=2
+MAX_PRICE = Decimal('1e10')
+
+ItemResult = namedtuple('ItemResult', 'id success message value')
+
+NOT_FOUND = 'Không tồn tại'
+PERMISSION_DENIED = 'Không có quyền với cửa hàng này'
+DUPLICATE = 'ID lặp lại trong danh sách'
+
+
+def managed_store_ids(user):
+    """store_id user được sửa catalog (None = mọi cửa hàng, cho staff)"""
+    if user.is_staff:
+        return None
+    return list(
+        StoreUser.objects.filter(user=user, role__in=STORE_MANAGER_ROLES).values_list('store_id', flat=True)
+    )
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _dedupe(items, validate=None):
+    """(items hợp lệ không trùng id, {vị trí: ItemResult lỗi}) — giữ lần xuất hiện đầu tiên"""
+    seen, unique, errors = set(), [], {}
+    for index, item in enumerate(items):
+        if item[0] in seen:
+            errors[index] = ItemResult(item[0], False, DUPLICATE, None)
+            continue
+        message = validate(item[1]) if validate else None
+        if message:
+            errors[index] = ItemResult(item[0], False, message, None)
+            continue
+        seen.add(item[0])
+        unique.append(item)
+    return unique, errors
+
+
+def _store_filter(store_ids):
+    """Điều kiện quyền trên cột store_id của CTE locked (store_ids None → không giới hạn)"""
+    if store_ids is None:
+        return 'TRUE', []
+    return 'l.store_id = ANY(%s)', [list(store_ids)]
+
+
+def _run_variant_update(items, value_type, set_sql, guard_sql, store_ids, reject_message):
+    """
+    items: [(variant_id, value)] đã bỏ trùng, sắp theo variant_id.
+    set_sql / guard_sql dùng v (variant), i.value (giá trị mới).
+    Trả về {variant_id: ItemResult}, tập product_id đã đổi.
+    """
+    variants = ProductVariant._meta.db_table
+    products = Product._meta.db_table
+    allowed_sql, allowed_params = _store_filter(store_ids)
+    rows = ', '.join([f'(%s::integer, %s::{value_type})'] * len(items))
+    sql = f"""
+        WITH input(variant_id, value) AS (VALUES {rows}),
+        locked AS (
+            SELECT v.variant_id, v.product_id, p.store_id
+            FROM {variants} AS v
+            JOIN input AS i ON i.variant_id = v.variant_id
+            JOIN {products} AS p ON p.product_id = v.product_id
+            ORDER BY v.variant_id
+            FOR UPDATE OF v
+        ),
+        updated AS (
+            UPDATE {variants} AS v
+            SET {set_sql}, updated_at = now()
+            FROM input AS i, locked AS l
+            WHERE v.variant_id = i.variant_id AND l.variant_id = v.variant_id
+              AND {allowed_sql} AND {guard_sql}
+            RETURNING v.variant_id, v.product_id, v.stock, v.price, v.is_active
+        )
+        SELECT i.variant_id, l.variant_id IS NOT NULL, {allowed_sql}, u.variant_id IS NOT NULL,
+               u.product_id, u.stock, u.price, u.is_active
+        FROM input AS i
+        LEFT JOIN locked AS l ON l.variant_id = i.variant_id
+        LEFT JOIN updated AS u ON u.variant_id = i.variant_id
+    """
+    params = [value for item in items for value in item] + allowed_params + allowed_params
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        fetched = cursor.fetchall()
+
+    results, product_ids = {}, set()
+    for variant_id, found, allowed, updated, product_id, stock, price, is_active in fetched:
+        if updated:
+            product_ids.add(product_id)
+            results[variant_id] = ItemResult(variant_id, True, None, {'stock': stock, 'price': price, 'is_active': is_active})
+        elif not found:
+            results[variant_id] = ItemResult(variant_id, False, NOT_FOUND, None)
+        elif not allowed:
+            results[variant_id] = ItemResult(variant_id, False, PERMISSION_DENIED, None)
+        else:
+            results[variant_id] = ItemResult(variant_id, False, reject_message, None)
+    return results, product_ids
+
+
+def _refresh_stats_on_commit(product_ids):
+    if product_ids:
+        product_ids = list(product_ids)
+        transaction.on_commit(lambda: stats.refresh_product_stats(product_ids, fields=stats.VARIANT_FIELDS))
+
+
+def _bulk_variant_update(items, value_type, set_sql, guard_sql, store_ids, reject_message, chunk_size,
+                         validate=None):
+    """Chạy theo lô, mỗi lô 1 transaction; trả về ItemResult theo đúng thứ tự input"""
+    unique, results_by_index = _dedupe(items, validate)
+    results = {}
+    for chunk in _chunks(sorted(unique), chunk_size):
+        with transaction.atomic():
+            chunk_results, product_ids = _run_variant_update(
+                chunk, value_type, set_sql, guard_sql, store_ids, reject_message,
+            )
+            _refresh_stats_on_commit(product_ids)
+        results.update(chunk_results)
+    return [results_by_index.get(index) or results[item[0]] for index, item in enumerate(items)]
+
+
+def adjust_stock(changes, store_ids=None, chunk_size=BULK_UPDATE_CHUNK_SIZE):
+    """changes: [(variant_id, số lượng cộng thêm / trừ đi)]; không cho tồn kho âm"""
+    return _bulk_variant_update(
+        [(int(variant_id), int(delta)) for variant_id, delta in changes],
+        'integer', 'stock = v.stock + i.value', 'v.stock + i.value >= 0',
+        store_ids, 'Tồn kho không được âm', chunk_size,
+    )
+
+
+def _validate_price(price):
+    if price <= 0:
+        return 'Giá phải lớn hơn 0'
+    if price >= MAX_PRICE:
+        return 'Giá quá lớn'
+    return None
+
+
+def set_prices(prices, store_ids=None, chunk_size=BULK_UPDATE_CHUNK_SIZE):
+    """prices: [(variant_id, giá mới)]; giá phải > 0"""
+    return _bulk_variant_update(
+        [(int(variant_id), Decimal(price)) for variant_id, price in prices],
+        'numeric', 'price = i.value', 'TRUE',
+        store_ids, None, chunk_size, validate=_validate_price,
+    )
+
+
+def set_variant_status(variant_ids, is_active, store_ids=None, chunk_size=BULK_UPDATE_CHUNK_SIZE):
+    return _bulk_variant_update(
+        [(int(variant_id), bool(is_active)) for variant_id in variant_ids],
+        'boolean', 'is_active = i.value', 'TRUE',
+        store_ids, None, chunk_size,
+    )
+
+
+def set_product_status(product_ids, is_active, store_ids=None, chunk_size=BULK_UPDATE_CHUNK_SIZE):
+    """Bật / tắt sản phẩm và toàn bộ biến thể của nó; khóa product rồi variant, đều theo thứ tự id"""
+    products = Product._meta.db_table
+    variants = ProductVariant._meta.db_table
+    allowed_sql, allowed_params = _store_filter(store_ids)
+    items = [(int(product_id),) for product_id in product_ids]
+    unique, results_by_index = _dedupe(items)
+
+    results = {}
+    for chunk in _chunks(sorted(unique), chunk_size):
+        rows = ', '.join(['(%s::integer)'] * len(chunk))
+        sql = f"""
+            WITH input(product_id) AS (VALUES {rows}),
+            locked AS (
+                SELECT p.product_id, p.store_id
+                FROM {products} AS p
+                JOIN input AS i ON i.product_id = p.product_id
+                ORDER BY p.product_id
+                FOR UPDATE OF p
+            ),
+            updated AS (
+                UPDATE {products} AS p
+                SET is_active = %s, updated_at = now()
+                FROM locked AS l
+                WHERE p.product_id = l.product_id AND {allowed_sql}
+                RETURNING p.product_id
+            ),
+            locked_variants AS (
+                SELECT v.variant_id
+                FROM {variants} AS v
+                JOIN updated AS u ON u.product_id = v.product_id
+                ORDER BY v.variant_id
+                FOR UPDATE OF v
+            ),
+            updated_variants AS (
+                UPDATE {variants} AS v
+                SET is_active = %s, updated_at = now()
+                FROM locked_variants AS lv
+                WHERE v.variant_id = lv.variant_id
+                RETURNING v.variant_id
+            )
+            SELECT i.product_id, l.product_id IS NOT NULL, {allowed_sql}, u.product_id IS NOT NULL,
+                   (SELECT count(*) FROM updated_variants)
+            FROM input AS i
+            LEFT JOIN locked AS l ON l.product_id = i.product_id
+            LEFT JOIN updated AS u ON u.product_id = i.product_id
+        """
+        params = [item[0] for item in chunk] + [bool(is_active)] + allowed_params + [bool(is_active)] + allowed_params
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                fetched = cursor.fetchall()
+            updated_ids = [product_id for product_id, _, _, updated, _ in fetched if updated]
+            _refresh_stats_on_commit(updated_ids)
+
+        for product_id, found, allowed, updated, _ in fetched:
+            if updated:
+                results[product_id] = ItemResult(product_id, True, None, {'is_active': bool(is_active)})
+            elif not found:
+                results[product_id] = ItemResult(product_id, False, NOT_FOUND, None)
+            else:
+                results[product_id] = ItemResult(product_id, False, PERMISSION_DENIED, None)
+    return [results_by_index.get(index) or results[item[0]] for index, item in enumerate(items)]
@@ -0,0 +1,581 @@
+"""
+Nhập catalog hàng loạt cho người bán từ file CSV / XLSX / JSONL
+
+Mỗi dòng là 1 biến thể (SKU); các dòng cùng product_code (= Product.model_code) thuộc cùng 1 sản phẩm:
+
+    product_code,name,category,brand,description,base_price,sku,price,stock,weight,is_active,option:Size,option:Color
+    AIR-1,Air Zoom,Giày > Giày chạy,Nike,...,2500000,AIR-1-40-DEN,2390000,12,0.8,1,40,Đen
+
+JSONL: mỗi dòng 1 object cùng các key, thuộc tính có thể để trong "options": {"Size": "40"}.
+
+- Đọc file dạng stream (csv.reader / openpyxl read_only / từng dòng JSON), không nạp cả file vào bộ nhớ
+- Danh mục / thương hiệu / thuộc tính tra qua map nạp sẵn 1 lần (CatalogResolver), không query theo dòng
+- Mỗi lô CATALOG_IMPORT_CHUNK_SIZE dòng: kiểm tra, rồi bulk_create / bulk_update trong 1 transaction
+  cùng với điểm dừng processed_rows → lô đã commit không chạy lại, nhập tiếp từ dòng kế tiếp
+- SKU đã có của cửa hàng → cập nhật giá / tồn kho / khối lượng / thuộc tính; của cửa hàng khác → lỗi dòng
+- Dòng lỗi được bỏ qua và ghi vào CatalogImport.errors, các dòng khác vẫn nhập
+
+Chạy nền: start_import() → job products.import_catalog (tự nối tiếp sau mỗi CATALOG_IMPORT_SLICE_SECONDS);
+dòng lệnh: manage.py import_catalog.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import re
+import time
+from collections import defaultdict, namedtuple
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from brand.models import Brand
+from .attributes import ATTRIBUTE_ALIASES, normalize_key
+from .models import (
+    CatalogImport, Category, Product, ProductAttribute, ProductAttributeOption, ProductVariant,
+)
+from .search import update_search_vectors
+from .stats import refresh_product_stats
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ('product_code', 'sku', 'price')
+COLUMN_ALIASES = {
+    'model_code': 'product_code',
+    'category_id': 'category',
+    'brand_id': 'brand',
+    'quantity': 'stock',
+}
+OPTION_PREFIX = 'option:'
+FORMAT_EXTENSIONS = {'.csv': 'csv', '.xlsx': 'xlsx', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+THOUSANDS_RE = re.compile(r'^\d{1,3}(,\d{3})+(\.\d+)?$')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x', 'có', 'co'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'không', 'khong'}
+
+ParsedRow = namedtuple(
+    'ParsedRow',
+    'row product_code name description category_id brand_id base_price sku price stock weight is_active options',
+)
+
+
+class CatalogImportError(ValueError):
+    """Lỗi cả file (định dạng không hỗ trợ, thiếu cột bắt buộc...)"""
+
+
+class RowError(ValueError):
+    """Lỗi 1 dòng: dòng bị bỏ qua, ghi vào CatalogImport.errors"""
+
+
+class ImportConflict(RuntimeError):
+    """Lần nhập đã được worker khác xử lý tiếp (processed_rows không khớp điểm dừng)"""
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    file_format = FORMAT_EXTENSIONS.get(extension)
+    if file_format is None:
+        raise CatalogImportError(f'Định dạng không hỗ trợ. Chỉ chấp nhận: {", ".join(FORMAT_EXTENSIONS)}')
+    return file_format
+
+
+# ===== ĐỌC FILE (STREAM) =====
+
+def _normalize_record(record):
+    """Chuẩn hóa tên cột; gom các cột option:<tên> / key "options" vào record['options']"""
+    normalized, options = {}, {}
+    for column, value in record.items():
+        if column is None:
+            continue
+        column = str(column).strip()
+        if column.lower().startswith(OPTION_PREFIX):
+            options[column[len(OPTION_PREFIX):].strip()] = value
+            continue
+        name = column.lower()
+        if name == 'options' and isinstance(value, dict):
+            options.update(value)
+            continue
+        normalized[COLUMN_ALIASES.get(name, name)] = value
+    normalized['options'] = {
+        name: str(value).strip() for name, value in options.items()
+        if name and value is not None and str(value).strip()
+    }
+    return normalized
+
+
+def _check_columns(columns):
+    present = {COLUMN_ALIASES.get(c, c) for c in (str(c).strip().lower() for c in columns if c is not None)}
+    missing = [c for c in REQUIRED_COLUMNS if c not in present]
+    if missing:
+        raise CatalogImportError(f'Thiếu cột bắt buộc: {", ".join(missing)}')
+
+
+def _csv_records(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    header = next(reader, None)
+    if header is None:
+        return
+    _check_columns(header)
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        yield reader.line_num, _normalize_record(dict(zip(header, values)))
+
+
+def _xlsx_records(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise CatalogImportError('Cần cài openpyxl để nhập file .xlsx (pip install openpyxl)')
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        _check_columns(header)
+        for number, values in enumerate(rows, start=2):
+            if all(value is None or str(value).strip() == '' for value in values):
+                continue
+            yield number, _normalize_record(dict(zip(header, values)))
+    finally:
+        workbook.close()
+
+
+def _jsonl_records(fileobj):
+    checked = False
+    for number, line in enumerate(io.TextIOWrapper(fileobj, encoding='utf-8-sig'), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            # Dòng hỏng → lỗi dòng (parse_row), không dừng cả file
+            yield number, None
+            continue
+        if not checked:
+            _check_columns(record)
+            checked = True
+        yield number, _normalize_record(record)
+
+
+RECORD_READERS = {'csv': _csv_records, 'xlsx': _xlsx_records, 'jsonl': _jsonl_records}
+
+
+def iter_records(fileobj, file_format):
+    """(số dòng trong file, record đã chuẩn hóa | None nếu dòng hỏng), đọc tuần tự"""
+    return RECORD_READERS[file_format](fileobj)
+
+
+# ===== TRA CỨU DANH MỤC / THƯƠNG HIỆU / THUỘC TÍNH =====
+
+class CatalogResolver:
+    """Map nạp sẵn 1 lần cho cả lần nhập (vài query, không phụ thuộc số dòng)"""
+
+    def __init__(self):
+        categories = list(Category.objects.filter(is_active=True).values_list('category_id', 'name', 'parent_id'))
+        names = {category_id: name for category_id, name, _ in categories}
+        parents = {category_id: parent_id for category_id, _, parent_id in categories}
+
+        self._category_ids = set(names)
+        self._categories_by_name = defaultdict(set)
+        self._categories_by_path = {}
+        for category_id, name, _ in categories:
+            self._categories_by_name[normalize_key(name)].add(category_id)
+            path, current = [], category_id
+            while current in names and len(path) < 20:
+                path.append(normalize_key(names[current]))
+                current = parents.get(current)
+            self._categories_by_path[' > '.join(reversed(path))] = category_id
+
+        self._brands = {normalize_key(name): brand_id for brand_id, name in Brand.objects.values_list('brand_id', 'name')}
+
+        self._attributes = {}
+        for attribute in ProductAttribute.objects.all():
+            self._attributes[normalize_key(attribute.name)] = attribute.attribute_id
+            self._attributes.setdefault(normalize_key(attribute.get_name_display()), attribute.attribute_id)
+        for alias, name in ATTRIBUTE_ALIASES.items():
+            if name in self._attributes:
+                self._attributes.setdefault(alias, self._attributes[name])
+
+    def category(self, value):
+        text = str(value).strip()
+        if text.isdigit():
+            if int(text) in self._category_ids:
+                return int(text)
+            raise RowError(f'Danh mục {text} không tồn tại')
+        if '>' in text or '/' in text:
+            path = ' > '.join(normalize_key(part) for part in text.replace('/', '>').split('>') if part.strip())
+            category_id = self._categories_by_path.get(path)
+            if category_id is None:
+                raise RowError(f'Danh mục "{text}" không tồn tại')
+            return category_id
+        ids = self._categories_by_name.get(normalize_key(text), ())
+        if not ids:
+            raise RowError(f'Danh mục "{text}" không tồn tại')
+        if len(ids) > 1:
+            raise RowError(f'Có nhiều danh mục tên "{text}", dùng đường dẫn "Cha > Con" hoặc mã danh mục')
+        return next(iter(ids))
+
+    def brand(self, value):
+        text = str(value).strip()
+        if text.isdigit() and int(text) in self._brands.values():
+            return int(text)
+        brand_id = self._brands.get(normalize_key(text))
+        if brand_id is None:
+            raise RowError(f'Thương hiệu "{text}" không tồn tại')
+        return brand_id
+
+    def attribute(self, option_name):
+        """attribute_id cho key trong option_combinations (None: chỉ lưu trong JSON của biến thể)"""
+        return self._attributes.get(normalize_key(option_name))
+
+
+# ===== KIỂM TRA DÒNG =====
+
+def _text(record, column, max_length=None):
+    value = record.get(column)
+    if value is None:
+        return ''
+    text = str(value).strip()
+    if max_length and len(text) > max_length:
+        raise RowError(f'{column} dài quá {max_length} ký tự')
+    return text
+
+
+def _decimal(record, column, default=None, minimum=Decimal('0')):
+    text = _text(record, column).replace(' ', '')
+    if not text:
+        if default is None:
+            raise RowError(f'Thiếu {column}')
+        return default
+    if THOUSANDS_RE.match(text):
+        text = text.replace(',', '')
+    elif text.count(',') == 1 and '.' not in text:
+        text = text.replace(',', '.')  # '0,8' (dấu phẩy thập phân)
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        raise RowError(f'{column} không phải số: {text}')
+    if value < minimum or not value.is_finite():
+        raise RowError(f'{column} không hợp lệ: {text}')
+    return value
+
+
+def _int(record, column, default):
+    text = _text(record, column).replace(' ', '')
+    if not text:
+        return default
+    try:
+        value = int(Decimal(text))
+    except (InvalidOperation, ValueError):
+        raise RowError(f'{column} không phải số nguyên: {text}')
+    if value < 0:
+        raise RowError(f'{column} không được âm')
+    return value
+
+
+def _bool(record, column, default=True):
+    value = record.get(column)
+    if isinstance(value, bool):
+        return value
+    text = _text(record, column).lower()
+    if not text:
+        return default
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f'{column} không hợp lệ: {text}')
+
+
+def parse_row(row, record, resolver):
+    """ParsedRow từ record đã chuẩn hóa; raise RowError nếu dòng không hợp lệ"""
+    if record is None:
+        raise RowError('Dòng không phải JSON object hợp lệ')
+    product_code = _text(record, 'product_code', 100)
+    sku = _text(record, 'sku', 100)
+    if not product_code:
+        raise RowError('Thiếu product_code')
+    if not sku:
+        raise RowError('Thiếu sku')
+
+    category = _text(record, 'category')
+    brand = _text(record, 'brand')
+    return ParsedRow(
+        row=row,
+        product_code=product_code,
+        name=_text(record, 'name', 200),
+        description=_text(record, 'description'),
+        category_id=resolver.category(category) if category else None,
+        brand_id=resolver.brand(brand) if brand else None,
+        base_price=_decimal(record, 'base_price') if _text(record, 'base_price') else None,
+        sku=sku,
+        price=_decimal(record, 'price'),
+        stock=_int(record, 'stock', 0),
+        weight=_decimal(record, 'weight', default=Decimal('0.1'), minimum=Decimal('0.01')),
+        is_active=_bool(record, 'is_active'),
+        options=record.get('options') or {},
+    )
+
+
+# ===== GHI 1 LÔ =====
+
+def _unique_slugs(products):
+    """
+    Slug theo tên, cắt theo độ dài cột; trùng (trong DB hoặc trong lô) → thêm product_code
+    (cắt phần tên để giữ hậu tố), vẫn trùng thì thêm số thứ tự
+    """
+    max_length = Product._meta.get_field('slug').max_length
+    wanted = {
+        code: (slugify(product.name) or slugify(code))[:max_length].rstrip('-')
+        for code, product in products.items()
+    }
+    taken = set(Product.objects.filter(slug__in=wanted.values()).values_list('slug', flat=True))
+    for code, product in products.items():
+        base = slug = wanted[code]
+        attempt = 1
+        # base đã được kiểm tra với DB ở truy vấn trên; slug có hậu tố thì kiểm tra từng cái (hiếm)
+        while slug in taken or (slug != base and Product.objects.filter(slug=slug).exists()):
+            suffix = f'-{slugify(code)[:20]}' + (f'-{attempt}' if attempt > 1 else '')
+            slug = f'{base[:max_length - len(suffix)].rstrip("-")}{suffix}'
+            attempt += 1
+        taken.add(slug)
+        product.slug = slug
+
+
+def _apply_chunk(store_id, rows, resolver):
+    """
+    Ghi các dòng đã kiểm tra của 1 lô (trong transaction của lô).
+    Trả về (counts, errors): counts = {'created_products', 'created_variants', 'updated_variants'}
+    """
+    errors = []
+    codes = {row.product_code for row in rows}
+    skus = {row.sku for row in rows}
+    products = {
+        code: (product_id, owner)
+        for code, product_id, owner in Product.objects.filter(model_code__in=codes)
+        .values_list('model_code', 'product_id', 'store_id')
+    }
+    variants = {
+        sku: (variant_id, product_id, owner)
+        for sku, variant_id, product_id, owner in ProductVariant.objects.filter(sku__in=skus)
+        .values_list('sku', 'variant_id', 'product_id', 'product__store_id')
+    }
+
+    new_products, accepted, seen_skus = {}, [], set()
+    for row in rows:
+        try:
+            if row.sku in seen_skus:
+                raise RowError(f'SKU {row.sku} lặp lại trong file')
+            product = products.get(row.product_code)
+            if product is not None and product[1] != store_id:
+                raise RowError(f'product_code {row.product_code} thuộc cửa hàng khác')
+            variant = variants.get(row.sku)
+            if variant is not None:
+                if variant[2] != store_id:
+                    raise RowError(f'SKU {row.sku} thuộc cửa hàng khác')
+                if product is None or variant[1] != product[0]:
+                    raise RowError(f'SKU {row.sku} đã thuộc sản phẩm khác')
+            if product is None and row.product_code not in new_products:
+                if not row.name or row.category_id is None:
+                    raise RowError('Sản phẩm mới cần name và category')
+                new_products[row.product_code] = Product(
+                    store_id=store_id,
+                    model_code=row.product_code,
+                    name=row.name,
+                    description=row.description,
+                    category_id=row.category_id,
+                    brand_id=row.brand_id,
+                    base_price=row.base_price if row.base_price is not None else row.price,
+                )
+        except RowError as e:
+            errors.append({'row': row.row, 'sku': row.sku, 'message': str(e)})
+            continue
+        seen_skus.add(row.sku)
+        accepted.append(row)
+
+    if new_products:
+        _unique_slugs(new_products)
+        # Postgres trả về khóa chính sau bulk_create
+        Product.objects.bulk_create(new_products.values())
+        for code, product in new_products.items():
+            products[code] = (product.product_id, store_id)
+        update_search_vectors(product.product_id for product in new_products.values())
+
+    now = timezone.now()
+    to_create, to_update, options = [], [], set()
+    for row in accepted:
+        product_id = products[row.product_code][0]
+        variant = ProductVariant(
+            product_id=product_id,
+            sku=row.sku,
+            price=row.price,
+            stock=row.stock,
+            weight=row.weight,
+            option_combinations=row.options,
+            is_active=row.is_active,
+            updated_at=now,
+        )
+        if row.sku in variants:
+            variant.variant_id = variants[row.sku][0]
+            to_update.append(variant)
+        else:
+            to_create.append(variant)
+        for name, value in row.options.items():
+            attribute_id = resolver.attribute(name)
+            if attribute_id is not None:
+                options.add((product_id, attribute_id, value))
+
+    ProductVariant.objects.bulk_create(to_create)
+    ProductVariant.objects.bulk_update(
+        to_update, ['price', 'stock', 'weight', 'option_combinations', 'is_active', 'updated_at'],
+    )
+    ProductAttributeOption.objects.bulk_create(
+        [
+            ProductAttributeOption(product_id=product_id, attribute_id=attribute_id, value=value)
+            for product_id, attribute_id, value in sorted(options)
+        ],
+        ignore_conflicts=True,
+    )
+    # bulk_create/bulk_update không gửi signal → tự cập nhật read model cho listing
+    refresh_product_stats({products[row.product_code][0] for row in accepted})
+
+    counts = {
+        'created_products': len(new_products),
+        'created_variants': len(to_create),
+        'updated_variants': len(to_update),
+    }
+    return counts, errors
+
+
+def _commit_chunk(import_id, start, records, resolver):
+    """
+    Kiểm tra + ghi 1 lô và dời điểm dừng processed_rows trong cùng 1 transaction.
+    Khóa dòng CatalogImport: 2 worker không thể ghi cùng 1 lô.
+    """
+    with transaction.atomic():
+        catalog_import = CatalogImport.objects.select_for_update().get(pk=import_id)
+        if catalog_import.processed_rows != start:
+            raise ImportConflict(f'Import {import_id} đã ở dòng {catalog_import.processed_rows}, không phải {start}')
+
+        rows, errors = [], []
+        for row, record in records:
+            try:
+                rows.append(parse_row(row, record, resolver))
+            except RowError as e:
+                errors.append({'row': row, 'sku': (record or {}).get('sku'), 'message': str(e)})
+        counts, chunk_errors = _apply_chunk(catalog_import.store_id, rows, resolver) if rows else ({}, [])
+        errors.extend(chunk_errors)
+
+        catalog_import.processed_rows = start + len(records)
+        for field, value in counts.items():
+            setattr(catalog_import, field, getattr(catalog_import, field) + value)
+        catalog_import.error_count += len(errors)
+        room = settings.CATALOG_IMPORT_MAX_ERRORS - len(catalog_import.errors)
+        if room > 0 and errors:
+            catalog_import.errors = catalog_import.errors + sorted(errors, key=lambda e: e['row'])[:room]
+        catalog_import.save(update_fields=[
+            'processed_rows', 'created_products', 'created_variants', 'updated_variants', 'error_count', 'errors',
+        ])
+    return catalog_import
+
+
+def _finish(catalog_import, status, message=''):
+    catalog_import.status = status
+    catalog_import.message = message
+    catalog_import.finished_at = timezone.now()
+    catalog_import.save(update_fields=['status', 'message', 'finished_at'])
+    return catalog_import
+
+
+def fail_import(import_id, message):
+    """Đánh dấu failed lần nhập chưa kết thúc (job hết số lần thử); giữ nguyên các lô đã commit"""
+    catalog_import = CatalogImport.objects.filter(pk=import_id).first()
+    if catalog_import is None or catalog_import.status in ('done', 'failed'):
+        return catalog_import
+    return _finish(catalog_import, 'failed', message)
+
+
+def run_import(import_id, time_budget=None, progress=None):
+    """
+    Nhập tiếp từ điểm dừng processed_rows. Trả về (catalog_import, xong hay chưa).
+    time_budget (giây): hết thời gian thì dừng sau lô hiện tại (job tự nối tiếp).
+    progress(catalog_import): gọi sau mỗi lô.
+    """
+    catalog_import = CatalogImport.objects.get(pk=import_id)
+    if catalog_import.status in ('done', 'failed'):
+        return catalog_import, True
+    deadline = time.monotonic() + time_budget if time_budget else None
+    chunk_size = settings.CATALOG_IMPORT_CHUNK_SIZE
+
+    CatalogImport.objects.filter(pk=import_id).update(
+        status='running', started_at=catalog_import.started_at or timezone.now(),
+    )
+    try:
+        if catalog_import.total_rows is None:
+            # Đếm trước 1 lượt (stream, không giữ dữ liệu) để hiển thị tiến độ
+            with catalog_import.file.open('rb') as fileobj:
+                total = sum(1 for _ in iter_records(fileobj, catalog_import.file_format))
+            CatalogImport.objects.filter(pk=import_id).update(total_rows=total)
+
+        resolver = CatalogResolver()
+        start = catalog_import.processed_rows
+        with catalog_import.file.open('rb') as fileobj:
+            # Bỏ qua các dòng đã commit ở lần chạy trước
+            records = islice(iter_records(fileobj, catalog_import.file_format), start, None)
+            while True:
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    break
+                catalog_import = _commit_chunk(import_id, start, chunk, resolver)
+                start += len(chunk)
+                if progress is not None:
+                    progress(catalog_import)
+                if deadline is not None and time.monotonic() >= deadline:
+                    return catalog_import, False
+    except CatalogImportError as e:
+        catalog_import.refresh_from_db()
+        return _finish(catalog_import, 'failed', str(e)), True
+
+    catalog_import.refresh_from_db()
+    message = (
+        f'{catalog_import.created_products} sản phẩm mới, {catalog_import.created_variants} biến thể mới, '
+        f'{catalog_import.updated_variants} biến thể cập nhật, {catalog_import.error_count} dòng lỗi'
+    )
+    return _finish(catalog_import, 'done', message), True
+
+
+def schedule_import(catalog_import):
+    """Đưa (phần còn lại của) lần nhập vào hàng đợi; khóa theo điểm dừng nên mỗi đoạn chỉ có 1 job"""
+    from .tasks import import_catalog
+
+    return import_catalog.enqueue(
+        {'import_id': catalog_import.pk},
+        dedup_key=f'catalog-import:{catalog_import.pk}:{catalog_import.processed_rows}',
+    )
+
+
+def start_import(store, uploaded, user=None):
+    """Lưu file upload, tạo CatalogImport và đưa vào hàng đợi; trả về CatalogImport (id để theo dõi tiến độ)"""
+    file_format = detect_format(getattr(uploaded, 'name', ''))
+    with transaction.atomic():
+        catalog_import = CatalogImport(store=store, created_by=user, file_format=file_format)
+        catalog_import.file.save(os.path.basename(uploaded.name), uploaded, save=False)
+        catalog_import.save()
+        schedule_import(catalog_import)
+    return catalog_import
@@ -0,0 +1,117 @@
+"""
+Cây danh mục cache trong process
+
+Toàn bộ bảng Category (vài trăm dòng) được load 1 lần thành cây trong bộ nhớ;
+mở rộng cây con (filter category_id + include_subcategories) và breadcrumb
+(full_path) không tốn query nào sau đó.
+
+Invalidate: signal Category save/delete tăng version trong Django cache,
+mỗi process so version trước khi dùng cây (kèm TTL phòng khi cache không chia sẻ).
+Khi process có listener của caching/bus.py, tin invalidate tag 'category' bỏ cây ngay
+nên không cần đọc version mỗi lần (chỉ còn TTL).
+"""
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from caching import bus
+
+from .models import Category
+
+TREE_VERSION_KEY = 'category_tree:version'
+TREE_TTL = 300  # giây
+
+_tree = None
+
+
+class CategoryTree:
+    """Snapshot bất biến của bảng Category"""
+
+    def __init__(self, categories, version):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.by_id = {c.category_id: c for c in categories}
+        self.children = defaultdict(list)
+        for category in categories:
+            if category.parent_id is not None:
+                self.children[category.parent_id].append(category.category_id)
+
+    def get(self, category_id):
+        return self.by_id.get(category_id)
+
+    def descendant_ids(self, category_id, active_only=True):
+        """ID con cháu (không gồm chính nó); active_only bỏ qua cả nhánh dưới danh mục inactive"""
+        ids, seen = [], {category_id}
+        stack = list(reversed(self.children.get(category_id, [])))
+        while stack:
+            child_id = stack.pop()
+            if child_id in seen or (active_only and not self.by_id[child_id].is_active):
+                continue
+            seen.add(child_id)
+            ids.append(child_id)
+            stack.extend(reversed(self.children.get(child_id, [])))
+        return ids
+
+    def subtree_ids(self, category_ids, active_only=True):
+        """Gộp chính các ID + con cháu của chúng (giữ thứ tự, bỏ trùng)"""
+        result = {}
+        for category_id in category_ids:
+            result[category_id] = None
+            for child_id in self.descendant_ids(category_id, active_only):
+                result[child_id] = None
+        return list(result)
+
+    def ancestors(self, category_id, include_self=True):
+        """Danh mục từ gốc → (chính nó), đọc theo path"""
+        category = self.by_id.get(category_id)
+        if category is None:
+            return []
+        ids = category.ancestor_ids + ([category_id] if include_self else [])
+        return [self.by_id[i] for i in ids if i in self.by_id]
+
+
+def _current_version():
+    version = cache.get(TREE_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(TREE_VERSION_KEY, version, None)
+        version = cache.get(TREE_VERSION_KEY, version)
+    return version
+
+
+def get_category_tree():
+    """Cây danh mục hiện tại (load lại khi version đổi hoặc quá TTL)"""
+    global _tree
+    tree = _tree
+    if tree is not None and bus.is_listening() and time.monotonic() - tree.loaded_at <= TREE_TTL:
+        return tree
+    version = _current_version()
+    if tree is None or tree.version != version or time.monotonic() - tree.loaded_at > TREE_TTL:
+        tree = CategoryTree(list(Category.objects.all()), version)
+        _tree = tree
+    return tree
+
+
+def invalidate_category_tree():
+    """Gọi sau khi Category thay đổi (signals)"""
+    global _tree
+    _tree = None
+    cache.set(TREE_VERSION_KEY, time.time_ns(), None)
+
+
+def _on_remote_invalidation(tags):
+    global _tree
+    if tags is None or 'category' in tags:
+        _tree = None
+
+
+bus.subscribe(_on_remote_invalidation)
+
+
+def expand_category_ids(category_ids, include_subcategories=True):
+    """ID danh mục cần lọc product: các ID đã chọn (+ toàn bộ cây con active)"""
+    category_ids = [int(i) for i in category_ids]
+    if not include_subcategories:
+        return category_ids
+    return get_category_tree().subtree_ids(category_ids)
@@ -0,0 +1,67 @@
+"""
+Tạo các cỡ ảnh JPEG + WebP từ bytes ảnh gốc
+
+Chạy trong process con (ProcessPoolExecutor, xem products/images.py) nên module này chỉ dùng PIL,
+không import Django.
+"""
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+
+def _to_rgb(img):
+    """Ảnh có kênh alpha / bảng màu → RGB trên nền trắng"""
+    if img.mode == 'RGB':
+        return img
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def _encode(img, fmt, **options):
+    output = BytesIO()
+    img.save(output, format=fmt, **options)
+    return output.getvalue()
+
+
+def fit_size(original_size, box):
+    """Kích thước nằm trong box, giữ tỉ lệ, không phóng to"""
+    width, height = original_size
+    scale = min(box[0] / width, box[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def render_derivatives(data, sizes, jpeg_quality=85, webp_quality=80):
+    """
+    data: bytes ảnh gốc; sizes: {tên: (rộng tối đa, cao tối đa)}
+    Trả về {tên: {'width', 'height', 'jpeg': bytes, 'webp': bytes} | {'same_as': tên khác}}
+    Cỡ lớn được tạo trước, cỡ nhỏ resize từ cỡ lớn liền trước (nhanh hơn resize từ ảnh gốc).
+    Các cỡ trùng kích thước (ảnh gốc nhỏ) chỉ mã hóa 1 lần.
+    """
+    img = Image.open(BytesIO(data))
+    ordered = sorted(sizes.items(), key=lambda item: item[1][0] * item[1][1], reverse=True)
+    # JPEG: giải mã sẵn ở độ phân giải gần cỡ lớn nhất (nhanh hơn nhiều với ảnh máy ảnh)
+    largest = max(ordered[0][1])
+    img.draft('RGB', (largest, largest))
+    img = _to_rgb(ImageOps.exif_transpose(img))
+
+    results, by_size = {}, {}
+    current = img
+    for name, box in ordered:
+        size = fit_size(img.size, box)
+        if size in by_size:
+            results[name] = {'same_as': by_size[size]}
+            continue
+        if size != current.size:
+            current = current.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        results[name] = {
+            'width': size[0],
+            'height': size[1],
+            'jpeg': _encode(current, 'JPEG', quality=jpeg_quality, optimize=True, progressive=True),
+            'webp': _encode(current, 'WEBP', quality=webp_quality, method=4),
+        }
+        by_size[size] = name
+    return results
@@ -0,0 +1,221 @@
+"""
+Pipeline ảnh: lưu ảnh gốc 1 lần + tạo các cỡ JPEG/WebP ngoài request
+
+- ingest_image(): đọc file upload, băm SHA-256 → đã có ảnh cùng nội dung thì dùng lại (không lưu thêm file);
+  chưa có thì lưu nguyên bản gốc vào images/originals/<hash>.<ext> và đưa job tạo cỡ vào hàng đợi
+- attach_image(): gắn asset cho ProductImage / ProductAttributeOption / ReviewImage
+  (field `image` trỏ tới file gốc của asset → API cũ dùng image.url vẫn chạy)
+- Job products.generate_image_derivatives (manage.py run_jobs) tạo các cỡ settings.IMAGE_DERIVATIVE_SIZES
+  trong process pool (products/image_render.py), ghi images/derived/<hash>_<cỡ>.jpg|.webp
+- srcset() / variant_url() cho GraphQL; khi chưa có cỡ nào thì trả về ảnh gốc
+
+Dựng lại / bổ sung cho ảnh cũ: manage.py generate_image_derivatives
+"""
+import hashlib
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .image_render import render_derivatives
+from .models import ImageAsset
+
+logger = logging.getLogger(__name__)
+
+ORIGINALS_DIR = 'images/originals'
+DERIVED_DIR = 'images/derived'
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+class ImageIngestError(ValueError):
+    """File upload không phải ảnh hợp lệ / định dạng không hỗ trợ"""
+
+
+def is_asset_file(name):
+    """File thuộc ImageAsset (dùng chung giữa nhiều bản ghi) → không xóa theo từng bản ghi"""
+    return bool(name) and (name.startswith(ORIGINALS_DIR + '/') or name.startswith(DERIVED_DIR + '/'))
+
+
+def _read(uploaded):
+    if hasattr(uploaded, 'seek'):
+        uploaded.seek(0)
+    if hasattr(uploaded, 'chunks'):
+        return b''.join(uploaded.chunks())
+    return uploaded.read()
+
+
+# ===== NHẬN ẢNH =====
+
+def ingest_image(uploaded, schedule=True):
+    """
+    ImageAsset cho file upload (dùng lại asset cũ nếu trùng nội dung)
+    schedule=False: không đưa job tạo cỡ vào hàng đợi (lệnh generate_image_derivatives tự xử lý)
+    """
+    data = _read(uploaded)
+    content_hash = hashlib.sha256(data).hexdigest()
+
+    existing = ImageAsset.objects.filter(content_hash=content_hash).first()
+    if existing is not None:
+        if existing.status == 'failed' and schedule:
+            schedule_derivatives(existing)
+        return existing
+
+    try:
+        img = Image.open(BytesIO(data))
+        extension = FORMAT_EXTENSIONS.get(img.format)
+        width, height = img.size
+    except (UnidentifiedImageError, OSError):
+        raise ImageIngestError('File không phải là ảnh hợp lệ')
+    if extension is None:
+        raise ImageIngestError(f'Định dạng không hỗ trợ. Chỉ chấp nhận: {", ".join(FORMAT_EXTENSIONS)}')
+
+    # Tên file theo hash → ghi lại cùng nội dung là idempotent
+    name = f'{ORIGINALS_DIR}/{content_hash[:2]}/{content_hash}.{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+
+    asset, created = ImageAsset.objects.get_or_create(
+        content_hash=content_hash,
+        defaults={'original': name, 'width': width, 'height': height},
+    )
+    if created and schedule:
+        schedule_derivatives(asset)
+    return asset
+
+
+def attach_image(instance, uploaded):
+    """Gắn ảnh upload cho instance có field `image` + `asset` (chưa save instance)"""
+    asset = ingest_image(uploaded)
+    instance.asset = asset
+    instance.image = asset.original.name
+    return asset
+
+
+def schedule_derivatives(asset):
+    from .tasks import generate_image_derivatives
+
+    # Trong transaction: job chỉ hiện ra khi commit
+    generate_image_derivatives.enqueue({'asset_id': asset.pk}, dedup_key=f'image-derivatives:{asset.pk}')
+
+
+# ===== TẠO CÁC CỠ =====
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Process pool dùng chung trong process worker (spawn: process con không mang theo kết nối DB)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_WORKER_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _derived_name(asset, size_name, extension):
+    return f'{DERIVED_DIR}/{asset.content_hash[:2]}/{asset.content_hash}_{size_name}.{extension}'
+
+
+def _save(name, data):
+    # Tên cố định theo hash + cỡ: tạo lại thì ghi đè
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(data))
+
+
+def _store_rendered(asset, rendered):
+    derivatives = {}
+    for size_name, result in rendered.items():
+        if 'same_as' in result:
+            continue
+        derivatives[size_name] = {
+            'width': result['width'],
+            'height': result['height'],
+            'jpeg': _save(_derived_name(asset, size_name, 'jpg'), result['jpeg']),
+            'webp': _save(_derived_name(asset, size_name, 'webp'), result['webp']),
+        }
+    for size_name, result in rendered.items():
+        if 'same_as' in result:
+            derivatives[size_name] = derivatives[result['same_as']]
+
+    asset.derivatives = derivatives
+    asset.status = 'ready'
+    asset.error = None
+    asset.processed_at = timezone.now()
+    asset.save(update_fields=['derivatives', 'status', 'error', 'processed_at'])
+
+
+def _mark_failed(asset, error):
+    logger.error('Image derivatives failed for asset %s: %s', asset.pk, error)
+    asset.status = 'failed'
+    asset.error = str(error)[:2000]
+    asset.save(update_fields=['status', 'error'])
+
+
+def generate_derivatives(assets):
+    """
+    Tạo các cỡ cho nhiều asset song song trong process pool; ghi file + DB ở process hiện tại.
+    Trả về (số thành công, số lỗi).
+    """
+    pool = get_process_pool()
+    sizes = {name: tuple(box) for name, box in settings.IMAGE_DERIVATIVE_SIZES.items()}
+    futures = []
+    for asset in assets:
+        try:
+            with default_storage.open(asset.original.name, 'rb') as original:
+                data = original.read()
+        except OSError as e:
+            _mark_failed(asset, e)
+            continue
+        futures.append((asset, pool.submit(
+            render_derivatives, data, sizes, settings.IMAGE_JPEG_QUALITY, settings.IMAGE_WEBP_QUALITY,
+        )))
+
+    done, failed = 0, len(assets) - len(futures)
+    for asset, future in futures:
+        try:
+            _store_rendered(asset, future.result())
+            done += 1
+        except Exception as e:
+            _mark_failed(asset, e)
+            failed += 1
+    return done, failed
+
+
+# ===== URL / SRCSET =====
+
+def variant_url(asset, size_name=None, fmt='jpeg'):
+    """URL (tương đối) của 1 cỡ; chưa có cỡ đó → ảnh gốc"""
+    if asset is None:
+        return None
+    variant = asset.derivatives.get(size_name) if size_name else None
+    if variant:
+        return default_storage.url(variant[fmt])
+    return asset.original.url
+
+
+def srcset(asset, fmt='jpeg', absolute=lambda url: url):
+    """'url 150w, url 400w, ...' theo chiều rộng tăng dần (bỏ cỡ trùng)"""
+    if asset is None:
+        return None
+    variants = {}
+    for variant in asset.derivatives.values():
+        variants.setdefault(variant['width'], variant[fmt])
+    if not variants:
+        if fmt != 'jpeg':
+            return None
+        return f'{absolute(asset.original.url)} {asset.width}w'
+    return ', '.join(
+        f'{absolute(default_storage.url(name))} {width}w' for width, name in sorted(variants.items())
+    )
@@ -0,0 +1,107 @@
+"""
+Benchmark cập nhật giá / tồn kho hàng loạt: vòng lặp get() + save() cũ so với products.bulk_updates
+Chạy: python manage.py benchmark_bulk_updates --variants 5000
+
+Tạo dữ liệu tạm (store / product / variants có prefix "bench-"), chạy cùng 1 thay đổi giá và tồn kho
+bằng 2 cách, in số query, thời gian và số variant/giây. Dữ liệu tạm bị xóa khi kết thúc
+(trừ khi có --keep). Cần PostgreSQL.
+"""
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from products import bulk_updates
+from products.models import Category, Product, ProductVariant
+from store.models import Store
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-row vs set-based bulk stock and price updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--variants', type=int, default=5000, help='Số variants cập nhật')
+        parser.add_argument('--chunk-size', type=int, default=bulk_updates.BULK_UPDATE_CHUNK_SIZE,
+                            help='Số id mỗi câu UPDATE')
+        parser.add_argument('--keep', action='store_true', help='Giữ lại dữ liệu benchmark')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_bulk_updates cần PostgreSQL')
+
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        store, variant_ids = self._setup(tag, options['variants'])
+        try:
+            prices = [(variant_id, Decimal(100000 + i)) for i, variant_id in enumerate(variant_ids)]
+            changes = [(variant_id, 1) for variant_id in variant_ids]
+
+            self._report('price / loop', lambda: self._loop_prices(prices), len(prices))
+            self._report('price / set-based', lambda: bulk_updates.set_prices(
+                prices, store_ids=[store.store_id], chunk_size=options['chunk_size']), len(prices))
+            self._report('stock / loop', lambda: self._loop_stock(changes), len(changes))
+            self._report('stock / set-based', lambda: bulk_updates.adjust_stock(
+                changes, store_ids=[store.store_id], chunk_size=options['chunk_size']), len(changes))
+
+            stocks = set(ProductVariant.objects.filter(pk__in=variant_ids).values_list('stock', flat=True))
+            if stocks != {12}:
+                raise CommandError(f'Stock mismatch: {sorted(stocks)[:5]}')
+            self.stdout.write(self.style.SUCCESS('Stock consistent after both runs'))
+        finally:
+            if not options['keep']:
+                Product.objects.filter(store=store).delete()
+                Category.objects.filter(name=tag).delete()
+                store.delete()
+
+    def _setup(self, tag, count):
+        store = Store.objects.create(
+            store_id=tag, name=tag, slug=tag, email=f'{tag}@example.com', join_date=timezone.now()
+        )
+        category = Category.objects.create(name=tag)
+        product = Product.objects.create(
+            store=store, category=category, name=tag, description=tag, base_price=Decimal('100000')
+        )
+        ProductVariant.objects.bulk_create(
+            ProductVariant(product=product, sku=f'{tag}-{i}', price=Decimal('100000'), stock=10,
+                           option_combinations={'Size': str(i)})
+            for i in range(count)
+        )
+        return store, list(ProductVariant.objects.filter(product=product).values_list('variant_id', flat=True))
+
+    def _loop_prices(self, prices):
+        """Cách cũ của BulkPriceUpdate: get() + kiểm tra quyền + save() từng variant, 1 transaction dài"""
+        with transaction.atomic():
+            for variant_id, price in prices:
+                variant = ProductVariant.objects.get(variant_id=variant_id)
+                variant.product.store_id  # kiểm tra quyền theo store (1 query / variant)
+                variant.price = price
+                variant.save()
+
+    def _loop_stock(self, changes):
+        with transaction.atomic():
+            for variant_id, delta in changes:
+                variant = ProductVariant.objects.get(variant_id=variant_id)
+                variant.product.store_id
+                if variant.stock + delta < 0:
+                    continue
+                variant.stock += delta
+                variant.save()
+
+    def _report(self, label, run, count):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            began = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - began
+        self.stdout.write(
+            f'{label:<18} {count} variants  queries={queries:<6} '
+            f'elapsed={elapsed:.2f}s  throughput={count / elapsed:.0f} variants/s'
+        )
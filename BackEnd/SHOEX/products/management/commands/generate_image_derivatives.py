@@ -0,0 +1,61 @@
+"""
+Tạo các cỡ JPEG/WebP cho ImageAsset (thay cho job nền khi cần chạy hàng loạt)
+Chạy: python manage.py generate_image_derivatives             # asset pending / failed
+      python manage.py generate_image_derivatives --all       # dựng lại tất cả (đổi IMAGE_DERIVATIVE_SIZES)
+      python manage.py generate_image_derivatives --backfill  # tạo asset cho ảnh cũ chưa có asset trước
+
+Mỗi lô --batch-size asset được render song song trong process pool (settings.IMAGE_WORKER_PROCESSES).
+"""
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from products.images import ImageIngestError, generate_derivatives, ingest_image
+from products.models import ImageAsset, ProductAttributeOption, ProductImage
+from reviews.models import ReviewImage
+
+
+class Command(BaseCommand):
+    help = 'Generate JPEG/WebP derivatives for uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Dựng lại cả asset đã sẵn sàng')
+        parser.add_argument('--backfill', action='store_true', help='Tạo asset cho ảnh cũ chưa có asset')
+        parser.add_argument('--batch-size', type=int, default=50, help='Số asset mỗi lô')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            for model in (ProductImage, ProductAttributeOption, ReviewImage):
+                self._backfill(model)
+
+        assets = ImageAsset.objects.order_by('pk')
+        if not options['all']:
+            assets = assets.exclude(status='ready')
+        pks = list(assets.values_list('pk', flat=True))
+
+        done = failed = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(pks), batch_size):
+            batch = list(ImageAsset.objects.filter(pk__in=pks[start:start + batch_size]))
+            batch_done, batch_failed = generate_derivatives(batch)
+            done += batch_done
+            failed += batch_failed
+            self.stdout.write(f'  {start + len(batch)}/{len(pks)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Generated derivatives: {done} ready, {failed} failed'))
+
+    def _backfill(self, model):
+        """Gắn asset cho bản ghi cũ (update thẳng, không qua signal xóa file cũ)"""
+        pk_name = model._meta.pk.name
+        rows = model.objects.filter(asset__isnull=True).exclude(image='').exclude(image__isnull=True)
+        attached = skipped = 0
+        for pk, name in rows.values_list(pk_name, 'image').iterator():
+            try:
+                with default_storage.open(name, 'rb') as uploaded:
+                    asset = ingest_image(uploaded, schedule=False)
+            except (OSError, ImageIngestError) as e:
+                self.stderr.write(f'  {model.__name__} {pk}: {e}')
+                skipped += 1
+                continue
+            model.objects.filter(pk=pk).update(asset=asset, image=asset.original.name)
+            attached += 1
+        self.stdout.write(f'{model.__name__}: attached {attached}, skipped {skipped}')
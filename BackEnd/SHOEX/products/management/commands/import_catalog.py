@@ -0,0 +1,63 @@
+"""
+Nhập catalog từ file CSV / XLSX / JSONL cho 1 cửa hàng (chạy trực tiếp, không qua hàng đợi)
+Chạy: python manage.py import_catalog --store <store_id> catalog.csv
+      python manage.py import_catalog --resume <import_id>     # nhập tiếp lần nhập bị dừng
+
+Định dạng cột: xem products/catalog_import.py
+"""
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog_import import CatalogImportError, detect_format, run_import
+from products.models import CatalogImport
+from store.models import Store
+
+
+class Command(BaseCommand):
+    help = 'Import a seller catalog (CSV / XLSX / JSONL) in batches, resumable'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='File cần nhập')
+        parser.add_argument('--store', help='store_id của cửa hàng')
+        parser.add_argument('--resume', type=int, help='import_id cần nhập tiếp')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            catalog_import = CatalogImport.objects.filter(pk=options['resume']).first()
+            if catalog_import is None:
+                raise CommandError(f"Import {options['resume']} không tồn tại")
+            if catalog_import.status == 'failed':
+                catalog_import.status = 'pending'
+                catalog_import.save(update_fields=['status'])
+        else:
+            catalog_import = self._create(options['path'], options['store'])
+
+        def progress(current):
+            total = current.total_rows or '?'
+            self.stdout.write(f'  {current.processed_rows}/{total} rows, {current.error_count} errors')
+
+        catalog_import, _ = run_import(catalog_import.pk, progress=progress)
+        style = self.style.SUCCESS if catalog_import.status == 'done' else self.style.ERROR
+        self.stdout.write(style(f'Import #{catalog_import.pk} {catalog_import.status}: {catalog_import.message}'))
+        for error in catalog_import.errors[:20]:
+            self.stdout.write(f"  row {error['row']} ({error.get('sku') or '-'}): {error['message']}")
+
+    def _create(self, path, store_id):
+        if not path or not store_id:
+            raise CommandError('Cần path và --store (hoặc --resume)')
+        store = Store.objects.filter(store_id=store_id).first()
+        if store is None:
+            raise CommandError(f'Store {store_id} không tồn tại')
+        try:
+            file_format = detect_format(path)
+        except CatalogImportError as e:
+            raise CommandError(str(e))
+
+        catalog_import = CatalogImport(store=store, file_format=file_format)
+        with open(path, 'rb') as source:
+            catalog_import.file.save(os.path.basename(path), File(source), save=False)
+        catalog_import.save()
+        self.stdout.write(f'Import #{catalog_import.pk}: {path}')
+        return catalog_import
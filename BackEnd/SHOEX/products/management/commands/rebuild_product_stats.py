@@ -0,0 +1,45 @@
+"""
+Tính lại bảng ProductStats (read model cho listing sản phẩm)
+Chạy: python manage.py rebuild_product_stats [--only sales|ratings|variants]
+
+Nên chạy định kỳ (VD: mỗi đêm) với --only sales để trượt cửa sổ sold_count_last_30.
+--only variants cũng tính lại ma trận biến thể (variant_matrix) cho dữ liệu có trước migration 0014.
+"""
+
+from django.core.management.base import BaseCommand
+
+from products import stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild ProductStats read model from orders, reviews and variants'
+
+    ONLY_CHOICES = {
+        'sales': stats.SALES_FIELDS,
+        'ratings': stats.RATING_FIELDS,
+        'variants': stats.VARIANT_FIELDS,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            choices=list(self.ONLY_CHOICES),
+            help='Chỉ tính lại một nhóm chỉ số'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=stats.REBUILD_BATCH_SIZE,
+            help='Số sản phẩm mỗi lô'
+        )
+
+    def handle(self, *args, **options):
+        fields = self.ONLY_CHOICES.get(options['only']) if options['only'] else None
+        total = stats.rebuild_product_stats(
+            batch_size=options['batch_size'],
+            fields=fields,
+            stdout=self.stdout,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt ProductStats for {total} products')
+        )
@@ -0,0 +1,18 @@
+"""
+Tính lại Product.search_vector cho toàn bộ sản phẩm
+Chạy: python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+
+from products.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Rebuild full-text search vectors for all products'
+
+    def handle(self, *args, **options):
+        total = update_search_vectors()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt search vectors for {total} products')
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_alter_productattribute_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='products.product', verbose_name='Sản phẩm')),
+                ('sold_count', models.PositiveIntegerField(default=0, verbose_name='Tổng số đã bán')),
+                ('sold_count_last_30', models.PositiveIntegerField(default=0, help_text='Cửa sổ trượt, được làm mới bởi lệnh rebuild_product_stats', verbose_name='Số đã bán 30 ngày gần nhất')),
+                ('avg_rating', models.FloatField(default=0.0, verbose_name='Điểm đánh giá trung bình')),
+                ('review_count', models.PositiveIntegerField(default=0, verbose_name='Số lượng đánh giá')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Giá thấp nhất (variant active)')),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Giá cao nhất (variant active)')),
+                ('total_stock', models.IntegerField(default=0, verbose_name='Tổng tồn kho (variant active)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Ngày cập nhật')),
+            ],
+            options={
+                'verbose_name': 'Thống kê sản phẩm',
+                'verbose_name_plural': 'Thống kê sản phẩm',
+                'indexes': [models.Index(fields=['-sold_count'], name='product_stats_sold_idx'), models.Index(fields=['-sold_count_last_30'], name='product_stats_sold30_idx'), models.Index(fields=['avg_rating'], name='product_stats_rating_idx'), models.Index(fields=['min_price'], name='product_stats_min_price_idx'), models.Index(fields=['total_stock'], name='product_stats_stock_idx')],
+            },
+        ),
+    ]
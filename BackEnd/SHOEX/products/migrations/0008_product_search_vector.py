@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:11
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+
+# Cấu hình full-text "shoex_vi": tách từ như 'simple' rồi bỏ dấu (giay == giày, đ == d)
+CREATE_SEARCH_CONFIG = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'shoex_vi') THEN
+        CREATE TEXT SEARCH CONFIGURATION shoex_vi (COPY = simple);
+        ALTER TEXT SEARCH CONFIGURATION shoex_vi
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+    END IF;
+END
+$$;
+"""
+
+DROP_SEARCH_CONFIG = "DROP TEXT SEARCH CONFIGURATION IF EXISTS shoex_vi;"
+
+BACKFILL_SEARCH_VECTOR = """
+UPDATE products_product AS p
+SET search_vector =
+    setweight(to_tsvector('shoex_vi', coalesce(p.name, '')), 'A') ||
+    setweight(to_tsvector('shoex_vi', coalesce(b.name, '')), 'B') ||
+    setweight(to_tsvector('shoex_vi', coalesce(c.name, '')), 'B') ||
+    setweight(to_tsvector('shoex_vi', coalesce(p.description, '')), 'C')
+FROM products_product AS p2
+LEFT JOIN brand_brand AS b ON b.brand_id = p2.brand_id
+LEFT JOIN products_category AS c ON c.category_id = p2.category_id
+WHERE p2.product_id = p.product_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brand', '0002_remove_brand_id_brand_brand_id'),
+        ('collection', '0002_initial'),
+        ('products', '0007_productstats'),
+        ('store', '0004_remove_store_phone_addressstore_phone'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.RunSQL(CREATE_SEARCH_CONFIG, DROP_SEARCH_CONFIG),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Chỉ mục tìm kiếm'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_VECTOR, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:21
+
+from django.db import migrations, models
+
+
+def backfill_category_paths(apps, schema_editor):
+    """Tính path/depth cho danh mục hiện có (duyệt cây trong bộ nhớ)"""
+    Category = apps.get_model('products', 'Category')
+    parents = dict(Category.objects.values_list('category_id', 'parent_id'))
+
+    def chain(category_id):
+        ids, seen = [], set()
+        while category_id is not None and category_id not in seen:
+            seen.add(category_id)
+            ids.insert(0, category_id)
+            category_id = parents.get(category_id)
+        return ids
+
+    updated = []
+    for category in Category.objects.only('category_id'):
+        ids = chain(category.category_id)
+        category.path = '/' + ''.join(f'{i}/' for i in ids)
+        category.depth = len(ids) - 1
+        updated.append(category)
+    Category.objects.bulk_update(updated, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Cấp độ'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Đường dẫn cây'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(backfill_category_paths, migrations.RunPython.noop),
+    ]
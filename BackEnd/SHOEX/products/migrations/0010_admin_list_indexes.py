@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brand', '0002_remove_brand_id_brand_brand_id'),
+        ('collection', '0002_initial'),
+        ('products', '0009_category_path'),
+        ('store', '0005_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created_at', '-product_id'], name='product_created_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('asset_id', models.AutoField(primary_key=True, serialize=False, verbose_name='Mã ảnh')),
+                ('content_hash', models.CharField(max_length=64, unique=True, verbose_name='SHA-256 nội dung')),
+                ('original', models.ImageField(max_length=255, upload_to='', verbose_name='Ảnh gốc')),
+                ('width', models.PositiveIntegerField(verbose_name='Chiều rộng gốc')),
+                ('height', models.PositiveIntegerField(verbose_name='Chiều cao gốc')),
+                ('status', models.CharField(choices=[('pending', 'Đang tạo các cỡ ảnh'), ('ready', 'Sẵn sàng'), ('failed', 'Lỗi')], default='pending', max_length=10, verbose_name='Trạng thái')),
+                ('derivatives', models.JSONField(blank=True, default=dict, help_text='{"card": {"width": 400, "height": 300, "jpeg": "...", "webp": "..."}, ...}', verbose_name='Các cỡ ảnh')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Lỗi xử lý')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Ngày tạo')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Thời điểm tạo xong các cỡ')),
+            ],
+            options={
+                'verbose_name': 'Ảnh (gốc + các cỡ)',
+                'verbose_name_plural': 'Ảnh (gốc + các cỡ)',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='productattributeoption',
+            name='asset',
+            field=models.ForeignKey(blank=True, help_text='Bản ghi ImageAsset (products/images.py); image trỏ tới ảnh gốc của asset', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.imageasset', verbose_name='Ảnh gốc + các cỡ'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='asset',
+            field=models.ForeignKey(blank=True, help_text='Bản ghi ImageAsset (products/images.py); image trỏ tới ảnh gốc của asset', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.imageasset', verbose_name='Ảnh gốc + các cỡ'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_image_assets'),
+        ('store', '0005_sales_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogImport',
+            fields=[
+                ('import_id', models.AutoField(primary_key=True, serialize=False, verbose_name='Mã lần nhập')),
+                ('file', models.FileField(max_length=255, upload_to='imports/catalog/', verbose_name='File nhập')),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel (XLSX)'), ('jsonl', 'JSON Lines')], max_length=10, verbose_name='Định dạng')),
+                ('status', models.CharField(choices=[('pending', 'Chờ xử lý'), ('running', 'Đang nhập'), ('done', 'Hoàn tất'), ('failed', 'Lỗi')], default='pending', max_length=10, verbose_name='Trạng thái')),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True, verbose_name='Tổng số dòng')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='Số dòng đã xử lý')),
+                ('created_products', models.PositiveIntegerField(default=0, verbose_name='Sản phẩm tạo mới')),
+                ('created_variants', models.PositiveIntegerField(default=0, verbose_name='Biến thể tạo mới')),
+                ('updated_variants', models.PositiveIntegerField(default=0, verbose_name='Biến thể cập nhật')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='Số dòng lỗi')),
+                ('errors', models.JSONField(blank=True, default=list, help_text='[{"row": 12, "sku": "...", "message": "..."}], tối đa settings.CATALOG_IMPORT_MAX_ERRORS', verbose_name='Lỗi theo dòng')),
+                ('message', models.TextField(blank=True, default='', verbose_name='Ghi chú / lỗi chung')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Ngày tạo')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Bắt đầu')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Kết thúc')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Người tạo')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_imports', to='store.store', verbose_name='Cửa hàng')),
+            ],
+            options={
+                'verbose_name': 'Lần nhập catalog',
+                'verbose_name_plural': 'Lần nhập catalog',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
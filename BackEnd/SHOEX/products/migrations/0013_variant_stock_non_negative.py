@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_catalog_import'),
+    ]
+
+    operations = [
+        # Dữ liệu cũ có thể đã âm (trừ kho không điều kiện trước đây) → về 0 trước khi thêm CHECK
+        migrations.RunSQL(
+            "UPDATE products_productvariant SET stock = 0 WHERE stock < 0",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='productvariant',
+            constraint=models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='productvariant_stock_non_negative'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:35
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_variant_stock_non_negative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productstats',
+            name='variant_matrix',
+            field=models.JSONField(blank=True, help_text='Trục thuộc tính + (variant_id, tồn kho, giá) theo từng kết hợp (products/variant_matrix.py)', null=True, verbose_name='Ma trận biến thể'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['option_combinations'], name='variant_options_gin', opclasses=['jsonb_path_ops']),
+        ),
+    ]
@@ -1,8 +1,13 @@
+from django.conf import settings
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 import json
 from django.utils.text import slugify
-from django.db.models import Avg, Count
+from django.db import transaction
+from django.db.models import Avg, Count, F, Value
+from django.db.models.functions import Concat, Substr
 # Create your models here.
 
 class Category(models.Model):
@@ -43,15 +48,74 @@ class Category(models.Model):
         auto_now_add=True,
         verbose_name="Ngày tạo"
     )
+    # Materialized path: "/<id gốc>/.../<id chính nó>/", tự cập nhật trong save()
+    path = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Đường dẫn cây"
+    )
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Cấp độ"
+    )
 
     class Meta:
         verbose_name = "Danh mục"
         verbose_name_plural = "Danh mục"
         ordering = ['name']
+        indexes = [
+            # varchar_pattern_ops để LIKE 'prefix%' dùng được index
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return self.name
 
+    def _build_path(self):
+        # Đọc path của cha từ DB: instance self.parent có thể đã cũ nếu cây vừa bị dời
+        parent_path = '/'
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or '/'
+        if f'/{self.category_id}/' in parent_path:
+            raise ValidationError("Danh mục cha không được là chính nó hoặc danh mục con của nó")
+        return f"{parent_path}{self.category_id}/", parent_path.count('/') - 1
+
+    def save(self, *args, **kwargs):
+        """Lưu và cập nhật path/depth của chính nó + toàn bộ cây con nếu đổi danh mục cha"""
+        with transaction.atomic():
+            if self.category_id is not None and self.parent_id is not None:
+                self._build_path()  # chặn vòng lặp trước khi ghi
+            super().save(*args, **kwargs)
+
+            old_path, old_depth = self.path, self.depth
+            new_path, new_depth = self._build_path()
+            if new_path == old_path:
+                return
+
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+            if old_path:
+                # Dời cả cây con: thay prefix cũ bằng prefix mới trong 1 UPDATE
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (new_depth - old_depth),
+                )
+            self.path, self.depth = new_path, new_depth
+
+    @property
+    def ancestor_ids(self):
+        """ID các danh mục tổ tiên (gốc → cha), đọc từ path, không query"""
+        return [int(part) for part in self.path.strip('/').split('/')[:-1] if part]
+
+    def get_descendants(self, include_self=False):
+        """Toàn bộ danh mục con cháu trong 1 query (LIKE 'path%')"""
+        qs = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            qs = qs.exclude(pk=self.pk)
+        return qs
+
 
 class Product(models.Model):
     """Sản phẩm chính - Master data"""
@@ -141,6 +205,13 @@ class Product(models.Model):
     )
     rating = models.FloatField(default=0.0)
     review_count = models.IntegerField(default=0)
+
+    # Full-text search (name + brand + category + description), bảo trì bởi products/search.py
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="Chỉ mục tìm kiếm"
+    )
     class Meta:
         verbose_name = "Sản phẩm"
         verbose_name_plural = "Sản phẩm" 
@@ -148,6 +219,8 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['store', 'is_active']),
             models.Index(fields=['category', 'is_active']),
+            models.Index(fields=['-created_at', '-product_id'], name='product_created_idx'),
+            GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
         ]
 
     def __str__(self):
@@ -297,6 +370,15 @@ class ProductAttributeOption(models.Model):
         verbose_name="Ảnh",
         help_text="Upload ảnh cho tùy chọn này (nếu attribute.has_image = True)"
     )
+    asset = models.ForeignKey(
+        'ImageAsset',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Ảnh gốc + các cỡ",
+        help_text="Bản ghi ImageAsset (products/images.py); image trỏ tới ảnh gốc của asset"
+    )
     display_order = models.IntegerField(
         default=0,
         verbose_name="Thứ tự hiển thị"
@@ -322,34 +404,20 @@ class ProductAttributeOption(models.Model):
         ]
 
     def get_variants(self):
-        """Lấy tất cả variants có tùy chọn này"""
-        return self.product.variants.filter(
-            option_combinations__contains=f'"{self.attribute.name}": "{self.value}"',
-            is_active=True
-        )
+        """Lấy tất cả variants có tùy chọn này (jsonb @>, dùng GIN index variant_options_gin)"""
+        from .variant_matrix import option_keys
+
+        match = models.Q()
+        for key in option_keys(self.attribute):
+            match |= models.Q(option_combinations__contains={key: self.value})
+        return self.product.variants.filter(match, is_active=True)
 
     def get_available_combinations(self, exclude_attributes=None):
-        """Lấy các kết hợp khác có sẵn khi đã chọn tùy chọn này"""
-        exclude_attributes = exclude_attributes or []
-        variants = self.get_variants().filter(stock__gt=0)
-        
-        combinations = {}
-        for variant in variants:
-            try:
-                options = json.loads(variant.option_combinations)
-                for attr_name, attr_value in options.items():
-                    if attr_name not in exclude_attributes and attr_name != self.attribute.name:
-                        if attr_name not in combinations:
-                            combinations[attr_name] = set()
-                        combinations[attr_name].add(attr_value)
-            except (json.JSONDecodeError, TypeError):
-                pass
-        
-        # Convert sets to sorted lists
-        for attr_name in combinations:
-            combinations[attr_name] = sorted(list(combinations[attr_name]))
-        
-        return combinations
+        """Lấy các kết hợp khác có sẵn khi đã chọn tùy chọn này (đọc từ ma trận biến thể của product)"""
+        from .variant_matrix import available_values, stored_matrices
+
+        matrix = stored_matrices([self.product_id])[self.product_id]
+        return available_values(matrix, self.attribute.name, self.value, exclude=exclude_attributes or ())
 
     @property
     def image_url(self):
@@ -426,6 +494,12 @@ class ProductVariant(models.Model):
         indexes = [
             models.Index(fields=['product', 'is_active']),
             models.Index(fields=['sku']),
+            # option_combinations @> {...} (ProductAttributeOption.get_variants, lọc theo size/màu)
+            GinIndex(fields=['option_combinations'], name='variant_options_gin', opclasses=['jsonb_path_ops']),
+        ]
+        constraints = [
+            # Chốt chặn cuối cho mọi đường trừ kho (checkout, cập nhật hàng loạt...)
+            models.CheckConstraint(condition=models.Q(stock__gte=0), name='productvariant_stock_non_negative'),
         ]
 
     def __str__(self):
@@ -453,11 +527,19 @@ class ProductVariant(models.Model):
         1. Tìm trong attribute options xem cái nào có ảnh (ưu tiên Color).
         2. Nếu không có, lấy ảnh đại diện của Product cha.
         """
+        return self.get_variant_image()
+
+    def get_variant_image(self, attribute_options=None, gallery_images=None):
+        """
+        Như variant_image; attribute_options / gallery_images là options / ảnh của Product cha
+        đã load sẵn (DataLoader của GraphQL), None → query.
+        """
         # 1. Lấy tất cả các options của Product cha mà có ảnh (thường là Màu sắc)
         # Lưu ý: attribute__name='color' dựa trên choices của bạn
-        image_options = self.product.attribute_options.filter(
-            attribute__has_image=True
-        )
+        if attribute_options is None:
+            image_options = self.product.attribute_options.filter(attribute__has_image=True)
+        else:
+            image_options = [option for option in attribute_options if option.attribute.has_image]
 
         current_options = self.option_combinations
         if isinstance(current_options, str):
@@ -479,8 +561,12 @@ class ProductVariant(models.Model):
                 return option.image.url
 
         # 3. Fallback: Nếu không tìm thấy ảnh option, trả về ảnh thumbnail của Product cha
-        if self.product.gallery_images.filter(is_thumbnail=True).exists():
-             return self.product.gallery_images.filter(is_thumbnail=True).first().image.url
+        if gallery_images is None:
+            thumbnail = self.product.gallery_images.filter(is_thumbnail=True).first()
+        else:
+            thumbnail = next((image for image in gallery_images if image.is_thumbnail), None)
+        if thumbnail and thumbnail.image:
+            return thumbnail.image.url
         
         return None
     @property
@@ -555,6 +641,16 @@ class ProductImage(models.Model):
         help_text="Upload ảnh sản phẩm"
     )
     
+    asset = models.ForeignKey(
+        'ImageAsset',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Ảnh gốc + các cỡ",
+        help_text="Bản ghi ImageAsset (products/images.py); image trỏ tới ảnh gốc của asset"
+    )
+    
     is_thumbnail = models.BooleanField(
         default=False,
         verbose_name="Ảnh đại diện",
@@ -603,4 +699,231 @@ class ProductImage(models.Model):
         return f"{img_type} - {self.product.name}"
 
 
+class ImageAsset(models.Model):
+    """
+    Ảnh gốc (lưu 1 lần theo SHA-256 nội dung) + các cỡ dẫn xuất JPEG/WebP
+    Dùng chung cho ProductImage, ProductAttributeOption và ReviewImage (xem products/images.py)
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Đang tạo các cỡ ảnh'),
+        ('ready', 'Sẵn sàng'),
+        ('failed', 'Lỗi'),
+    ]
+
+    asset_id = models.AutoField(
+        primary_key=True,
+        verbose_name="Mã ảnh"
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="SHA-256 nội dung"
+    )
+    original = models.ImageField(
+        max_length=255,
+        verbose_name="Ảnh gốc"
+    )
+    width = models.PositiveIntegerField(verbose_name="Chiều rộng gốc")
+    height = models.PositiveIntegerField(verbose_name="Chiều cao gốc")
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name="Trạng thái"
+    )
+    derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Các cỡ ảnh",
+        help_text='{"card": {"width": 400, "height": 300, "jpeg": "...", "webp": "..."}, ...}'
+    )
+    error = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name="Lỗi xử lý"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Ngày tạo"
+    )
+    processed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Thời điểm tạo xong các cỡ"
+    )
+
+    class Meta:
+        verbose_name = "Ảnh (gốc + các cỡ)"
+        verbose_name_plural = "Ảnh (gốc + các cỡ)"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.width}x{self.height}, {self.status})"
+
+
+class CatalogImport(models.Model):
+    """
+    1 lần nhập catalog từ file CSV / XLSX / JSONL của người bán (products/catalog_import.py)
+    processed_rows là điểm dừng đã commit: chạy lại sẽ bỏ qua số dòng này
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Chờ xử lý'),
+        ('running', 'Đang nhập'),
+        ('done', 'Hoàn tất'),
+        ('failed', 'Lỗi'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+        ('jsonl', 'JSON Lines'),
+    ]
+
+    import_id = models.AutoField(
+        primary_key=True,
+        verbose_name="Mã lần nhập"
+    )
+    store = models.ForeignKey(
+        'store.Store',
+        on_delete=models.CASCADE,
+        related_name='catalog_imports',
+        verbose_name="Cửa hàng"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Người tạo"
+    )
+    file = models.FileField(
+        upload_to='imports/catalog/',
+        max_length=255,
+        verbose_name="File nhập"
+    )
+    file_format = models.CharField(
+        max_length=10,
+        choices=FORMAT_CHOICES,
+        verbose_name="Định dạng"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name="Trạng thái"
+    )
+    total_rows = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Tổng số dòng"
+    )
+    processed_rows = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Số dòng đã xử lý"
+    )
+    created_products = models.PositiveIntegerField(default=0, verbose_name="Sản phẩm tạo mới")
+    created_variants = models.PositiveIntegerField(default=0, verbose_name="Biến thể tạo mới")
+    updated_variants = models.PositiveIntegerField(default=0, verbose_name="Biến thể cập nhật")
+    error_count = models.PositiveIntegerField(default=0, verbose_name="Số dòng lỗi")
+    errors = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Lỗi theo dòng",
+        help_text='[{"row": 12, "sku": "...", "message": "..."}], tối đa settings.CATALOG_IMPORT_MAX_ERRORS'
+    )
+    message = models.TextField(
+        blank=True,
+        default='',
+        verbose_name="Ghi chú / lỗi chung"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Ngày tạo"
+    )
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Bắt đầu")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Kết thúc")
+
+    class Meta:
+        verbose_name = "Lần nhập catalog"
+        verbose_name_plural = "Lần nhập catalog"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import #{self.import_id} ({self.store_id}, {self.status})"
+
+
+class ProductStats(models.Model):
+    """
+    Read model thống kê sản phẩm (1 dòng / product)
+    Được cập nhật dần từ OrderItem, Review, ProductVariant (xem products/stats.py)
+    để listing lọc/sắp xếp trên cột có index thay vì SUM/AVG/MIN/MAX mỗi request.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name="Sản phẩm"
+    )
+    sold_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Tổng số đã bán"
+    )
+    sold_count_last_30 = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Số đã bán 30 ngày gần nhất",
+        help_text="Cửa sổ trượt, được làm mới bởi lệnh rebuild_product_stats"
+    )
+    avg_rating = models.FloatField(
+        default=0.0,
+        verbose_name="Điểm đánh giá trung bình"
+    )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Số lượng đánh giá"
+    )
+    min_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Giá thấp nhất (variant active)"
+    )
+    max_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Giá cao nhất (variant active)"
+    )
+    total_stock = models.IntegerField(
+        default=0,
+        verbose_name="Tổng tồn kho (variant active)"
+    )
+    variant_matrix = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="Ma trận biến thể",
+        help_text="Trục thuộc tính + (variant_id, tồn kho, giá) theo từng kết hợp (products/variant_matrix.py)"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Ngày cập nhật"
+    )
+
+    class Meta:
+        verbose_name = "Thống kê sản phẩm"
+        verbose_name_plural = "Thống kê sản phẩm"
+        indexes = [
+            models.Index(fields=['-sold_count'], name='product_stats_sold_idx'),
+            models.Index(fields=['-sold_count_last_30'], name='product_stats_sold30_idx'),
+            models.Index(fields=['avg_rating'], name='product_stats_rating_idx'),
+            models.Index(fields=['min_price'], name='product_stats_min_price_idx'),
+            models.Index(fields=['total_stock'], name='product_stats_stock_idx'),
+        ]
+
+    def __str__(self):
+        return f"Stats - {self.product_id}"
+
+
 # Bỏ phần cũ vì đã được thay thế ở trên
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Full-text search cho sản phẩm (PostgreSQL)
+
+- Product.search_vector: tsvector (name A, brand/category B, description C)
+  được cập nhật qua signal (products/signals.py) và lệnh rebuild_search_index
+- Cấu hình 'shoex_vi' (migration 0008) bỏ dấu tiếng Việt: "giay" khớp "giày"
+- search_products(): lọc qua GIN index, xếp hạng ts_rank, kèm đoạn highlight
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchHeadline
+from django.db import connection
+from django.db.models import F, IntegerField, Value
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = 'shoex_vi'
+
+# Các field của Product ảnh hưởng tới search_vector
+SEARCH_SOURCE_FIELDS = {'name', 'description', 'brand', 'brand_id', 'category', 'category_id'}
+
+HEADLINE_OPTIONS = {
+    'start_sel': '<mark>',
+    'stop_sel': '</mark>',
+    'max_words': 25,
+    'min_words': 10,
+    'max_fragments': 2,
+}
+
+_UPDATE_VECTOR_SQL = """
+UPDATE products_product AS p
+SET search_vector =
+    setweight(to_tsvector(%(config)s, coalesce(p.name, '')), 'A') ||
+    setweight(to_tsvector(%(config)s, coalesce(b.name, '')), 'B') ||
+    setweight(to_tsvector(%(config)s, coalesce(c.name, '')), 'B') ||
+    setweight(to_tsvector(%(config)s, coalesce(p.description, '')), 'C')
+FROM products_product AS p2
+LEFT JOIN brand_brand AS b ON b.brand_id = p2.brand_id
+LEFT JOIN products_category AS c ON c.category_id = p2.category_id
+WHERE p2.product_id = p.product_id
+"""
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# ts_rank là float4: giá trị qua cursor keyset (JSON) không còn bằng đúng giá trị trong DB
+# → sắp xếp theo điểm nguyên (rank × SCORE_SCALE, làm tròn)
+SCORE_SCALE = 1_000_000
+
+
+def update_search_vectors(product_ids=None, brand_id=None, category_id=None):
+    """
+    Tính lại search_vector bằng một câu UPDATE ... FROM (không fire signal).
+    Không truyền tham số nào → tính lại toàn bộ bảng.
+    """
+    sql = _UPDATE_VECTOR_SQL
+    params = {'config': SEARCH_CONFIG}
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return 0
+        sql += " AND p.product_id = ANY(%(ids)s)"
+        params['ids'] = product_ids
+    if brand_id is not None:
+        sql += " AND p.brand_id = %(brand_id)s"
+        params['brand_id'] = brand_id
+    if category_id is not None:
+        sql += " AND p.category_id = %(category_id)s"
+        params['category_id'] = category_id
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def build_search_query(text):
+    """
+    Chuyển chuỗi người dùng gõ thành tsquery an toàn:
+    các từ nối bằng AND, từ cuối cùng khớp tiền tố (gõ dần "gia" → "giày").
+    Trả về None nếu không có từ nào hợp lệ.
+    """
+    tokens = _TOKEN_RE.findall(text or '')
+    if not tokens:
+        return None
+    terms = tokens[:-1] + [f"{tokens[-1]}:*"]
+    return SearchQuery(' & '.join(terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def filter_by_search(queryset, text):
+    """Lọc queryset Product theo search_vector (dùng GIN index)"""
+    query = build_search_query(text)
+    if query is None:
+        return queryset.none()
+    return queryset.filter(search_vector=query)
+
+
+def search_products(queryset, text, with_headline=True):
+    """
+    Lọc + xếp hạng queryset Product theo từ khóa.
+    Annotate: search_rank (ts_rank), search_score (rank làm tròn, dùng để sắp xếp / cursor)
+    và search_headline (đoạn mô tả có <mark>).
+    """
+    query = build_search_query(text)
+    if query is None:
+        return queryset.none()
+
+    qs = queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(F('search_vector'), query)
+    ).annotate(
+        search_score=Cast(F('search_rank') * Value(float(SCORE_SCALE)), IntegerField())
+    )
+    if with_headline:
+        qs = qs.annotate(
+            search_headline=SearchHeadline(
+                'description', query, config=SEARCH_CONFIG, **HEADLINE_OPTIONS
+            )
+        )
+    return qs.order_by('-search_score', '-created_at', '-product_id')
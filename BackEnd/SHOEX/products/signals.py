@@ -2,10 +2,17 @@ import os
 from django.db.models.signals import post_delete, pre_save
 from django.dispatch import receiver
 from django.conf import settings
-from django.db.models.signals import post_delete,pre_save
+from django.db.models.signals import post_delete,pre_save, post_save
 from django.dispatch import receiver
-from reviews.models import Review
-from .models import ProductImage, ProductAttributeOption
+from django.db import transaction
+from reviews.models import Review, ReviewImage
+from orders.models import OrderItem
+from brand.models import Brand
+from .models import Product, ProductVariant, ProductImage, ProductAttributeOption, Category
+from . import stats
+from . import search
+from .images import attach_image, is_asset_file
+from .category_tree import invalidate_category_tree
 
 @receiver(pre_save, sender=Review)
 def update_product_rating_on_save(sender, instance, **kwargs):
@@ -14,12 +21,113 @@ def update_product_rating_on_save(sender, instance, **kwargs):
 @receiver(post_delete, sender=Review)
 def update_product_rating_on_delete(sender, instance, **kwargs):
     instance.order_item.variant.product.update_rating()
+
+
+# ===== FULL-TEXT SEARCH VECTOR =====
+
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Tính lại search_vector khi tên / mô tả / brand / category thay đổi"""
+    if update_fields is not None and not (set(update_fields) & search.SEARCH_SOURCE_FIELDS):
+        return
+    product_id = instance.product_id
+    transaction.on_commit(lambda: search.update_search_vectors([product_id]))
+
+
+@receiver(post_save, sender=Brand)
+def update_search_vector_on_brand_save(sender, instance, created, **kwargs):
+    if created:
+        return
+    brand_id = instance.brand_id
+    transaction.on_commit(lambda: search.update_search_vectors(brand_id=brand_id))
+
+
+@receiver(post_save, sender=Category)
+def update_search_vector_on_category_save(sender, instance, created, **kwargs):
+    if created:
+        return
+    category_id = instance.category_id
+    transaction.on_commit(lambda: search.update_search_vectors(category_id=category_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree_on_change(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_category_tree)
+
+
+# ===== PRODUCT STATS (read model) =====
+
+def _product_id_of_item(order_item):
+    """Lấy product_id của OrderItem mà không query lại variant nếu đã có sẵn"""
+    if OrderItem.variant.is_cached(order_item):
+        return order_item.variant.product_id
+    return ProductVariant.objects.filter(
+        pk=order_item.variant_id
+    ).values_list('product_id', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def create_product_stats(sender, instance, created, **kwargs):
+    """Mỗi product mới có sẵn một dòng ProductStats"""
+    if created:
+        stats.ensure_stats(instance.product_id)
+
+
+@receiver(post_save, sender=OrderItem)
+def update_product_stats_on_order_item_save(sender, instance, created, **kwargs):
+    """Cộng dồn số lượng bán khi tạo OrderItem (sau commit để không giữ lock lâu)"""
+    product_id = _product_id_of_item(instance)
+    if not product_id:
+        return
+    if created:
+        transaction.on_commit(lambda: stats.record_sale(product_id, instance.quantity))
+    else:
+        transaction.on_commit(lambda: stats.refresh_product_stats([product_id], fields=stats.SALES_FIELDS))
+
+
+@receiver(post_delete, sender=OrderItem)
+def update_product_stats_on_order_item_delete(sender, instance, **kwargs):
+    product_id = _product_id_of_item(instance)
+    if not product_id:
+        return
+    transaction.on_commit(lambda: stats.refresh_product_stats([product_id], fields=stats.SALES_FIELDS))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def update_product_stats_on_review_change(sender, instance, **kwargs):
+    try:
+        product_id = _product_id_of_item(instance.order_item)
+    except OrderItem.DoesNotExist:
+        return
+    if not product_id:
+        return
+    transaction.on_commit(lambda: stats.refresh_product_stats([product_id], fields=stats.RATING_FIELDS))
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def update_product_stats_on_variant_change(sender, instance, **kwargs):
+    """Giá / tồn kho thay đổi → tính lại min/max price và total_stock"""
+    product_id = instance.product_id
+    transaction.on_commit(lambda: stats.refresh_product_stats([product_id], fields=stats.VARIANT_FIELDS))
+
+
+@receiver(post_save, sender=ProductAttributeOption)
+@receiver(post_delete, sender=ProductAttributeOption)
+def update_variant_matrix_on_option_change(sender, instance, **kwargs):
+    """Thứ tự trục / giá trị của ma trận biến thể theo display_order của option"""
+    product_id = instance.product_id
+    transaction.on_commit(lambda: stats.refresh_product_stats([product_id], fields=stats.VARIANT_FIELDS))
+
+
 @receiver(post_delete, sender=ProductImage)
 def delete_product_image_file(sender, instance, **kwargs):
     """
     Xóa file ảnh khi xóa ProductImage
     """
-    if instance.image:
+    if instance.image and not is_asset_file(instance.image.name):
         if os.path.isfile(instance.image.path):
             os.remove(instance.image.path)
 
@@ -29,7 +137,7 @@ def delete_product_attribute_option_image_file(sender, instance, **kwargs):
     """
     Xóa file ảnh khi xóa ProductAttributeOption
     """
-    if instance.image:
+    if instance.image and not is_asset_file(instance.image.name):
         if os.path.isfile(instance.image.path):
             os.remove(instance.image.path)
 
@@ -49,7 +157,7 @@ def delete_old_product_image_file_on_update(sender, instance, **kwargs):
 
     new_file = instance.image
     if not old_file == new_file:
-        if old_file and os.path.isfile(old_file.path):
+        if old_file and not is_asset_file(old_file.name) and os.path.isfile(old_file.path):
             os.remove(old_file.path)
 
 
@@ -68,5 +176,18 @@ def delete_old_product_attribute_option_image_file_on_update(sender, instance, *
 
     new_file = instance.image
     if not old_file == new_file:
-        if old_file and os.path.isfile(old_file.path):
-            os.remove(old_file.path)
\ No newline at end of file
+        if old_file and not is_asset_file(old_file.name) and os.path.isfile(old_file.path):
+            os.remove(old_file.path)
+
+
+@receiver(pre_save, sender=ProductImage)
+@receiver(pre_save, sender=ProductAttributeOption)
+@receiver(pre_save, sender=ReviewImage)
+def attach_uploaded_image_asset(sender, instance, **kwargs):
+    """
+    File ảnh mới upload (admin / code cũ gán thẳng vào `image`) → đưa qua pipeline ảnh:
+    lưu gốc theo hash, dùng lại nếu trùng, tạo các cỡ nền (products/images.py)
+    """
+    image = instance.image
+    if image and not getattr(image, '_committed', True):
+        attach_image(instance, image.file)
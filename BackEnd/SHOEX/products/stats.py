@@ -0,0 +1,173 @@
+"""
+Bảo trì read model ProductStats
+
+- record_sale(): cộng dồn số lượng bán khi có OrderItem mới (UPDATE ... SET x = x + n)
+- refresh_product_stats(): tính lại các cột cho một tập product (dùng khi review/variant thay đổi)
+- rebuild_product_stats(): tính lại toàn bộ theo lô (lệnh rebuild_product_stats)
+- variant_matrix: ma trận biến thể cho bộ chọn size/màu (products/variant_matrix.py), đi cùng nhóm VARIANT_FIELDS
+
+Mỗi nhóm chỉ số được tính bằng một truy vấn GROUP BY riêng trên đúng bảng của nó,
+nên không bị nhân dòng như khi join variants → order_items → reviews trong một query.
+"""
+from datetime import timedelta
+
+from django.db.models import Sum, Avg, Count, Min, Max, Q, F
+from django.utils import timezone
+
+from caching.cache import invalidate_on_commit
+
+from .models import Product, ProductVariant, ProductStats
+
+# Cửa sổ tính "bán chạy 30 ngày" (giữ đồng bộ với DAYS_FOR_NEW trong graphql_api)
+SOLD_WINDOW_DAYS = 30
+REBUILD_BATCH_SIZE = 1000
+
+SALES_FIELDS = ['sold_count', 'sold_count_last_30']
+RATING_FIELDS = ['avg_rating', 'review_count']
+VARIANT_FIELDS = ['min_price', 'max_price', 'total_stock', 'variant_matrix']
+ALL_FIELDS = SALES_FIELDS + RATING_FIELDS + VARIANT_FIELDS
+
+
+def ensure_stats(product_id):
+    """Tạo dòng ProductStats rỗng nếu chưa có"""
+    ProductStats.objects.get_or_create(product_id=product_id)
+
+
+def record_sale(product_id, quantity):
+    """Cộng dồn số lượng bán cho product (atomic, không đọc-rồi-ghi)"""
+    updated = ProductStats.objects.filter(product_id=product_id).update(
+        sold_count=F('sold_count') + quantity,
+        sold_count_last_30=F('sold_count_last_30') + quantity,
+    )
+    if not updated:
+        # Chưa có dòng thống kê → tính đầy đủ một lần
+        refresh_product_stats([product_id])
+    else:
+        invalidate_on_commit('product', f'product:{product_id}')
+
+
+def _sales_by_product(product_ids):
+    from orders.models import OrderItem
+
+    since = timezone.now() - timedelta(days=SOLD_WINDOW_DAYS)
+    rows = OrderItem.objects.filter(variant__product_id__in=product_ids)\
+        .values('variant__product_id')\
+        .annotate(
+            total=Sum('quantity'),
+            recent=Sum('quantity', filter=Q(order__created_at__gte=since)),
+        )
+    return {
+        r['variant__product_id']: {
+            'sold_count': r['total'] or 0,
+            'sold_count_last_30': r['recent'] or 0,
+        }
+        for r in rows
+    }
+
+
+def _ratings_by_product(product_ids):
+    from reviews.models import Review
+
+    rows = Review.objects.filter(order_item__variant__product_id__in=product_ids)\
+        .values('order_item__variant__product_id')\
+        .annotate(avg=Avg('rating'), total=Count('review_id'))
+    return {
+        r['order_item__variant__product_id']: {
+            'avg_rating': r['avg'] or 0.0,
+            'review_count': r['total'] or 0,
+        }
+        for r in rows
+    }
+
+
+def _variants_by_product(product_ids):
+    rows = ProductVariant.objects.filter(product_id__in=product_ids, is_active=True)\
+        .values('product_id')\
+        .annotate(min_p=Min('price'), max_p=Max('price'), stock=Sum('stock'))
+    return {
+        r['product_id']: {
+            'min_price': r['min_p'],
+            'max_price': r['max_p'],
+            'total_stock': r['stock'] or 0,
+        }
+        for r in rows
+    }
+
+
+def refresh_product_stats(product_ids, fields=None):
+    """
+    Tính lại ProductStats cho danh sách product_ids và upsert.
+
+    Args:
+        product_ids: iterable các product_id
+        fields: danh sách cột cần tính lại (mặc định: tất cả)
+    """
+    product_ids = list({pid for pid in product_ids if pid})
+    if not product_ids:
+        return 0
+    fields = list(fields or ALL_FIELDS)
+
+    # Chỉ giữ lại product còn tồn tại (tránh lỗi FK khi product vừa bị xóa)
+    product_ids = list(Product.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True))
+    if not product_ids:
+        return 0
+
+    # Product chưa có dòng thống kê → phải tính đủ mọi cột, không chỉ cột được yêu cầu
+    existing = set(ProductStats.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True))
+    if len(existing) < len(product_ids):
+        fields = list(ALL_FIELDS)
+
+    values = {pid: {} for pid in product_ids}
+    if set(fields) & set(SALES_FIELDS):
+        sales = _sales_by_product(product_ids)
+        for pid in product_ids:
+            values[pid].update(sales.get(pid, {'sold_count': 0, 'sold_count_last_30': 0}))
+    if set(fields) & set(RATING_FIELDS):
+        ratings = _ratings_by_product(product_ids)
+        for pid in product_ids:
+            values[pid].update(ratings.get(pid, {'avg_rating': 0.0, 'review_count': 0}))
+    if set(fields) & set(VARIANT_FIELDS):
+        variants = _variants_by_product(product_ids)
+        for pid in product_ids:
+            values[pid].update(variants.get(pid, {'min_price': None, 'max_price': None, 'total_stock': 0}))
+        # import muộn: variant_matrix → catalog_import → stats
+        from .variant_matrix import matrices_by_product
+
+        matrices = matrices_by_product(product_ids)
+        for pid in product_ids:
+            values[pid]['variant_matrix'] = matrices[pid]
+
+    update_fields = [f for f in fields if f in ALL_FIELDS] + ['updated_at']
+    objs = [
+        ProductStats(product_id=pid, **{k: v for k, v in data.items() if k in fields})
+        for pid, data in values.items()
+    ]
+    ProductStats.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=update_fields,
+    )
+    # Chi tiết sản phẩm đã cache mang theo stats (và variants) → bỏ; tag chung cho response / facet / danh sách
+    # (checkout, cập nhật hàng loạt, nhập catalog không qua post_save nên chỉ được invalidate ở đây)
+    invalidate_on_commit('product', *(f'product:{pid}' for pid in product_ids))
+    return len(objs)
+
+
+def rebuild_product_stats(batch_size=REBUILD_BATCH_SIZE, fields=None, stdout=None):
+    """Tính lại ProductStats cho toàn bộ sản phẩm theo lô"""
+    total = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Product.objects.filter(product_id__gt=last_id)
+            .order_by('product_id')
+            .values_list('product_id', flat=True)[:batch_size]
+        )
+        if not batch:
+            break
+        total += refresh_product_stats(batch, fields=fields)
+        last_id = batch[-1]
+        if stdout:
+            stdout.write(f"  ... {total} sản phẩm")
+    return total
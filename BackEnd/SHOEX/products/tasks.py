@@ -0,0 +1,45 @@
+"""
+Job nền cho sản phẩm (worker: manage.py run_jobs)
+"""
+from jobs.models import Job
+from jobs.queue import task
+from .models import ImageAsset
+
+
+@task('products.generate_image_derivatives', priority=Job.PRIORITY_NORMAL, max_attempts=3)
+def generate_image_derivatives(asset_id):
+    """Tạo các cỡ JPEG/WebP cho 1 ảnh vừa upload (products/images.py)"""
+    from .images import generate_derivatives
+
+    asset = ImageAsset.objects.filter(pk=asset_id).first()
+    if asset is None:
+        return {'asset_id': asset_id, 'skipped': True}
+    done, failed = generate_derivatives([asset])
+    if failed:
+        # Lỗi đã ghi vào asset.error; raise để hàng đợi thử lại theo backoff
+        raise RuntimeError(f'Image derivatives failed for asset {asset_id}: {asset.error}')
+    return {'asset_id': asset_id, 'status': asset.status}
+
+
+@task('products.import_catalog', priority=Job.PRIORITY_LOW, max_attempts=3)
+def import_catalog(import_id):
+    """Nhập catalog từ file (products/catalog_import.py); hết thời gian thì đưa phần còn lại vào job mới"""
+    from django.conf import settings
+    from .catalog_import import ImportConflict, run_import, schedule_import
+
+    try:
+        catalog_import, finished = run_import(import_id, time_budget=settings.CATALOG_IMPORT_SLICE_SECONDS)
+    except ImportConflict:
+        # Worker khác đã nhập tiếp lần này
+        return {'import_id': import_id, 'skipped': True}
+    if not finished:
+        schedule_import(catalog_import)
+    return {'import_id': import_id, 'status': catalog_import.status, 'processed_rows': catalog_import.processed_rows}
+
+
+@import_catalog.on_failure
+def import_catalog_failed(error, import_id):
+    """Lỗi ngoài CatalogImportError hết số lần thử → lần nhập không còn job nào chạy tiếp, đánh dấu failed"""
+    from .catalog_import import fail_import
+
+    fail_import(import_id, f'Lỗi hệ thống: {error}')
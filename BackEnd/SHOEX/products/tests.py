@@ -1,3 +1,809 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from PIL import Image
+
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.text import slugify
+
+from brand.models import Brand
+from caching import cache as tagged_cache
+from discount.models import Voucher, VoucherCategory
+from store.models import Store, StoreUser
+from users.models import User
+from graphql_api.api import schema
+from jobs.models import Job
+from products import bulk_updates
+from jobs.queue import claim, run_job
+from products.catalog_import import run_import, schedule_import
+from products.category_tree import expand_category_ids, get_category_tree
+from products.image_render import render_derivatives
+from products.images import generate_derivatives, ingest_image, srcset
+from products.models import (
+    Category, Product, ProductVariant, ProductAttribute, ProductAttributeOption, ProductImage, ImageAsset,
+    CatalogImport, ProductStats,
+)
+
+
+PRODUCT_GRID_QUERY = """
+query Grid($first: Int) {
+  products(first: $first) {
+    edges {
+      node {
+        name
+        priceRange minPrice maxPrice
+        discountPercentage finalPrice hasDiscount
+        totalStock variantCount availabilityStatus availableColorsCount
+        thumbnailImage { imageUrl }
+        galleryImages { imageUrl }
+        colorImages { value }
+        colorOptions { value }
+        sizeOptions { value }
+        availableAttributes { name }
+        tags
+      }
+    }
+  }
+  productVariants(first: $first) {
+    edges {
+      node { sku discountPercentage finalPrice colorImageUrl }
+    }
+  }
+}
+"""
+
+
+class ProductStatsTest(TestCase):
+    """ProductStats được cập nhật dần từ variant / order item / review và listing sắp xếp theo nó"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from orders.models import Order, SubOrder
+
+        cls.store = Store.objects.create(
+            store_id='stats-store', name='Stats Store', slug='stats-store', email='stats@example.com', join_date=timezone.now()
+        )
+        category = Category.objects.create(name='Giày stats')
+        cls.buyer = User.objects.create(username='stats-buyer', email='stats-buyer@example.com')
+        cls.order = Order.objects.create(buyer=cls.buyer, total_amount=Decimal('0'))
+        cls.sub_order = SubOrder.objects.create(order=cls.order, store=cls.store, subtotal=Decimal('0'))
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.quiet = Product.objects.create(
+                store=cls.store, category=category, name='Ít bán', description='d', base_price=Decimal('100000')
+            )
+            cls.popular = Product.objects.create(
+                store=cls.store, category=category, name='Bán chạy', description='d', base_price=Decimal('100000')
+            )
+            for product in (cls.quiet, cls.popular):
+                for sku, price, stock in (('A', '90000', 3), ('B', '120000', 4)):
+                    ProductVariant.objects.create(
+                        product=product, sku=f'{product.pk}-{sku}', price=Decimal(price), stock=stock,
+                        option_combinations={'Size': sku},
+                    )
+
+    def test_stats_follow_variants_sales_and_reviews(self):
+        from orders.models import OrderItem
+        from reviews.models import Review
+
+        stats = ProductStats.objects.get(product=self.popular)
+        self.assertEqual((stats.min_price, stats.max_price, stats.total_stock), (Decimal('90000'), Decimal('120000'), 7))
+        self.assertEqual(stats.sold_count, 0)
+
+        variant = self.popular.variants.get(sku=f'{self.popular.pk}-A')
+        with self.captureOnCommitCallbacks(execute=True):
+            item = OrderItem.objects.create(
+                order=self.order, sub_order=self.sub_order, variant=variant, quantity=3, price_at_order=Decimal('90000')
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(order_item=item, rating=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.stock = 0
+            variant.save()
+
+        stats.refresh_from_db()
+        self.assertEqual((stats.sold_count, stats.sold_count_last_30), (3, 3))
+        self.assertEqual((stats.avg_rating, stats.review_count), (4.0, 1))
+        self.assertEqual(stats.total_stock, 4)
+
+        request = RequestFactory().get('/graphql/')
+        result = schema.execute(
+            '{ products(first: 2, sortBy: SALES_DESC) { edges { node { name } } } }', context_value=request
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual([e['node']['name'] for e in result.data['products']['edges']], ['Bán chạy', 'Ít bán'])
+
+
+class ProductSearchTest(TestCase):
+    """Full-text search bỏ dấu, khớp tiền tố từ cuối, xếp hạng theo trọng số name > description"""
+
+    @classmethod
+    def setUpTestData(cls):
+        store = Store.objects.create(
+            store_id='search-store', name='Search Store', slug='search-store', email='search@example.com', join_date=timezone.now()
+        )
+        category = Category.objects.create(name='Thể thao')
+        with cls.captureOnCommitCallbacks(execute=True):
+            for name, description in (
+                ('Giày chạy bộ Nike', 'Đế êm cho người chạy đường dài'),
+                ('Dép quai ngang', 'Đi trong nhà, không dùng để chạy bộ'),
+                ('Túi đeo chéo', 'Đựng điện thoại'),
+            ):
+                Product.objects.create(store=store, category=category, name=name, description=description, base_price=Decimal('100000'))
+
+    def _search(self, text):
+        result = schema.execute(
+            'query($q: String!) { searchProducts(query: $q, first: 10) { edges { node { name searchHighlight } } } }',
+            variables={'q': text}, context_value=RequestFactory().get('/graphql/'),
+        )
+        self.assertIsNone(result.errors)
+        return [edge['node'] for edge in result.data['searchProducts']['edges']]
+
+    def test_accent_folding_prefix_and_rank(self):
+        # Không dấu + từ cuối đang gõ dở; khớp ở tên xếp trên khớp ở mô tả
+        nodes = self._search('chay bo')
+        self.assertEqual([n['name'] for n in nodes], ['Giày chạy bộ Nike', 'Dép quai ngang'])
+        self.assertIn('<mark>', nodes[1]['searchHighlight'])
+        self.assertEqual([n['name'] for n in self._search('giay ch')], ['Giày chạy bộ Nike'])
+        self.assertEqual(self._search('!!!'), [])
+
+    def test_keyset_pages_follow_rank(self):
+        query = """
+        query($q: String!, $after: String, $before: String, $first: Int, $last: Int) {
+          searchProducts(query: $q, first: $first, last: $last, after: $after, before: $before) {
+            edges { node { name } }
+            pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+          }
+        }
+        """
+
+        def page(**variables):
+            result = schema.execute(query, variables={'q': 'chay', **variables}, context_value=RequestFactory().get('/graphql/'))
+            self.assertIsNone(result.errors)
+            data = result.data['searchProducts']
+            return [edge['node']['name'] for edge in data['edges']], data['pageInfo']
+
+        names, first_page = page(first=1)
+        self.assertEqual(names, ['Giày chạy bộ Nike'])
+        self.assertEqual((first_page['hasPreviousPage'], first_page['hasNextPage']), (False, True))
+
+        names, second_page = page(first=1, after=first_page['endCursor'])
+        self.assertEqual(names, ['Dép quai ngang'])
+        self.assertEqual((second_page['hasPreviousPage'], second_page['hasNextPage']), (True, False))
+
+        names, back = page(last=1, before=second_page['startCursor'])
+        self.assertEqual(names, ['Giày chạy bộ Nike'])
+        self.assertEqual((back['hasPreviousPage'], back['hasNextPage']), (False, True))
+
+
+class CategoryTreeTest(TestCase):
+    """Materialized path của Category và cây danh mục trong process"""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.root = Category.objects.create(name='Giày')
+            self.sport = Category.objects.create(name='Thể thao', parent=self.root)
+            self.running = Category.objects.create(name='Chạy bộ', parent=self.sport)
+            self.other = Category.objects.create(name='Phụ kiện')
+
+    def test_moving_a_category_rewrites_its_subtree(self):
+        self.assertEqual(self.running.path, f'/{self.root.pk}/{self.sport.pk}/{self.running.pk}/')
+        self.assertEqual(self.running.depth, 2)
+        self.assertEqual(self.running.ancestor_ids, [self.root.pk, self.sport.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sport.parent = self.other
+            self.sport.save()
+
+        self.running.refresh_from_db()
+        self.assertEqual(self.running.path, f'/{self.other.pk}/{self.sport.pk}/{self.running.pk}/')
+        self.assertEqual(self.running.depth, 2)
+        self.assertEqual(list(self.root.get_descendants()), [])
+        self.assertEqual(set(self.other.get_descendants()), {self.sport, self.running})
+
+        # Cây trong process đã bỏ sau signal → đọc lại path mới
+        tree = get_category_tree()
+        self.assertEqual([c.pk for c in tree.ancestors(self.running.pk)], [self.other.pk, self.sport.pk, self.running.pk])
+        self.assertEqual(expand_category_ids([self.other.pk]), [self.other.pk, self.sport.pk, self.running.pk])
+        self.assertEqual(expand_category_ids([self.root.pk]), [self.root.pk])
+
+    def test_category_cannot_move_under_its_descendant(self):
+        self.root.parent = self.running
+        with self.assertRaises(ValidationError):
+            self.root.save()
+
+    def test_inactive_branch_is_not_expanded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sport.is_active = False
+            self.sport.save()
+        self.assertEqual(expand_category_ids([self.root.pk]), [self.root.pk])
+        self.assertEqual(expand_category_ids([self.root.pk], include_subcategories=False), [self.root.pk])
+
+
+class ProductFacetsTest(TestCase):
+    """productFacets đếm theo danh mục / brand / khoảng giá / size / màu trên tập đã lọc"""
+
+    QUERY = """
+    query($filter: ProductFilterInput) {
+      productFacets(filter: $filter) {
+        total
+        categories { label count }
+        brands { label count }
+        sizes { value count }
+        colors { value count }
+        priceRanges { value count }
+      }
+    }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        store = Store.objects.create(
+            store_id='facet-store', name='Facet Store', slug='facet-store', email='facet@example.com', join_date=timezone.now()
+        )
+        shoes = Category.objects.create(name='Giày')
+        cls.sandals = Category.objects.create(name='Dép')
+        nike = Brand.objects.create(name='Nike')
+        with cls.captureOnCommitCallbacks(execute=True):
+            for name, category, brand, price, combos in (
+                ('Giày A', shoes, nike, '150000', [{'Size': '40', 'Màu Sắc': 'Đen'}, {'Size': '41', 'Màu Sắc': 'Đen'}]),
+                ('Giày B', shoes, nike, '350000', [{'size': '40', 'color': 'Trắng'}]),
+                ('Dép C', cls.sandals, None, '90000', [{'Size': '40', 'Màu': 'Đen'}]),
+            ):
+                product = Product.objects.create(
+                    store=store, category=category, brand=brand, name=name, description='d', base_price=Decimal(price)
+                )
+                for idx, combo in enumerate(combos):
+                    ProductVariant.objects.create(
+                        product=product, sku=f'{name}-{idx}', price=Decimal(price), stock=1, option_combinations=combo
+                    )
+            Product.objects.create(
+                store=store, category=shoes, name='Ngừng bán', description='d', base_price=Decimal('100000'), is_active=False
+            )
+
+    def setUp(self):
+        caches['default'].clear()
+        tagged_cache.reset_cache()
+
+    def _facets(self, filter=None):
+        result = schema.execute(self.QUERY, variables={'filter': filter}, context_value=RequestFactory().get('/graphql/'))
+        self.assertIsNone(result.errors)
+        return result.data['productFacets']
+
+    def test_counts_distinct_products_per_facet(self):
+        facets = self._facets()
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(facets['categories'], [{'label': 'Giày', 'count': 2}, {'label': 'Dép', 'count': 1}])
+        self.assertEqual(facets['brands'], [{'label': 'Nike', 'count': 2}])
+        # Giày A có 2 biến thể size khác nhau nhưng màu Đen chỉ đếm 1 lần; key "Màu" / "color" gộp chung trục màu
+        self.assertEqual(facets['sizes'], [{'value': '40', 'count': 3}, {'value': '41', 'count': 1}])
+        self.assertEqual(facets['colors'], [{'value': 'Đen', 'count': 2}, {'value': 'Trắng', 'count': 1}])
+        self.assertEqual(
+            {bucket['value']: bucket['count'] for bucket in facets['priceRanges']},
+            {'0-200k': 2, '200k-500k': 1, '500k-1m': 0, '1m-2m': 0, '2m+': 0},
+        )
+
+    def test_counts_follow_filter(self):
+        facets = self._facets({'categoryId': self.sandals.pk})
+        self.assertEqual(facets['total'], 1)
+        self.assertEqual(facets['brands'], [])
+        self.assertEqual(facets['colors'], [{'value': 'Đen', 'count': 1}])
+
+    def test_variant_filters_do_not_multiply_counts(self):
+        # Giày A giảm giá ở cả 2 biến thể: join variants ra 2 dòng nhưng chỉ là 1 sản phẩm
+        variants = ProductVariant.objects.filter(product__name='Giày A')
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_updates.set_prices([(variant.pk, Decimal('120000')) for variant in variants])
+        facets = self._facets({'hasDiscount': True})
+        self.assertEqual(facets['total'], 1)
+        self.assertEqual(facets['categories'], [{'label': 'Giày', 'count': 1}])
+        self.assertEqual(facets['brands'], [{'label': 'Nike', 'count': 1}])
+        self.assertEqual({b['value']: b['count'] for b in facets['priceRanges']}['0-200k'], 1)
+        self.assertEqual(facets['sizes'], [{'value': '40', 'count': 1}, {'value': '41', 'count': 1}])
+
+    def test_cached_counts_follow_bulk_price_update(self):
+        self.assertEqual(self._facets({'hasDiscount': True})['total'], 0)
+        self.assertEqual(self._facets({'hasDiscount': True})['total'], 0)
+
+        # UPDATE theo tập không qua post_save: lần tính lại ProductStats sau commit invalidate tag 'product'
+        variant = ProductVariant.objects.get(sku='Giày B-0')
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_updates.set_prices([(variant.pk, Decimal('300000'))])
+        facets = self._facets({'hasDiscount': True})
+        self.assertEqual(facets['total'], 1)
+        self.assertEqual(facets['categories'], [{'label': 'Giày', 'count': 1}])
+
+
+class ProductGridQueryCountTest(TestCase):
+    """Số query của lưới sản phẩm không được tăng theo số sản phẩm (DataLoader)"""
+
+    GRID_SIZE = 40
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        store = Store.objects.create(
+            store_id='grid-store', name='Grid Store', slug='grid-store',
+            email='grid@example.com', join_date=timezone.now()
+        )
+        category = Category.objects.create(name='Giày chạy')
+        brand = Brand.objects.create(name='Grid Brand')
+        color = ProductAttribute.objects.create(name='color', has_image=True)
+        size = ProductAttribute.objects.create(name='size')
+
+        voucher = Voucher.objects.create(
+            code='GRID10', discount_type='percent', discount_value=Decimal('10'),
+            start_date=today - timedelta(days=1), end_date=today + timedelta(days=1),
+        )
+        VoucherCategory.objects.create(voucher=voucher, category=category)
+
+        # ProductStats được refresh qua transaction.on_commit
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls._create_products(store, category, brand, color, size)
+
+    @classmethod
+    def _create_products(cls, store, category, brand, color, size):
+        for i in range(cls.GRID_SIZE):
+            product = Product.objects.create(
+                store=store, category=category, brand=brand,
+                name=f'Giày {i}', description='mô tả', base_price=Decimal('500000')
+            )
+            ProductImage.objects.create(product=product, image=f'products/{i}.jpg', is_thumbnail=True)
+            ProductImage.objects.create(product=product, image=f'products/{i}-2.jpg')
+            ProductAttributeOption.objects.create(product=product, attribute=color, value='Đen', image=f'colors/{i}.jpg')
+            ProductAttributeOption.objects.create(product=product, attribute=size, value='42')
+            ProductVariant.objects.create(
+                product=product, sku=f'GRID-{i}', price=Decimal('450000'), stock=5,
+                option_combinations={'color': 'Đen', 'Size': '42'}
+            )
+
+    def _run_grid(self, first):
+        from graphql_api.api import schema
+
+        request = RequestFactory().get('/graphql/')
+        with CaptureQueriesContext(connection) as ctx:
+            result = schema.execute(PRODUCT_GRID_QUERY, variables={'first': first}, context_value=request)
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data['products']['edges']), first)
+        return len(ctx.captured_queries), result.data
+
+    def test_query_count_is_bounded(self):
+        small_count, _ = self._run_grid(5)
+        grid_count, data = self._run_grid(self.GRID_SIZE)
+
+        # Không có N+1: 40 sản phẩm tốn đúng bằng số query của 5 sản phẩm
+        self.assertEqual(grid_count, small_count)
+        self.assertLessEqual(grid_count, 20)
+
+        node = data['products']['edges'][0]['node']
+        self.assertEqual(node['discountPercentage'], 10.0)
+        self.assertEqual(node['variantCount'], 1)
+        self.assertEqual(node['availabilityStatus'], 'in_stock')
+        self.assertEqual([o['value'] for o in node['colorOptions']], ['Đen'])
+        self.assertTrue(node['thumbnailImage']['imageUrl'].endswith('.jpg'))
+        variant = data['productVariants']['edges'][0]['node']
+        self.assertTrue(variant['colorImageUrl'].endswith('.jpg'))
+
+
+def _jpeg_upload(size, color='red', name='shoe.jpg'):
+    output = BytesIO()
+    Image.new('RGB', size, color).save(output, format='JPEG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/jpeg')
+
+
+class ImagePipelineTest(TestCase):
+    SIZES = {'thumbnail': [150, 150], 'card': [400, 400], 'detail': [800, 800], 'zoom': [1600, 1600]}
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_DERIVATIVE_SIZES=self.SIZES)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_render_resizes_each_box_and_dedupes_equal_sizes(self):
+        upload = _jpeg_upload((600, 300))
+        rendered = render_derivatives(upload.read(), {name: tuple(box) for name, box in self.SIZES.items()})
+
+        self.assertEqual((rendered['thumbnail']['width'], rendered['thumbnail']['height']), (150, 75))
+        self.assertEqual((rendered['card']['width'], rendered['card']['height']), (400, 200))
+        # Ảnh gốc nhỏ hơn box: không phóng to, detail dùng chung với zoom
+        self.assertEqual((rendered['zoom']['width'], rendered['zoom']['height']), (600, 300))
+        self.assertEqual(rendered['detail'], {'same_as': 'zoom'})
+        self.assertEqual(Image.open(BytesIO(rendered['card']['webp'])).format, 'WEBP')
+
+    def test_same_content_is_stored_once(self):
+        first = ingest_image(_jpeg_upload((300, 200), name='a.jpg'))
+        second = ingest_image(_jpeg_upload((300, 200), name='b.jpg'))
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(ImageAsset.objects.count(), 1)
+        self.assertTrue(first.original.name.startswith('images/originals/'))
+        self.assertEqual((first.width, first.height, first.status), (300, 200, 'pending'))
+        self.assertEqual(Job.objects.filter(task='products.generate_image_derivatives').count(), 1)
+
+    def test_generate_derivatives_builds_srcset(self):
+        asset = ingest_image(_jpeg_upload((2000, 1000)))
+        self.assertEqual(srcset(asset), f'{asset.original.url} 2000w')
+
+        done, failed = generate_derivatives([asset])
+
+        asset.refresh_from_db()
+        self.assertEqual((done, failed, asset.status), (1, 0, 'ready'))
+        widths = [entry.rsplit(' ', 1)[1] for entry in srcset(asset).split(', ')]
+        self.assertEqual(widths, ['150w', '400w', '800w', '1600w'])
+        self.assertIn('_card.webp', srcset(asset, 'webp'))
+
+    def test_image_assigned_directly_goes_through_pipeline(self):
+        store = Store.objects.create(
+            store_id='img-store', name='Img Store', slug='img-store', email='img@example.com', join_date=timezone.now()
+        )
+        product = Product.objects.create(
+            store=store, category=Category.objects.create(name='Giày'), name='Giày ảnh',
+            description='mô tả', base_price=Decimal('100000'),
+        )
+
+        image = ProductImage.objects.create(product=product, image=_jpeg_upload((500, 500), color='blue'))
+
+        self.assertIsNotNone(image.asset)
+        self.assertEqual(image.image.name, image.asset.original.name)
+        # Xóa ảnh sản phẩm không xóa file gốc dùng chung
+        image.delete()
+        self.assertTrue(image.asset.original.storage.exists(image.asset.original.name))
+
+    def test_image_url_serves_sized_variant_once_ready(self):
+        store = Store.objects.create(
+            store_id='size-store', name='Size Store', slug='size-store', email='size@example.com', join_date=timezone.now()
+        )
+        product = Product.objects.create(
+            store=store, category=Category.objects.create(name='Giày'), name='Giày cỡ ảnh',
+            description='mô tả', base_price=Decimal('100000'),
+        )
+        color = ProductAttribute.objects.create(name='color', has_image=True)
+        image = ProductImage.objects.create(product=product, image=_jpeg_upload((1000, 1000)), is_thumbnail=True)
+        option = ProductAttributeOption.objects.create(
+            product=product, attribute=color, value='Đen', image=_jpeg_upload((900, 900), color='black'),
+        )
+
+        def image_urls():
+            result = schema.execute(
+                'query($id: ID) { product(id: $id) { galleryImages { imageUrl } colorImages { imageUrl } } }',
+                variable_values={'id': product.pk}, context_value=RequestFactory().get('/graphql/'),
+            )
+            self.assertIsNone(result.errors)
+            data = result.data['product']
+            return data['galleryImages'][0]['imageUrl'], data['colorImages'][0]['imageUrl']
+
+        # Chưa tạo xong các cỡ → ảnh gốc
+        gallery_url, option_url = image_urls()
+        self.assertTrue(gallery_url.endswith(image.asset.original.url))
+        self.assertTrue(option_url.endswith(option.asset.original.url))
+
+        generate_derivatives([image.asset, option.asset])
+        gallery_url, option_url = image_urls()
+        self.assertTrue(gallery_url.endswith(f'{image.asset.content_hash}_detail.jpg'), gallery_url)
+        self.assertTrue(option_url.endswith(f'{option.asset.content_hash}_card.jpg'), option_url)
+
+
+CATALOG_CSV = """product_code,name,category,brand,sku,price,stock,weight,option:Size,option:Màu sắc
+AIR-1,Air Zoom,Giày > Giày chạy,Nike,AIR-1-40,"2,390,000",5,"0,8",40,Đen
+AIR-1,,,,AIR-1-41,2390000,3,0.8,41,Đen
+AIR-1,,,,AIR-1-42,abc,3,0.8,42,Đen
+RUN-2,Run Fast,Không có,Nike,RUN-2-40,990000,1,0.5,40,Trắng
+RUN-3,Run Slow,Giày chạy,,OTHER-SKU,990000,1,0.5,40,Trắng
+RUN-4,Run On,Giày chạy,,RUN-4-39,1200000,,,39,Xanh
+"""
+
+
+class CatalogImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = Store.objects.create(
+            store_id='import-store', name='Import Store', slug='import-store',
+            email='import@example.com', join_date=timezone.now()
+        )
+        other = Store.objects.create(
+            store_id='other-store', name='Other Store', slug='other-store',
+            email='other@example.com', join_date=timezone.now()
+        )
+        shoes = Category.objects.create(name='Giày')
+        cls.running = Category.objects.create(name='Giày chạy', parent=shoes)
+        Brand.objects.create(name='Nike')
+        ProductAttribute.objects.create(name='size')
+        ProductAttribute.objects.create(name='color', has_image=True)
+        other_product = Product.objects.create(
+            store=other, category=cls.running, name='Khác', description='d', base_price=Decimal('1')
+        )
+        ProductVariant.objects.create(
+            product=other_product, sku='OTHER-SKU', price=Decimal('1'), stock=1, option_combinations={}
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _import(self, content, name='catalog.csv', file_format='csv'):
+        catalog_import = CatalogImport(store=self.store, file_format=file_format)
+        catalog_import.file.save(name, ContentFile(content.encode('utf-8')), save=False)
+        catalog_import.save()
+        return catalog_import
+
+    def test_csv_import_creates_catalog_and_reports_row_errors(self):
+        catalog_import, finished = run_import(self._import(CATALOG_CSV).pk)
+
+        self.assertTrue(finished)
+        self.assertEqual(catalog_import.status, 'done')
+        self.assertEqual((catalog_import.total_rows, catalog_import.processed_rows), (6, 6))
+        self.assertEqual((catalog_import.created_products, catalog_import.created_variants), (2, 3))
+        self.assertEqual(
+            [(e['row'], e['sku']) for e in catalog_import.errors],
+            [(4, 'AIR-1-42'), (5, 'RUN-2-40'), (6, 'OTHER-SKU')],
+        )
+
+        variant = ProductVariant.objects.get(sku='AIR-1-40')
+        self.assertEqual((variant.price, variant.weight, variant.stock), (Decimal('2390000'), Decimal('0.8'), 5))
+        self.assertEqual(variant.option_combinations, {'Size': '40', 'Màu sắc': 'Đen'})
+        product = variant.product
+        self.assertEqual((product.model_code, product.category_id, product.brand.name), ('AIR-1', self.running.pk, 'Nike'))
+        self.assertEqual(
+            sorted(product.attribute_options.values_list('attribute__name', 'value')),
+            [('color', 'Đen'), ('size', '40'), ('size', '41')],
+        )
+        self.assertEqual(ProductStats.objects.get(product=product).total_stock, 8)
+        self.assertEqual(ProductVariant.objects.get(sku='RUN-4-39').weight, Decimal('0.1'))
+
+    @override_settings(CATALOG_IMPORT_CHUNK_SIZE=2)
+    def test_import_resumes_after_committed_chunks(self):
+        catalog_import = self._import(CATALOG_CSV)
+
+        # Hết thời gian sau lô đầu → dừng ở điểm dừng đã commit
+        catalog_import, finished = run_import(catalog_import.pk, time_budget=1e-9)
+        self.assertFalse(finished)
+        self.assertEqual(catalog_import.processed_rows, 2)
+
+        catalog_import, finished = run_import(catalog_import.pk)
+        self.assertTrue(finished)
+        self.assertEqual(catalog_import.processed_rows, 6)
+        self.assertEqual((catalog_import.created_variants, catalog_import.error_count), (3, 3))
+        self.assertEqual(ProductVariant.objects.filter(product__store=self.store).count(), 3)
+
+    def test_jsonl_updates_existing_skus(self):
+        run_import(self._import(CATALOG_CSV).pk)
+        content = (
+            '{"product_code": "AIR-1", "sku": "AIR-1-40", "price": 1990000, "stock": 9, "options": {"Size": "40"}}\n'
+            'not json\n'
+            '\n'
+            '{"product_code": "AIR-1", "sku": "AIR-1-43", "price": 1990000, "stock": 2, "option:Size": "43"}\n'
+        )
+
+        catalog_import, _ = run_import(self._import(content, 'update.jsonl', 'jsonl').pk)
+
+        self.assertEqual(catalog_import.status, 'done')
+        self.assertEqual((catalog_import.updated_variants, catalog_import.created_variants), (1, 1))
+        self.assertEqual([e['row'] for e in catalog_import.errors], [2])
+        variant = ProductVariant.objects.get(sku='AIR-1-40')
+        self.assertEqual((variant.price, variant.stock), (Decimal('1990000'), 9))
+        self.assertEqual(Product.objects.filter(model_code='AIR-1').count(), 1)
+
+    def test_missing_required_column_fails_import(self):
+        catalog_import, finished = run_import(self._import('name,sku\nA,B\n').pk)
+
+        self.assertTrue(finished)
+        self.assertEqual(catalog_import.status, 'failed')
+        self.assertIn('product_code', catalog_import.message)
+
+    def test_long_names_get_slugs_within_column_length(self):
+        name = 'Giày chạy bộ nam nữ siêu nhẹ thoáng khí đế cao su chống trượt phiên bản giới hạn'
+        max_length = Product._meta.get_field('slug').max_length
+        taken = slugify(name)[:max_length]
+        Product.objects.create(
+            store=self.store, category=self.running, name='Đã có', slug=taken, description='d', base_price=Decimal('1')
+        )
+        content = (
+            'product_code,name,category,sku,price,stock\n'
+            f'LONG-1,{name},Giày chạy,LONG-1-40,100000,1\n'
+            f'LONG-2,{name},Giày chạy,LONG-2-40,100000,1\n'
+        )
+
+        catalog_import, _ = run_import(self._import(content).pk)
+
+        self.assertEqual((catalog_import.status, catalog_import.created_products), ('done', 2))
+        slugs = list(Product.objects.filter(model_code__in=['LONG-1', 'LONG-2']).order_by('model_code').values_list('slug', flat=True))
+        self.assertEqual([slug.rsplit('-', 2)[1:] for slug in slugs], [['long', '1'], ['long', '2']])
+        self.assertTrue(all(len(slug) <= max_length and slug.startswith(taken[:30]) for slug in slugs), slugs)
+
+    def test_import_is_failed_when_job_exhausts_attempts(self):
+        catalog_import = self._import(CATALOG_CSV)
+        catalog_import.file.storage.delete(catalog_import.file.name)  # lỗi hệ thống, không phải CatalogImportError
+        schedule_import(catalog_import)
+
+        for attempt in range(3):
+            Job.objects.filter(task='products.import_catalog').update(run_at=timezone.now())
+            [job] = claim(worker='test', tasks=['products.import_catalog'])
+            status = run_job(job)
+            catalog_import.refresh_from_db()
+            if attempt < 2:
+                self.assertEqual((status, catalog_import.status), (Job.QUEUED, 'running'))
+
+        self.assertEqual((status, catalog_import.status), (Job.FAILED, 'failed'))
+        self.assertIsNotNone(catalog_import.finished_at)
+
+
+class BulkUpdateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = Store.objects.create(
+            store_id='bulk-store', name='Bulk Store', slug='bulk-store', email='bulk@example.com', join_date=timezone.now()
+        )
+        other = Store.objects.create(
+            store_id='bulk-other', name='Bulk Other', slug='bulk-other', email='other@example.com', join_date=timezone.now()
+        )
+        category = Category.objects.create(name='Giày')
+        cls.product = Product.objects.create(
+            store=cls.store, category=category, name='Giày bulk', description='d', base_price=Decimal('100000')
+        )
+        other_product = Product.objects.create(
+            store=other, category=category, name='Giày khác', description='d', base_price=Decimal('100000')
+        )
+        cls.variants = [
+            ProductVariant.objects.create(
+                product=cls.product, sku=f'BULK-{i}', price=Decimal('100000'), stock=5, option_combinations={'Size': str(40 + i)}
+            )
+            for i in range(3)
+        ]
+        cls.other_variant = ProductVariant.objects.create(
+            product=other_product, sku='BULK-OTHER', price=Decimal('100000'), stock=5, option_combinations={}
+        )
+        cls.manager = User.objects.create(username='bulk-manager', email='manager@example.com')
+        StoreUser.objects.create(store=cls.store, user=cls.manager, role='manager', status='active')
+
+    def test_adjust_stock_reports_each_id(self):
+        first, second, third = self.variants
+        changes = [
+            (third.pk, 2), (first.pk, -5), (second.pk, -6), (999999, 1), (self.other_variant.pk, 1), (third.pk, 1),
+        ]
+
+        results = bulk_updates.adjust_stock(changes, store_ids=[self.store.pk], chunk_size=2)
+
+        self.assertEqual([r.id for r in results], [c[0] for c in changes])
+        self.assertEqual([r.success for r in results], [True, True, False, False, False, False])
+        self.assertEqual(
+            [r.message for r in results[2:]],
+            ['Tồn kho không được âm', bulk_updates.NOT_FOUND, bulk_updates.PERMISSION_DENIED, bulk_updates.DUPLICATE],
+        )
+        self.assertEqual(results[0].value['stock'], 7)
+        self.assertEqual(
+            list(ProductVariant.objects.filter(product=self.product).order_by('pk').values_list('stock', flat=True)),
+            [0, 5, 7],
+        )
+        self.assertEqual(ProductVariant.objects.get(pk=self.other_variant.pk).stock, 5)
+
+    def test_set_prices_and_status_in_one_statement_per_chunk(self):
+        with CaptureQueriesContext(connection) as ctx:
+            results = bulk_updates.set_prices(
+                [(v.pk, Decimal('120000')) for v in self.variants] + [(self.other_variant.pk, Decimal('0'))],
+            )
+        self.assertEqual([r.success for r in results], [True, True, True, False])
+        self.assertEqual(results[3].message, 'Giá phải lớn hơn 0')
+        statements = [q['sql'] for q in ctx.captured_queries if 'UPDATE' in q['sql']]
+        self.assertEqual(len(statements), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            results = bulk_updates.set_product_status([self.product.pk, self.product.pk], False)
+        self.assertEqual([r.message for r in results], [None, bulk_updates.DUPLICATE])
+        self.assertFalse(Product.objects.get(pk=self.product.pk).is_active)
+        self.assertFalse(ProductVariant.objects.filter(product=self.product, is_active=True).exists())
+        self.assertEqual(ProductStats.objects.get(product=self.product).total_stock, 0)
+
+    def test_stock_check_constraint(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ProductVariant.objects.filter(pk=self.variants[0].pk).update(stock=-1)
+
+    def test_bulk_price_update_mutation_checks_store_membership(self):
+        request = RequestFactory().post('/graphql/')
+        request.user = self.manager
+        result = schema.execute(
+            """
+            mutation($updates: [BulkPriceUpdateInput]!) {
+              bulkPriceUpdate(updates: $updates) {
+                successCount errorCount errors
+                results { id success message price }
+              }
+            }
+            """,
+            variable_values={'updates': [
+                {'variantId': self.variants[0].pk, 'newPrice': '99000'},
+                {'variantId': self.other_variant.pk, 'newPrice': '99000'},
+            ]},
+            context_value=request,
+        )
+
+        self.assertIsNone(result.errors)
+        data = result.data['bulkPriceUpdate']
+        self.assertEqual((data['successCount'], data['errorCount']), (1, 1))
+        self.assertEqual(data['results'][0], {'id': self.variants[0].pk, 'success': True, 'message': None, 'price': '99000.00'})
+        self.assertEqual(data['errors'], [f'Variant {self.other_variant.pk}: {bulk_updates.PERMISSION_DENIED}'])
+
+
+class VariantMatrixTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        store = Store.objects.create(
+            store_id='matrix-store', name='Matrix Store', slug='matrix-store', email='matrix@example.com', join_date=timezone.now()
+        )
+        category = Category.objects.create(name='Giày')
+        color = ProductAttribute.objects.create(name='color', has_image=True, display_order=0)
+        size = ProductAttribute.objects.create(name='size', display_order=1)
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.product = Product.objects.create(
+                store=store, category=category, name='Giày matrix', description='d', base_price=Decimal('500000')
+            )
+            cls.black = ProductAttributeOption.objects.create(product=cls.product, attribute=color, value='Đen', display_order=0)
+            ProductAttributeOption.objects.create(product=cls.product, attribute=color, value='Trắng', display_order=1)
+            for order, value in enumerate(['39', '40']):
+                ProductAttributeOption.objects.create(product=cls.product, attribute=size, value=value, display_order=order)
+            # Tạo theo thứ tự "lộn xộn", key theo nhiều kiểu như dữ liệu thật
+            cls.white_40 = ProductVariant.objects.create(
+                product=cls.product, sku='MX-W40', price=Decimal('510000'), stock=3, option_combinations={'Size': '40', 'Màu Sắc': 'Trắng'}
+            )
+            cls.black_40 = ProductVariant.objects.create(
+                product=cls.product, sku='MX-B40', price=Decimal('500000'), stock=0, option_combinations={'Size': '40', 'Màu Sắc': 'Đen'}
+            )
+            cls.black_39 = ProductVariant.objects.create(
+                product=cls.product, sku='MX-B39', price=Decimal('500000'), stock=2, option_combinations={'Size': '39', 'Màu Sắc': 'Đen'}
+            )
+
+    def test_matrix_is_stored_and_follows_stock_changes(self):
+        matrix = ProductStats.objects.get(product=self.product).variant_matrix
+        self.assertEqual(matrix['axes'], [
+            {'name': 'Màu Sắc', 'attribute': 'color', 'values': ['Đen', 'Trắng']},
+            {'name': 'Size', 'attribute': 'size', 'values': ['39', '40']},
+        ])
+        self.assertEqual(matrix['variants'], [
+            [self.white_40.pk, 3, '510000.00', [1, 1]],
+            [self.black_40.pk, 0, '500000.00', [0, 1]],
+            [self.black_39.pk, 2, '500000.00', [0, 0]],
+        ])
+        self.assertEqual(self.black.get_variants().count(), 2)
+        self.assertEqual(self.black.get_available_combinations(), {'Size': ['39']})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_updates.adjust_stock([(self.black_40.pk, 4)])
+        self.assertEqual(self.black.get_available_combinations(), {'Size': ['39', '40']})
+
+    def test_variant_matrix_field_costs_one_query(self):
+        query = 'query($id: ID) { product(id: $id) { name %s } }'
+        fields = 'variantMatrix { axes { attribute values } variants { variantId stock price inStock options } }'
+        request = RequestFactory().get('/graphql/')
+
+        def execute(selection):
+            # product(id) đi qua cache theo tag → đo từ cache rỗng
+            caches['default'].clear()
+            tagged_cache.reset_cache()
+            return schema.execute(query % selection, variable_values={'id': self.product.pk}, context_value=request)
+
+        with CaptureQueriesContext(connection) as base:
+            execute('')
+        with CaptureQueriesContext(connection) as ctx:
+            result = execute(fields)
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(ctx.captured_queries), len(base.captured_queries) + 1)
+        matrix = result.data['product']['variantMatrix']
+        self.assertEqual([axis['attribute'] for axis in matrix['axes']], ['color', 'size'])
+        self.assertEqual(
+            matrix['variants'][1],
+            {'variantId': self.black_40.pk, 'stock': 0, 'price': '500000.00', 'inStock': False, 'options': [0, 1]},
+        )
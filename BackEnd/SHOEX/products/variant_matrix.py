@@ -0,0 +1,142 @@
+"""
+Ma trận biến thể cho bộ chọn size / màu ở trang chi tiết sản phẩm
+
+Lưu ở ProductStats.variant_matrix, tính lại cùng min/max price và total_stock
+(mọi chỗ gọi stats.refresh_product_stats(..., fields=stats.VARIANT_FIELDS)):
+
+  {
+    "axes": [{"name": "color", "attribute": "color", "values": ["Đen", "Trắng"]},
+             {"name": "Size", "attribute": "size", "values": ["39", "40"]}],
+    "variants": [[variant_id, stock, "giá", [chỉ số giá trị theo thứ tự axes]], ...]
+  }
+
+- name: key trong option_combinations; attribute: ProductAttribute.name tương ứng (None nếu không khớp)
+- Trục xếp theo ProductAttribute.display_order, giá trị theo ProductAttributeOption.display_order
+  (giá trị không có option đứng sau, theo thứ tự xuất hiện); biến thể thiếu trục → null
+- Chỉ gồm biến thể active; hết hàng vẫn có mặt (stock 0) để bộ chọn hiện "hết hàng"
+"""
+import json
+from collections import defaultdict
+
+from .attributes import ATTRIBUTE_ALIASES, normalize_key
+from .models import ProductAttributeOption, ProductStats, ProductVariant
+
+EMPTY_MATRIX = {'axes': [], 'variants': []}
+
+
+def parse_options(option_combinations):
+    """option_combinations (dict, hoặc chuỗi JSON ở dữ liệu cũ) → dict"""
+    if isinstance(option_combinations, str):
+        try:
+            option_combinations = json.loads(option_combinations)
+        except json.JSONDecodeError:
+            return {}
+    return option_combinations if isinstance(option_combinations, dict) else {}
+
+
+def option_keys(attribute):
+    """Các key option_combinations có thể dùng cho 1 ProductAttribute ('color', 'Màu Sắc', 'màu'...)"""
+    keys = {attribute.name, attribute.get_name_display()}
+    keys.update(alias for alias, name in ATTRIBUTE_ALIASES.items() if name == attribute.name)
+    return keys
+
+
+def build_matrix(variants, options=()):
+    """
+    variants: [(variant_id, option_combinations, stock, price)] của 1 product
+    options: ProductAttributeOption của product đó (đã select_related attribute)
+    """
+    attributes, value_order = {}, {}
+    for option in options:
+        for key in option_keys(option.attribute):
+            attributes.setdefault(normalize_key(key), option.attribute)
+        value_order.setdefault((option.attribute.name, option.value), (option.display_order, option.pk))
+
+    rows, seen = [], {}
+    for variant_id, combination, stock, price in sorted(variants, key=lambda v: v[0]):
+        combination = {name: str(value) for name, value in parse_options(combination).items()}
+        for name, value in combination.items():
+            values = seen.setdefault(name, {})
+            values.setdefault(value, len(values))
+        rows.append((variant_id, stock, price, combination))
+
+    def axis_order(item):
+        position, name = item
+        attribute = attributes.get(normalize_key(name))
+        return (0, attribute.display_order, attribute.name) if attribute else (1, position, name)
+
+    axes = []
+    for _, name in sorted(enumerate(seen), key=axis_order):
+        attribute = attributes.get(normalize_key(name))
+        attribute_name = attribute.name if attribute else None
+
+        def value_key(item, attribute_name=attribute_name):
+            value, position = item
+            order = value_order.get((attribute_name, value))
+            return (0, *order) if order else (1, position, 0)
+
+        values = [value for value, _ in sorted(seen[name].items(), key=value_key)]
+        axes.append({'name': name, 'attribute': attribute_name, 'values': values})
+
+    indexes = [{value: i for i, value in enumerate(axis['values'])} for axis in axes]
+    return {
+        'axes': axes,
+        'variants': [
+            [
+                variant_id, stock, str(price),
+                [index.get(combination.get(axis['name'])) for axis, index in zip(axes, indexes)],
+            ]
+            for variant_id, stock, price, combination in rows
+        ],
+    }
+
+
+def matrices_by_product(product_ids):
+    """{product_id: ma trận} tính từ DB (2 query cho cả tập)"""
+    product_ids = list(product_ids)
+    variants, options = defaultdict(list), defaultdict(list)
+    rows = ProductVariant.objects.filter(product_id__in=product_ids, is_active=True)\
+        .values_list('product_id', 'variant_id', 'option_combinations', 'stock', 'price')
+    for product_id, *variant in rows:
+        variants[product_id].append(variant)
+    for option in ProductAttributeOption.objects.filter(product_id__in=product_ids).select_related('attribute'):
+        options[option.product_id].append(option)
+    return {pid: build_matrix(variants[pid], options[pid]) for pid in product_ids}
+
+
+def stored_matrices(product_ids):
+    """Ma trận đã lưu ở ProductStats; product chưa có (dữ liệu trước khi có cột) thì tính trực tiếp"""
+    product_ids = list(product_ids)
+    matrices = dict(
+        ProductStats.objects.filter(product_id__in=product_ids, variant_matrix__isnull=False)
+        .values_list('product_id', 'variant_matrix')
+    )
+    missing = [pid for pid in product_ids if pid not in matrices]
+    if missing:
+        matrices.update(matrices_by_product(missing))
+    return matrices
+
+
+def available_values(matrix, axis_name, value, exclude=()):
+    """
+    Các giá trị còn hàng ở những trục khác khi đã chọn axis_name=value
+    → {tên trục: [giá trị]} theo thứ tự của ma trận
+    """
+    axes = matrix.get('axes') or []
+    position = next((i for i, axis in enumerate(axes) if axis_name in (axis['name'], axis['attribute'])), None)
+    if position is None or value not in axes[position]['values']:
+        return {}
+    selected = axes[position]['values'].index(value)
+
+    available = defaultdict(set)
+    for _, stock, _, indexes in matrix.get('variants') or []:
+        if stock <= 0 or indexes[position] != selected:
+            continue
+        for i, index in enumerate(indexes):
+            if i != position and index is not None:
+                available[i].add(index)
+    return {
+        axes[i]['name']: [axes[i]['values'][index] for index in sorted(indexes)]
+        for i, indexes in sorted(available.items())
+        if axes[i]['name'] not in exclude and axes[i]['attribute'] not in exclude
+    }
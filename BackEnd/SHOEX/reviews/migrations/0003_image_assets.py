@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_image_assets'),
+        ('reviews', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewimage',
+            name='asset',
+            field=models.ForeignKey(blank=True, help_text='Bản ghi ImageAsset (products/images.py); image trỏ tới ảnh gốc của asset', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.imageasset', verbose_name='Ảnh gốc + các cỡ'),
+        ),
+    ]
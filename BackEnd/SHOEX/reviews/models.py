@@ -171,6 +171,16 @@ class ReviewImage(models.Model):
         verbose_name="Ảnh đánh giá",
         help_text="Ảnh đính kèm trong đánh giá"
     )
+
+    asset = models.ForeignKey(
+        'products.ImageAsset',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Ảnh gốc + các cỡ",
+        help_text="Bản ghi ImageAsset (products/images.py); image trỏ tới ảnh gốc của asset"
+    )
     
     caption = models.CharField(
         max_length=200,
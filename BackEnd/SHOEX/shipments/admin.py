@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
 
-from .models import Shipment, ShipmentTracking
+from store import rollups
+from .models import Shipment, ShipmentTracking, GHTKWebhookEvent
 
 
 # =========================
@@ -107,8 +108,16 @@ class ShipmentAdmin(admin.ModelAdmin):
     ]
 
     # ===== ADMIN ACTIONS =====
+    def _update_status(self, queryset, status):
+        # QuerySet.update không bắn post_save → tự báo rollup thống kê
+        sub_order_ids = list(queryset.values_list('sub_order_id', flat=True))
+        updated = queryset.update(status=status)
+        for sub_order_id in sub_order_ids:
+            rollups.schedule('sub_orders', sub_order_id)
+        return updated
+
     def mark_as_shipping(self, request, queryset):
-        updated = queryset.update(status='shipping')
+        updated = self._update_status(queryset, 'shipping')
         self.message_user(
             request,
             f"Đã cập nhật {updated} vận đơn sang trạng thái 'Vận chuyển'."
@@ -116,7 +125,7 @@ class ShipmentAdmin(admin.ModelAdmin):
     mark_as_shipping.short_description = "Chuyển sang 'Vận chuyển'"
 
     def mark_as_out_for_delivery(self, request, queryset):
-        updated = queryset.update(status='out_for_delivery')
+        updated = self._update_status(queryset, 'out_for_delivery')
         self.message_user(
             request,
             f"Đã cập nhật {updated} vận đơn sang trạng thái 'Chờ giao hàng'."
@@ -124,7 +133,7 @@ class ShipmentAdmin(admin.ModelAdmin):
     mark_as_out_for_delivery.short_description = "Chuyển sang 'Chờ giao hàng'"
 
     def mark_as_completed(self, request, queryset):
-        updated = queryset.update(status='completed')
+        updated = self._update_status(queryset, 'completed')
         self.message_user(
             request,
             f"Đã cập nhật {updated} vận đơn sang trạng thái 'Hoàn thành'."
@@ -132,7 +141,7 @@ class ShipmentAdmin(admin.ModelAdmin):
     mark_as_completed.short_description = "Chuyển sang 'Hoàn thành'"
 
     def mark_as_cancelled(self, request, queryset):
-        updated = queryset.update(status='cancelled')
+        updated = self._update_status(queryset, 'cancelled')
         self.message_user(
             request,
             f"Đã cập nhật {updated} vận đơn sang trạng thái 'Đã hủy'."
@@ -226,3 +235,34 @@ class ShipmentTrackingAdmin(admin.ModelAdmin):
             'fields': ('raw_response',),
         }),
     )
+
+
+# =========================
+# Inbox webhook GHTK
+# =========================
+@admin.register(GHTKWebhookEvent)
+class GHTKWebhookEventAdmin(admin.ModelAdmin):
+
+    list_display = (
+        'id',
+        'label_id',
+        'status_id',
+        'action_time',
+        'received_at',
+        'processed_at',
+        'outcome',
+    )
+
+    list_filter = (
+        'outcome',
+        'status_id',
+    )
+
+    search_fields = (
+        'label_id',
+        'partner_id',
+    )
+
+    readonly_fields = [field.name for field in GHTKWebhookEvent._meta.fields]
+
+    ordering = ('-id',)
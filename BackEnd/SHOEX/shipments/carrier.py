@@ -0,0 +1,332 @@
+"""
+HTTP client dùng chung cho hãng vận chuyển (GHTK)
+
+- 1 requests.Session / process: giữ kết nối keep-alive, pool theo host
+- Timeout (connect, read) riêng cho từng endpoint
+- Retry với exponential backoff + full jitter; POST tạo đơn chỉ retry khi
+  chắc chắn request chưa tới hãng (connect timeout, 429)
+- Circuit breaker: lỗi liên tiếp vượt ngưỡng → fail nhanh trong reset_timeout
+  giây rồi cho 1 request thử (half-open)
+- Metrics trong process: số request / lỗi / retry / bị chặn, latency p50-p95-p99
+
+Dùng: get_ghtk_client().calculate_fee(params) / create_order(payload) / cancel_order(label, reason)
+     / get_status(label)
+Test với server giả: GHTKClient(base_url='http://127.0.0.1:<port>', token='x')
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) giây
+DEFAULT_TIMEOUT = (3.05, 10)
+POOL_SIZE = 20
+LATENCY_SAMPLES = 500
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CarrierError(Exception):
+    """Lỗi khi gọi hãng vận chuyển"""
+
+    def __init__(self, message, *, endpoint=None, status_code=None, payload=None):
+        super().__init__(message)
+        self.endpoint = endpoint
+        self.status_code = status_code
+        self.payload = payload
+
+
+class CarrierUnavailable(CarrierError):
+    """Không kết nối được / hết lượt retry / circuit đang mở"""
+
+
+class CircuitOpenError(CarrierUnavailable):
+    """Circuit đang mở: request bị chặn, không gửi tới hãng"""
+
+
+class CarrierAPIError(CarrierError):
+    """Hãng trả lời nhưng báo lỗi nghiệp vụ (success = false)"""
+
+
+class Endpoint:
+    def __init__(self, name, method, path, timeout=DEFAULT_TIMEOUT, idempotent=True):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.timeout = timeout
+        self.idempotent = idempotent
+
+
+# ===== CIRCUIT BREAKER =====
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+    def allow_request(self):
+        """False → fail nhanh, không gọi hãng"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                # Chỉ 1 request thử, các request khác vẫn bị chặn tới khi có kết quả
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning('Carrier circuit opened after %s failures', self._failures)
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
+
+
+# ===== METRICS =====
+
+class CarrierMetrics:
+    """Bộ đếm trong process, theo endpoint"""
+
+    COUNTERS = ('requests', 'successes', 'failures', 'api_errors', 'retries', 'short_circuited')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _entry(self, endpoint):
+        entry = self._endpoints.get(endpoint)
+        if entry is None:
+            entry = {name: 0 for name in self.COUNTERS}
+            entry['latencies'] = deque(maxlen=LATENCY_SAMPLES)
+            entry['last_error'] = None
+            self._endpoints[endpoint] = entry
+        return entry
+
+    def incr(self, endpoint, counter):
+        with self._lock:
+            self._entry(endpoint)[counter] += 1
+
+    def observe(self, endpoint, seconds):
+        with self._lock:
+            self._entry(endpoint)['latencies'].append(seconds)
+
+    def error(self, endpoint, message):
+        with self._lock:
+            self._entry(endpoint)['last_error'] = message
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for endpoint, entry in self._endpoints.items():
+                latencies = sorted(entry['latencies'])
+
+                def pct(p):
+                    if not latencies:
+                        return None
+                    return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1)
+
+                result[endpoint] = {
+                    **{name: entry[name] for name in self.COUNTERS},
+                    'latency_ms': {'p50': pct(0.5), 'p95': pct(0.95), 'p99': pct(0.99)},
+                    'last_error': entry['last_error'],
+                }
+            return result
+
+
+# ===== CLIENT =====
+
+class CarrierClient:
+    """Client HTTP chung: session pool + timeout + retry + circuit breaker + metrics"""
+
+    endpoints = {}
+
+    def __init__(self, base_url, headers=None, *, max_retries=2, backoff_base=0.2, backoff_max=2.0,
+                 failure_threshold=5, reset_timeout=30, timeouts=None, sleep=time.sleep):
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeouts = timeouts or {}
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = CarrierMetrics()
+        self._sleep = sleep
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(headers or {})
+
+    def _backoff(self, attempt):
+        """Full jitter: random(0, min(max, base * 2^attempt))"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _should_retry(self, endpoint, error=None, status_code=None):
+        if error is not None:
+            if isinstance(error, requests.exceptions.ConnectTimeout):
+                return True
+            # Lỗi sau khi đã gửi request: chỉ retry endpoint idempotent
+            return endpoint.idempotent and isinstance(
+                error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+            )
+        if status_code == 429:
+            return True
+        return endpoint.idempotent and status_code in RETRYABLE_STATUS
+
+    def request(self, name, *, path_args=(), params=None, json=None):
+        """Gọi endpoint; trả về dict JSON. Raise CarrierUnavailable / CarrierError"""
+        endpoint = self.endpoints[name]
+        url = self.base_url + endpoint.path.format(*path_args)
+        timeout = self.timeouts.get(name, endpoint.timeout)
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                self.metrics.incr(name, 'short_circuited')
+                raise CircuitOpenError('Carrier temporarily unavailable (circuit open)', endpoint=name)
+
+            self.metrics.incr(name, 'requests')
+            started = time.monotonic()
+            error = response = None
+            try:
+                response = self.session.request(endpoint.method, url, params=params, json=json, timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                error = e
+            self.metrics.observe(name, time.monotonic() - started)
+
+            status_code = response.status_code if response is not None else None
+            failed = error is not None or status_code >= 500 or status_code == 429
+            if not failed:
+                self.breaker.record_success()
+                break
+
+            self.breaker.record_failure()
+            self.metrics.incr(name, 'failures')
+            message = f'{type(error).__name__}: {error}' if error else f'HTTP {status_code}'
+            self.metrics.error(name, message)
+            if attempt >= self.max_retries or not self._should_retry(endpoint, error, status_code):
+                logger.warning('Carrier %s failed after %s attempt(s): %s', name, attempt + 1, message)
+                raise CarrierUnavailable(
+                    f'Carrier error on {name}: {message}', endpoint=name, status_code=status_code
+                )
+            delay = self._backoff(attempt)
+            attempt += 1
+            self.metrics.incr(name, 'retries')
+            logger.info('Carrier %s: %s, retry %s in %.2fs', name, message, attempt, delay)
+            self._sleep(delay)
+
+        if status_code != 200:
+            self.metrics.incr(name, 'api_errors')
+            self.metrics.error(name, f'HTTP {status_code}')
+            raise CarrierError(f'GHTK HTTP error {status_code}', endpoint=name, status_code=status_code)
+        try:
+            data = response.json()
+        except ValueError:
+            self.metrics.incr(name, 'api_errors')
+            raise CarrierError('GHTK returned invalid JSON', endpoint=name, status_code=status_code)
+        self.metrics.incr(name, 'successes')
+        return data
+
+
+class GHTKClient(CarrierClient):
+    endpoints = {
+        'fee': Endpoint('fee', 'GET', '/services/shipment/fee', timeout=(3.05, 5)),
+        'create_order': Endpoint('create_order', 'POST', '/services/shipment/order/?ver=1.5',
+                                 timeout=(3.05, 15), idempotent=False),
+        'status': Endpoint('status', 'GET', '/services/shipment/v2/{}', timeout=(3.05, 5)),
+        # Hủy 2 lần chỉ nhận lỗi "đã hủy" → coi như idempotent
+        'cancel': Endpoint('cancel', 'POST', '/services/shipment/cancel/{}', timeout=(3.05, 10)),
+        'address_level4': Endpoint('address_level4', 'GET', '/services/address/getAddressLevel4', timeout=(3.05, 10)),
+    }
+
+    def __init__(self, base_url=None, token=None, partner_code=None, **kwargs):
+        super().__init__(
+            base_url or settings.GHTK_BASE_URL,
+            headers={
+                'Token': token if token is not None else (settings.GHTK_API_TOKEN or ''),
+                'X-Client-Source': partner_code if partner_code is not None else (settings.GHTK_PARTNER_CODE or ''),
+            },
+            **kwargs,
+        )
+
+    def _checked(self, name, data):
+        """GHTK trả 200 kèm success=false khi lỗi nghiệp vụ"""
+        if not data.get('success'):
+            self.metrics.incr(name, 'api_errors')
+            message = data.get('message') or 'GHTK error'
+            raise CarrierAPIError(f'GHTK error: {message}', endpoint=name, payload=data)
+        return data
+
+    def calculate_fee(self, params):
+        return self._checked('fee', self.request('fee', params=params))
+
+    def create_order(self, payload):
+        return self._checked('create_order', self.request('create_order', json=payload))
+
+    def cancel_order(self, tracking_code, reason):
+        return self._checked('cancel', self.request('cancel', path_args=(tracking_code,), json={'reason': reason}))
+
+    def get_status(self, tracking_code):
+        """Trả về JSON thô (kể cả success=false) để caller lưu vào tracking"""
+        return self.request('status', path_args=(tracking_code,))
+
+    def get_address_level4(self, province, ward):
+        """Danh sách thôn/xóm/địa điểm (cấp 4) của 1 phường/xã"""
+        params = {'province': province, 'district': '', 'ward_street': ward}
+        return self._checked('address_level4', self.request('address_level4', params=params)).get('data') or []
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_ghtk_client():
+    """Client GHTK dùng chung trong process (tạo lần đầu khi cần)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GHTKClient(
+                    max_retries=settings.GHTK_MAX_RETRIES,
+                    failure_threshold=settings.GHTK_CIRCUIT_FAILURE_THRESHOLD,
+                    reset_timeout=settings.GHTK_CIRCUIT_RESET_SECONDS,
+                )
+    return _client
@@ -0,0 +1,175 @@
+"""
+Cache báo giá phí ship GHTK (đứng trước calculate_ghtk_fee)
+
+Khóa: (tỉnh, phường) lấy hàng + (tỉnh, phường) giao đã chuẩn hóa (address/normalize.py), bậc khối lượng,
+bậc giá trị hàng, transport, tags. Khối lượng / giá trị được làm tròn LÊN tới bậc và gửi
+đúng giá trị làm tròn cho GHTK → 1 báo giá dùng đúng cho mọi đơn trong cùng bậc.
+
+- Còn hạn (GHTK_FEE_CACHE_TTL)           → trả ngay
+- Quá hạn nhưng chưa quá GHTK_FEE_STALE_TTL → trả bản cũ + job nền làm mới (stale-while-revalidate)
+- "Không hỗ trợ giao" được cache ngắn hơn (GHTK_FEE_NEGATIVE_TTL)
+- Nhiều request giống nhau cùng lúc trong 1 process → chỉ 1 request tới GHTK (single-flight)
+Metrics: fee_quote_metrics.snapshot() (hit / stale / miss / negative / coalesced, hit_rate)
+"""
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from address.normalize import place_key
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+# Chờ request dẫn đầu tối đa (giây) trước khi tự gọi GHTK
+SINGLE_FLIGHT_WAIT = 10
+
+
+def _round_up(value, step):
+    value = max(0.0, float(value or 0))
+    return round(math.ceil(value / step) * step, 3)
+
+
+def weight_bucket(weight):
+    """Khối lượng (kg, như ProductVariant.weight) làm tròn lên bậc GHTK_FEE_WEIGHT_STEP"""
+    return max(settings.GHTK_FEE_WEIGHT_STEP, _round_up(weight, settings.GHTK_FEE_WEIGHT_STEP))
+
+
+def value_band(value):
+    return int(_round_up(value, settings.GHTK_FEE_VALUE_STEP))
+
+
+def quote_key(params):
+    parts = {
+        'pick': list(place_key(params.get('pick_province'), params.get('pick_ward'))),
+        'to': list(place_key(params.get('province'), params.get('ward'))),
+        'weight': weight_bucket(params.get('weight')),
+        'value': value_band(params.get('value')),
+        'transport': (params.get('transport') or '').lower(),
+        'tags': sorted(str(tag) for tag in (params.get('tags') or [])),
+    }
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'ghtk_fee:v{CACHE_VERSION}:{digest}'
+
+
+# ===== METRICS =====
+
+class FeeQuoteMetrics:
+    COUNTERS = ('hits', 'stale_hits', 'negative_hits', 'misses', 'coalesced', 'errors')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def incr(self, counter):
+        with self._lock:
+            self._counts[counter] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        served_from_cache = counts['hits'] + counts['stale_hits'] + counts['negative_hits'] + counts['coalesced']
+        lookups = served_from_cache + counts['misses']
+        counts['hit_rate'] = round(served_from_cache / lookups, 4) if lookups else None
+        return counts
+
+
+fee_quote_metrics = FeeQuoteMetrics()
+
+
+# ===== SINGLE-FLIGHT =====
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _single_flight(key, compute):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if flight.done.wait(SINGLE_FLIGHT_WAIT) and flight.error is None:
+            fee_quote_metrics.incr('coalesced')
+            return flight.result
+        # Request dẫn đầu lỗi / quá lâu → tự gọi
+        return compute()
+
+    try:
+        flight.result = compute()
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        flight.done.set()
+        with _flights_lock:
+            _flights.pop(key, None)
+
+
+# ===== CACHE =====
+
+def _bucketed(params):
+    return {**params, 'weight': weight_bucket(params.get('weight')), 'value': value_band(params.get('value'))}
+
+
+def _store(key, quote):
+    ttl = settings.GHTK_FEE_CACHE_TTL if quote['delivery_supported'] else settings.GHTK_FEE_NEGATIVE_TTL
+    cache.set(key, {'quote': quote, 'fresh_until': time.time() + ttl}, ttl + settings.GHTK_FEE_STALE_TTL)
+
+
+def fetch_quote(params, key=None):
+    """Gọi GHTK (khối lượng / giá trị đã làm tròn theo bậc) và ghi cache"""
+    from graphql_api.shipment.ultis.callAPI_ghtk import calculate_ghtk_fee
+
+    quote = calculate_ghtk_fee(**_bucketed(params))
+    _store(key or quote_key(params), quote)
+    return quote
+
+
+def get_fee_quote(**params):
+    """
+    Cùng tham số với calculate_ghtk_fee; trả về báo giá (có thể từ cache).
+    Raise CarrierError như calculate_ghtk_fee khi không có bản cache nào dùng được.
+    """
+    key = quote_key(params)
+    entry = cache.get(key)
+    if entry is not None:
+        quote = entry['quote']
+        if entry['fresh_until'] > time.time():
+            fee_quote_metrics.incr('hits' if quote['delivery_supported'] else 'negative_hits')
+            return quote
+        fee_quote_metrics.incr('stale_hits')
+        _schedule_refresh(key, params)
+        return quote
+
+    fee_quote_metrics.incr('misses')
+    try:
+        return _single_flight(key, lambda: fetch_quote(params, key))
+    except Exception:
+        fee_quote_metrics.incr('errors')
+        raise
+
+
+def _schedule_refresh(key, params):
+    from .tasks import refresh_fee_quote
+
+    try:
+        refresh_fee_quote.enqueue({'params': params}, dedup_key=key)
+    except Exception:
+        # Không chặn checkout nếu không ghi được job; lần sau sẽ thử lại
+        logger.exception('Could not enqueue fee quote refresh')
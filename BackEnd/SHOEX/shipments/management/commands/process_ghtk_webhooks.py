@@ -0,0 +1,69 @@
+"""
+Áp dụng inbox webhook GHTK vào Shipment / ShipmentTracking (shipments/webhook_inbox.py)
+Chạy: python manage.py process_ghtk_webhooks
+      python manage.py process_ghtk_webhooks --once --batch 2000   # xử lý hết inbox rồi thoát
+
+Có thể chạy nhiều process song song (FOR UPDATE SKIP LOCKED). Sự kiện đã xử lý
+được xóa sau 30 ngày.
+"""
+import signal
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from shipments import webhook_inbox
+
+PURGE_EVERY_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = 'Apply queued GHTK webhook events in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Xử lý hết inbox rồi thoát')
+        parser.add_argument('--batch', type=int, default=1000, help='Số sự kiện mỗi batch')
+        parser.add_argument('--sleep', type=float, default=0.5, help='Số giây nghỉ khi inbox trống')
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        totals = Counter()
+        started = time.monotonic()
+        last_purge = 0
+        while not self._stopping:
+            if time.monotonic() - last_purge >= PURGE_EVERY_SECONDS:
+                webhook_inbox.purge_processed()
+                last_purge = time.monotonic()
+
+            batch_started = time.monotonic()
+            counts = webhook_inbox.process_batch(options['batch'])
+            if not counts:
+                if options['once']:
+                    break
+                close_old_connections()
+                time.sleep(options['sleep'])
+                continue
+
+            totals.update(counts)
+            if options['verbosity'] > 1:
+                elapsed = time.monotonic() - batch_started
+                self.stdout.write(
+                    f"batch: {sum(counts.values())} events in {elapsed * 1000:.0f}ms "
+                    f"({', '.join(f'{k}={v}' for k, v in sorted(counts.items()))})"
+                )
+
+        elapsed = time.monotonic() - started
+        processed = sum(totals.values())
+        self.stdout.write(
+            f"Processed {processed} events in {elapsed:.1f}s "
+            f"({processed / elapsed if elapsed else 0:.0f}/s; "
+            f"{', '.join(f'{k}={v}' for k, v in sorted(totals.items())) or 'inbox empty'})"
+        )
+
+    def _stop(self, signum, frame):
+        self._stopping = True
@@ -0,0 +1,88 @@
+"""
+Scheduler đồng bộ trạng thái vận đơn GHTK (shipments/status_sync.py)
+Chạy: python manage.py sync_shipment_status
+      python manage.py sync_shipment_status --once        # xử lý hết vận đơn tới hạn rồi thoát (cron)
+      python manage.py sync_shipment_status --concurrency 8 --rate 10 --batch 200
+
+Mỗi batch: lấy vận đơn tới hạn (FOR UPDATE SKIP LOCKED), hỏi GHTK song song với giới hạn
+request/giây, ghi kết quả và hẹn lần hỏi kế tiếp. In số liệu từng batch và tổng kết khi dừng.
+"""
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from shipments import status_sync
+from shipments.carrier import get_ghtk_client, CircuitBreaker
+
+
+class Command(BaseCommand):
+    help = 'Poll GHTK for active shipments on an adaptive schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Xử lý hết vận đơn tới hạn rồi thoát')
+        parser.add_argument('--batch', type=int, default=100, help='Số vận đơn mỗi batch')
+        parser.add_argument('--concurrency', type=int, default=settings.GHTK_SYNC_CONCURRENCY,
+                            help='Số request song song')
+        parser.add_argument('--rate', type=float, default=settings.GHTK_SYNC_MAX_RPS,
+                            help='Tối đa request/giây tới GHTK')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Số giây nghỉ khi không có vận đơn tới hạn')
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        client = get_ghtk_client()
+        limiter = status_sync.RateLimiter(options['rate'], burst=options['concurrency'])
+        metrics = status_sync.SyncMetrics()
+
+        while not self._stopping:
+            if client.breaker.state == CircuitBreaker.OPEN:
+                # GHTK đang lỗi: không lấy vận đơn ra khỏi lịch, chờ circuit chuyển half-open
+                self.stdout.write(self.style.WARNING('Circuit open, waiting for GHTK to recover'))
+                if options['once']:
+                    break
+                time.sleep(client.breaker.reset_timeout)
+                continue
+
+            shipments = status_sync.due_shipments(options['batch'])
+            if not shipments:
+                if options['once']:
+                    break
+                close_old_connections()
+                time.sleep(options['sleep'])
+                continue
+
+            started = time.monotonic()
+            results = status_sync.sync_shipments(
+                shipments, client=client, concurrency=options['concurrency'], limiter=limiter,
+            )
+            metrics.add(results)
+            self._report_batch(metrics.batches, results, time.monotonic() - started)
+
+        self._report_summary(metrics, client)
+
+    def _report_batch(self, number, results, elapsed):
+        batch = status_sync.SyncMetrics()
+        batch.add(results)
+        counts = batch.snapshot()
+        self.stdout.write(
+            f"batch {number}: {counts['polled']} polled, {counts['changed']} changed, "
+            f"{counts['finalized']} final, {counts['errors']} errors, {counts['short_circuited']} short-circuited "
+            f"in {elapsed:.2f}s ({counts['polled'] / elapsed if elapsed else 0:.1f} polls/s), "
+            f"backlog {status_sync.due_count()}"
+        )
+
+    def _report_summary(self, metrics, client):
+        summary = metrics.snapshot()
+        self.stdout.write('Summary: ' + ', '.join(f'{key}={value}' for key, value in summary.items()))
+        latency = client.metrics.snapshot().get('status', {}).get('latency_ms')
+        if latency:
+            self.stdout.write(f"GHTK status latency: p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms")
+
+    def _stop(self, signum, frame):
+        self._stopping = True
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:55
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def schedule_active_shipments(apps, schema_editor):
+    """Vận đơn đang chạy có mã GHTK: đưa vào lịch đồng bộ ngay"""
+    Shipment = apps.get_model('shipments', 'Shipment')
+    Shipment.objects.filter(
+        status__in=['pending', 'shipping', 'out_for_delivery'], tracking_code__isnull=False,
+    ).update(next_sync_at=timezone.now(), status_changed_at=Coalesce('updated_at', 'created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_rollup_indexes'),
+        ('shipments', '0002_shipmenttracking_estimated_deliver_time_and_more'),
+        ('store', '0005_sales_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='carrier_status',
+            field=models.CharField(blank=True, help_text='Mã trạng thái hãng ở lần hỏi gần nhất', max_length=20, null=True, verbose_name='Mã trạng thái GHTK'),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='next_sync_at',
+            field=models.DateTimeField(blank=True, help_text='NULL = không đồng bộ nữa (trạng thái cuối)', null=True, verbose_name='Hỏi hãng lần tới'),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Trạng thái hãng đổi lúc'),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='status_checked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Hỏi hãng lần cuối'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('next_sync_at__isnull', False), ('status__in', ['pending', 'shipping', 'out_for_delivery'])), fields=['next_sync_at'], name='shipment_next_sync_idx'),
+        ),
+        migrations.RunPython(schedule_active_shipments, migrations.RunPython.noop),
+    ]
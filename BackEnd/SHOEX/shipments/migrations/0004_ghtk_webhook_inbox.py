@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0003_status_sync_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GHTKWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('label_id', models.CharField(max_length=100, verbose_name='Mã vận đơn GHTK')),
+                ('partner_id', models.CharField(blank=True, max_length=100, null=True, verbose_name='Mã đơn phía shop')),
+                ('status_id', models.IntegerField(verbose_name='Mã trạng thái GHTK')),
+                ('action_time', models.DateTimeField(verbose_name='Thời điểm GHTK cập nhật')),
+                ('payload', models.JSONField(verbose_name='Payload thô')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Nhận lúc')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Xử lý lúc')),
+                ('outcome', models.CharField(blank=True, choices=[('applied', 'Đã cập nhật vận đơn'), ('stale', 'Sự kiện cũ hơn trạng thái hiện tại'), ('unknown', 'Không tìm thấy vận đơn')], default='', max_length=10, verbose_name='Kết quả')),
+            ],
+            options={
+                'verbose_name': 'Webhook GHTK',
+                'verbose_name_plural': 'Webhook GHTK',
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='ghtk_webhook_pending_idx'), models.Index(fields=['processed_at'], name='ghtk_webhook_processed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('label_id', 'status_id', 'action_time'), name='ghtk_webhook_event_uniq')],
+            },
+        ),
+    ]
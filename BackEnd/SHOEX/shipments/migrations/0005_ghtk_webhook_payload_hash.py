@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0004_ghtk_webhook_inbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ghtkwebhookevent',
+            name='payload_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='SHA-256 payload'),
+        ),
+        migrations.AlterField(
+            model_name='ghtkwebhookevent',
+            name='action_time',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Thời điểm GHTK cập nhật'),
+        ),
+        migrations.AddConstraint(
+            model_name='ghtkwebhookevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('action_time__isnull', True)), fields=('label_id', 'status_id', 'payload_hash'), name='ghtk_webhook_event_no_time_uniq'),
+        ),
+    ]
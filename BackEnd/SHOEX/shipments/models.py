@@ -104,6 +104,31 @@ class Shipment(models.Model):
         help_text="Ngày giờ vận chuyển được cập nhật"
     )
 
+    # ===== ĐỒNG BỘ TRẠNG THÁI GHTK (shipments/status_sync.py) =====
+    carrier_status = models.CharField(
+        max_length=20,
+        blank=True,
+        null=True,
+        verbose_name="Mã trạng thái GHTK",
+        help_text="Mã trạng thái hãng ở lần hỏi gần nhất"
+    )
+    status_changed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Trạng thái hãng đổi lúc"
+    )
+    status_checked_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Hỏi hãng lần cuối"
+    )
+    next_sync_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Hỏi hãng lần tới",
+        help_text="NULL = không đồng bộ nữa (trạng thái cuối)"
+    )
+
     def __str__(self):
         return f"Shipment {self.shipment_id} - {self.status}"
 
@@ -116,6 +141,12 @@ class Shipment(models.Model):
             models.Index(fields=['tracking_code']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            # Hàng đợi đồng bộ: chỉ vận đơn còn chạy
+            models.Index(
+                fields=['next_sync_at'],
+                condition=models.Q(status__in=['pending', 'shipping', 'out_for_delivery'], next_sync_at__isnull=False),
+                name='shipment_next_sync_idx',
+            ),
         ]
 
 
@@ -219,3 +250,57 @@ class ShipmentTracking(models.Model):
 
     def __str__(self):
         return f"{self.label_id} - {self.carrier_status_text}"
+
+
+class GHTKWebhookEvent(models.Model):
+    """
+    Inbox callback GHTK: webhook chỉ ghi payload thô vào đây rồi trả 200 ngay,
+    manage.py process_ghtk_webhooks áp dụng theo batch (shipments/webhook_inbox.py).
+    GHTK gửi lại cùng (label_id, status_id, action_time) → bỏ qua nhờ unique constraint;
+    thiếu / không đọc được action_time → NULL, chống trùng theo SHA-256 của payload.
+    """
+
+    OUTCOME_CHOICES = [
+        ('applied', 'Đã cập nhật vận đơn'),
+        ('stale', 'Sự kiện cũ hơn trạng thái hiện tại'),
+        ('unknown', 'Không tìm thấy vận đơn'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    label_id = models.CharField(max_length=100, verbose_name="Mã vận đơn GHTK")
+    partner_id = models.CharField(max_length=100, blank=True, null=True, verbose_name="Mã đơn phía shop")
+    status_id = models.IntegerField(verbose_name="Mã trạng thái GHTK")
+    action_time = models.DateTimeField(blank=True, null=True, verbose_name="Thời điểm GHTK cập nhật")
+    payload = models.JSONField(verbose_name="Payload thô")
+    payload_hash = models.CharField(max_length=64, blank=True, default='', verbose_name="SHA-256 payload")
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name="Nhận lúc")
+    processed_at = models.DateTimeField(blank=True, null=True, verbose_name="Xử lý lúc")
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, blank=True, default='', verbose_name="Kết quả")
+
+    class Meta:
+        verbose_name = "Webhook GHTK"
+        verbose_name_plural = "Webhook GHTK"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['label_id', 'status_id', 'action_time'],
+                name='ghtk_webhook_event_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['label_id', 'status_id', 'payload_hash'],
+                condition=models.Q(action_time__isnull=True),
+                name='ghtk_webhook_event_no_time_uniq',
+            ),
+        ]
+        indexes = [
+            # Inbox: chỉ index sự kiện chưa xử lý
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='ghtk_webhook_pending_idx'),
+            models.Index(fields=['processed_at'], name='ghtk_webhook_processed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.label_id} - {self.status_id} @ {self.event_time}"
+
+    @property
+    def event_time(self):
+        """Thời điểm dùng để sắp xếp / so với trạng thái đã biết (không có action_time → lúc nhận)"""
+        return self.action_time or self.received_at
@@ -0,0 +1,321 @@
+"""
+Đồng bộ trạng thái vận đơn GHTK theo lịch thích ứng
+
+Mỗi Shipment còn chạy (pending / shipping / out_for_delivery, có tracking_code) có next_sync_at.
+Scheduler (manage.py sync_shipment_status) lấy các vận đơn tới hạn theo batch, hỏi GHTK
+song song (ThreadPool + giới hạn request/giây), rồi hẹn lần hỏi kế tiếp:
+
+  - Khoảng cách = thời gian trạng thái hãng giữ nguyên / 2, kẹp trong [MIN_INTERVAL, MAX_INTERVAL]
+    (vừa đổi trạng thái → hỏi lại sau 10 phút; đứng yên 1 ngày → vài giờ mới hỏi)
+  - Trạng thái map sang completed / cancelled / returned → next_sync_at = NULL, ngừng hỏi
+  - Lỗi hãng → thử lại sau MIN_INTERVAL; circuit mở → dừng batch, chờ circuit đóng
+
+Số lần gọi hãng tỉ lệ với số vận đơn đang chạy, không theo lượng đọc API.
+ShipmentTracking chỉ được ghi khi mã trạng thái hãng thay đổi.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from store import rollups
+from .carrier import get_ghtk_client, CarrierAPIError, CarrierError, CarrierUnavailable, CircuitOpenError
+from .constants import GHTK_STATUS_TO_SHIPMENT
+from .models import Shipment, ShipmentTracking
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('pending', 'shipping', 'out_for_delivery')
+MIN_INTERVAL = timedelta(minutes=10)
+MAX_INTERVAL = timedelta(hours=6)
+# Đang giao: khách chờ nhận hàng → không để quá 1 giờ
+STATUS_MAX_INTERVAL = {'out_for_delivery': timedelta(hours=1)}
+# Giữ chỗ khi đã lấy ra khỏi hàng đợi, tránh 2 scheduler cùng hỏi 1 vận đơn
+LEASE = timedelta(minutes=5)
+
+SYNC_FIELDS = ['carrier_status', 'status_changed_at', 'status_checked_at', 'next_sync_at']
+# Cột trạng thái + lịch hỏi: bị chặn khi vận đơn đã đổi trạng thái sau lúc đọc (xem _update_rows)
+GUARDED_FIELDS = ('status', 'updated_at', 'carrier_status', 'status_changed_at', 'next_sync_at')
+
+
+def _update_rows(shipments, fields, read_changed_at=None, batch_size=1000):
+    """
+    UPDATE ... FROM (VALUES ...) theo từng lô: nhanh hơn nhiều so với bulk_update
+    (CASE WHEN cho từng dòng) khi ghi hàng nghìn vận đơn.
+    read_changed_at: {shipment_id: status_changed_at lúc đọc} khi dòng không bị khóa trong lúc hỏi hãng;
+    webhook đã đổi trạng thái kể từ đó → giữ nguyên các cột GUARDED_FIELDS (webhook đã hẹn lịch hỏi),
+    chỉ ghi status_checked_at.
+    """
+    table = Shipment._meta.db_table
+    pk = Shipment._meta.pk.column
+    changed_at = Shipment._meta.get_field('status_changed_at')
+    model_fields = [Shipment._meta.get_field(name) for name in fields]
+    casts = [f'%s::{f.db_type(connection)}' for f in model_fields]
+    columns = [pk] + [f.column for f in model_fields]
+    if read_changed_at is not None:
+        casts.append(f'%s::{changed_at.db_type(connection)}')
+        columns.append('prev_changed_at')
+
+    def assignment(f):
+        if read_changed_at is None or f.name not in GUARDED_FIELDS:
+            return f'{f.column} = r.{f.column}'
+        return (
+            f'{f.column} = CASE WHEN s.{changed_at.column} IS NOT DISTINCT FROM r.prev_changed_at '
+            f'THEN r.{f.column} ELSE s.{f.column} END'
+        )
+
+    row = '(%s, ' + ', '.join(casts) + ')'
+    assignments = ', '.join(assignment(f) for f in model_fields)
+    with connection.cursor() as cursor:
+        for start in range(0, len(shipments), batch_size):
+            chunk = shipments[start:start + batch_size]
+            params = []
+            for shipment in chunk:
+                params.append(shipment.pk)
+                params.extend(f.get_db_prep_save(getattr(shipment, f.attname), connection) for f in model_fields)
+                if read_changed_at is not None:
+                    params.append(changed_at.get_db_prep_save(read_changed_at.get(shipment.pk), connection))
+            cursor.execute(
+                f"UPDATE {table} AS s SET {assignments} "
+                f"FROM (VALUES {', '.join([row] * len(chunk))}) AS r({', '.join(columns)}) "
+                f"WHERE s.{pk} = r.{pk}",
+                params,
+            )
+
+
+def save_shipments(quiet, status_changed, read_changed_at=None):
+    """
+    Ghi bulk kết quả đồng bộ. UPDATE trực tiếp không bắn post_save
+    → tự báo rollup thống kê cho vận đơn đổi trạng thái.
+    read_changed_at: như _update_rows (poller đọc vận đơn không giữ khóa; inbox webhook thì có khóa → None)
+    """
+    if quiet:
+        _update_rows(quiet, SYNC_FIELDS, read_changed_at)
+    if status_changed:
+        _update_rows(status_changed, ['status', 'updated_at', *SYNC_FIELDS], read_changed_at)
+        for shipment in status_changed:
+            rollups.schedule('sub_orders', shipment.sub_order_id)
+
+
+# ===== LỊCH =====
+
+def next_interval(status, unchanged_for):
+    """Khoảng chờ tới lần hỏi kế tiếp (±10% để các vận đơn không dồn cùng lúc)"""
+    upper = STATUS_MAX_INTERVAL.get(status, MAX_INTERVAL)
+    interval = min(upper, max(MIN_INTERVAL, unchanged_for / 2))
+    return interval * random.uniform(0.9, 1.1)
+
+
+def schedule_after_create(shipment, carrier_status, now=None):
+    """Vận đơn vừa tạo bên GHTK: bắt đầu theo dõi (chưa save)"""
+    now = now or timezone.now()
+    shipment.carrier_status = carrier_status
+    shipment.status_changed_at = now
+    shipment.status_checked_at = now
+    shipment.next_sync_at = now + MIN_INTERVAL
+
+
+def due_shipments(limit, now=None):
+    """Lấy tối đa limit vận đơn tới hạn và đẩy next_sync_at ra sau LEASE"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        shipments = list(
+            Shipment.objects.select_for_update(skip_locked=True)
+            .filter(status__in=ACTIVE_STATUSES, next_sync_at__lte=now, tracking_code__isnull=False)
+            .order_by('next_sync_at')[:limit]
+        )
+        if shipments:
+            Shipment.objects.filter(pk__in=[s.pk for s in shipments]).update(next_sync_at=now + LEASE)
+    return shipments
+
+
+def due_count(now=None):
+    now = now or timezone.now()
+    return Shipment.objects.filter(
+        status__in=ACTIVE_STATUSES, next_sync_at__lte=now, tracking_code__isnull=False,
+    ).count()
+
+
+# ===== GIỚI HẠN TỐC ĐỘ =====
+
+class RateLimiter:
+    """Token bucket dùng chung giữa các thread: tối đa rate request/giây, cho phép dồn burst"""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+# ===== METRICS =====
+
+class SyncMetrics:
+    COUNTERS = ('polled', 'changed', 'finalized', 'errors', 'short_circuited')
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.batches = 0
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+    def add(self, results):
+        self.batches += 1
+        for result in results:
+            if result.get('short_circuited'):
+                self.short_circuited += 1
+                continue
+            self.polled += 1
+            if not result['success']:
+                self.errors += 1
+                continue
+            self.changed += int(result['changed'])
+            self.finalized += int(result['final'])
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            'batches': self.batches,
+            **{name: getattr(self, name) for name in self.COUNTERS},
+            'elapsed_s': round(elapsed, 1),
+            'polls_per_s': round(self.polled / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+# ===== ĐỒNG BỘ =====
+
+def parse_status(data):
+    """(mã trạng thái GHTK, trạng thái Shipment tương ứng hoặc None, dict order)"""
+    ghtk_order = data.get('order') or {}
+    status_int = None
+    for key in ('status_id', 'status', 'status_code', 'code'):
+        if ghtk_order.get(key) is not None:
+            try:
+                status_int = int(ghtk_order[key])
+            except (TypeError, ValueError):
+                status_int = None
+            break
+    mapped = GHTK_STATUS_TO_SHIPMENT.get(status_int) if status_int is not None else None
+    return status_int, mapped, ghtk_order
+
+
+def _fetch(client, shipment, limiter):
+    if limiter is not None:
+        limiter.acquire()
+    try:
+        return shipment, client.get_status(shipment.tracking_code), None
+    except CarrierError as e:
+        return shipment, None, e
+
+
+def _result(shipment, **extra):
+    return {
+        'sub_order_id': shipment.sub_order_id,
+        'shipment_id': shipment.shipment_id,
+        'tracking_code': shipment.tracking_code,
+        **extra,
+    }
+
+
+def sync_shipments(shipments, *, client=None, concurrency=1, limiter=None, now=None):
+    """
+    Hỏi GHTK trạng thái các vận đơn (song song tối đa concurrency), lưu kết quả, hẹn lần hỏi kế tiếp.
+    Trả về list kết quả theo từng vận đơn.
+    """
+    client = client or get_ghtk_client()
+    shipments = [s for s in shipments if s.tracking_code]
+    if not shipments:
+        return []
+    # Mốc trạng thái lúc đọc: webhook có thể áp dụng sự kiện mới hơn trong lúc chờ hãng trả lời
+    read_changed_at = {s.pk: s.status_changed_at for s in shipments}
+
+    if concurrency > 1 and len(shipments) > 1:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(shipments))) as pool:
+            fetched = list(pool.map(lambda s: _fetch(client, s, limiter), shipments))
+    else:
+        fetched = [_fetch(client, s, limiter) for s in shipments]
+
+    now = now or timezone.now()
+    results, quiet, status_changed, trackings = [], [], [], []
+    for shipment, data, error in fetched:
+        if isinstance(error, CircuitOpenError):
+            # Không gửi request: giữ lịch, thử lại khi circuit đóng
+            shipment.next_sync_at = now + timedelta(seconds=client.breaker.reset_timeout)
+            quiet.append(shipment)
+            results.append(_result(shipment, success=False, short_circuited=True, retryable=True, error=str(error)))
+            continue
+        if error is None and not data.get('success'):
+            error = CarrierAPIError(data.get('message') or 'GHTK error', endpoint='status', payload=data)
+        if error is not None:
+            # status_checked_at chỉ tính lần hỏi thành công
+            shipment.next_sync_at = now + MIN_INTERVAL
+            quiet.append(shipment)
+            results.append(_result(
+                shipment, success=False, error=str(error), retryable=isinstance(error, CarrierUnavailable),
+            ))
+            continue
+
+        status_int, mapped, ghtk_order = parse_status(data)
+        carrier_status = str(status_int) if status_int is not None else None
+        new_status = mapped or shipment.status
+        changed = carrier_status != shipment.carrier_status
+        if changed:
+            shipment.carrier_status = carrier_status
+            shipment.status_changed_at = now
+            trackings.append(ShipmentTracking(
+                shipment=shipment,
+                label_id=ghtk_order.get('label_id') or shipment.tracking_code,
+                partner_id=ghtk_order.get('partner_id'),
+                carrier_status=carrier_status,
+                carrier_status_text=ghtk_order.get('status_text') or ghtk_order.get('status_name') or None,
+                raw_response=data,
+                weight=ghtk_order.get('total_weight') or shipment.total_weight,
+                message=ghtk_order.get('message') or data.get('message'),
+                estimated_pick_time=ghtk_order.get('estimated_pick_time'),
+                estimated_deliver_time=ghtk_order.get('estimated_deliver_time'),
+            ))
+
+        shipment.status_checked_at = now
+        final = new_status not in ACTIVE_STATUSES
+        if final:
+            shipment.next_sync_at = None
+        else:
+            unchanged_for = now - (shipment.status_changed_at or shipment.created_at)
+            shipment.next_sync_at = now + next_interval(new_status, unchanged_for)
+
+        if new_status != shipment.status:
+            shipment.status = new_status
+            shipment.updated_at = now
+            status_changed.append(shipment)
+        else:
+            quiet.append(shipment)
+        results.append(_result(
+            shipment, success=True, changed=changed, final=final,
+            mapped_status=mapped, raw_status=status_int,
+        ))
+
+    with transaction.atomic():
+        if trackings:
+            ShipmentTracking.objects.bulk_create(trackings)
+        save_shipments(quiet, status_changed, read_changed_at)
+    return results
@@ -0,0 +1,54 @@
+"""
+Job nền cho vận chuyển (worker: manage.py run_jobs)
+
+API đọc (myOrders, subOrdersByStore, createSettlement) không gọi GHTK nữa mà trả trạng thái
+đang lưu và đưa việc đồng bộ vào hàng đợi qua enqueue_status_refresh().
+Lịch đồng bộ định kỳ: shipments/status_sync.py (manage.py sync_shipment_status).
+"""
+from django.conf import settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import task, enqueue_many, RetryLater
+from .carrier import CarrierUnavailable
+from .models import Shipment
+from .status_sync import MIN_INTERVAL
+
+
+@task('shipments.refresh_status', priority=Job.PRIORITY_NORMAL, max_attempts=5)
+def refresh_status(sub_order_id):
+    """Đồng bộ trạng thái GHTK cho 1 đơn con"""
+    from graphql_api.order.ultis.updateStatusOrder import update_status_for_suborder
+
+    # Vừa hỏi hãng (scheduler hoặc job trước) → không gọi lại: số lần gọi không tăng theo lượt đọc
+    recent = Shipment.objects.filter(
+        sub_order_id=sub_order_id, status_checked_at__gte=timezone.now() - MIN_INTERVAL,
+    )
+    if recent.exists():
+        return {'sub_order_id': sub_order_id, 'skipped': True, 'reason': 'fresh'}
+
+    result = update_status_for_suborder(sub_order_id)
+    if result.get('retryable'):
+        # Hãng không phản hồi / circuit đang mở → để hàng đợi thử lại sau
+        raise RetryLater(result.get('error'), delay=settings.GHTK_CIRCUIT_RESET_SECONDS)
+    return result
+
+
+def enqueue_status_refresh(sub_order_ids, priority=Job.PRIORITY_NORMAL):
+    """Đưa các đơn con vào hàng đợi đồng bộ (bỏ qua đơn đã có job đang chờ)"""
+    return enqueue_many(
+        refresh_status.name,
+        [({'sub_order_id': pk}, f'shipment-status:{pk}') for pk in dict.fromkeys(sub_order_ids)],
+        priority=priority,
+    )
+
+
+@task('shipments.refresh_fee_quote', priority=Job.PRIORITY_LOW, max_attempts=3)
+def refresh_fee_quote(params):
+    """Làm mới báo giá phí ship đã quá hạn trong cache (shipments/fee_quotes.py)"""
+    from .fee_quotes import fetch_quote
+
+    try:
+        fetch_quote(params)
+    except CarrierUnavailable as e:
+        raise RetryLater(str(e), delay=settings.GHTK_CIRCUIT_RESET_SECONDS)
@@ -0,0 +1,87 @@
+"""
+Công cụ test dùng chung cho code gọi GHTK (shipments/tests.py, orders/tests.py)
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.cache import cache
+
+from . import carrier
+from .carrier import GHTKClient
+
+
+class FakeGHTK:
+    """
+    Server GHTK giả chạy trên 127.0.0.1 (thread riêng).
+    script: list các hành vi lần lượt cho từng request - (status, body) hoặc ('sleep', giây);
+    hết script thì trả về default.
+    """
+
+    def __init__(self, default=(200, {'success': True})):
+        self.default = default
+        self.script = []
+        # responder(path) → (status, body) hoặc None: trả lời theo đường dẫn (dùng khi gọi song song)
+        self.responder = None
+        self.requests = []
+        self.connections = set()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                fake.requests.append((self.command, self.path, dict(self.headers), body))
+                fake.connections.add(self.client_address)
+                routed = fake.responder(self.path) if fake.responder else None
+                action = routed or (fake.script.pop(0) if fake.script else fake.default)
+                if action[0] == 'sleep':
+                    time.sleep(action[1])
+                    action = fake.default
+                status, payload = action
+                data = json.dumps(payload).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client đã timeout và đóng kết nối
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeGHTKMixin:
+    """
+    setUp: cache rỗng, self.fake = FakeGHTK trả về FEE và client GHTK dùng chung (carrier._client)
+    trỏ tới nó (không retry); tất cả được trả lại sau test.
+    """
+    FEE = {'success': True, 'fee': {'name': 'area1', 'fee': 30000, 'insurance_fee': 0, 'delivery': True}}
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.fake = FakeGHTK(default=(200, self.FEE)).__enter__()
+        self.addCleanup(self.fake.__exit__)
+        original = carrier._client
+        carrier._client = GHTKClient(base_url=self.fake.url, token='t', max_retries=0, sleep=lambda s: None)
+        self.addCleanup(setattr, carrier, '_client', original)
@@ -1,3 +1,358 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.models import Job
+from orders.models import Order, SubOrder
+from store.models import Store
+from users.models import User
+from . import fee_quotes, status_sync, webhook_inbox
+from .carrier import (
+    GHTKClient, CarrierAPIError, CarrierUnavailable, CircuitOpenError, CircuitBreaker,
+)
+from .models import Shipment, ShipmentTracking, GHTKWebhookEvent
+from .testing import FakeGHTK, FakeGHTKMixin
+
+
+class GHTKClientTest(SimpleTestCase):
+    FEE_OK = {'success': True, 'fee': {'name': 'area1', 'fee': 30000, 'insurance_fee': 0, 'delivery': True}}
+
+    def _client(self, fake, **kwargs):
+        kwargs.setdefault('max_retries', 2)
+        kwargs.setdefault('sleep', lambda seconds: None)
+        return GHTKClient(base_url=fake.url, token='token', partner_code='partner', **kwargs)
+
+    def test_fee_reuses_connection_and_sends_auth_headers(self):
+        with FakeGHTK(default=(200, self.FEE_OK)) as fake:
+            client = self._client(fake)
+            for _ in range(3):
+                self.assertEqual(client.calculate_fee({'weight': 500})['fee']['fee'], 30000)
+
+        # keep-alive: 3 request trên cùng 1 kết nối
+        self.assertEqual(len(fake.connections), 1)
+        method, path, headers, _ = fake.requests[0]
+        self.assertEqual(method, 'GET')
+        self.assertTrue(path.startswith('/services/shipment/fee?'))
+        self.assertEqual(headers['Token'], 'token')
+        self.assertEqual(headers['X-Client-Source'], 'partner')
+        metrics = client.metrics.snapshot()['fee']
+        self.assertEqual(metrics['requests'], 3)
+        self.assertEqual(metrics['successes'], 3)
+        self.assertIsNotNone(metrics['latency_ms']['p95'])
+
+    def test_retries_idempotent_request_on_5xx(self):
+        with FakeGHTK(default=(200, self.FEE_OK)) as fake:
+            fake.script = [(502, {}), (503, {})]
+            client = self._client(fake)
+            client.calculate_fee({'weight': 500})
+
+        self.assertEqual(len(fake.requests), 3)
+        self.assertEqual(client.metrics.snapshot()['fee']['retries'], 2)
+
+    def test_create_order_is_not_retried_after_request_was_sent(self):
+        with FakeGHTK(default=(200, {'success': True, 'order': {'label': 'S1'}})) as fake:
+            fake.script = [(502, {})]
+            client = self._client(fake)
+            with self.assertRaises(CarrierUnavailable):
+                client.create_order({'order': {'id': 'SUB_1'}})
+
+        # Có thể hãng đã tạo đơn → không gửi lại
+        self.assertEqual(len(fake.requests), 1)
+
+    def test_read_timeout_is_retried_then_raises(self):
+        with FakeGHTK(default=(200, self.FEE_OK)) as fake:
+            fake.script = [('sleep', 0.5)] * 3
+            client = self._client(fake, timeouts={'fee': (1, 0.1)})
+            with self.assertRaises(CarrierUnavailable):
+                client.calculate_fee({'weight': 500})
+
+        self.assertEqual(client.metrics.snapshot()['fee']['failures'], 3)
+
+    def test_business_error_raises_api_error_without_retry(self):
+        with FakeGHTK(default=(200, {'success': False, 'message': 'Địa chỉ không hợp lệ'})) as fake:
+            client = self._client(fake)
+            with self.assertRaisesMessage(CarrierAPIError, 'Địa chỉ không hợp lệ'):
+                client.calculate_fee({'weight': 500})
+
+        self.assertEqual(len(fake.requests), 1)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_circuit_opens_then_recovers_through_half_open(self):
+        with FakeGHTK(default=(500, {})) as fake:
+            client = self._client(fake, max_retries=0, failure_threshold=3, reset_timeout=0.2)
+            for _ in range(3):
+                with self.assertRaises(CarrierUnavailable):
+                    client.get_status('S1')
+            self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+            # Circuit mở: fail nhanh, không gửi request
+            with self.assertRaises(CircuitOpenError):
+                client.get_status('S1')
+            self.assertEqual(len(fake.requests), 3)
+
+            time.sleep(0.25)
+            fake.default = (200, {'success': True, 'order': {'status': 5}})
+            self.assertTrue(client.get_status('S1')['success'])
+            self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+        self.assertEqual(client.metrics.snapshot()['status']['short_circuited'], 1)
+
+
+class StatusSyncTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='buyer', email='buyer@example.com')
+        cls.store = Store.objects.create(store_id='s1', name='S1', slug='s1', email='s1@example.com',
+                                         join_date=timezone.now())
+
+    def _shipment(self, code, status='shipping', carrier_status='3', changed_ago=timedelta(hours=1), due=True):
+        now = timezone.now()
+        order = Order.objects.create(buyer=self.user, total_amount=100)
+        sub_order = SubOrder.objects.create(order=order, store=self.store, subtotal=100)
+        return Shipment.objects.create(
+            user=self.user, store=self.store, sub_order=sub_order, tracking_code=code, value=100,
+            transport='road', status=status, carrier_status=carrier_status,
+            status_changed_at=now - changed_ago,
+            next_sync_at=now - timedelta(seconds=1) if due else now + timedelta(hours=1),
+        )
+
+    def test_next_interval_backs_off_with_unchanged_time(self):
+        fresh = status_sync.next_interval('shipping', timedelta(minutes=1))
+        stale = status_sync.next_interval('shipping', timedelta(days=3))
+        self.assertLessEqual(fresh, status_sync.MIN_INTERVAL * 1.1)
+        self.assertGreaterEqual(stale, status_sync.MAX_INTERVAL * 0.9)
+        self.assertLessEqual(status_sync.next_interval('out_for_delivery', timedelta(days=3)), timedelta(hours=1.1))
+
+    def test_due_shipments_leases_only_active_due_rows(self):
+        due = self._shipment('S1')
+        self._shipment('S2', due=False)
+        self._shipment('S3', status='completed')
+
+        self.assertEqual([s.pk for s in status_sync.due_shipments(10)], [due.pk])
+        # Đã giữ chỗ → lần lấy tiếp theo không trả lại
+        self.assertEqual(status_sync.due_shipments(10), [])
+
+    def test_sync_updates_schedule_status_and_tracking(self):
+        unchanged = self._shipment('S1', changed_ago=timedelta(hours=4))
+        delivered = self._shipment('S2', status='out_for_delivery', carrier_status='4')
+        failing = self._shipment('S3')
+        statuses = {'S1': 3, 'S2': 5}
+
+        def respond(path):
+            code = path.rsplit('/', 1)[-1]
+            if code not in statuses:
+                return (500, {})
+            return (200, {'success': True, 'order': {'label_id': code, 'status': statuses[code]}})
+
+        with FakeGHTK() as fake:
+            fake.responder = respond
+            client = GHTKClient(base_url=fake.url, token='t', max_retries=0, sleep=lambda s: None)
+            metrics = status_sync.SyncMetrics()
+            metrics.add(status_sync.sync_shipments(
+                status_sync.due_shipments(10), client=client, concurrency=3,
+                limiter=status_sync.RateLimiter(100),
+            ))
+
+        now = timezone.now()
+        unchanged.refresh_from_db()
+        self.assertEqual(unchanged.status, 'shipping')
+        # Giữ nguyên 4 giờ → hỏi lại sau khoảng 2 giờ
+        self.assertGreater(unchanged.next_sync_at, now + timedelta(hours=1.5))
+        self.assertFalse(ShipmentTracking.objects.filter(shipment=unchanged).exists())
+
+        delivered.refresh_from_db()
+        self.assertEqual(delivered.status, 'completed')
+        self.assertEqual(delivered.carrier_status, '5')
+        self.assertIsNone(delivered.next_sync_at)
+        self.assertEqual(ShipmentTracking.objects.get(shipment=delivered).carrier_status, '5')
+
+        failing.refresh_from_db()
+        self.assertIsNone(failing.status_checked_at)
+        self.assertLessEqual(failing.next_sync_at, now + status_sync.MIN_INTERVAL)
+
+        self.assertEqual(
+            {k: metrics.snapshot()[k] for k in ('polled', 'changed', 'finalized', 'errors')},
+            {'polled': 3, 'changed': 1, 'finalized': 1, 'errors': 1},
+        )
+
+    def test_sync_does_not_overwrite_webhook_applied_meanwhile(self):
+        shipment = self._shipment('S1', carrier_status='3')
+        due = status_sync.due_shipments(10)
+
+        # Trong lúc hỏi GHTK: webhook báo đã giao (5)
+        GHTKWebhookEvent.objects.create(label_id='S1', status_id=5, action_time=timezone.now(), payload={})
+        self.assertEqual(webhook_inbox.process_batch(), {'applied': 1})
+        delivered_at = Shipment.objects.get(pk=shipment.pk).status_changed_at
+
+        with FakeGHTK() as fake:
+            fake.default = (200, {'success': True, 'order': {'label_id': 'S1', 'status': 4}})
+            client = GHTKClient(base_url=fake.url, token='t', max_retries=0, sleep=lambda s: None)
+            [result] = status_sync.sync_shipments(due, client=client)
+
+        self.assertTrue(result['changed'])
+        shipment.refresh_from_db()
+        self.assertEqual(
+            (shipment.status, shipment.carrier_status, shipment.status_changed_at), ('completed', '5', delivered_at),
+        )
+        self.assertIsNotNone(shipment.status_checked_at)
+        self.assertIsNone(shipment.next_sync_at)
+
+    def test_rate_limiter_spaces_requests(self):
+        clock = [0.0]
+        limiter = status_sync.RateLimiter(
+            2, burst=1, clock=lambda: clock[0], sleep=lambda s: clock.__setitem__(0, clock[0] + s),
+        )
+        for _ in range(5):
+            limiter.acquire()
+        self.assertAlmostEqual(clock[0], 2.0)
+
+
+class GHTKWebhookTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='buyer', email='buyer@example.com')
+        store = Store.objects.create(store_id='s1', name='S1', slug='s1', email='s1@example.com',
+                                     join_date=timezone.now())
+        order = Order.objects.create(buyer=user, total_amount=100)
+        sub_order = SubOrder.objects.create(order=order, store=store, subtotal=100)
+        cls.shipment = Shipment.objects.create(
+            user=user, store=store, sub_order=sub_order, tracking_code='S1.A1', value=100,
+            transport='road', status='shipping', carrier_status='2',
+            status_changed_at=datetime(2026, 10, 16, tzinfo=timezone.get_fixed_timezone(420)),  # trước mọi action_time bên dưới
+        )
+
+    def _post(self, status_id, action_time, label_id='S1.A1', **extra):
+        return self.client.post(reverse('ghtk_webhook'), {
+            'label_id': label_id, 'partner_id': 'SUB_1', 'status_id': status_id,
+            'action_time': action_time, **extra,
+        })
+
+    def test_webhook_only_appends_to_inbox_and_dedups_retries(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self._post(3, '2026-10-17T10:00:00+07:00').status_code, 200)
+        self._post(3, '2026-10-17T10:00:00+07:00')
+        self._post(4, '2026-10-17T12:00:00+07:00')
+        self.assertEqual(self._post('abc', '2026-10-17T12:00:00+07:00').status_code, 200)
+
+        self.assertEqual(GHTKWebhookEvent.objects.count(), 2)
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.carrier_status, '2')
+
+    def test_retries_without_action_time_are_deduped_by_payload(self):
+        for _ in range(2):
+            self._post(4, '', reason='Đang giao')
+            self._post(4, 'không phải ngày giờ', reason='Đang giao')
+        self._post(4, '', reason='Giao lại')
+
+        events = GHTKWebhookEvent.objects.order_by('id')
+        self.assertEqual(events.count(), 3)
+        self.assertTrue(all(event.action_time is None for event in events))
+
+        # Không có action_time → áp dụng theo lúc nhận
+        self.assertEqual(webhook_inbox.process_batch(), {'applied': 3})
+        self.shipment.refresh_from_db()
+        self.assertEqual((self.shipment.carrier_status, self.shipment.status_changed_at), ('4', events.last().received_at))
+
+    def test_batch_applies_in_action_time_order_without_regressing(self):
+        # Đến sai thứ tự: giao thành công (5) trước, đang giao (4) tới sau
+        self._post(5, '2026-10-17T15:00:00+07:00', reason='Đã giao', weight='1.2')
+        self._post(4, '2026-10-17T12:00:00+07:00')
+        self._post(3, '2026-10-17T09:00:00+07:00', label_id='UNKNOWN')
+
+        counts = webhook_inbox.process_batch()
+        self.assertEqual(counts, {'applied': 2, 'unknown': 1})
+
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.status, 'completed')
+        self.assertEqual(self.shipment.carrier_status, '5')
+        self.assertIsNone(self.shipment.next_sync_at)
+        self.assertEqual(
+            list(ShipmentTracking.objects.filter(shipment=self.shipment).values_list('carrier_status', flat=True)),
+            ['5', '4'],
+        )
+
+        # Sự kiện cũ đến sau khi đã áp dụng: chỉ ghi lịch sử
+        self._post(4, '2026-10-17T13:00:00+07:00')
+        self.assertEqual(webhook_inbox.process_batch(), {'stale': 1})
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.status, 'completed')
+        self.assertEqual(ShipmentTracking.objects.filter(shipment=self.shipment).count(), 3)
+        self.assertEqual(webhook_inbox.process_batch(), {})
+
+
+class FeeQuoteCacheTest(FakeGHTKMixin, TestCase):
+    PARAMS = dict(
+        pick_address_id='1', pick_address='1 Lê Lợi', pick_province='Hà Nội', pick_ward='Phường Hoàn Kiếm',
+        address='2 Nguyễn Huệ', province='TP. Hồ Chí Minh', ward='Phường Sài Gòn', weight=0.3, value=250000,
+    )
+
+    def test_key_normalizes_places_and_buckets_weight_and_value(self):
+        key = fee_quotes.quote_key(self.PARAMS)
+        same = {**self.PARAMS, 'province': 'thành phố hồ chí minh', 'ward': 'phường  sài gòn',
+                'weight': 0.45, 'value': 290000, 'pick_address': 'khác'}
+        self.assertEqual(fee_quotes.quote_key(same), key)
+        self.assertNotEqual(fee_quotes.quote_key({**self.PARAMS, 'weight': 0.6}), key)
+        self.assertNotEqual(fee_quotes.quote_key({**self.PARAMS, 'transport': 'fly'}), key)
+
+    def test_miss_calls_carrier_with_bucketed_params_then_hits(self):
+        first = fee_quotes.get_fee_quote(**self.PARAMS)
+        second = fee_quotes.get_fee_quote(**{**self.PARAMS, 'weight': 0.5})
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.fake.requests), 1)
+        self.assertIn('weight=0.5', self.fake.requests[0][1])
+        self.assertIn('value=300000', self.fake.requests[0][1])
+
+    def test_delivery_not_supported_is_cached_with_negative_ttl(self):
+        self.fake.default = (200, {'success': True, 'fee': {'name': 'x', 'fee': 0, 'delivery': False}})
+        with self.settings(GHTK_FEE_NEGATIVE_TTL=60):
+            self.assertFalse(fee_quotes.get_fee_quote(**self.PARAMS)['delivery_supported'])
+            fee_quotes.get_fee_quote(**self.PARAMS)
+
+        self.assertEqual(len(self.fake.requests), 1)
+        entry = cache.get(fee_quotes.quote_key(self.PARAMS))
+        self.assertLess(entry['fresh_until'] - time.time(), 61)
+
+    def test_concurrent_identical_lookups_share_one_carrier_call(self):
+        # GHTK giữ request đầu tiên cho tới khi cả 5 lookup đã chạy: các lookup sau
+        # hoặc chờ request đó (single-flight) hoặc đọc cache nó vừa ghi
+        release = threading.Event()
+
+        def hold(path):
+            release.wait(10)
+
+        self.fake.responder = hold
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(fee_quotes.get_fee_quote(**self.PARAMS)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(len(self.fake.requests), 1)
+
+    def test_stale_quote_is_served_and_refreshed_in_background(self):
+        key = fee_quotes.quote_key(self.PARAMS)
+        stale = {'name': 'old', 'base_fee': 1, 'insurance_fee': 0, 'extra_fees': [], 'total_fee': 1,
+                 'delivery_supported': True}
+        cache.set(key, {'quote': stale, 'fresh_until': time.time() - 1}, 60)
+
+        self.assertEqual(fee_quotes.get_fee_quote(**self.PARAMS), stale)
+        self.assertEqual(self.fake.requests, [])
+        job = Job.objects.get(dedup_key=key)
+        self.assertEqual(job.task, 'shipments.refresh_fee_quote')
+
+        from .tasks import refresh_fee_quote
+        refresh_fee_quote(**job.payload)
+        self.assertEqual(fee_quotes.get_fee_quote(**self.PARAMS)['total_fee'], 30000)
+        self.assertGreaterEqual(fee_quotes.fee_quote_metrics.snapshot()['stale_hits'], 1)
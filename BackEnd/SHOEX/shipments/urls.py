@@ -1,7 +1,9 @@
 # shipping/urls.py
 from django.urls import path
 from .webhooks import ghtk_webhook
+from .views import carrier_metrics
 
 urlpatterns = [
     path('webhook/ghtk/', ghtk_webhook, name='ghtk_webhook'),
+    path('carrier/metrics/', carrier_metrics, name='carrier_metrics'),
 ]
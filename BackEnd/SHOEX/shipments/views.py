@@ -1,3 +1,18 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 
-# Create your views here.
+from .carrier import get_ghtk_client
+from .fee_quotes import fee_quote_metrics
+
+
+@staff_member_required
+def carrier_metrics(request):
+    """Trạng thái circuit breaker + metrics client GHTK + cache báo giá của process hiện tại"""
+    client = get_ghtk_client()
+    return JsonResponse({
+        'ghtk': {
+            'circuit': client.breaker.state,
+            'endpoints': client.metrics.snapshot(),
+            'fee_cache': fee_quote_metrics.snapshot(),
+        }
+    })
@@ -0,0 +1,128 @@
+"""
+Xử lý inbox webhook GHTK (GHTKWebhookEvent) theo batch
+
+Webhook (shipments/webhooks.py) chỉ INSERT payload thô; process_batch():
+  1. Lấy tối đa batch_size sự kiện chưa xử lý (FOR UPDATE SKIP LOCKED, chạy song song được)
+  2. Tải + khóa mọi Shipment liên quan trong 1 query
+  3. Áp dụng từng vận đơn theo thứ tự action_time (không có thì lúc nhận, GHTKWebhookEvent.event_time):
+     - luôn ghi ShipmentTracking (lịch sử đầy đủ, kể cả sự kiện đến trễ)
+     - chỉ đổi trạng thái khi action_time mới hơn mốc đã biết (status_changed_at / status_checked_at)
+       → sự kiện đến trễ không kéo trạng thái lùi lại
+     - không cho webhook đưa vận đơn về 'pending'
+     - có tin mới từ hãng → dời lịch hỏi GHTK (status_sync.next_interval)
+  4. Ghi bulk: tracking, vận đơn, đánh dấu sự kiện đã xử lý
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .constants import GHTK_STATUS_TO_SHIPMENT
+from .models import GHTKWebhookEvent, Shipment, ShipmentTracking
+from .status_sync import ACTIVE_STATUSES, next_interval, save_shipments
+
+RETENTION = timedelta(days=30)
+
+
+def _known_as_of(shipment):
+    """Mốc thời gian mà trạng thái hiện tại của vận đơn đã được xác nhận"""
+    marks = [t for t in (shipment.status_changed_at, shipment.status_checked_at) if t is not None]
+    return max(marks) if marks else None
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value)) if value not in (None, '') else None
+    except InvalidOperation:
+        return None
+
+
+def _tracking(shipment, event):
+    payload = event.payload
+    reason = str(payload.get('reason') or '')
+    reason_code = str(payload.get('reason_code') or '')
+    return ShipmentTracking(
+        shipment=shipment,
+        label_id=event.label_id,
+        partner_id=event.partner_id,
+        carrier_status=str(event.status_id),
+        carrier_status_text=reason[:255] or None,
+        message=f"{reason_code} - {reason}".strip(' -') or None,
+        event_time=event.event_time,
+        weight=_decimal(payload.get('weight')),
+        raw_response=payload,
+    )
+
+
+def process_batch(batch_size=1000):
+    """Xử lý 1 batch; trả về Counter theo outcome (rỗng nếu inbox trống)"""
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            GHTKWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True)
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return Counter()
+
+        shipments = {
+            s.tracking_code: s
+            for s in Shipment.objects.select_for_update().filter(
+                tracking_code__in={event.label_id for event in events}
+            )
+        }
+
+        by_label = defaultdict(list)
+        for event in events:
+            by_label[event.label_id].append(event)
+
+        outcomes = defaultdict(list)
+        trackings, touched, status_changed = [], {}, {}
+        for label_id, label_events in by_label.items():
+            shipment = shipments.get(label_id)
+            if shipment is None:
+                outcomes['unknown'].extend(event.pk for event in label_events)
+                continue
+
+            for event in sorted(label_events, key=lambda e: (e.event_time, e.pk)):
+                trackings.append(_tracking(shipment, event))
+                known_as_of = _known_as_of(shipment)
+                if known_as_of is not None and event.event_time < known_as_of:
+                    outcomes['stale'].append(event.pk)
+                    continue
+
+                shipment.carrier_status = str(event.status_id)
+                shipment.status_changed_at = event.event_time
+                mapped = GHTK_STATUS_TO_SHIPMENT.get(event.status_id)
+                # ❌ KHÔNG cho webhook set trạng thái "pending"
+                if mapped and mapped != 'pending' and mapped != shipment.status:
+                    shipment.status = mapped
+                    shipment.updated_at = now
+                    status_changed[shipment.pk] = shipment
+                outcomes['applied'].append(event.pk)
+                touched[shipment.pk] = shipment
+
+        for shipment in touched.values():
+            if shipment.status in ACTIVE_STATUSES:
+                unchanged_for = max(timedelta(0), now - shipment.status_changed_at)
+                shipment.next_sync_at = now + next_interval(shipment.status, unchanged_for)
+            else:
+                shipment.next_sync_at = None
+
+        if trackings:
+            ShipmentTracking.objects.bulk_create(trackings)
+        quiet = [s for pk, s in touched.items() if pk not in status_changed]
+        save_shipments(quiet, list(status_changed.values()))
+
+        for outcome, ids in outcomes.items():
+            GHTKWebhookEvent.objects.filter(pk__in=ids).update(processed_at=now, outcome=outcome)
+
+    return Counter({outcome: len(ids) for outcome, ids in outcomes.items()})
+
+
+def purge_processed(older_than=RETENTION):
+    deleted, _ = GHTKWebhookEvent.objects.filter(processed_at__lt=timezone.now() - older_than).delete()
+    return deleted
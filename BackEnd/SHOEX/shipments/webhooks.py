@@ -1,72 +1,83 @@
 # shipping/webhooks.py
+import hashlib
+import json
+
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
 from django.utils.dateparse import parse_datetime
-from django.utils.timezone import now
 
-from .models import Shipment, ShipmentTracking
-from .constants import GHTK_STATUS_TO_SHIPMENT
+from .models import GHTKWebhookEvent
+
+
+def _payload(request):
+    """GHTK gửi form-urlencoded; hỗ trợ thêm JSON"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST.dict()
+
+
+def _action_time(value):
+    """None khi thiếu / sai định dạng (không dùng giờ nhận: lần gửi lại sẽ thành sự kiện khác)"""
+    try:
+        event_time = parse_datetime(value) if value else None
+    except (TypeError, ValueError):
+        return None
+    if event_time is None:
+        return None
+    if timezone.is_naive(event_time):
+        event_time = timezone.make_aware(event_time)
+    return event_time
+
+
+def _payload_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
 
 
 @csrf_exempt
 def ghtk_webhook(request):
     """
     Webhook nhận cập nhật trạng thái từ GHTK
-    - Lưu lịch sử tracking (RAW)
-    - Map trạng thái tổng cho Shipment
+    - Chỉ ghi payload thô vào inbox (1 câu INSERT ... ON CONFLICT DO NOTHING) rồi ACK ngay
+    - GHTK gửi lại cùng (label_id, status_id, action_time) → bỏ qua;
+      không có action_time thì so theo SHA-256 của payload
+    - Cập nhật Shipment / ShipmentTracking theo batch: manage.py process_ghtk_webhooks
     """
 
     if request.method != 'POST':
         return HttpResponse(status=405)
 
-    data = request.POST
+    data = _payload(request)
 
     # ===== 1. Parse dữ liệu =====
     label_id = data.get('label_id')            # mã vận đơn GHTK
-    partner_id = data.get('partner_id')        # mã SubOrder (tham khảo)
     status_id = data.get('status_id')
-    action_time = data.get('action_time')
-    reason = data.get('reason', '')
-    reason_code = data.get('reason_code', '')
 
-    # Validate tối thiểu
-    if not label_id or not status_id:
+    # Validate tối thiểu (vẫn trả 200 để GHTK không retry)
+    if not label_id or status_id in (None, ''):
         return HttpResponse(status=200)
 
     try:
         status_id = int(status_id)
-    except ValueError:
+    except (TypeError, ValueError):
         return HttpResponse(status=200)
 
-    event_time = parse_datetime(action_time) if action_time else now()
-
-    # ===== 2. Tìm shipment =====
-    try:
-        shipment = Shipment.objects.get(tracking_code=label_id)
-    except Shipment.DoesNotExist:
-        # Không tìm thấy vẫn trả 200 để GHTK không retry
-        return HttpResponse(status=200)
+    # ===== 2. Ghi inbox =====
+    partner_id = data.get('partner_id')        # mã SubOrder (tham khảo)
+    GHTKWebhookEvent.objects.bulk_create([
+        GHTKWebhookEvent(
+            label_id=str(label_id)[:100],
+            partner_id=str(partner_id)[:100] if partner_id else None,
+            status_id=status_id,
+            action_time=_action_time(data.get('action_time')),
+            payload=data,
+            payload_hash=_payload_hash(data),
+        )
+    ], ignore_conflicts=True)
 
-    # ===== 3. Lưu TRACKING (RAW – không ép logic) =====
-    ShipmentTracking.objects.create(
-        shipment=shipment,
-        carrier_status_code=str(status_id),
-        carrier_status_description=reason,
-        location='GHTK',
-        timestamp=event_time,
-        details=f"{reason_code} - {reason}".strip(' -'),
-        api_response=dict(data),
-    )
-
-    # ===== 4. Map trạng thái chính cho Shipment =====
-    shipment_status = GHTK_STATUS_TO_SHIPMENT.get(status_id)
-
-    # ❌ KHÔNG cho webhook set trạng thái "pending"
-    if shipment_status and shipment_status != 'pending':
-        if shipment.status != shipment_status:
-            shipment.status = shipment_status
-            shipment.updated_at = now()
-            shipment.save(update_fields=['status', 'updated_at'])
-
-    # ===== 5. ACK cho GHTK =====
+    # ===== 3. ACK cho GHTK =====
     return HttpResponse(status=200)
@@ -0,0 +1,180 @@
+"""
+Benchmark các danh sách admin (adminUsersConnection, adminStoresConnection,
+adminOrdersConnection, adminProductsConnection)
+Chạy: python manage.py benchmark_admin_lists --users 100000 --products 100000 --orders 20000
+
+Tạo dữ liệu tạm bằng bulk_create (prefix "bench-"), rồi với mỗi danh sách đo số query
+và thời gian của trang đầu, vài trang kế tiếp (theo cursor), trang có bộ lọc và totalCount.
+Báo lỗi nếu số query của 1 trang thay đổi theo kích thước trang (N+1).
+Dữ liệu tạm bị xóa khi kết thúc (trừ khi có --keep).
+"""
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from address.models import Address
+from orders.models import Order, SubOrder, OrderItem
+from products.models import Category, Product, ProductVariant
+from store.models import Store, StoreUser
+from users.models import User
+
+BATCH_SIZE = 5000
+
+LISTS = [
+    # (field, filter cho lượt đo có bộ lọc, các field con)
+    ('adminUsersConnection', '{search: "bench"}', 'id name email role status orders spending address storeName'),
+    ('adminStoresConnection', '{status: "active"}', 'id name ownerName email address revenue orders products'),
+    ('adminOrdersConnection', '{status: "pending"}', 'id customer store products total status paymentMethod shippingAddress'),
+    ('adminProductsConnection', '{status: "approved"}', 'id name store category price stock sold image'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark admin list connections on a large synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='Số user tạo thêm')
+        parser.add_argument('--products', type=int, default=100000, help='Số sản phẩm tạo thêm')
+        parser.add_argument('--stores', type=int, default=200, help='Số cửa hàng tạo thêm')
+        parser.add_argument('--orders', type=int, default=20000, help='Số đơn hàng tạo thêm')
+        parser.add_argument('--page-size', type=int, default=50, help='Kích thước trang')
+        parser.add_argument('--pages', type=int, default=5, help='Số trang duyệt theo cursor')
+        parser.add_argument('--keep', action='store_true', help='Giữ lại dữ liệu benchmark')
+
+    def handle(self, *args, **options):
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        began = time.perf_counter()
+        self._seed(tag, options)
+        self.stdout.write(f'Seeded in {time.perf_counter() - began:.1f}s')
+        try:
+            failures = [field for field, *rest in LISTS if not self._bench(field, *rest, options=options)]
+        finally:
+            if not options['keep']:
+                self._cleanup(tag)
+        if failures:
+            raise CommandError(f'Query count depends on page size: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('Query count per page is constant for all admin lists'))
+
+    # ===== DỮ LIỆU =====
+
+    def _seed(self, tag, options):
+        now = timezone.now()
+        users = User.objects.bulk_create([
+            User(
+                username=f'{tag}-u{i}', email=f'{tag}-u{i}@example.com', password='!',
+                first_name='Bench', last_name=str(i), phone='0900000000',
+                role='seller' if i < options['stores'] else 'buyer',
+            )
+            for i in range(options['users'])
+        ], batch_size=BATCH_SIZE)
+
+        stores = Store.objects.bulk_create([
+            Store(store_id=f'{tag}-s{i}', name=f'{tag} store {i}', slug=f'{tag}-s{i}',
+                  email=f'{tag}-s{i}@example.com', join_date=now)
+            for i in range(options['stores'])
+        ], batch_size=BATCH_SIZE)
+        StoreUser.objects.bulk_create([
+            StoreUser(store=store, user=user, role='owner', status='active')
+            for store, user in zip(stores, users)
+        ], batch_size=BATCH_SIZE)
+
+        category = Category.objects.create(name=tag)
+        products = Product.objects.bulk_create([
+            Product(
+                store=stores[i % len(stores)], category=category, name=f'{tag} product {i}',
+                slug=f'{tag}-p{i}', model_code=f'{tag}-p{i}', description=tag,
+                base_price=Decimal('100000'),
+            )
+            for i in range(options['products'])
+        ], batch_size=BATCH_SIZE)
+        variants = ProductVariant.objects.bulk_create([
+            ProductVariant(product=product, sku=f'{tag}-v{product.product_id}', price=Decimal('100000'),
+                           stock=10, option_combinations={'Size': '42'})
+            for product in products
+        ], batch_size=BATCH_SIZE)
+
+        buyers = users[options['stores']:] or users
+        addresses = Address.objects.bulk_create([
+            Address(user=user, name=user.username, phone_number='0900000000',
+                    province=random.choice(['Hà Nội', 'TP. Hồ Chí Minh', 'Đà Nẵng']),
+                    ward='Phường 1', detail='1 Bench', is_default=True)
+            for user in buyers[:options['orders']]
+        ], batch_size=BATCH_SIZE)
+
+        orders = Order.objects.bulk_create([
+            Order(buyer=address.user, address=address, total_amount=Decimal('200000'))
+            for address in (addresses[i % len(addresses)] for i in range(options['orders']))
+        ], batch_size=BATCH_SIZE)
+        sub_orders = SubOrder.objects.bulk_create([
+            SubOrder(order=order, store=stores[i % len(stores)], subtotal=Decimal('200000'))
+            for i, order in enumerate(orders)
+        ], batch_size=BATCH_SIZE)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=sub_order.order, sub_order=sub_order, variant=variants[i % len(variants)],
+                      quantity=2, price_at_order=Decimal('100000'))
+            for i, sub_order in enumerate(sub_orders)
+        ], batch_size=BATCH_SIZE)
+
+    def _cleanup(self, tag):
+        Order.objects.filter(buyer__username__startswith=tag).delete()
+        Product.objects.filter(store__store_id__startswith=tag).delete()
+        Category.objects.filter(name=tag).delete()
+        Store.objects.filter(store_id__startswith=tag).delete()
+        User.objects.filter(username__startswith=tag).delete()
+
+    # ===== ĐO =====
+
+    def _execute(self, query, variables=None):
+        from graphql_api.api import schema
+
+        request = RequestFactory().get('/graphql/')
+        with CaptureQueriesContext(connection) as ctx:
+            begin = time.perf_counter()
+            result = schema.execute(query, variables=variables, context_value=request)
+            elapsed = (time.perf_counter() - begin) * 1000
+        if result.errors:
+            raise CommandError(result.errors[0])
+        return result.data, len(ctx.captured_queries), elapsed
+
+    def _bench(self, field, filter_literal, selection, options):
+        page_query = f"""
+            query Page($first: Int, $after: String) {{
+              {field}(first: $first, after: $after) {{
+                edges {{ node {{ {selection} }} }}
+                pageInfo {{ endCursor hasNextPage }}
+              }}
+            }}
+        """
+        self.stdout.write(f'\n{field}')
+
+        _, small_queries, _ = self._execute(page_query, {'first': 2})
+        after = None
+        for page in range(1, options['pages'] + 1):
+            data, queries, elapsed = self._execute(page_query, {'first': options['page_size'], 'after': after})
+            connection_data = data[field]
+            self.stdout.write(
+                f'  page {page}: {len(connection_data["edges"])} rows, {queries} queries, {elapsed:.1f}ms'
+            )
+            if queries != small_queries:
+                self.stdout.write(self.style.ERROR(
+                    f'  {queries} queries for {options["page_size"]} rows vs {small_queries} for 2 rows'
+                ))
+                return False
+            after = connection_data['pageInfo']['endCursor']
+            if not connection_data['pageInfo']['hasNextPage']:
+                break
+
+        _, queries, elapsed = self._execute(
+            f'{{ {field}(first: {options["page_size"]}, filter: {filter_literal}) {{ edges {{ node {{ {selection} }} }} }} }}'
+        )
+        self.stdout.write(f'  filtered {filter_literal}: {queries} queries, {elapsed:.1f}ms')
+        data, queries, elapsed = self._execute(f'{{ {field}(first: 1) {{ totalCount }} }}')
+        self.stdout.write(f'  totalCount={data[field]["totalCount"]}: {queries} queries, {elapsed:.1f}ms')
+        return True
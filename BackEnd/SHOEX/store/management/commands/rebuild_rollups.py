@@ -0,0 +1,35 @@
+"""
+Dựng lại các bảng rollup thống kê đơn hàng (StoreAnalytics, CategorySalesDaily,
+ProvinceSalesDaily, PlatformSalesMonthly) từ Order / SubOrder / OrderItem
+Chạy: python manage.py rebuild_rollups [--days 7 | --since 2025-01-01]
+
+Chạy 1 lần sau migrate để backfill; sau đó signals tự cập nhật.
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from store import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild sales rollup tables from orders'
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument('--days', type=int, help='Chỉ tính lại N ngày gần nhất')
+        group.add_argument('--since', help='Tính lại từ ngày (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        start_day = None
+        if options['days']:
+            start_day = timezone.localdate() - timedelta(days=options['days'] - 1)
+        elif options['since']:
+            try:
+                start_day = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since phải có dạng YYYY-MM-DD')
+
+        days = rollups.rebuild_rollups(start_day=start_day, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups for {days} days'))
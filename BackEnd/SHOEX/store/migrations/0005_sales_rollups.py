@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_category_path'),
+        ('store', '0004_remove_store_phone_addressstore_phone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorySalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ngày')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Σ price_at_order × quantity', max_digits=15, verbose_name='Doanh thu')),
+                ('items_sold', models.IntegerField(default=0, verbose_name='Số sản phẩm bán ra')),
+                ('order_items', models.IntegerField(default=0, verbose_name='Số dòng đơn hàng')),
+            ],
+            options={
+                'verbose_name': 'Doanh số danh mục theo ngày',
+                'verbose_name_plural': 'Doanh số danh mục theo ngày',
+            },
+        ),
+        migrations.CreateModel(
+            name='PlatformSalesMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Tháng')),
+                ('orders', models.IntegerField(default=0, verbose_name='Số đơn hàng')),
+                ('order_total', models.DecimalField(decimal_places=2, default=0, help_text='Σ Order.total_amount', max_digits=15, verbose_name='Tổng tiền đơn hàng')),
+                ('sub_orders', models.IntegerField(default=0, verbose_name='Số đơn con')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Σ SubOrder.subtotal', max_digits=15, verbose_name='Doanh thu')),
+                ('shipping_fee', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Phí vận chuyển')),
+                ('items_sold', models.IntegerField(default=0, verbose_name='Số sản phẩm bán ra')),
+                ('active_buyers', models.IntegerField(default=0, verbose_name='Người mua có đơn')),
+                ('repeat_buyers', models.IntegerField(default=0, verbose_name='Người mua có từ 2 đơn')),
+                ('new_customers', models.IntegerField(default=0, verbose_name='Tài khoản buyer mới')),
+                ('new_sellers', models.IntegerField(default=0, verbose_name='Tài khoản seller mới')),
+                ('new_store_owners', models.IntegerField(default=0, verbose_name='Chủ cửa hàng mới')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Cập nhật lúc')),
+            ],
+            options={
+                'verbose_name': 'Thống kê sàn theo tháng',
+                'verbose_name_plural': 'Thống kê sàn theo tháng',
+                'ordering': ['month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProvinceSalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ngày')),
+                ('province', models.CharField(blank=True, help_text='Rỗng = đơn không có địa chỉ', max_length=100, verbose_name='Tỉnh/Thành phố')),
+                ('orders', models.IntegerField(default=0, verbose_name='Số đơn hàng')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Σ Order.total_amount', max_digits=15, verbose_name='Tổng tiền đơn hàng')),
+            ],
+            options={
+                'verbose_name': 'Đơn hàng theo tỉnh theo ngày',
+                'verbose_name_plural': 'Đơn hàng theo tỉnh theo ngày',
+            },
+        ),
+        migrations.AddField(
+            model_name='storeanalytics',
+            name='completed_orders',
+            field=models.IntegerField(default=0, verbose_name='Đơn đã giao'),
+        ),
+        migrations.AddField(
+            model_name='storeanalytics',
+            name='completed_revenue',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='subtotal + shipping_fee của SubOrder có shipment completed', max_digits=15, verbose_name='Doanh thu đơn đã giao'),
+        ),
+        migrations.AddField(
+            model_name='storeanalytics',
+            name='items_sold',
+            field=models.IntegerField(default=0, verbose_name='Số sản phẩm bán ra'),
+        ),
+        migrations.AddField(
+            model_name='storeanalytics',
+            name='shipping_fee',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Phí vận chuyển'),
+        ),
+        migrations.AddField(
+            model_name='storeanalytics',
+            name='status_counts',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Số đơn theo trạng thái vận chuyển'),
+        ),
+        migrations.AddIndex(
+            model_name='storeanalytics',
+            index=models.Index(fields=['date'], name='store_analytics_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='categorysalesdaily',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_daily', to='products.category', verbose_name='Danh mục'),
+        ),
+        migrations.AddConstraint(
+            model_name='provincesalesdaily',
+            constraint=models.UniqueConstraint(fields=('date', 'province'), name='unique_province_sales_daily'),
+        ),
+        migrations.AddConstraint(
+            model_name='categorysalesdaily',
+            constraint=models.UniqueConstraint(fields=('date', 'category'), name='unique_category_sales_daily'),
+        ),
+    ]
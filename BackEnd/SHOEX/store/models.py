@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from address.normalize import normalize_address_fields
 
 User = get_user_model()
 
@@ -522,7 +523,40 @@ class StoreAnalytics(models.Model):
         default=0,
         verbose_name="Sản phẩm thêm mới"
     )
-    
+
+    # ===== ROLLUP ĐƠN HÀNG (store/rollups.py) =====
+    # orders / revenue ở trên = số SubOrder tạo trong ngày / tổng subtotal
+    shipping_fee = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        verbose_name="Phí vận chuyển"
+    )
+
+    items_sold = models.IntegerField(
+        default=0,
+        verbose_name="Số sản phẩm bán ra"
+    )
+
+    completed_orders = models.IntegerField(
+        default=0,
+        verbose_name="Đơn đã giao"
+    )
+
+    completed_revenue = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        verbose_name="Doanh thu đơn đã giao",
+        help_text="subtotal + shipping_fee của SubOrder có shipment completed"
+    )
+
+    status_counts = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Số đơn theo trạng thái vận chuyển"
+    )
+
     class Meta:
         verbose_name = "Thống kê cửa hàng"
         verbose_name_plural = "Thống kê cửa hàng"
@@ -532,11 +566,121 @@ class StoreAnalytics(models.Model):
                 name='unique_store_analytics_date'
             ),
         ]
+        indexes = [
+            models.Index(fields=['date'], name='store_analytics_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.store.name} - {self.date}"
 
 
+class CategorySalesDaily(models.Model):
+    """Rollup doanh số theo danh mục / ngày (toàn sàn)"""
+
+    date = models.DateField(verbose_name="Ngày")
+
+    category = models.ForeignKey(
+        'products.Category',
+        on_delete=models.CASCADE,
+        related_name='sales_daily',
+        verbose_name="Danh mục"
+    )
+
+    revenue = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        verbose_name="Doanh thu",
+        help_text="Σ price_at_order × quantity"
+    )
+
+    items_sold = models.IntegerField(default=0, verbose_name="Số sản phẩm bán ra")
+
+    order_items = models.IntegerField(default=0, verbose_name="Số dòng đơn hàng")
+
+    class Meta:
+        verbose_name = "Doanh số danh mục theo ngày"
+        verbose_name_plural = "Doanh số danh mục theo ngày"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='unique_category_sales_daily'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} - {self.date}"
+
+
+class ProvinceSalesDaily(models.Model):
+    """Rollup đơn hàng theo tỉnh/thành giao hàng / ngày"""
+
+    date = models.DateField(verbose_name="Ngày")
+
+    province = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Tỉnh/Thành phố",
+        help_text="Rỗng = đơn không có địa chỉ"
+    )
+
+    orders = models.IntegerField(default=0, verbose_name="Số đơn hàng")
+
+    revenue = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        verbose_name="Tổng tiền đơn hàng",
+        help_text="Σ Order.total_amount"
+    )
+
+    class Meta:
+        verbose_name = "Đơn hàng theo tỉnh theo ngày"
+        verbose_name_plural = "Đơn hàng theo tỉnh theo ngày"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'province'], name='unique_province_sales_daily'),
+        ]
+
+    def __str__(self):
+        return f"{self.province or '-'} - {self.date}"
+
+
+class PlatformSalesMonthly(models.Model):
+    """Rollup toàn sàn theo tháng (month = ngày đầu tháng)"""
+
+    month = models.DateField(unique=True, verbose_name="Tháng")
+
+    orders = models.IntegerField(default=0, verbose_name="Số đơn hàng")
+    order_total = models.DecimalField(
+        max_digits=15, decimal_places=2, default=0,
+        verbose_name="Tổng tiền đơn hàng", help_text="Σ Order.total_amount"
+    )
+    sub_orders = models.IntegerField(default=0, verbose_name="Số đơn con")
+    revenue = models.DecimalField(
+        max_digits=15, decimal_places=2, default=0,
+        verbose_name="Doanh thu", help_text="Σ SubOrder.subtotal"
+    )
+    shipping_fee = models.DecimalField(
+        max_digits=15, decimal_places=2, default=0,
+        verbose_name="Phí vận chuyển"
+    )
+    items_sold = models.IntegerField(default=0, verbose_name="Số sản phẩm bán ra")
+
+    active_buyers = models.IntegerField(default=0, verbose_name="Người mua có đơn")
+    repeat_buyers = models.IntegerField(default=0, verbose_name="Người mua có từ 2 đơn")
+
+    new_customers = models.IntegerField(default=0, verbose_name="Tài khoản buyer mới")
+    new_sellers = models.IntegerField(default=0, verbose_name="Tài khoản seller mới")
+    new_store_owners = models.IntegerField(default=0, verbose_name="Chủ cửa hàng mới")
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Cập nhật lúc")
+
+    class Meta:
+        verbose_name = "Thống kê sàn theo tháng"
+        verbose_name_plural = "Thống kê sàn theo tháng"
+        ordering = ['month']
+
+    def __str__(self):
+        return self.month.strftime('%m/%Y')
+
+
 class StoreSettings(models.Model):
     """Cài đặt cửa hàng"""
     
@@ -920,6 +1064,8 @@ class AddressStore(models.Model):
 
     def save(self, *args, **kwargs):
         """Override save để đảm bảo chỉ có 1 địa chỉ mặc định per store"""
+        # Tỉnh / phường xã về tên chuẩn theo danh mục địa chỉ
+        normalize_address_fields(self)
         with transaction.atomic():
             if self.is_default:
                 AddressStore.objects.filter(
@@ -0,0 +1,482 @@
+"""
+Rollup thống kê đơn hàng cho dashboard / admin analytics
+
+Bảng fact (store/models.py):
+  - StoreAnalytics       (store, ngày)     : đơn con, doanh thu, phí ship, sản phẩm, trạng thái vận chuyển
+  - CategorySalesDaily   (danh mục, ngày)  : doanh thu, sản phẩm, số dòng đơn
+  - ProvinceSalesDaily   (tỉnh, ngày)      : số đơn, tổng tiền đơn
+  - PlatformSalesMonthly (tháng)           : tổng hợp toàn sàn + người mua / tài khoản mới
+
+Cập nhật:
+  - Order mới           → record_orders(): cộng dồn (INSERT ... ON CONFLICT DO UPDATE x = x + delta)
+  - Shipment đổi status → refresh_sub_orders(): tính lại (store, ngày) của đơn con đó
+  - Xóa Order/SubOrder  → recompute_days(): tính lại cả ngày + tháng
+  - User / chủ shop mới → record_signup()
+Tất cả chạy sau commit (signals.py). Dựng lại toàn bộ: manage.py rebuild_rollups
+"""
+import functools
+import threading
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import StoreAnalytics, CategorySalesDaily, ProvinceSalesDaily, PlatformSalesMonthly
+
+ZERO = Decimal('0')
+COMPLETED_STATUS = 'completed'
+REBUILD_CHUNK_DAYS = 31
+
+STORE_ROLLUP_FIELDS = [
+    'orders', 'revenue', 'shipping_fee', 'items_sold',
+    'completed_orders', 'completed_revenue', 'status_counts',
+]
+
+
+# ===== THỜI GIAN =====
+
+def local_day(dt):
+    return timezone.localdate(dt)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def day_bounds(start_day, end_day):
+    """[00:00 start_day, 00:00 ngày sau end_day) theo timezone hiện tại"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def _money(expression):
+    return Coalesce(Sum(expression), Value(ZERO), output_field=DecimalField(max_digits=15, decimal_places=2))
+
+
+# ===== UPSERT CỘNG DỒN =====
+
+def _increment(model, key_fields, rows):
+    """
+    INSERT ... ON CONFLICT (key) DO UPDATE SET f = f + EXCLUDED.f cho các field số trong rows.
+    Field không có trong row lấy giá trị default.
+    """
+    if not rows:
+        return
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    delta_fields = [
+        f for f in fields
+        if f.name not in key_fields and any(f.name in row for row in rows)
+    ]
+    now = timezone.now()
+    values = []
+    for row in rows:
+        for field in fields:
+            if field.name in row:
+                value = row[field.name]
+            elif getattr(field, 'auto_now', False):
+                value = now
+            else:
+                value = field.get_default()
+            values.append(field.get_db_prep_save(value, connection))
+
+    table = model._meta.db_table
+    columns = ', '.join(f.column for f in fields)
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(rows))
+    keys = ', '.join(model._meta.get_field(name).column for name in key_fields)
+    updates = [f"{f.column} = {table}.{f.column} + EXCLUDED.{f.column}" for f in delta_fields]
+    updates += [f"{f.column} = EXCLUDED.{f.column}" for f in fields if getattr(f, 'auto_now', False)]
+    sql = (
+        f"INSERT INTO {table} ({columns}) VALUES {placeholders} "
+        f"ON CONFLICT ({keys}) DO UPDATE SET {', '.join(updates)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, values)
+
+
+# ===== STORE x NGÀY =====
+
+def _store_day_rows(sub_order_filter):
+    """Tính các chỉ số StoreAnalytics (store, ngày) cho các SubOrder khớp filter"""
+    from orders.models import SubOrder, OrderItem
+
+    completed = Q(shipment__status=COMPLETED_STATUS)
+    rows = {}
+    base = SubOrder.objects.filter(sub_order_filter).annotate(day=TruncDate('created_at'))
+    for r in base.values('store_id', 'day').annotate(
+        n=Count('sub_order_id'),
+        revenue_sum=_money('subtotal'),
+        shipping_sum=_money('shipping_fee'),
+        completed_n=Count('sub_order_id', filter=completed),
+        completed_sum=Coalesce(
+            Sum(F('subtotal') + F('shipping_fee'), filter=completed),
+            Value(ZERO), output_field=DecimalField(max_digits=15, decimal_places=2)
+        ),
+    ).order_by():
+        rows[(r['store_id'], r['day'])] = {
+            'orders': r['n'],
+            'revenue': r['revenue_sum'],
+            'shipping_fee': r['shipping_sum'],
+            'items_sold': 0,
+            'completed_orders': r['completed_n'],
+            'completed_revenue': r['completed_sum'],
+            'status_counts': {},
+        }
+
+    for r in base.values('store_id', 'day', 'shipment__status').annotate(n=Count('sub_order_id')).order_by():
+        status = r['shipment__status'] or 'none'
+        rows[(r['store_id'], r['day'])]['status_counts'][status] = r['n']
+
+    items = OrderItem.objects.filter(
+        sub_order__in=SubOrder.objects.filter(sub_order_filter)
+    ).annotate(day=TruncDate('sub_order__created_at'))
+    for r in items.values('sub_order__store_id', 'day').annotate(n=Sum('quantity')).order_by():
+        key = (r['sub_order__store_id'], r['day'])
+        if key in rows:
+            rows[key]['items_sold'] = r['n'] or 0
+    return rows
+
+
+def _save_store_days(rows, zero_keys=()):
+    """Upsert StoreAnalytics, giữ nguyên các cột không thuộc rollup (views, visitors...)"""
+    objs = [
+        StoreAnalytics(store_id=store_id, date=day, **values)
+        for (store_id, day), values in rows.items()
+    ]
+    objs += [
+        StoreAnalytics(store_id=store_id, date=day, status_counts={})
+        for (store_id, day) in zero_keys if (store_id, day) not in rows
+    ]
+    if objs:
+        StoreAnalytics.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=['store', 'date'],
+            update_fields=STORE_ROLLUP_FIELDS,
+        )
+
+
+def refresh_store_days(pairs):
+    """Tính lại StoreAnalytics cho các cặp (store_id, ngày)"""
+    pairs = set(pairs)
+    if not pairs:
+        return
+    condition = Q()
+    for store_id, day in pairs:
+        start, end = day_bounds(day, day)
+        condition |= Q(store_id=store_id, created_at__gte=start, created_at__lt=end)
+    _save_store_days(_store_day_rows(condition), zero_keys=pairs)
+
+
+def refresh_sub_orders(sub_order_ids):
+    """Tính lại (store, ngày) chứa các SubOrder này (VD: shipment đổi trạng thái)"""
+    from orders.models import SubOrder
+
+    pairs = {
+        (r['store_id'], local_day(r['created_at']))
+        for r in SubOrder.objects.filter(sub_order_id__in=sub_order_ids).values('store_id', 'created_at')
+    }
+    refresh_store_days(pairs)
+
+
+# ===== ORDER MỚI (cộng dồn) =====
+
+def record_orders(order_ids):
+    """Cộng dồn rollup cho các Order vừa tạo (gọi sau commit)"""
+    from orders.models import Order, SubOrder, OrderItem
+
+    orders = list(
+        Order.objects.filter(order_id__in=order_ids)
+        .values('order_id', 'buyer_id', 'created_at', 'total_amount', province=F('address__province'))
+    )
+    if not orders:
+        return
+    order_day = {o['order_id']: local_day(o['created_at']) for o in orders}
+    ids = list(order_day)
+
+    subs = list(SubOrder.objects.filter(order_id__in=ids).values('order_id', 'store_id', 'subtotal', 'shipping_fee'))
+    items = list(
+        OrderItem.objects.filter(order_id__in=ids)
+        .values('order_id', category_id=F('variant__product__category_id'))
+        .annotate(
+            qty=Sum('quantity'),
+            amount=_money(ExpressionWrapper(F('price_at_order') * F('quantity'), output_field=DecimalField())),
+            lines=Count('item_id'),
+        ).order_by()
+    )
+
+    with transaction.atomic():
+        refresh_store_days({(s['store_id'], order_day[s['order_id']]) for s in subs})
+
+        categories = defaultdict(lambda: {'revenue': ZERO, 'items_sold': 0, 'order_items': 0})
+        for item in items:
+            if item['category_id'] is None:
+                continue
+            row = categories[(order_day[item['order_id']], item['category_id'])]
+            row['revenue'] += item['amount']
+            row['items_sold'] += item['qty']
+            row['order_items'] += item['lines']
+        _increment(CategorySalesDaily, ['date', 'category'], [
+            {'date': day, 'category': category_id, **values}
+            for (day, category_id), values in categories.items()
+        ])
+
+        provinces = defaultdict(lambda: {'orders': 0, 'revenue': ZERO})
+        for o in orders:
+            row = provinces[(order_day[o['order_id']], o['province'] or '')]
+            row['orders'] += 1
+            row['revenue'] += o['total_amount'] or ZERO
+        _increment(ProvinceSalesDaily, ['date', 'province'], [
+            {'date': day, 'province': province, **values}
+            for (day, province), values in provinces.items()
+        ])
+
+        months = defaultdict(lambda: {
+            'orders': 0, 'order_total': ZERO, 'sub_orders': 0, 'revenue': ZERO,
+            'shipping_fee': ZERO, 'items_sold': 0, 'active_buyers': 0, 'repeat_buyers': 0,
+        })
+        for o in orders:
+            row = months[month_start(order_day[o['order_id']])]
+            row['orders'] += 1
+            row['order_total'] += o['total_amount'] or ZERO
+        for s in subs:
+            row = months[month_start(order_day[s['order_id']])]
+            row['sub_orders'] += 1
+            row['revenue'] += s['subtotal'] or ZERO
+            row['shipping_fee'] += s['shipping_fee'] or ZERO
+        for item in items:
+            months[month_start(order_day[item['order_id']])]['items_sold'] += item['qty']
+        _count_buyers(orders, order_day, months)
+
+        _increment(PlatformSalesMonthly, ['month'], [
+            {'month': month, **values} for month, values in months.items()
+        ])
+
+
+def _count_buyers(orders, order_day, months):
+    """active/repeat buyers: so số đơn trong tháng của buyer trước và sau batch này"""
+    from orders.models import Order
+
+    new_orders = defaultdict(int)
+    for o in orders:
+        new_orders[(o['buyer_id'], month_start(order_day[o['order_id']]))] += 1
+
+    for month in {m for _, m in new_orders}:
+        buyers = [b for b, m in new_orders if m == month]
+        start, end = day_bounds(month, month + relativedelta(months=1) - timedelta(days=1))
+        totals = dict(
+            Order.objects.filter(buyer_id__in=buyers, created_at__gte=start, created_at__lt=end)
+            .values('buyer_id').annotate(n=Count('order_id')).order_by().values_list('buyer_id', 'n')
+        )
+        for buyer_id in buyers:
+            after = totals.get(buyer_id, 0)
+            before = after - new_orders[(buyer_id, month)]
+            if before <= 0 < after:
+                months[month]['active_buyers'] += 1
+            if before < 2 <= after:
+                months[month]['repeat_buyers'] += 1
+
+
+def record_signup(joined_at, customers=0, sellers=0, store_owners=0):
+    """Cộng tài khoản / chủ shop mới vào tháng tương ứng"""
+    _increment(PlatformSalesMonthly, ['month'], [{
+        'month': month_start(local_day(joined_at)),
+        'new_customers': customers,
+        'new_sellers': sellers,
+        'new_store_owners': store_owners,
+    }])
+
+
+# ===== TÍNH LẠI THEO KHOẢNG NGÀY =====
+
+def recompute_days(start_day, end_day):
+    """Tính lại toàn bộ rollup ngày trong [start_day, end_day] và các tháng chứa chúng"""
+    from orders.models import Order, OrderItem
+
+    start, end = day_bounds(start_day, end_day)
+    with transaction.atomic():
+        existing = set(
+            StoreAnalytics.objects.filter(date__gte=start_day, date__lte=end_day).values_list('store_id', 'date')
+        )
+        _save_store_days(
+            _store_day_rows(Q(created_at__gte=start, created_at__lt=end)),
+            zero_keys=existing,
+        )
+
+        CategorySalesDaily.objects.filter(date__gte=start_day, date__lte=end_day).delete()
+        CategorySalesDaily.objects.bulk_create([
+            CategorySalesDaily(
+                date=r['day'], category_id=r['category_id'],
+                revenue=r['amount'], items_sold=r['qty'], order_items=r['lines'],
+            )
+            for r in OrderItem.objects.filter(
+                sub_order__created_at__gte=start, sub_order__created_at__lt=end,
+                variant__product__category_id__isnull=False,
+            ).annotate(day=TruncDate('sub_order__created_at'))
+            .values('day', category_id=F('variant__product__category_id'))
+            .annotate(
+                qty=Sum('quantity'),
+                amount=_money(ExpressionWrapper(F('price_at_order') * F('quantity'), output_field=DecimalField())),
+                lines=Count('item_id'),
+            ).order_by()
+        ], batch_size=1000)
+
+        provinces = defaultdict(lambda: {'orders': 0, 'revenue': ZERO})
+        for r in Order.objects.filter(created_at__gte=start, created_at__lt=end)\
+                .annotate(day=TruncDate('created_at'))\
+                .values('day', province=F('address__province'))\
+                .annotate(n=Count('order_id'), total=_money('total_amount')).order_by():
+            # NULL (không có địa chỉ) và '' gộp chung
+            row = provinces[(r['day'], r['province'] or '')]
+            row['orders'] += r['n']
+            row['revenue'] += r['total']
+        ProvinceSalesDaily.objects.filter(date__gte=start_day, date__lte=end_day).delete()
+        ProvinceSalesDaily.objects.bulk_create([
+            ProvinceSalesDaily(date=day, province=province, **values)
+            for (day, province), values in provinces.items()
+        ], batch_size=1000)
+
+        month = month_start(start_day)
+        months = []
+        while month <= end_day:
+            months.append(month)
+            month += relativedelta(months=1)
+        refresh_months(months)
+
+
+def refresh_months(months):
+    """Tính lại PlatformSalesMonthly từ các bảng rollup ngày + bảng Order/User"""
+    from orders.models import Order
+    from store.models import StoreUser
+    from users.models import User
+
+    rows = []
+    for month in sorted(set(months)):
+        last_day = month + relativedelta(months=1) - timedelta(days=1)
+        start, end = day_bounds(month, last_day)
+        in_month = {'date__gte': month, 'date__lte': last_day}
+
+        store_agg = StoreAnalytics.objects.filter(**in_month).aggregate(
+            sub_orders=Coalesce(Sum('orders'), 0),
+            revenue=_money('revenue'),
+            shipping_fee=_money('shipping_fee'),
+            items_sold=Coalesce(Sum('items_sold'), 0),
+        )
+        province_agg = ProvinceSalesDaily.objects.filter(**in_month).aggregate(
+            orders=Coalesce(Sum('orders'), 0),
+            order_total=_money('revenue'),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT COUNT(*), COUNT(*) FILTER (WHERE n > 1)
+                FROM (
+                    SELECT buyer_id, COUNT(*) AS n FROM {Order._meta.db_table}
+                    WHERE created_at >= %s AND created_at < %s
+                    GROUP BY buyer_id
+                ) AS per_buyer
+            """, [start, end])
+            active_buyers, repeat_buyers = cursor.fetchone()
+        users = User.objects.filter(date_joined__gte=start, date_joined__lt=end).aggregate(
+            customers=Count('id', filter=Q(role='buyer')),
+            sellers=Count('id', filter=Q(role='seller')),
+        )
+        owners = StoreUser.objects.filter(role='owner', created_at__gte=start, created_at__lt=end).count()
+
+        rows.append(PlatformSalesMonthly(
+            month=month,
+            active_buyers=active_buyers,
+            repeat_buyers=repeat_buyers,
+            new_customers=users['customers'],
+            new_sellers=users['sellers'],
+            new_store_owners=owners,
+            **store_agg,
+            **province_agg,
+        ))
+
+    if rows:
+        PlatformSalesMonthly.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['month'],
+            update_fields=[
+                f.name for f in PlatformSalesMonthly._meta.concrete_fields
+                if not f.primary_key and f.name != 'month'
+            ],
+        )
+
+
+def rebuild_rollups(start_day=None, end_day=None, stdout=None):
+    """Dựng lại rollup theo từng khúc REBUILD_CHUNK_DAYS ngày. Trả về số ngày đã tính"""
+    from orders.models import Order
+
+    if start_day is None:
+        first = Order.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        if first is None:
+            return 0
+        start_day = local_day(first)
+    end_day = end_day or timezone.localdate()
+
+    day = start_day
+    while day <= end_day:
+        chunk_end = min(day + timedelta(days=REBUILD_CHUNK_DAYS - 1), end_day)
+        recompute_days(day, chunk_end)
+        if stdout:
+            stdout.write(f'  {day} → {chunk_end}')
+        day = chunk_end + timedelta(days=1)
+    return (end_day - start_day).days + 1
+
+
+# ===== GOM SỰ KIỆN THEO TRANSACTION =====
+
+_pending = threading.local()
+
+
+def _is_pending(batch):
+    """Callback flush của batch còn chờ commit (chưa chạy, chưa bị rollback bỏ đi)"""
+    return any(
+        isinstance(func, functools.partial) and func.args[0] is batch
+        for _, func, _ in transaction.get_connection().run_on_commit
+    )
+
+
+def schedule(kind, value):
+    """
+    Ghi nhận sự kiện (orders / sub_orders / days), xử lý gộp 1 lần sau commit.
+    Nhiều signal trong cùng transaction (VD: xóa Order cascade) chỉ tính lại 1 lần.
+    Batch gắn với callback on_commit của nó: transaction / savepoint rollback bỏ callback
+    → lần schedule sau mở batch mới, sự kiện của transaction đã rollback không bị tính.
+    """
+    batch = getattr(_pending, 'batch', None)
+    new = batch is None or not _is_pending(batch)
+    if new:
+        batch = _pending.batch = {'orders': set(), 'sub_orders': set(), 'days': set()}
+    batch[kind].add(value)
+    if new:
+        transaction.on_commit(functools.partial(flush_pending, batch))
+
+
+def flush_pending(batch):
+    if getattr(_pending, 'batch', None) is batch:
+        _pending.batch = None
+
+    days = sorted(batch['days'])
+    if days:
+        # Gộp các ngày liền nhau để ít lượt tính lại
+        run_start = prev = days[0]
+        for day in days[1:] + [None]:
+            if day is not None and day == prev + timedelta(days=1):
+                prev = day
+                continue
+            recompute_days(run_start, prev)
+            if day is not None:
+                run_start = prev = day
+    if batch['orders']:
+        record_orders(batch['orders'])
+    if batch['sub_orders']:
+        refresh_sub_orders(batch['sub_orders'])
@@ -0,0 +1,49 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.db import transaction
+
+from orders.models import Order, SubOrder
+from shipments.models import Shipment
+from users.models import User
+from .models import StoreUser
+from . import rollups
+
+
+# ===== ROLLUP THỐNG KÊ ĐƠN HÀNG =====
+
+@receiver(post_save, sender=Order)
+def record_order_rollup(sender, instance, created, **kwargs):
+    # SubOrder / OrderItem được bulk_create sau Order → đọc lại sau commit
+    if created:
+        rollups.schedule('orders', instance.order_id)
+
+
+@receiver(post_save, sender=Shipment)
+def refresh_rollup_on_shipment_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    rollups.schedule('sub_orders', instance.sub_order_id)
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=SubOrder)
+def recompute_rollup_on_delete(sender, instance, **kwargs):
+    rollups.schedule('days', rollups.local_day(instance.created_at))
+
+
+@receiver(post_save, sender=User)
+def record_signup_rollup(sender, instance, created, **kwargs):
+    if not created or instance.role not in ('buyer', 'seller'):
+        return
+    joined_at = instance.date_joined
+    is_buyer = instance.role == 'buyer'
+    transaction.on_commit(lambda: rollups.record_signup(
+        joined_at, customers=int(is_buyer), sellers=int(not is_buyer)
+    ))
+
+
+@receiver(post_save, sender=StoreUser)
+def record_store_owner_rollup(sender, instance, created, **kwargs):
+    if created and instance.role == 'owner':
+        created_at = instance.created_at
+        transaction.on_commit(lambda: rollups.record_signup(created_at, store_owners=1))
@@ -1,3 +1,67 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from address.models import Address
+from orders.models import Order, SubOrder
+from users.models import User
+from . import rollups
+from .models import Store, StoreAnalytics, ProvinceSalesDaily, PlatformSalesMonthly
+
+
+class RollupScheduleTest(TestCase):
+    """Rollup đơn hàng gom theo transaction và chạy sau commit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = Store.objects.create(
+            store_id='rollup-store', name='Rollup Store', slug='rollup-store',
+            email='rollup@example.com', join_date=timezone.now(),
+        )
+        cls.buyer = User.objects.create(username='rollup-buyer', email='rollup-buyer@example.com')
+        cls.address = Address.objects.create(user=cls.buyer, province='Hà Nội', ward='Phường 1', detail='1 Hàng Bài')
+
+    def _place(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            order = Order.objects.create(
+                buyer=self.buyer, address=self.address, total_amount=Decimal('330000'), shipping_fee=Decimal('30000'),
+            )
+            SubOrder.objects.create(order=order, store=self.store, subtotal=Decimal('300000'), shipping_fee=Decimal('30000'))
+        return order, callbacks
+
+    def test_orders_are_rolled_up_after_commit(self):
+        order, callbacks = self._place()
+        self.assertEqual(len(callbacks), 1)
+
+        today = rollups.local_day(order.created_at)
+        store_day = StoreAnalytics.objects.get(store=self.store, date=today)
+        self.assertEqual((store_day.orders, store_day.revenue, store_day.shipping_fee), (1, Decimal('300000'), Decimal('30000')))
+        province_day = ProvinceSalesDaily.objects.get(date=today, province=self.address.province)
+        self.assertEqual((province_day.orders, province_day.revenue), (1, Decimal('330000')))
+        month = PlatformSalesMonthly.objects.get(month=rollups.month_start(today))
+        self.assertEqual((month.orders, month.sub_orders, month.active_buyers), (1, 1, 1))
+
+        # Xóa Order (cascade SubOrder) → 2 signal, tính lại ngày đó 1 lần
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            order.delete()
+        self.assertEqual(len(callbacks), 1)
+        store_day.refresh_from_db()
+        self.assertEqual(store_day.orders, 0)
+        self.assertFalse(ProvinceSalesDaily.objects.filter(date=today).exists())
+
+    def test_rolled_back_events_are_dropped(self):
+        today = timezone.localdate()
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    rollups.schedule('sub_orders', -1)
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+            rollups.schedule('days', today)
+            rollups.schedule('orders', -2)
 
-# Create your tests here.
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(callbacks[0].args[0], {'orders': {-2}, 'sub_orders': set(), 'days': {today}})
@@ -62,6 +62,12 @@ class User(AbstractUser):
     )
     # AbstractUser đã có sẵn is_active, is_staff, is_superuser, last_login, date_joined
 
+    class Meta(AbstractUser.Meta):
+        swappable = 'AUTH_USER_MODEL'
+        indexes = [
+            models.Index(fields=['-date_joined', '-id'], name='user_date_joined_idx'),
+        ]
+
     def __str__(self):
         return self.username
     